@@ -0,0 +1,199 @@
+"""
+Sequentially decoded video frames.
+
+Seeking (cv2.CAP_PROP_POS_FRAMES) before every read makes FFmpeg re-decode
+from the previous keyframe each time, which on long-GOP H.264 costs up to a
+whole GOP per sampled frame. FrameSource instead decodes front to back,
+grabbing (not converting) the frames it skips and retrieving only the
+selected ones. Only gaps longer than max_skip frames are seeked, where a
+seek is cheaper than decoding through. Decoding runs on a background
+thread into a bounded prefetch queue, so it overlaps with the consumer.
+
+Example:
+    source = FrameSource("clip.mp4", target_fps=12)
+    for frame_number, frame in source:
+        timestamp_ms = source.timestamp_ms(frame_number)
+"""
+
+import itertools
+import queue
+import threading
+from typing import Iterator, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# x264's default keyframe interval: seeking across a longer gap never
+# decodes more frames than grabbing through it would
+DEFAULT_MAX_SKIP = 250
+
+# A frame that fails to grab or retrieve is skipped; this many failures in a
+# row (or one past CAP_PROP_FRAME_COUNT, unless decoding to EOF) end the stream
+MAX_CONSECUTIVE_FAILURES = 30
+
+_END = object()
+
+
+def sample_indices(total_frames: int, fps: float, num_frames: Optional[int] = None,
+                   target_fps: Optional[float] = None) -> np.ndarray:
+    """
+    Frame numbers to keep: every frame, num_frames evenly spaced, or as many
+    as target_fps gives over the video's duration (evenly spaced).
+    """
+    if target_fps is not None:
+        duration = total_frames / fps if fps > 0 else 0
+        num_frames = int(duration * target_fps)
+    if num_frames is None:
+        return np.arange(total_frames)
+    return np.linspace(0, total_frames - 1, num_frames, dtype=int)
+
+
+class FrameSource:
+    """
+    Iterable over (frame_number, BGR frame) of a video file, in order.
+
+    Each iteration decodes the file again from the start on its own thread.
+    Repeated frame numbers (target_fps above the source fps) yield the same
+    array again; consumers must not modify frames in place.
+    Frames that fail to decode are skipped (their numbers are missing from
+    the output). With to_eof, every frame is decoded until the stream really
+    ends, whatever CAP_PROP_FRAME_COUNT reports (containers may report 0 or
+    too few frames).
+    """
+
+    def __init__(self, path: str, num_frames: Optional[int] = None, target_fps: Optional[float] = None,
+                 indices: Optional[Sequence[int]] = None, prefetch: int = 8,
+                 max_skip: int = DEFAULT_MAX_SKIP, to_eof: bool = False):
+        """
+        Args:
+            path: Video file
+            num_frames: Keep this many evenly spaced frames
+            target_fps: Keep frames evenly spaced at this rate (overrides num_frames)
+            indices: Explicit frame numbers to keep (overrides both)
+            prefetch: Decoded frames buffered ahead of the consumer
+            max_skip: Seek instead of decoding through gaps longer than this
+            to_eof: Keep every frame up to the end of the stream, ignoring
+                the reported frame count (overrides the sampling arguments)
+        """
+        self.path = str(path)
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {self.path}")
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+
+        self.to_eof = to_eof
+        if to_eof:
+            self.indices = None  # Open-ended: frame numbers are only known once decoded
+        else:
+            if indices is None:
+                indices = sample_indices(self.frame_count, self.fps, num_frames, target_fps)
+            self.indices = np.sort(np.asarray(indices, dtype=int))
+        self.prefetch = max(1, prefetch)
+        self.max_skip = max_skip
+
+    @property
+    def duration(self) -> float:
+        """Length of the video in seconds (0 if the fps is unknown)."""
+        return self.frame_count / self.fps if self.fps > 0 else 0.0
+
+    def timestamp_ms(self, frame_number: int) -> int:
+        """Presentation time of a frame number."""
+        return int(frame_number * 1000 / self.fps) if self.fps > 0 else 0
+
+    def __len__(self) -> int:
+        """Number of selected frames (the reported frame count when decoding to EOF)."""
+        return self.frame_count if self.indices is None else len(self.indices)
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        frames: queue.Queue = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._decode, args=(frames, stop),
+                                  name="frame-source", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = frames.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            while thread.is_alive():  # Unblock a put() on a full queue
+                try:
+                    frames.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+    def frames(self) -> Iterator[np.ndarray]:
+        """The selected frames without their numbers."""
+        return (frame for _, frame in self)
+
+    def _decode(self, frames: queue.Queue, stop: threading.Event):
+        """Decode thread: put (frame_number, frame) for each selected index, then _END."""
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        cap = cv2.VideoCapture(self.path)
+        try:
+            if not cap.isOpened():
+                raise ValueError(f"Cannot open video: {self.path}")
+            position = 0  # Number of the frame the next grab() returns
+            failures = 0  # Consecutive failed grab()/retrieve() calls
+            last = None  # Last (frame_number, frame) put
+
+            def failed() -> bool:
+                """Count a failed frame; True once the stream is over (past frame_count or too many failures)."""
+                nonlocal failures
+                failures += 1
+                if failures >= MAX_CONSECUTIVE_FAILURES:
+                    return True
+                return not self.to_eof and 0 < self.frame_count <= position
+
+            indices = itertools.count() if self.indices is None else self.indices
+            for frame_number in indices:
+                frame_number = int(frame_number)
+                if frame_number < position:  # Repeated index: same frame again, unless it failed
+                    if last is not None and last[0] == frame_number and not put(last):
+                        break
+                    continue
+                if frame_number - position > self.max_skip:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                    position = frame_number
+                grabbed, ended = False, False
+                while position <= frame_number and not ended:
+                    grabbed = cap.grab()
+                    position += 1
+                    if grabbed:
+                        failures = 0
+                    else:
+                        ended = failed()
+                if ended:
+                    break
+                if not grabbed:
+                    continue  # Undecodable frame: skip this index
+                ret, frame = cap.retrieve()
+                if not ret:
+                    if failed():
+                        break
+                    continue
+                last = (frame_number, frame)
+                if not put(last):
+                    break
+            put(_END)
+        except Exception as e:
+            put(e)
+        finally:
+            cap.release()
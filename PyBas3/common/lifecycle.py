@@ -0,0 +1,114 @@
+"""
+Participant lifecycle tracking.
+
+Per-UUID state (NDI senders, smoothing state, score slots, score files)
+is created when a participant first appears. ParticipantLifecycle tracks
+when each UUID was last seen and fires callbacks on state changes, so
+that state is torn down once a participant has been gone long enough:
+
+    enter  -> first sighting
+    active -> seen again (after enter, or back from stale)
+    stale  -> not seen for stale_after seconds
+    gone   -> not seen for gone_after seconds; the UUID is forgotten
+
+Used independently by the Vision and Scoring processes.
+"""
+
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+ENTER = "enter"
+ACTIVE = "active"
+STALE = "stale"
+GONE = "gone"
+STATES = (ENTER, ACTIVE, STALE, GONE)
+
+
+class ParticipantLifecycle:
+    """
+    Tracks participant states and evicts UUIDs not seen within a TTL.
+
+    Example:
+        lifecycle = ParticipantLifecycle(stale_after=2.0, gone_after=30.0)
+        lifecycle.on(GONE, streamer.remove_stream)
+        lifecycle.seen(uuids)   # every frame
+        lifecycle.update()      # fires stale/gone callbacks
+    """
+
+    def __init__(self, stale_after: float = 2.0, gone_after: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if gone_after < stale_after:
+            raise ValueError("gone_after must be >= stale_after")
+        self.stale_after = stale_after
+        self.gone_after = gone_after
+        self.clock = clock
+        self._last_seen: Dict[str, float] = {}
+        self._states: Dict[str, str] = {}
+        self._callbacks: Dict[str, List[Callable[[str], None]]] = {state: [] for state in STATES}
+
+    def on(self, state: str, callback: Callable[[str], None]):
+        """Register callback(uuid) for a state change."""
+        if state not in self._callbacks:
+            raise ValueError(f"Unknown lifecycle state '{state}'")
+        self._callbacks[state].append(callback)
+
+    def _fire(self, state: str, uuid: str):
+        self._states[uuid] = state
+        for callback in self._callbacks[state]:
+            try:
+                callback(uuid)
+            except Exception as e:
+                # One failing teardown must not block the others
+                print(f"[lifecycle] {state} callback failed for {uuid[:8]}: {e}")
+
+    def seen(self, uuids: Iterable[str], now: Optional[float] = None):
+        """Record sightings (enter for new UUIDs, active for returning ones)."""
+        now = self.clock() if now is None else now
+        for uuid in uuids:
+            state = self._states.get(uuid)
+            self._last_seen[uuid] = now
+            if state is None:
+                self._fire(ENTER, uuid)
+            elif state != ACTIVE:
+                self._fire(ACTIVE, uuid)
+
+    def update(self, now: Optional[float] = None) -> List[str]:
+        """Apply TTLs, firing stale/gone callbacks. Returns UUIDs that went gone."""
+        now = self.clock() if now is None else now
+        gone = []
+        for uuid, last_seen in list(self._last_seen.items()):
+            age = now - last_seen
+            if age >= self.gone_after:
+                gone.append(uuid)
+            elif age >= self.stale_after and self._states[uuid] != STALE:
+                self._fire(STALE, uuid)
+        for uuid in gone:
+            self.evict(uuid)
+        return gone
+
+    def evict(self, uuid: str):
+        """Mark a participant gone now (fires gone callbacks) and forget it."""
+        if uuid not in self._last_seen:
+            return
+        self._fire(GONE, uuid)
+        del self._last_seen[uuid]
+        del self._states[uuid]
+
+    def evict_all(self):
+        """Evict every tracked participant (e.g. on shutdown)."""
+        for uuid in list(self._last_seen):
+            self.evict(uuid)
+
+    def state(self, uuid: str) -> str:
+        """Current state of a UUID (gone if untracked)."""
+        return self._states.get(uuid, GONE)
+
+    def states(self) -> Dict[str, str]:
+        """Snapshot of {uuid: state} for tracked participants."""
+        return dict(self._states)
+
+    def __contains__(self, uuid: str) -> bool:
+        return uuid in self._last_seen
+
+    def __len__(self) -> int:
+        return len(self._last_seen)
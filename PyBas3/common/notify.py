@@ -0,0 +1,199 @@
+"""
+Cross-process wake-on-write notification for shared memory buffers.
+
+A writer calls BufferNotifier.notify() after publishing; readers block in
+BufferWaiter.wait() until the next publish instead of polling on a fixed
+schedule.
+
+Each waiter owns a named FIFO in <tempdir>/<buffer_name>.notify/.
+notify() writes one byte to every registered FIFO without blocking, so all
+waiters wake (broadcast), and FIFOs left by readers that died are removed.
+The bytes only mean "something changed": readers still check the buffer's
+own sequence counters, so a coalesced or missed wake-up costs latency,
+never correctness.
+
+Where named FIFOs are unavailable (Windows), wait() sleeps in short steps
+instead; callers re-check their buffer after every wait() either way.
+"""
+
+import errno
+import os
+import select
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from uuid import uuid4
+
+NOTIFY_SUPPORTED = hasattr(os, "mkfifo")
+
+# Sleep step for the polling fallback (seconds)
+FALLBACK_POLL_INTERVAL = 0.002
+
+# Writers re-list waiters at least this often (seconds), in case a
+# directory mtime change was too fine-grained to notice
+RESCAN_INTERVAL = 1.0
+
+FIFO_SUFFIX = ".fifo"
+
+
+def notify_dir(buffer_name: str) -> Path:
+    """Directory holding the waiter FIFOs for a shared memory buffer."""
+    return Path(tempfile.gettempdir()) / f"{buffer_name}.notify"
+
+
+class BufferNotifier:
+    """
+    Wakes every BufferWaiter of a buffer (writer side).
+
+    Example:
+        notifier = BufferNotifier("bas_pose_data")
+        ...write frame...
+        notifier.notify()
+    """
+
+    def __init__(self, buffer_name: str):
+        self.directory = notify_dir(buffer_name)
+        self.enabled = NOTIFY_SUPPORTED
+        self._fds: Dict[str, int] = {}  # FIFO name -> write fd
+        self._dir_mtime: Optional[int] = None
+        self._next_scan = 0.0
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _scan(self):
+        """Open FIFOs of new waiters and forget removed ones."""
+        try:
+            names = {entry.name for entry in os.scandir(self.directory) if entry.name.endswith(FIFO_SUFFIX)}
+        except FileNotFoundError:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            names = set()
+
+        for name in set(self._fds) - names:
+            os.close(self._fds.pop(name))
+        for name in names - set(self._fds):
+            path = self.directory / name
+            try:
+                self._fds[name] = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    path.unlink(missing_ok=True)  # Nobody reading: waiter died
+
+    def _drop(self, name: str):
+        """Close and remove a dead waiter's FIFO."""
+        os.close(self._fds.pop(name))
+        (self.directory / name).unlink(missing_ok=True)
+
+    def notify(self):
+        """Wake all waiters (never blocks)."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is None or mtime != self._dir_mtime or now >= self._next_scan:
+            self._scan()
+            self._dir_mtime = mtime
+            self._next_scan = now + RESCAN_INTERVAL
+
+        for name, fd in list(self._fds.items()):
+            try:
+                os.write(fd, b"\x01")
+            except BlockingIOError:
+                pass  # FIFO full: the waiter has wake-ups pending already
+            except OSError:
+                self._drop(name)  # EPIPE: waiter process is gone
+
+    def close(self):
+        """Close all waiter FIFOs (they stay registered for the next writer)."""
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+
+
+class BufferWaiter:
+    """
+    Blocks until a BufferNotifier of the same buffer notifies (reader side).
+
+    Example:
+        waiter = BufferWaiter("bas_pose_data")
+        while not reader.has_new_frame():
+            waiter.wait(0.5)
+    """
+
+    def __init__(self, buffer_name: str):
+        self.path: Optional[Path] = None
+        self._fd: Optional[int] = None
+        self._keepalive_fd: Optional[int] = None
+        if not NOTIFY_SUPPORTED:
+            return
+
+        directory = notify_dir(buffer_name)
+        tmp_path = directory / f"{os.getpid()}-{uuid4().hex[:8]}"
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            os.mkfifo(tmp_path, 0o600)
+            self._fd = os.open(tmp_path, os.O_RDONLY | os.O_NONBLOCK)
+            # Our own write end keeps the FIFO from reporting EOF (and waking
+            # us constantly) whenever no writer has it open
+            self._keepalive_fd = os.open(tmp_path, os.O_WRONLY | os.O_NONBLOCK)
+            # Only publish the FIFO once it is open, so writers never mistake it for a dead waiter
+            self.path = tmp_path.with_name(tmp_path.name + FIFO_SUFFIX)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[notify] FIFO unavailable ({e}); falling back to polling")
+            self.close()
+            tmp_path.unlink(missing_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        """True if wake-ups come from notifications rather than polling."""
+        return self._fd is not None
+
+    def fileno(self) -> int:
+        """Readable fd for use in external select() loops (enabled waiters only)."""
+        return self._fd
+
+    def _drain(self):
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until notified or timeout seconds passed.
+
+        May return early (e.g. for a wake-up that was already pending), so
+        callers re-check their buffer after every call.
+
+        Returns:
+            True if a notification arrived
+        """
+        if self._fd is None:
+            time.sleep(max(0.0, min(timeout, FALLBACK_POLL_INTERVAL)))
+            return False
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if readable:
+            self._drain()
+            return True
+        return False
+
+    def close(self):
+        """Unregister and close the FIFO."""
+        for fd in (self._fd, self._keepalive_fd):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._keepalive_fd = None
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
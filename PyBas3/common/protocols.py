@@ -28,6 +28,54 @@ IN_ZONE_BYTES = 1
 POSE_RECORD_SIZE = UUID_BYTES + TIMESTAMP_BYTES + (MEDIAPIPE_LANDMARKS * KEYPOINT_BYTES) + IN_ZONE_BYTES
 POSE_BUFFER_SIZE = POSE_RECORD_SIZE * MAX_PARTICIPANTS
 
+# Versioned ring buffer layout (shared memory holds the last RING_SLOTS frames)
+# Header: magic, layout version, latest frame id, ring slots, record size
+RING_MAGIC = b'BASP'
+RING_LAYOUT_VERSION = 1
+RING_SLOTS = 4
+RING_HEADER_FORMAT = '<4sIQII'
+RING_HEADER_BYTES = 24
+# Slot header: seqlock counter (odd while writing), frame id, participant count
+SLOT_HEADER_FORMAT = '<QQI4x'
+SLOT_HEADER_BYTES = 24
+# Slots are 8-byte aligned so the 64-bit counters never straddle a word
+FRAME_SLOT_SIZE = (SLOT_HEADER_BYTES + POSE_BUFFER_SIZE + 7) // 8 * 8
+RING_BUFFER_SIZE = RING_HEADER_BYTES + FRAME_SLOT_SIZE * RING_SLOTS
+
+# Score table (Scoring -> TouchDesigner/dashboard)
+SCORE_BUFFER_NAME = 'bas_score_data'
+SCORE_TABLE_MAGIC = b'BASS'
+SCORE_TABLE_VERSION = 1
+SCORE_TABLE_SLOTS = 32
+# Header: magic, layout version, slot count, entry size
+SCORE_HEADER_FORMAT = '<4sIII'
+SCORE_HEADER_BYTES = 16
+# Entry: seqlock counter, uuid, in_zone, reference_frame, timestamp, score, raw_movement
+SCORE_ENTRY_FORMAT = '<Q36s?3xiddd4x'
+SCORE_ENTRY_BYTES = 80
+SCORE_TABLE_SIZE = SCORE_HEADER_BYTES + SCORE_ENTRY_BYTES * SCORE_TABLE_SLOTS
+
+# Thumbnail atlas (Vision -> TouchDesigner/dashboard)
+# Pixels form one (THUMB_ATLAS_SLOTS * THUMB_HEIGHT, THUMB_WIDTH, 3) BGR image,
+# slot i occupying rows i*THUMB_HEIGHT .. (i+1)*THUMB_HEIGHT
+THUMBNAIL_BUFFER_NAME = 'bas_thumbnails'
+THUMB_ATLAS_MAGIC = b'BAST'
+THUMB_ATLAS_VERSION = 1
+THUMB_ATLAS_SLOTS = 16
+THUMB_WIDTH = 160
+THUMB_HEIGHT = 120
+THUMB_CHANNELS = 3
+# Header: magic, layout version, slot count, width, height, channels, entry size, pixel offset
+THUMB_HEADER_FORMAT = '<4sIIIIIII'
+THUMB_HEADER_BYTES = 32
+# Entry: seqlock counter (odd while writing, guards the slot's pixels too), uuid, timestamp
+THUMB_ENTRY_FORMAT = '<Q36s4xd'
+THUMB_ENTRY_BYTES = 56
+# Pixel rows start 64-byte aligned after the entry table
+THUMB_PIXELS_OFFSET = (THUMB_HEADER_BYTES + THUMB_ENTRY_BYTES * THUMB_ATLAS_SLOTS + 63) // 64 * 64
+THUMB_SLOT_BYTES = THUMB_WIDTH * THUMB_HEIGHT * THUMB_CHANNELS
+THUMB_ATLAS_SIZE = THUMB_PIXELS_OFFSET + THUMB_SLOT_BYTES * THUMB_ATLAS_SLOTS
+
 
 # ============================================================================
 # Data Structures
@@ -0,0 +1,263 @@
+"""
+Shared memory score table.
+
+Fixed-layout table in `bas_score_data` with one entry per participant,
+written by the Scoring module and read by TouchDesigner / the dashboard.
+Each entry is guarded by its own seqlock counter (odd while writing), so
+readers get consistent entries without locks and can tell exactly which
+entries changed since their last poll by comparing counters. The writer's
+notify() wakes readers blocked in wait_for_changes(). Slot assignment,
+eviction and adoption are shared with the thumbnail atlas (slot_table.py).
+"""
+
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from .notify import BufferNotifier, BufferWaiter
+from .protocols import (
+    SCORE_BUFFER_NAME,
+    SCORE_TABLE_MAGIC,
+    SCORE_TABLE_VERSION,
+    SCORE_TABLE_SLOTS,
+    SCORE_HEADER_FORMAT,
+    SCORE_HEADER_BYTES,
+    SCORE_ENTRY_FORMAT,
+    SCORE_ENTRY_BYTES,
+    SCORE_TABLE_SIZE,
+    UUID_BYTES,
+)
+from .slot_table import SlotTableWriter, decode_uuid, seqlock_begin, seqlock_read, seqlock_seq
+
+
+def _entry_offset(slot: int) -> int:
+    """Byte offset of a score table entry."""
+    return SCORE_HEADER_BYTES + slot * SCORE_ENTRY_BYTES
+
+
+def score_table_is_valid(buffer: memoryview) -> bool:
+    """Check that buffer holds a score table matching this protocol version."""
+    if len(buffer) < SCORE_TABLE_SIZE:
+        return False
+    magic, version, slots, entry_size = struct.unpack_from(SCORE_HEADER_FORMAT, buffer, 0)
+    return (
+        magic == SCORE_TABLE_MAGIC
+        and version == SCORE_TABLE_VERSION
+        and slots == SCORE_TABLE_SLOTS
+        and entry_size == SCORE_ENTRY_BYTES
+    )
+
+
+def read_score_entry(buffer: memoryview, slot: int, retries: int = 5) -> Tuple[int, Optional[dict]]:
+    """
+    Read one entry consistently.
+
+    Returns:
+        (seq, score dict or None if the slot is empty). seq is 0 if the
+        entry never became stable.
+    """
+    offset = _entry_offset(slot)
+    seq, values = seqlock_read(
+        buffer, offset, lambda: struct.unpack_from(SCORE_ENTRY_FORMAT, buffer, offset), retries
+    )
+    if values is None:
+        return 0, None
+    _, uuid_bytes, in_zone, ref_frame, timestamp, score, raw = values
+    uuid = decode_uuid(uuid_bytes)
+    if not uuid:
+        return seq, None
+    return seq, {
+        'uuid': uuid,
+        'timestamp': timestamp,
+        'reference_frame': ref_frame,
+        'score_0_to_100': score,
+        'raw_movement': raw,
+        'in_zone': in_zone,
+    }
+
+
+class ScoreTableWriter(SlotTableWriter):
+    """Publishes per-participant scores into the shared memory score table."""
+
+    def __init__(self, buffer_name: str = SCORE_BUFFER_NAME, adopt: bool = True):
+        """
+        Args:
+            buffer_name: Shared memory name
+            adopt: Keep entries left by a previous scorer run (listed in
+                `adopted`, for the caller to age out); False clears them
+        """
+        self.notifier = BufferNotifier(buffer_name)
+        super().__init__(buffer_name, SCORE_TABLE_SIZE, SCORE_TABLE_SLOTS, adopt)
+
+    def _is_valid(self, buf: memoryview) -> bool:
+        return score_table_is_valid(buf)
+
+    def _init_header(self, buf: memoryview):
+        struct.pack_into(
+            SCORE_HEADER_FORMAT, buf, 0,
+            SCORE_TABLE_MAGIC, SCORE_TABLE_VERSION, SCORE_TABLE_SLOTS, SCORE_ENTRY_BYTES
+        )
+
+    def _read_uuid(self, slot: int) -> Optional[str]:
+        _, entry = read_score_entry(self.shm.buf, slot)
+        return entry['uuid'] if entry else None
+
+    def _clear_slot(self, slot: int):
+        self._write_entry(slot, '', None)
+
+    def _write_entry(self, slot: int, uuid: str, data: Optional[dict]):
+        """Seqlock-protected write of one entry (data=None clears it)."""
+        buf = self.shm.buf
+        offset = _entry_offset(slot)
+        write_seq = seqlock_begin(buf, offset)
+        if data is None:
+            values = (b'', False, 0, 0.0, 0.0, 0.0)
+        else:
+            values = (
+                uuid.encode('utf-8')[:UUID_BYTES],
+                bool(data.get('in_zone', False)),
+                int(data.get('reference_frame', 0)),
+                float(data.get('timestamp', time.time())),
+                float(data.get('score_0_to_100', 0.0)),
+                float(data.get('raw_movement', 0.0)),
+            )
+        struct.pack_into(SCORE_ENTRY_FORMAT, buf, offset, write_seq + 1, *values)
+
+    def publish(self, score_data: dict):
+        """Write (or update) the entry for score_data['uuid']."""
+        if not self.shm:
+            return
+        uuid = score_data['uuid']
+        slot = self._slot_for(uuid)
+        if slot is None:
+            return
+        self._write_entry(slot, uuid, score_data)
+        self._touch(uuid)
+
+    def notify(self):
+        """Wake blocked readers; call once after a batch of publish()/retire() calls."""
+        self.notifier.notify()
+
+    def close(self):
+        """Close shared memory connection (does not unlink - readers may still use it)."""
+        self.notifier.close()
+        super().close()
+
+    def unlink(self):
+        """Unlink shared memory. Only call when no other processes are using it."""
+        self.notifier.close()
+        super().unlink()
+
+
+class ScoreTableReader:
+    """
+    Reads the shared memory score table.
+
+    Example:
+        reader = ScoreTableReader()
+        if reader.connect():
+            changed, removed = reader.poll_changes()
+    """
+
+    def __init__(self, buffer_name: str = SCORE_BUFFER_NAME):
+        self.buffer_name = buffer_name
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self._seqs = [0] * SCORE_TABLE_SLOTS  # Last seen seq per slot
+        self._slot_uuids: Dict[int, str] = {}  # slot -> uuid last seen there
+        self.scores: Dict[str, dict] = {}  # Current scores by uuid
+        self._waiter: Optional[BufferWaiter] = None  # Created on first wait_for_changes()
+
+    def connect(self) -> bool:
+        """Connect to existing score table. Returns True on success."""
+        if self.shm:
+            return True
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.buffer_name)
+        except FileNotFoundError:
+            return False
+        if not score_table_is_valid(self.shm.buf):
+            self.close()
+            return False
+        return True
+
+    def has_changes(self) -> bool:
+        """True if any entry counter moved since the last poll."""
+        if not self.shm:
+            return False
+        buf = self.shm.buf
+        return any(
+            seqlock_seq(buf, _entry_offset(slot)) != self._seqs[slot]
+            for slot in range(SCORE_TABLE_SLOTS)
+        )
+
+    def wait_for_changes(self, timeout: float) -> bool:
+        """
+        Block until an entry changes (the writer calls notify()) or timeout.
+
+        Returns:
+            True if there are changes to poll, False on timeout
+        """
+        if self._waiter is None:
+            self._waiter = BufferWaiter(self.buffer_name)
+        deadline = time.monotonic() + timeout
+        while not self.has_changes():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._waiter.wait(remaining)
+        return True
+
+    def poll_changes(self) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Read only entries whose counter moved since the last poll.
+
+        Returns:
+            (changed {uuid: score_dict}, removed [uuid])
+        """
+        changed: Dict[str, dict] = {}
+        removed: List[str] = []
+        if not self.shm:
+            return changed, removed
+
+        buf = self.shm.buf
+        for slot in range(SCORE_TABLE_SLOTS):
+            seq = seqlock_seq(buf, _entry_offset(slot))
+            if seq == self._seqs[slot]:
+                continue
+            seq, entry = read_score_entry(buf, slot)
+            if seq == 0:
+                continue  # Still being written; pick it up next poll
+            self._seqs[slot] = seq
+
+            previous = self._slot_uuids.pop(slot, None)
+            if previous and (entry is None or entry['uuid'] != previous):
+                self.scores.pop(previous, None)
+                removed.append(previous)
+            if entry:
+                self._slot_uuids[slot] = entry['uuid']
+                self.scores[entry['uuid']] = entry
+                changed[entry['uuid']] = entry
+
+        return changed, removed
+
+    def poll(self) -> Dict[str, dict]:
+        """Apply changes and return all current scores ({uuid: score_dict})."""
+        self.poll_changes()
+        return self.scores.copy()
+
+    def close(self):
+        """Close shared memory connection (does not unlink)."""
+        if self._waiter:
+            self._waiter.close()
+            self._waiter = None
+        if self.shm:
+            self.shm.close()
+            self.shm = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -3,12 +3,26 @@ Binary protocol for shared memory pose data.
 
 Provides encoding/decoding functions for the shared memory buffer format
 used for inter-process communication between Vision and Scoring modules.
+
+The buffer is a ring of RING_SLOTS frame slots behind a small header.
+Each slot is guarded by a seqlock: the writer bumps the slot counter to an
+odd value, writes the records, then bumps it to the next even value and
+publishes the frame id in the header. Readers copy a slot out and retry if
+the counter was odd or changed underneath them, so no lock is needed.
+
+Records can be handled either one ParticipantPose at a time (encode_pose /
+decode_pose) or as whole NumPy arrays via POSE_RECORD_DTYPE, which mirrors
+POSE_RECORD_SIZE byte for byte. The array path is what the hot loops use.
 """
 
 import struct
-from typing import List, Optional
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
 from multiprocessing import shared_memory
 
+import numpy as np
+
 from .protocols import (
     SHARED_MEMORY_BUFFER_NAME,
     MAX_PARTICIPANTS,
@@ -19,9 +33,83 @@ from .protocols import (
     TIMESTAMP_BYTES,
     KEYPOINT_BYTES,
     IN_ZONE_BYTES,
+    RING_MAGIC,
+    RING_LAYOUT_VERSION,
+    RING_SLOTS,
+    RING_HEADER_FORMAT,
+    RING_HEADER_BYTES,
+    SLOT_HEADER_FORMAT,
+    SLOT_HEADER_BYTES,
+    FRAME_SLOT_SIZE,
+    RING_BUFFER_SIZE,
     ParticipantPose,
 )
 
+# Byte offsets of the 64-bit counters used by the seqlock
+_LATEST_FRAME_OFFSET = 8
+_ZERO_RECORDS = memoryview(bytes(POSE_BUFFER_SIZE))
+
+# Packed (unaligned) record layout, identical to encode_pose output
+POSE_RECORD_DTYPE = np.dtype([
+    ('uuid', f'S{UUID_BYTES}'),
+    ('timestamp', '<f8'),
+    ('keypoints', '<f4', (MEDIAPIPE_LANDMARKS, 4)),
+    ('in_zone', 'u1'),
+])
+assert POSE_RECORD_DTYPE.itemsize == POSE_RECORD_SIZE
+
+
+@dataclass
+class PoseArrays:
+    """
+    Column view of a frame of poses.
+    
+    keypoints is (N, 33, 4) float32 holding (x, y, z, visibility).
+    """
+    uuids: List[str]
+    timestamps: np.ndarray  # (N,) float64
+    keypoints: np.ndarray  # (N, 33, 4) float32
+    in_zone: np.ndarray  # (N,) bool
+    
+    def __len__(self) -> int:
+        return len(self.uuids)
+    
+    def to_poses(self) -> List[ParticipantPose]:
+        """Convert to ParticipantPose objects (compatibility path)."""
+        kp_lists = self.keypoints.tolist()
+        return [
+            ParticipantPose.from_tuple_list(uuid, float(ts), kps, bool(zone))
+            for uuid, ts, kps, zone in zip(self.uuids, self.timestamps, kp_lists, self.in_zone)
+        ]
+    
+    def to_dicts(self) -> List[dict]:
+        """Convert to the reader's dict format (keypoints as tuples)."""
+        kp_lists = self.keypoints.tolist()
+        return [
+            {
+                'uuid': uuid,
+                'timestamp': float(ts),
+                'keypoints': [tuple(kp) for kp in kps],
+                'in_zone': bool(zone),
+            }
+            for uuid, ts, kps, zone in zip(self.uuids, self.timestamps, kp_lists, self.in_zone)
+        ]
+    
+    @classmethod
+    def from_poses(cls, poses: Sequence[ParticipantPose]) -> "PoseArrays":
+        """Build arrays from ParticipantPose objects."""
+        keypoints = np.zeros((len(poses), MEDIAPIPE_LANDMARKS, 4), dtype=np.float32)
+        for i, pose in enumerate(poses):
+            kps = pose.to_tuple_list()[:MEDIAPIPE_LANDMARKS]
+            if kps:
+                keypoints[i, :len(kps)] = kps
+        return cls(
+            uuids=[pose.uuid for pose in poses],
+            timestamps=np.array([pose.timestamp for pose in poses], dtype=np.float64),
+            keypoints=keypoints,
+            in_zone=np.array([pose.in_zone for pose in poses], dtype=bool),
+        )
+
 
 def encode_pose(pose: ParticipantPose, buffer: bytearray, offset: int) -> int:
     """
@@ -92,3 +180,219 @@ def decode_pose(buffer: memoryview, offset: int) -> Optional[ParticipantPose]:
     in_zone = bool(buffer[offset])
     
     return ParticipantPose.from_tuple_list(uuid, timestamp, keypoints, in_zone)
+
+
+def pose_records(buffer: memoryview, offset: int = 0, count: int = MAX_PARTICIPANTS) -> np.ndarray:
+    """
+    Structured NumPy view of count records starting at offset (no copy).
+    
+    records['keypoints'] is an (count, 33, 4) float32 view over buffer.
+    """
+    return np.frombuffer(buffer, dtype=POSE_RECORD_DTYPE, count=count, offset=offset)
+
+
+def encode_pose_arrays(
+    buffer: memoryview,
+    offset: int,
+    uuids: Sequence[str],
+    timestamps: Sequence[float],
+    keypoints: np.ndarray,
+    in_zone: Sequence[bool]
+) -> int:
+    """
+    Encode a whole frame of poses with one vectorized write per field.
+    
+    Args:
+        buffer: Writable buffer (bytearray or shm.buf)
+        offset: Starting byte offset of the first record
+        uuids: Participant UUIDs
+        timestamps: Per-participant timestamps
+        keypoints: (N, 33, 4) array of (x, y, z, visibility)
+        in_zone: Per-participant zone flags
+    
+    Returns:
+        New offset after encoding (offset + N * POSE_RECORD_SIZE)
+    """
+    count = len(uuids)
+    if count == 0:
+        return offset
+    records = pose_records(buffer, offset, count)
+    # Same space padding as encode_pose so both decoders agree
+    records['uuid'] = [u.encode('utf-8').ljust(UUID_BYTES)[:UUID_BYTES] for u in uuids]
+    records['timestamp'] = timestamps
+    records['keypoints'] = keypoints
+    records['in_zone'] = in_zone
+    return offset + count * POSE_RECORD_SIZE
+
+
+def decode_pose_arrays(buffer: memoryview, offset: int, count: int) -> PoseArrays:
+    """
+    Decode count records as arrays.
+    
+    keypoints/timestamps/in_zone are views over buffer (no copy); call
+    .copy() if the data must outlive the next write. Empty slots are dropped.
+    """
+    records = pose_records(buffer, offset, count)
+    uuids = [u.decode('utf-8').strip('\x00').strip() for u in records['uuid'].tolist()]
+    occupied = [i for i, u in enumerate(uuids) if u]
+    if len(occupied) != count:
+        records = records[occupied]
+        uuids = [uuids[i] for i in occupied]
+    return PoseArrays(
+        uuids=uuids,
+        timestamps=records['timestamp'],
+        keypoints=records['keypoints'],
+        in_zone=records['in_zone'].view(bool),
+    )
+
+
+# ============================================================================
+# Ring buffer (seqlock-versioned frames)
+# ============================================================================
+
+def _slot_offset(frame_id: int) -> int:
+    """Byte offset of the ring slot holding frame_id."""
+    return RING_HEADER_BYTES + (frame_id % RING_SLOTS) * FRAME_SLOT_SIZE
+
+
+def ring_is_valid(buffer: memoryview) -> bool:
+    """Check that buffer holds a ring header matching this protocol version."""
+    if len(buffer) < RING_BUFFER_SIZE:
+        return False
+    magic, version, _, slots, record_size = struct.unpack_from(RING_HEADER_FORMAT, buffer, 0)
+    return (
+        magic == RING_MAGIC
+        and version == RING_LAYOUT_VERSION
+        and slots == RING_SLOTS
+        and record_size == POSE_RECORD_SIZE
+    )
+
+
+def ring_init(buffer: memoryview) -> int:
+    """
+    Prepare buffer for ring writes.
+    
+    Keeps an existing compatible ring so a restarted writer continues the
+    frame numbering readers already follow; otherwise clears it.
+    
+    Returns:
+        Latest published frame id (0 if none)
+    """
+    if ring_is_valid(buffer):
+        return ring_latest_frame_id(buffer)
+    
+    buffer[:RING_BUFFER_SIZE] = bytes(RING_BUFFER_SIZE)
+    struct.pack_into(
+        RING_HEADER_FORMAT, buffer, 0,
+        RING_MAGIC, RING_LAYOUT_VERSION, 0, RING_SLOTS, POSE_RECORD_SIZE
+    )
+    return 0
+
+
+def ring_latest_frame_id(buffer: memoryview) -> int:
+    """Id of the most recently published frame (0 if nothing written yet)."""
+    return struct.unpack_from('<Q', buffer, _LATEST_FRAME_OFFSET)[0]
+
+
+def ring_write_frame_arrays(
+    buffer: memoryview,
+    frame_id: int,
+    uuids: Sequence[str],
+    timestamps: Sequence[float],
+    keypoints: np.ndarray,
+    in_zone: Sequence[bool]
+) -> int:
+    """
+    Encode a frame of pose arrays directly into the ring slot for frame_id
+    and publish it.
+    
+    Args:
+        buffer: Shared memory buffer initialized with ring_init
+        frame_id: Monotonic frame id (must be > previously published id)
+        uuids, timestamps, keypoints, in_zone: See encode_pose_arrays
+            (truncated to MAX_PARTICIPANTS)
+    
+    Returns:
+        Number of poses written
+    """
+    count = min(len(uuids), MAX_PARTICIPANTS)
+    slot = _slot_offset(frame_id)
+    seq = struct.unpack_from('<Q', buffer, slot)[0]
+    write_seq = (seq + 1) | 1  # odd = write in progress
+    struct.pack_into('<Q', buffer, slot, write_seq)
+    
+    start = slot + SLOT_HEADER_BYTES
+    offset = encode_pose_arrays(
+        buffer, start,
+        uuids[:count], timestamps[:count], keypoints[:count], in_zone[:count]
+    )
+    
+    # Clear records left over from the frame previously held in this slot
+    end = start + POSE_BUFFER_SIZE
+    if offset < end:
+        buffer[offset:end] = _ZERO_RECORDS[:end - offset]
+    
+    struct.pack_into(SLOT_HEADER_FORMAT, buffer, slot, write_seq + 1, frame_id, count)
+    struct.pack_into('<Q', buffer, _LATEST_FRAME_OFFSET, frame_id)
+    return count
+
+
+def ring_write_frame(buffer: memoryview, frame_id: int, poses: List[ParticipantPose]) -> int:
+    """ParticipantPose wrapper around ring_write_frame_arrays."""
+    arrays = PoseArrays.from_poses(poses[:MAX_PARTICIPANTS])
+    return ring_write_frame_arrays(
+        buffer, frame_id, arrays.uuids, arrays.timestamps, arrays.keypoints, arrays.in_zone
+    )
+
+
+def ring_read_frame_arrays(
+    buffer: memoryview,
+    frame_id: int,
+    retries: int = 5
+) -> Optional[PoseArrays]:
+    """
+    Read a consistent snapshot of frame_id from the ring as arrays.
+    
+    The slot is copied out with a single memcpy (no per-landmark objects)
+    so the returned arrays stay valid after the writer reuses the slot.
+    
+    Args:
+        buffer: Shared memory buffer
+        frame_id: Frame to read
+        retries: Attempts before giving up on a slot that keeps changing
+    
+    Returns:
+        PoseArrays, or None if the frame was overwritten (reader fell more
+        than RING_SLOTS behind) or never became stable
+    """
+    slot = _slot_offset(frame_id)
+    start = slot + SLOT_HEADER_BYTES
+    for attempt in range(retries):
+        seq, slot_frame_id, count = struct.unpack_from(SLOT_HEADER_FORMAT, buffer, slot)
+        if seq & 1:
+            # Writer is mid-frame; give it a moment
+            time.sleep(0.0002 * (attempt + 1))
+            continue
+        if slot_frame_id != frame_id:
+            return None
+        
+        count = min(count, MAX_PARTICIPANTS)
+        snapshot = bytearray(buffer[start:start + count * POSE_RECORD_SIZE])
+        
+        if struct.unpack_from('<Q', buffer, slot)[0] != seq:
+            continue
+        try:
+            return decode_pose_arrays(snapshot, 0, count)
+        except UnicodeDecodeError:
+            return None
+    return None
+
+
+def ring_read_frame(
+    buffer: memoryview,
+    frame_id: int,
+    retries: int = 5
+) -> Optional[List[ParticipantPose]]:
+    """ParticipantPose wrapper around ring_read_frame_arrays."""
+    arrays = ring_read_frame_arrays(buffer, frame_id, retries)
+    return arrays.to_poses() if arrays is not None else None
@@ -0,0 +1,173 @@
+"""
+Seqlock slot tables in shared memory.
+
+Shared by the score table and the thumbnail atlas: a fixed header followed
+by one entry per participant, each entry starting with a uint64 seqlock
+counter (odd while writing, bumped on every write), so readers get
+consistent entries without locks and can tell which entries changed.
+
+SlotTableWriter owns the writer side: creating or connecting to the
+buffer, the uuid -> slot map, least-recently-updated eviction when all
+slots are taken, and retiring entries. Entries found on connect (left by a
+previous run) are adopted and listed in `adopted`; hand them to the
+owner's ParticipantLifecycle so they age out like any other participant,
+or pass adopt=False to clear them for a fresh session.
+"""
+
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+SEQ_FORMAT = '<Q'
+
+
+def seqlock_begin(buffer: memoryview, offset: int) -> int:
+    """Mark the entry at offset as being written; returns the odd write seq (finish with write seq + 1)."""
+    seq = struct.unpack_from(SEQ_FORMAT, buffer, offset)[0]
+    write_seq = (seq + 1) | 1  # odd = write in progress
+    struct.pack_into(SEQ_FORMAT, buffer, offset, write_seq)
+    return write_seq
+
+
+def seqlock_seq(buffer: memoryview, offset: int) -> int:
+    """Current counter of the entry at offset (no consistency check)."""
+    return struct.unpack_from(SEQ_FORMAT, buffer, offset)[0]
+
+
+def seqlock_read(buffer: memoryview, offset: int, read: Callable[[], T],
+                 retries: int = 5) -> Tuple[int, Optional[T]]:
+    """
+    Run read() until it sees a stable entry.
+
+    Returns:
+        (seq, read() result), or (0, None) if the entry never became stable
+    """
+    for attempt in range(retries):
+        seq = seqlock_seq(buffer, offset)
+        if not seq & 1:
+            value = read()
+            if seqlock_seq(buffer, offset) == seq:
+                return seq, value
+        time.sleep(0.0001 * (attempt + 1))
+    return 0, None
+
+
+def decode_uuid(uuid_bytes: bytes) -> str:
+    """UUID from a NUL-padded entry field ('' for an empty slot)."""
+    return uuid_bytes.rstrip(b'\x00').decode('utf-8', errors='replace').strip()
+
+
+class SlotTableWriter:
+    """
+    Writer side of a seqlock slot table (subclasses define the layout).
+
+    Subclasses implement _is_valid(buf), _init_header(buf),
+    _read_uuid(slot) and _clear_slot(slot).
+    """
+
+    def __init__(self, buffer_name: str, size: int, slots: int, adopt: bool = True):
+        """
+        Args:
+            buffer_name: Shared memory name
+            size: Total buffer size in bytes
+            slots: Number of entries
+            adopt: Keep entries left by a previous run (listed in `adopted`);
+                False clears them, e.g. for a fresh session
+        """
+        self.buffer_name = buffer_name
+        self.size = size
+        self.slot_count = slots
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self._slots: Dict[str, int] = {}  # uuid -> slot
+        self._updated: Dict[str, float] = {}  # uuid -> last publish time
+        self.adopted: List[str] = []  # UUIDs of entries kept from a previous run
+        self._create_or_connect(adopt)
+
+    def _is_valid(self, buf: memoryview) -> bool:
+        raise NotImplementedError
+
+    def _init_header(self, buf: memoryview):
+        raise NotImplementedError
+
+    def _read_uuid(self, slot: int) -> Optional[str]:
+        """UUID in a slot, or None if it is empty (or never became stable)."""
+        raise NotImplementedError
+
+    def _clear_slot(self, slot: int):
+        """Seqlock-protected write of an empty entry."""
+        raise NotImplementedError
+
+    def _create_or_connect(self, adopt: bool):
+        """Create or connect to the table, adopting (or clearing) live entries."""
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.buffer_name)
+            if self.shm.size < self.size:
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = None
+        except FileNotFoundError:
+            pass
+
+        if self.shm is None:
+            self.shm = shared_memory.SharedMemory(name=self.buffer_name, create=True, size=self.size)
+
+        buf = self.shm.buf
+        if not self._is_valid(buf):
+            buf[:self.size] = bytes(self.size)
+            self._init_header(buf)
+            return
+
+        now = time.time()
+        for slot in range(self.slot_count):
+            uuid = self._read_uuid(slot)
+            if not uuid:
+                continue
+            if adopt:
+                self._slots[uuid] = slot
+                self._updated[uuid] = now
+                self.adopted.append(uuid)
+            else:
+                self._clear_slot(slot)  # Through the seqlock, so readers see it removed
+
+    def _slot_for(self, uuid: str) -> Optional[int]:
+        """Slot of uuid, assigning a free one (evicting the least recently updated entry if full)."""
+        slot = self._slots.get(uuid)
+        if slot is not None:
+            return slot
+        used = set(self._slots.values())
+        slot = next((s for s in range(self.slot_count) if s not in used), None)
+        if slot is None:
+            if not self._updated:
+                return None
+            oldest = min(self._updated, key=self._updated.get)
+            slot = self._slots[oldest]
+            self.retire(oldest)
+        self._slots[uuid] = slot
+        return slot
+
+    def _touch(self, uuid: str):
+        """Record a publish (for eviction order)."""
+        self._updated[uuid] = time.time()
+
+    def retire(self, uuid: str):
+        """Remove a participant's entry (readers see it as removed)."""
+        slot = self._slots.pop(uuid, None)
+        self._updated.pop(uuid, None)
+        if slot is not None and self.shm:
+            self._clear_slot(slot)
+
+    def close(self):
+        """Close shared memory connection (does not unlink - readers may still use it)."""
+        if self.shm:
+            self.shm.close()
+            self.shm = None
+
+    def unlink(self):
+        """Unlink shared memory. Only call when no other processes are using it."""
+        if self.shm:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
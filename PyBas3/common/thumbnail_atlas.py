@@ -0,0 +1,247 @@
+"""
+Shared memory thumbnail atlas.
+
+Fixed-layout atlas in `bas_thumbnails` with one slot per participant,
+written by the Vision module and read by TouchDesigner / the dashboard.
+All slot pixels form a single tall BGR image (slot i at rows
+i*THUMB_HEIGHT..), so a reader can map the whole atlas as one texture.
+Each slot is guarded by its own seqlock counter (odd while writing), which
+also serves as its version: readers get consistent thumbnails without
+locks and can tell which slots changed since their last poll. Slot
+assignment, eviction and adoption are shared with the score table
+(slot_table.py).
+"""
+
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .protocols import (
+    THUMBNAIL_BUFFER_NAME,
+    THUMB_ATLAS_MAGIC,
+    THUMB_ATLAS_VERSION,
+    THUMB_ATLAS_SLOTS,
+    THUMB_WIDTH,
+    THUMB_HEIGHT,
+    THUMB_CHANNELS,
+    THUMB_HEADER_FORMAT,
+    THUMB_HEADER_BYTES,
+    THUMB_ENTRY_FORMAT,
+    THUMB_ENTRY_BYTES,
+    THUMB_PIXELS_OFFSET,
+    THUMB_SLOT_BYTES,
+    THUMB_ATLAS_SIZE,
+    UUID_BYTES,
+)
+from .slot_table import SlotTableWriter, decode_uuid, seqlock_begin, seqlock_read, seqlock_seq
+
+THUMB_SHAPE = (THUMB_HEIGHT, THUMB_WIDTH, THUMB_CHANNELS)
+
+
+def _entry_offset(slot: int) -> int:
+    """Byte offset of a thumbnail entry."""
+    return THUMB_HEADER_BYTES + slot * THUMB_ENTRY_BYTES
+
+
+def atlas_pixels(buffer: memoryview) -> np.ndarray:
+    """(slots * height, width, 3) uint8 view of all thumbnails (no copy)."""
+    return np.frombuffer(
+        buffer, dtype=np.uint8, count=THUMB_SLOT_BYTES * THUMB_ATLAS_SLOTS, offset=THUMB_PIXELS_OFFSET
+    ).reshape(THUMB_ATLAS_SLOTS * THUMB_HEIGHT, THUMB_WIDTH, THUMB_CHANNELS)
+
+
+def thumbnail_atlas_is_valid(buffer: memoryview) -> bool:
+    """Check that buffer holds a thumbnail atlas matching this protocol version."""
+    if len(buffer) < THUMB_ATLAS_SIZE:
+        return False
+    header = struct.unpack_from(THUMB_HEADER_FORMAT, buffer, 0)
+    return header == (
+        THUMB_ATLAS_MAGIC, THUMB_ATLAS_VERSION, THUMB_ATLAS_SLOTS, THUMB_WIDTH,
+        THUMB_HEIGHT, THUMB_CHANNELS, THUMB_ENTRY_BYTES, THUMB_PIXELS_OFFSET
+    )
+
+
+def read_thumbnail(buffer: memoryview, slot: int, retries: int = 5) -> Tuple[int, Optional[dict]]:
+    """
+    Read one slot consistently.
+
+    Returns:
+        (seq, {'uuid', 'timestamp', 'image'} or None if the slot is empty).
+        image is a (THUMB_HEIGHT, THUMB_WIDTH, 3) BGR copy. seq is 0 if the
+        slot never became stable.
+    """
+    offset = _entry_offset(slot)
+    pixels = atlas_pixels(buffer)[slot * THUMB_HEIGHT:(slot + 1) * THUMB_HEIGHT]
+
+    def read():
+        _, uuid_bytes, timestamp = struct.unpack_from(THUMB_ENTRY_FORMAT, buffer, offset)
+        return uuid_bytes, timestamp, pixels.copy()
+
+    seq, values = seqlock_read(buffer, offset, read, retries)
+    if values is None:
+        return 0, None
+    uuid_bytes, timestamp, image = values
+    uuid = decode_uuid(uuid_bytes)
+    if not uuid:
+        return seq, None
+    return seq, {'uuid': uuid, 'timestamp': timestamp, 'image': image}
+
+
+class ThumbnailAtlasWriter(SlotTableWriter):
+    """Publishes per-participant thumbnails into the shared memory atlas."""
+
+    def __init__(self, buffer_name: str = THUMBNAIL_BUFFER_NAME, adopt: bool = True):
+        """
+        Args:
+            buffer_name: Shared memory name
+            adopt: Keep thumbnails left by a previous vision run (listed in
+                `adopted`, for the caller to age out); False clears them
+        """
+        super().__init__(buffer_name, THUMB_ATLAS_SIZE, THUMB_ATLAS_SLOTS, adopt)
+
+    def _is_valid(self, buf: memoryview) -> bool:
+        return thumbnail_atlas_is_valid(buf)
+
+    def _init_header(self, buf: memoryview):
+        struct.pack_into(
+            THUMB_HEADER_FORMAT, buf, 0,
+            THUMB_ATLAS_MAGIC, THUMB_ATLAS_VERSION, THUMB_ATLAS_SLOTS, THUMB_WIDTH,
+            THUMB_HEIGHT, THUMB_CHANNELS, THUMB_ENTRY_BYTES, THUMB_PIXELS_OFFSET
+        )
+
+    def _read_uuid(self, slot: int) -> Optional[str]:
+        # Header only: adoption does not need the pixels
+        buf, offset = self.shm.buf, _entry_offset(slot)
+        _, values = seqlock_read(buf, offset, lambda: struct.unpack_from(THUMB_ENTRY_FORMAT, buf, offset))
+        if values is None:
+            return None
+        return decode_uuid(values[1]) or None
+
+    def _clear_slot(self, slot: int):
+        self._write_slot(slot, '', None, 0.0)
+
+    def _write_slot(self, slot: int, uuid: str, image: Optional[np.ndarray], timestamp: float):
+        """Seqlock-protected write of one slot (image=None clears it)."""
+        buf = self.shm.buf
+        offset = _entry_offset(slot)
+        write_seq = seqlock_begin(buf, offset)
+        pixels = atlas_pixels(buf)[slot * THUMB_HEIGHT:(slot + 1) * THUMB_HEIGHT]
+        if image is None:
+            pixels.fill(0)
+            values = (b'', 0.0)
+        else:
+            np.copyto(pixels, image)
+            values = (uuid.encode('utf-8')[:UUID_BYTES], timestamp)
+        struct.pack_into(THUMB_ENTRY_FORMAT, buf, offset, write_seq + 1, *values)
+
+    def publish(self, uuid: str, image: np.ndarray, timestamp: Optional[float] = None):
+        """
+        Write (or replace) a participant's thumbnail.
+
+        Args:
+            uuid: Participant UUID
+            image: (THUMB_HEIGHT, THUMB_WIDTH, 3) uint8 BGR image
+            timestamp: Capture time (default: now)
+        """
+        if not self.shm:
+            return
+        if image.shape != THUMB_SHAPE or image.dtype != np.uint8:
+            raise ValueError(f"thumbnail must be {THUMB_SHAPE} uint8, got {image.shape} {image.dtype}")
+        slot = self._slot_for(uuid)
+        if slot is None:
+            return
+        self._write_slot(slot, uuid, image, time.time() if timestamp is None else timestamp)
+        self._touch(uuid)
+
+
+class ThumbnailAtlasReader:
+    """
+    Reads the shared memory thumbnail atlas.
+
+    Example:
+        reader = ThumbnailAtlasReader()
+        if reader.connect():
+            changed, removed = reader.poll_changes()
+            image = reader.get(uuid)
+    """
+
+    def __init__(self, buffer_name: str = THUMBNAIL_BUFFER_NAME):
+        self.buffer_name = buffer_name
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self._seqs = [0] * THUMB_ATLAS_SLOTS  # Last seen seq per slot
+        self._slot_uuids: Dict[int, str] = {}  # slot -> uuid last seen there
+        self.slots: Dict[str, int] = {}  # Current atlas slot by uuid
+        self.thumbnails: Dict[str, np.ndarray] = {}  # Current thumbnails by uuid
+
+    def connect(self) -> bool:
+        """Connect to existing atlas. Returns True on success."""
+        if self.shm:
+            return True
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.buffer_name)
+        except FileNotFoundError:
+            return False
+        if not thumbnail_atlas_is_valid(self.shm.buf):
+            self.close()
+            return False
+        return True
+
+    def pixels(self) -> Optional[np.ndarray]:
+        """Live (slots * height, width, 3) view of the whole atlas, e.g. for a texture upload."""
+        return atlas_pixels(self.shm.buf) if self.shm else None
+
+    def poll_changes(self) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        """
+        Copy only slots whose counter moved since the last poll.
+
+        Returns:
+            (changed {uuid: image}, removed [uuid])
+        """
+        changed: Dict[str, np.ndarray] = {}
+        removed: List[str] = []
+        if not self.shm:
+            return changed, removed
+
+        buf = self.shm.buf
+        for slot in range(THUMB_ATLAS_SLOTS):
+            seq = seqlock_seq(buf, _entry_offset(slot))
+            if seq == self._seqs[slot]:
+                continue
+            seq, entry = read_thumbnail(buf, slot)
+            if seq == 0:
+                continue  # Still being written; pick it up next poll
+            self._seqs[slot] = seq
+
+            previous = self._slot_uuids.pop(slot, None)
+            if previous and (entry is None or entry['uuid'] != previous):
+                self.thumbnails.pop(previous, None)
+                self.slots.pop(previous, None)
+                removed.append(previous)
+            if entry:
+                uuid = entry['uuid']
+                self._slot_uuids[slot] = uuid
+                self.slots[uuid] = slot
+                self.thumbnails[uuid] = entry['image']
+                changed[uuid] = entry['image']
+
+        return changed, removed
+
+    def get(self, uuid: str) -> Optional[np.ndarray]:
+        """Latest polled thumbnail for a participant, or None."""
+        return self.thumbnails.get(uuid)
+
+    def close(self):
+        """Close shared memory connection (does not unlink)."""
+        if self.shm:
+            self.shm.close()
+            self.shm = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Local HTTP control endpoint for the vision process.
+
+Lets zone settings be tuned while the detector runs headless (no preview
+window). Binds to localhost only.
+
+    GET  /zone    -> current zone config (JSON)
+    POST /zone    -> merge a partial config, e.g. {"screen_region": {"x": 0.3}}
+    GET  /stats   -> pipeline / NDI timing stats
+
+Example:
+    curl -s localhost:8765/zone
+    curl -s -X POST localhost:8765/zone -d '{"z_range": {"min": -0.5, "max": 0.2}}'
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    """Request handler; server attributes hold the zone filter and stats callable."""
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/zone":
+            self._send_json(200, self.server.zone_filter.config)
+        elif self.path == "/stats" and self.server.stats_fn:
+            self._send_json(200, self.server.stats_fn())
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/zone":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            changes = json.loads(self.rfile.read(length) or b"{}")
+            config = self.server.zone_filter.update(changes)
+        except (ValueError, TypeError) as e:  # JSONDecodeError is a ValueError
+            self._send_json(400, {"error": str(e)})
+            return
+        print(f"[control] Zone updated: {json.dumps(changes)}")
+        self._send_json(200, config)
+
+    def log_message(self, format, *args):
+        pass  # Keep the detector's console output readable
+
+
+class ControlServer:
+    """Serves the control endpoint on a background thread."""
+
+    def __init__(self, zone_filter, port: int = 8765, host: str = "127.0.0.1",
+                 stats_fn: Optional[Callable[[], dict]] = None):
+        self.zone_filter = zone_filter
+        self.host = host
+        self.port = port
+        self.stats_fn = stats_fn
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Start serving. Returns False if the port is unavailable."""
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _ControlHandler)
+        except OSError as e:
+            print(f"[control] Could not bind {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self._server.zone_filter = self.zone_filter
+        self._server.stats_fn = self.stats_fn
+        self.port = self._server.server_address[1]  # Resolved if port was 0
+        self._thread = threading.Thread(target=self._server.serve_forever, name="vision-control", daemon=True)
+        self._thread.start()
+        print(f"[control] Zone control at http://{self.host}:{self.port}/zone")
+        return True
+
+    def stop(self):
+        """Stop serving and release the port."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
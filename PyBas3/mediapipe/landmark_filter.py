@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Landmark smoothing for pose output.
+
+Per-participant filter state lives in (slots, 33, 3) float32 arrays, and
+all participants of a frame are filtered in one vectorized step. Two modes:
+
+- one_euro: speed-adaptive One-Euro filter (Casiez et al. 2012). Heavy
+  smoothing while still (less jitter), light smoothing during fast moves
+  (less lag).
+- ema: fixed-alpha exponential moving average (the original behaviour).
+
+Visibility is passed through unfiltered. Output is an (N, 33, 4) float32
+array ready for SharedMemoryPoseWriter.write_pose_arrays().
+"""
+
+import math
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+# Add parent directory to path for common module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from common.protocols import MEDIAPIPE_LANDMARKS
+
+FILTER_MODES = ("one_euro", "ema")
+
+# Frame interval assumed when timestamps do not advance
+DEFAULT_DT = 1.0 / 30.0
+
+
+def landmarks_to_array(landmarks) -> np.ndarray:
+    """
+    (33, 4) float32 x, y, z, visibility from MediaPipe landmarks, tuples or an array.
+
+    Missing landmarks are zero; missing z defaults to 0, missing visibility to 1.
+    """
+    if isinstance(landmarks, np.ndarray):
+        out = np.zeros((MEDIAPIPE_LANDMARKS, 4), dtype=np.float32)
+        rows = landmarks[:MEDIAPIPE_LANDMARKS]
+        out[:len(rows), :min(4, rows.shape[1])] = rows[:, :4]
+        if rows.shape[1] < 4:
+            out[:len(rows), 3] = 1.0
+        return out
+
+    landmarks = landmarks[:MEDIAPIPE_LANDMARKS]
+    if landmarks and hasattr(landmarks[0], 'x'):
+        rows = [
+            (lm.x, lm.y, getattr(lm, 'z', None) or 0.0,
+             1.0 if getattr(lm, 'visibility', None) is None else lm.visibility)
+            for lm in landmarks
+        ]
+    else:
+        rows = [
+            (lm[0], lm[1], lm[2] if len(lm) > 2 else 0.0, lm[3] if len(lm) > 3 else 1.0)
+            for lm in landmarks
+        ]
+    if len(rows) == MEDIAPIPE_LANDMARKS:
+        return np.array(rows, dtype=np.float32)
+    out = np.zeros((MEDIAPIPE_LANDMARKS, 4), dtype=np.float32)
+    if rows:
+        out[:len(rows)] = rows
+    return out
+
+
+class LandmarkFilter:
+    """
+    Vectorized per-participant landmark filter.
+
+    Example:
+        landmark_filter = LandmarkFilter(mode="one_euro")
+        smoothed = landmark_filter.filter(uuids, keypoints, timestamps)  # (N, 33, 4)
+        landmark_filter.forget(uuid)  # participant left
+    """
+
+    def __init__(
+        self,
+        mode: str = "one_euro",
+        alpha: float = 0.15,
+        min_cutoff: float = 1.0,
+        beta: float = 8.0,
+        d_cutoff: float = 1.0,
+        capacity: int = 8
+    ):
+        """
+        Args:
+            mode: "one_euro" or "ema"
+            alpha: EMA mode weight of the new sample (0-1: lower = more smoothing)
+            min_cutoff: One-Euro cutoff (Hz) at rest; 1 Hz at 30 fps is close to alpha 0.15
+            beta: One-Euro cutoff increase per unit/s of landmark speed (higher = less lag)
+            d_cutoff: One-Euro cutoff (Hz) for the speed estimate
+            capacity: Initial number of participant slots (grows as needed)
+        """
+        if mode not in FILTER_MODES:
+            raise ValueError(f"Unknown landmark filter mode '{mode}' (expected one of {FILTER_MODES})")
+        self.mode = mode
+        self.alpha = alpha
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+
+        self._lock = threading.Lock()  # forget() may come from another thread
+        self._slots: Dict[str, int] = {}  # uuid -> state slot
+        self._free_slots: List[int] = []
+        self._value = np.zeros((0, MEDIAPIPE_LANDMARKS, 3), dtype=np.float32)  # Filtered x, y, z
+        self._speed = np.zeros((0, MEDIAPIPE_LANDMARKS, 3), dtype=np.float32)  # Filtered derivative
+        self._last_time = np.zeros(0, dtype=np.float64)
+        self._grow(capacity)
+
+    def _grow(self, capacity: int):
+        """Enlarge the state arrays to capacity slots."""
+        n = len(self._last_time)
+        self._value = np.concatenate([self._value, np.zeros((capacity - n, MEDIAPIPE_LANDMARKS, 3), np.float32)])
+        self._speed = np.concatenate([self._speed, np.zeros((capacity - n, MEDIAPIPE_LANDMARKS, 3), np.float32)])
+        self._last_time = np.concatenate([self._last_time, np.zeros(capacity - n)])
+        self._free_slots.extend(range(n, capacity))
+
+    @staticmethod
+    def _smoothing_factor(dt: np.ndarray, cutoff) -> np.ndarray:
+        """One-Euro alpha = 1 / (1 + tau / dt) with tau = 1 / (2 pi cutoff)."""
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def filter(
+        self,
+        uuids: Sequence[str],
+        keypoints: np.ndarray,
+        timestamps: Union[float, Sequence[float]]
+    ) -> np.ndarray:
+        """
+        Filter one frame of poses.
+
+        Args:
+            uuids: Participant UUID per row
+            keypoints: (N, 33, 4) x, y, z, visibility
+            timestamps: Capture time in seconds (scalar or one per row)
+
+        Returns:
+            (N, 33, 4) float32 filtered keypoints (visibility unchanged)
+        """
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        out = keypoints.copy()
+        if len(uuids) == 0:
+            return out
+        times = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), (len(uuids),))
+
+        with self._lock:
+            slots = np.empty(len(uuids), dtype=np.intp)
+            new = np.zeros(len(uuids), dtype=bool)
+            for i, uuid in enumerate(uuids):
+                slot = self._slots.get(uuid)
+                if slot is None:
+                    if not self._free_slots:
+                        self._grow(len(self._last_time) * 2)
+                    slot = self._free_slots.pop(0)
+                    self._slots[uuid] = slot
+                    new[i] = True
+                slots[i] = slot
+
+            raw = keypoints[:, :, :3]
+            prev = self._value[slots]
+            if self.mode == "ema":
+                filtered = self.alpha * raw + (1.0 - self.alpha) * prev
+                speed = self._speed[slots]
+            else:
+                dt = times - self._last_time[slots]
+                dt = np.where(dt > 0, dt, DEFAULT_DT)[:, None, None]
+                a_d = self._smoothing_factor(dt, self.d_cutoff)
+                speed = a_d * ((raw - prev) / dt) + (1.0 - a_d) * self._speed[slots]
+                cutoff = self.min_cutoff + self.beta * np.abs(speed)
+                a = self._smoothing_factor(dt, cutoff)
+                filtered = a * raw + (1.0 - a) * prev
+
+            # First sighting starts from the raw pose
+            filtered[new] = raw[new]
+            speed[new] = 0.0
+
+            self._value[slots] = filtered
+            self._speed[slots] = speed
+            self._last_time[slots] = times
+
+        out[:, :, :3] = filtered
+        return out
+
+    def forget(self, uuid: str):
+        """Release a participant's filter state."""
+        with self._lock:
+            slot = self._slots.pop(uuid, None)
+            if slot is not None:
+                self._free_slots.append(slot)
+
+    def __len__(self) -> int:
+        return len(self._slots)
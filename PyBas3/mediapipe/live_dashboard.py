@@ -8,22 +8,45 @@ Usage:
 
 import cv2
 import json
+import sys
+import time
 import numpy as np
 from pathlib import Path
 from typing import Dict, Optional
 
+# Add parent directory to path for common module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from common.score_table import ScoreTableReader
+from common.thumbnail_atlas import ThumbnailAtlasReader
+
 SCORE_DIR = Path(__file__).parent.parent / "scoring" / "output"
 THUMBNAIL_DIR = Path(__file__).parent / "thumbnails"
 
 
 class ScoreWatcher:
-    """Watch score JSON files."""
+    """Watch the shared memory score table, falling back to score JSON files."""
     
     def __init__(self):
         self.scores: Dict[str, dict] = {}
         self._mtimes: Dict[str, float] = {}
+        self._table = ScoreTableReader()
+    
+    def wait(self, timeout: float):
+        """Block until the scorer publishes new scores (or timeout)."""
+        if self._table.connect():
+            self._table.wait_for_changes(timeout)
+        else:
+            time.sleep(timeout)
     
     def poll(self) -> Dict[str, dict]:
+        if self._table.connect():
+            changed, removed = self._table.poll_changes()
+            for uuid in removed:
+                self.scores.pop(uuid, None)
+            self.scores.update(changed)
+            return self.scores
+        
         if not SCORE_DIR.exists():
             return self.scores
         
@@ -43,14 +66,23 @@ class ScoreWatcher:
 
 
 class ThumbnailCache:
-    """Cache participant thumbnails."""
+    """Participant thumbnails from the shared memory atlas, falling back to JPEG files."""
     
     def __init__(self):
         self.thumbnails: Dict[str, np.ndarray] = {}
         self._mtimes: Dict[str, float] = {}
+        self._atlas = ThumbnailAtlasReader()
+    
+    def poll(self):
+        """Pick up changed atlas slots (call once per dashboard refresh)."""
+        if self._atlas.connect():
+            self._atlas.poll_changes()
     
     def get(self, uuid: str) -> Optional[np.ndarray]:
         """Get thumbnail for participant, reload if updated."""
+        if self._atlas.shm:
+            return self._atlas.get(uuid)
+        
         thumb_path = THUMBNAIL_DIR / f"participant_{uuid}.jpg"
         
         if not thumb_path.exists():
@@ -137,7 +169,10 @@ def main():
     
     try:
         while True:
+            # Redraw as soon as scores change (at least every 100 ms)
+            score_watcher.wait(0.1)
             scores = score_watcher.poll()
+            thumb_cache.poll()
             
             # Build score cards
             cards = []
@@ -159,7 +194,7 @@ def main():
             
             cv2.imshow("Participants", dashboard)
             
-            key = cv2.waitKey(100) & 0xFF
+            key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
                 break
     
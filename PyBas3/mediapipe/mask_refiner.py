@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Segmentation mask refinement.
+
+Turns MediaPipe's soft per-person segmentation mask into a hard-edged
+uint8 mask (blur, threshold, open/close, edge smoothing, largest contour).
+Refinement runs once per person per frame and only inside the person's
+landmark bounding box (plus enough context for the filters to see the same
+neighbours as a full-frame pass), optionally at reduced resolution. If the
+person spills past the box, the whole frame is refined instead, so the
+result matches a full-frame pass. The resulting RefinedMask is shared by
+the NDI composite, thumbnails and the preview.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Bounding box padding: fraction of the landmark box size plus fixed pixels
+# (the mask extends past the landmarks - hair, hands, feet)
+BBOX_MARGIN = 0.15
+BBOX_PAD_PX = 24
+
+# Reach of the cleanup filters (two 5x5 blurs, 3x3 open and close). The box
+# is grown by twice this: pixels within the reach of the box are then
+# filtered exactly as in a full frame, and an empty ring there separates the
+# person from anything outside
+FILTER_REACH_PX = 8
+
+_KERNEL_3X3 = np.ones((3, 3), np.uint8)
+
+
+@dataclass
+class RefinedMask:
+    """
+    Hard-edged person mask restricted to a bounding box.
+
+    mask holds 0/255 values for the bbox region (x0, y0, x1, y1) of a
+    full mask of size shape (height, width).
+    """
+    mask: np.ndarray
+    bbox: Tuple[int, int, int, int]
+    shape: Tuple[int, int]
+    _full: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def roi(self) -> Tuple[slice, slice]:
+        """(rows, cols) slices of the bbox, for indexing full-size images."""
+        x0, y0, x1, y1 = self.bbox
+        return slice(y0, y1), slice(x0, x1)
+
+    def full(self) -> np.ndarray:
+        """Full-size uint8 (0/255) mask (built once, then cached)."""
+        if self._full is None:
+            full = np.zeros(self.shape, dtype=np.uint8)
+            full[self.roi] = self.mask
+            self._full = full
+        return self._full
+
+    def resized(self, width: int, height: int) -> "RefinedMask":
+        """Same mask scaled to a (width, height) frame (nearest neighbour keeps hard edges)."""
+        h, w = self.shape
+        if (w, h) == (width, height):
+            return self
+        sx, sy = width / w, height / h
+        x0, y0, x1, y1 = self.bbox
+        bbox = (int(x0 * sx), int(y0 * sy), max(int(x0 * sx) + 1, int(round(x1 * sx))),
+                max(int(y0 * sy) + 1, int(round(y1 * sy))))
+        mask = cv2.resize(self.mask, (bbox[2] - bbox[0], bbox[3] - bbox[1]), interpolation=cv2.INTER_NEAREST)
+        return RefinedMask(mask, bbox, (height, width))
+
+
+def landmark_bbox(landmarks, width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+    """Padded pixel bounding box (x0, y0, x1, y1) of pose landmarks, clipped to the frame."""
+    xs = [lm.x for lm in landmarks if hasattr(lm, 'x')]
+    ys = [lm.y for lm in landmarks if hasattr(lm, 'y')]
+    if not xs:
+        return None
+
+    x0, x1 = min(xs) * width, max(xs) * width
+    y0, y1 = min(ys) * height, max(ys) * height
+    pad_x = (x1 - x0) * BBOX_MARGIN + BBOX_PAD_PX
+    pad_y = (y1 - y0) * BBOX_MARGIN + BBOX_PAD_PX
+    x0, x1 = max(0, int(x0 - pad_x)), min(width, int(x1 + pad_x) + 1)
+    y0, y1 = max(0, int(y0 - pad_y)), min(height, int(y1 + pad_y) + 1)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def _grow(bbox: Tuple[int, int, int, int], pad: int, width: int, height: int) -> Tuple[int, int, int, int]:
+    """bbox grown by pad pixels on each side, clipped to the frame."""
+    x0, y0, x1, y1 = bbox
+    return max(0, x0 - pad), max(0, y0 - pad), min(width, x1 + pad), min(height, y1 + pad)
+
+
+def _spills(mask: np.ndarray, region: Tuple[int, int, int, int], bbox: Tuple[int, int, int, int]) -> bool:
+    """True if the cleaned region mask has foreground outside bbox (in mask pixels, which may be scaled)."""
+    rx0, ry0, rx1, ry1 = region
+    sx, sy = mask.shape[1] / (rx1 - rx0), mask.shape[0] / (ry1 - ry0)
+    x0, y0 = int((bbox[0] - rx0) * sx), int((bbox[1] - ry0) * sy)
+    x1, y1 = int(np.ceil((bbox[2] - rx0) * sx)), int(np.ceil((bbox[3] - ry0) * sy))
+    return cv2.countNonZero(mask) != cv2.countNonZero(mask[y0:y1, x0:x1])
+
+
+def _clean(soft_mask: np.ndarray, region: Tuple[int, int, int, int], scale: float) -> np.ndarray:
+    """Blur, threshold, open/close and edge-smooth the region of a soft mask (0/255, scaled if scale < 1)."""
+    x0, y0, x1, y1 = region
+
+    # Convert to uint8 for processing
+    mask = (soft_mask[y0:y1, x0:x1] * 255).astype(np.uint8)
+    if scale < 1.0:
+        small = (max(8, int((x1 - x0) * scale)), max(8, int((y1 - y0) * scale)))
+        mask = cv2.resize(mask, small, interpolation=cv2.INTER_AREA)
+
+    # Light blur to reduce pixel noise, higher threshold = tighter fit to body
+    mask = cv2.GaussianBlur(mask, (5, 5), 0)
+    _, mask = cv2.threshold(mask, 160, 255, cv2.THRESH_BINARY)
+
+    # Small morphological ops - just remove speckles, don't fill gaps
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, _KERNEL_3X3, iterations=1)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, _KERNEL_3X3, iterations=1)
+
+    # Gentle edge smoothing via blur + threshold
+    mask = cv2.GaussianBlur(mask, (5, 5), 0)
+    _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+    return mask
+
+
+def refine_mask(soft_mask: np.ndarray, landmarks=None, scale: float = 1.0) -> Optional[RefinedMask]:
+    """
+    Refine a soft (0-1 float) segmentation mask into a hard-edged RefinedMask.
+
+    Args:
+        soft_mask: (H, W) or (H, W, 1) float mask from MediaPipe
+        landmarks: Pose landmarks used to restrict work to the person's bbox
+            (None = whole mask; a person reaching past the bbox also falls
+            back to the whole mask)
+        scale: Process the bbox at this fraction of full resolution (<1 is
+            faster; the result is upsampled and re-thresholded)
+
+    Returns:
+        RefinedMask, or None if the mask is empty.
+    """
+    if soft_mask.ndim == 3:
+        soft_mask = soft_mask[:, :, 0]
+    height, width = soft_mask.shape
+
+    full_frame = (0, 0, width, height)
+    bbox = landmark_bbox(landmarks, width, height) if landmarks else None
+    if bbox is None:
+        mask, region = _clean(soft_mask, full_frame, scale), full_frame
+    else:
+        region = _grow(bbox, 2 * FILTER_REACH_PX, width, height)
+        mask = _clean(soft_mask, region, scale)
+        if _spills(mask, region, bbox):
+            mask, region = _clean(soft_mask, full_frame, scale), full_frame
+    x0, y0, x1, y1 = region
+    roi_w, roi_h = x1 - x0, y1 - y0
+
+    # Keep only the largest contour (removes stray blobs)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    largest = max(contours, key=cv2.contourArea)
+    mask = np.zeros_like(mask)
+    cv2.drawContours(mask, [largest], -1, 255, -1)
+
+    if scale < 1.0:
+        mask = cv2.resize(mask, (roi_w, roi_h), interpolation=cv2.INTER_LINEAR)
+        _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+
+    # Shrink the bbox to the person so consumers touch as few pixels as possible
+    bx, by, bw, bh = cv2.boundingRect(mask)
+    if bw == 0 or bh == 0:
+        return None
+    mask = mask[by:by + bh, bx:bx + bw]
+    return RefinedMask(mask, (x0 + bx, y0 + by, x0 + bx + bw, y0 + by + bh), (height, width))
@@ -11,8 +11,9 @@ import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 import numpy as np
-import json
-import os
+import signal
+import sys
+import threading
 import time
 from pathlib import Path
 from uuid import uuid4
@@ -22,140 +23,105 @@ from participant_tracker import ParticipantTracker
 from download_model import download_model
 from ndi_streamer import NDIStreamer
 from shared_memory_writer import SharedMemoryPoseWriter
+from vision_pipeline import PreviewThread, VisionPipeline, format_stats
+from mask_refiner import RefinedMask, refine_mask
+from participant_compositor import ParticipantCompositor
+from control_server import ControlServer
+from zone_filter import WATCH_MODES, ZoneFilter
+from thumbnail_writer import ThumbnailWriter
 
+# Add parent directory to path for common module
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-class ZoneFilter:
-    """Filters detections based on zone configuration."""
-    
-    def __init__(self, config_path: str = None):
-        if config_path is None:
-            config_path = str(Path(__file__).parent / "zone_config.json")
-        self.config_path = config_path
-        self.config = self._load_config()
-        self._last_reload = time.time()
-    
-    def reload_if_needed(self, interval: float = 0.5):
-        """Reload config from disk if interval elapsed."""
-        if time.time() - self._last_reload > interval:
-            self.config = self._load_config()
-            self._last_reload = time.time()
-    
-    def save_config(self):
-        """Save current config to disk."""
-        import json
-        tmp_path = self.config_path + ".tmp"
-        with open(tmp_path, 'w') as f:
-            json.dump(self.config, f, indent=2)
-        os.rename(tmp_path, self.config_path)
-    
-    def _load_config(self) -> Dict:
-        """Load zone configuration from JSON file."""
-        default_config = {
-            "screen_region": {"x": 0.0, "y": 0.0, "width": 1.0, "height": 1.0},
-            "z_range": {"min": -10.0, "max": 10.0},
-            "max_people": 3,
-            "min_visibility": 0.1,
-            "min_landmarks": 1
-        }
-        
-        if os.path.exists(self.config_path):
-            try:
-                with open(self.config_path, 'r') as f:
-                    config = json.load(f)
-                    # Merge with defaults
-                    default_config.update(config)
-                    return default_config
-            except (json.JSONDecodeError, KeyError):
-                pass
-        
-        # Save default config if file doesn't exist
-        with open(self.config_path, 'w') as f:
-            json.dump(default_config, f, indent=2)
-        
-        return default_config
-    
-    def is_in_zone(self, landmarks) -> bool:
-        """
-        Check if pose landmarks are within configured zone.
-        
-        Args:
-            landmarks: List of pose landmarks (Tasks API format)
-        
-        Returns:
-            True if pose is in zone, False otherwise
-        """
-        if not landmarks or len(landmarks) < self.config["min_landmarks"]:
-            return False
-        
-        # Check visibility (if available)
-        visible_count = 0
-        for lm in landmarks:
-            if hasattr(lm, 'visibility') and lm.visibility >= self.config["min_visibility"]:
-                visible_count += 1
-            elif hasattr(lm, 'x'):  # Assume visible if has coordinates
-                visible_count += 1
-        
-        if visible_count < self.config["min_landmarks"]:
-            return False
-        
-        # Check screen region (x, y coordinates)
-        screen_region = self.config["screen_region"]
-        in_screen = False
-        for lm in landmarks:
-            if hasattr(lm, 'x') and hasattr(lm, 'y'):
-                x, y = lm.x, lm.y
-                if (screen_region["x"] <= x <= screen_region["x"] + screen_region["width"] and
-                    screen_region["y"] <= y <= screen_region["y"] + screen_region["height"]):
-                    in_screen = True
-                    break
-        
-        if not in_screen:
-            return False
-        
-        # Check z-range (depth) if available
-        z_range = self.config["z_range"]
-        in_z_range = False
-        for lm in landmarks:
-            if hasattr(lm, 'z'):
-                z = lm.z
-                if z_range["min"] <= z <= z_range["max"]:
-                    in_z_range = True
-                    break
-        
-        # If z is not available, assume it's in range
-        return in_z_range if any(hasattr(lm, 'z') for lm in landmarks) else True
+from common.lifecycle import GONE, ParticipantLifecycle
+from common.score_table import ScoreTableWriter
+from common.thumbnail_atlas import ThumbnailAtlasWriter
+from common.protocols import MAX_PARTICIPANTS
+from landmark_filter import FILTER_MODES, LandmarkFilter, landmarks_to_array
+
+# Scoring module, for --in-process-scoring
+sys.path.insert(0, str(Path(__file__).parent.parent / "scoring"))
+
+from pose_scorer import SCORING_DIR, ScoringStage, create_scorer
 
 
 class MultiPersonDetector:
-    """MediaPipe multi-person pose detector with participant tracking."""
+    """
+    MediaPipe multi-person pose detector with participant tracking.
+    
+    By default detect() runs the landmarker synchronously (VIDEO mode).
+    With live_stream=True frames are submitted with detect_async() and each
+    result is processed on MediaPipe's callback thread, then passed to
+    on_result(frame, participants, hard_masks, tag, latency_ms).
+    """
+    
+    # LIVE_STREAM frame drop policies:
+    #   skip - drop new frames while max_in_flight frames are still being processed
+    #   none - submit every frame and let MediaPipe's flow limiter drop
+    DROP_POLICIES = ("skip", "none")
     
     def __init__(
         self,
         zone_config_path: str = "zone_config.json",
+        zone_watch: str = "notify",
         participants_db_path: str = "participants_db.json",
         min_detection_confidence: float = 0.5,
         min_tracking_confidence: float = 0.5,
         enable_segmentation: bool = False,
         num_poses: int = 3,
         hash_history_size: int = 3,
-        face_threshold_floor: int = 40
+        face_threshold_floor: int = 40,
+        db_flush_interval: float = 2.0,
+        db_journal: bool = False,
+        live_stream: bool = False,
+        drop_policy: str = "skip",
+        max_in_flight: int = 1,
+        mask_scale: float = 1.0,
+        auto_frame: bool = False,
+        participant_ttl: float = 30.0,
+        landmark_filter: str = "one_euro",
+        filter_min_cutoff: float = 1.0,
+        filter_beta: float = 8.0,
+        thumbnail_interval: float = 2.0,
+        thumbnail_jpeg: bool = False,
+        scoring_stage: Optional[ScoringStage] = None
     ):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {self.DROP_POLICIES}, got {drop_policy!r}")
         
-        self.zone_filter = ZoneFilter(zone_config_path)
+        self.zone_filter = ZoneFilter(zone_config_path, watch=zone_watch)
         self.tracker = ParticipantTracker(
             participants_db_path,
             max_participants=num_poses,
             hash_history_size=hash_history_size,
-            face_threshold_floor=face_threshold_floor
+            face_threshold_floor=face_threshold_floor,
+            flush_interval=db_flush_interval,
+            journal=db_journal
         )
         self.num_poses = num_poses
         
+        # Mask refinement resolution (fraction of the mask bbox; <1 is faster)
+        self.mask_scale = mask_scale
+        
+        # Asynchronous LIVE_STREAM mode state
+        self.live_stream = live_stream
+        self.drop_policy = drop_policy
+        self.max_in_flight = max(1, max_in_flight)
+        self.on_result = None  # Callable(frame, participants, hard_masks, tag, latency_ms)
+        self._pending: Dict[int, Tuple[np.ndarray, object, float]] = {}  # timestamp_ms -> (frame, tag, submitted_at)
+        self._pending_lock = threading.Lock()
+        self._last_timestamp_ms = -1
+        self.submitted_frames = 0
+        self.dropped_frames = 0  # Skipped by the drop policy or dropped inside MediaPipe
+        self.result_latency_ms = 0.0  # Smoothed submit -> processed latency
+        
         # Download model file if needed and use MediaPipe Tasks API for multi-person detection
         model_path = download_model()
         base_options = python.BaseOptions(model_asset_path=model_path)
         options = vision.PoseLandmarkerOptions(
             base_options=base_options,
-            running_mode=vision.RunningMode.VIDEO,
+            running_mode=vision.RunningMode.LIVE_STREAM if live_stream else vision.RunningMode.VIDEO,
+            result_callback=self._on_live_result if live_stream else None,
             num_poses=num_poses,
             min_pose_detection_confidence=0.5,  # Restored to 0.5 for better robustness
             min_pose_presence_confidence=0.5,  # Restored to 0.5
@@ -184,80 +150,128 @@ class MultiPersonDetector:
             (24, 26), (26, 28), (28, 30), (28, 32)
         ]
         
+        # Renders participants straight into stream-resolution NDI buffers
+        self.compositor = ParticipantCompositor(self.POSE_CONNECTIONS, auto_frame=auto_frame)
+        
         self.current_participants: Dict[str, Dict] = {}
-        self.frame_counter = 0
+        self.frame_counter = 0  # Frames detected/submitted; counted only by the pipeline's inference thread
         self.start_time = time.time()
         self.last_segmentation_masks = None  # Store soft masks from pose landmarker
-        self.last_hard_masks = None  # Store hard-edged binary masks (thresholded at 0.5)
+        self.last_hard_masks = None  # Refined hard-edged masks (RefinedMask per pose, None if refinement failed)
         
-        # Landmark smoothing to reduce MediaPipe jitter
-        self._smoothed_landmarks: Dict[str, List[Tuple[float, float, float, float]]] = {}
-        self.LANDMARK_SMOOTHING = 0.15  # 0-1: lower = more smoothing, less responsive
+        # Landmark smoothing to reduce MediaPipe jitter (vectorized over participants)
+        self.landmark_filter = LandmarkFilter(mode=landmark_filter, min_cutoff=filter_min_cutoff, beta=filter_beta)
         
-        # Thumbnail output directory
+        # Thumbnails are rendered on a worker thread into the shared memory atlas
+        # (refreshed every thumbnail_interval seconds; optional JPEG export)
         self.thumbnails_dir = Path(__file__).parent / "thumbnails"
-        self.thumbnails_dir.mkdir(exist_ok=True)
-        self.thumbnail_size = (160, 120)  # Low-res thumbnail size (width, height)
-        self.saved_thumbnails = set()  # Track which UUIDs have thumbnails saved (save only once)
-    
-    def _smooth_landmarks(self, participants: List[Dict]) -> List[Dict]:
-        """Apply exponential moving average smoothing to landmark positions."""
-        smoothed = []
+        self.thumbnail_writer = ThumbnailWriter(
+            self.compositor,
+            refresh_interval=thumbnail_interval,
+            export_dir=self.thumbnails_dir if thumbnail_jpeg else None
+        )
         
-        for p in participants:
-            uuid = p["uuid"]
-            raw_landmarks = p["landmarks"]
-            
-            # Convert landmarks to list of tuples for smoothing
-            raw_list = []
-            for lm in raw_landmarks:
-                x = lm.x if hasattr(lm, 'x') else lm[0]
-                y = lm.y if hasattr(lm, 'y') else lm[1]
-                z = lm.z if hasattr(lm, 'z') else (lm[2] if len(lm) > 2 else 0)
-                vis = lm.visibility if hasattr(lm, 'visibility') else (lm[3] if len(lm) > 3 else 1.0)
-                raw_list.append((x, y, z, vis))
-            
-            # Get previous smoothed landmarks or initialize with current
-            prev_smoothed = self._smoothed_landmarks.get(uuid, raw_list)
-            
-            # Apply exponential smoothing: new = alpha * raw + (1-alpha) * prev
-            alpha = self.LANDMARK_SMOOTHING
-            new_smoothed = []
-            for i, (raw, prev) in enumerate(zip(raw_list, prev_smoothed)):
-                sx = alpha * raw[0] + (1 - alpha) * prev[0]
-                sy = alpha * raw[1] + (1 - alpha) * prev[1]
-                sz = alpha * raw[2] + (1 - alpha) * prev[2]
-                # Keep visibility from raw (don't smooth)
-                new_smoothed.append((sx, sy, sz, raw[3]))
-            
-            # Store smoothed landmarks for next frame
-            self._smoothed_landmarks[uuid] = new_smoothed
-            
-            # Create new participant dict with smoothed landmarks
-            smoothed.append({
-                "uuid": uuid,
-                "landmarks": new_smoothed,  # Now a list of tuples
-                "in_zone": p["in_zone"],
-                "timestamp": p["timestamp"]
-            })
+        # In-process scoring (None = a separate pose_scorer.py reads shared memory)
+        self.scoring_stage = scoring_stage
         
-        return smoothed
+        # Per-UUID state above is torn down once a participant is gone for participant_ttl seconds
+        self.lifecycle = ParticipantLifecycle(stale_after=min(2.0, participant_ttl), gone_after=participant_ttl)
+        self.lifecycle.on(GONE, self._release_participant)
+        # Thumbnails adopted from a previous run age out unless their participant shows up again
+        self.lifecycle.seen(self.thumbnail_writer.atlas.adopted)
+    
+    def _release_participant(self, uuid: str):
+        """Lifecycle GONE callback: drop the NDI sender and all per-UUID state."""
+        self.ndi_streamer.remove_stream(uuid)
+        self.compositor.forget(uuid)
+        self.landmark_filter.forget(uuid)
+        self.thumbnail_writer.forget(uuid)
     
     def detect(self, frame: np.ndarray) -> List[Dict]:
         """
         Detect poses in frame and return list of participant data.
         
-        Returns list of dicts with keys: uuid, landmarks, in_zone, timestamp
+        Returns list of dicts with keys: uuid, landmarks, in_zone, zones, keypoints, timestamp
         """
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
         
         # Process frame (synchronous VIDEO mode)
-        timestamp_ms = int((time.time() - self.start_time) * 1000)
+        timestamp_ms = self._next_timestamp_ms()
         detection_result = self.landmarker.detect_for_video(mp_image, timestamp_ms)
+        return self._process_detection(frame, detection_result)
+    
+    def _next_timestamp_ms(self) -> int:
+        """Strictly increasing landmarker timestamp."""
+        timestamp_ms = max(int((time.time() - self.start_time) * 1000), self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+    
+    def detect_async(self, frame: np.ndarray, tag=None) -> bool:
+        """
+        Submit a frame in LIVE_STREAM mode (returns immediately).
+        
+        The result is processed on MediaPipe's callback thread and passed to
+        on_result together with tag. Returns False if the drop policy skipped
+        the frame.
+        """
+        with self._pending_lock:
+            if self.drop_policy == "skip" and len(self._pending) >= self.max_in_flight:
+                self.dropped_frames += 1
+                return False
+            timestamp_ms = self._next_timestamp_ms()
+            self._pending[timestamp_ms] = (frame, tag, time.perf_counter())
+            self.submitted_frames += 1
         
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        self.landmarker.detect_async(mp_image, timestamp_ms)
+        return True
+    
+    def _on_live_result(self, detection_result, output_image, timestamp_ms: int):
+        """LIVE_STREAM result callback (MediaPipe thread): track, smooth, write, hand off."""
+        with self._pending_lock:
+            entry = self._pending.pop(timestamp_ms, None)
+            # Frames submitted before this one that never produced a result were dropped by MediaPipe
+            for stale in [ts for ts in self._pending if ts < timestamp_ms]:
+                del self._pending[stale]
+                self.dropped_frames += 1
+        if entry is None:
+            return
+        
+        frame, tag, submitted_at = entry
+        try:
+            participants = self._process_detection(frame, detection_result)
+            hard_masks = self.last_hard_masks
+            latency_ms = (time.perf_counter() - submitted_at) * 1000
+            self.result_latency_ms += 0.1 * (latency_ms - self.result_latency_ms)
+            if self.on_result:
+                self.on_result(frame, participants, hard_masks, tag, latency_ms)
+        except Exception as e:
+            # Never let an exception escape into MediaPipe's callback thread
+            print(f"LIVE_STREAM result handler error: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    def live_stats(self) -> dict:
+        """Submitted/dropped frame counts, frames in flight and smoothed latency."""
+        with self._pending_lock:
+            in_flight = len(self._pending)
+        return {
+            "submitted": self.submitted_frames,
+            "dropped": self.dropped_frames,
+            "in_flight": in_flight,
+            "latency_ms": round(self.result_latency_ms, 2),
+        }
+    
+    def _process_detection(self, frame: np.ndarray, detection_result) -> List[Dict]:
+        """Masks, zone check, UUID tracking, smoothing, shared memory write (and scoring) for one result."""
         detected = []
         
+        # Scoring TTLs run on this thread too (before the early returns below)
+        if self.scoring_stage is not None:
+            self.scoring_stage.update()
+        
         # Debug: Check what MediaPipe returned
         if not detection_result:
             if self.frame_counter % 60 == 0:
@@ -281,52 +295,27 @@ class MultiPersonDetector:
         else:
             self.last_segmentation_masks = None
         
-        # Create hard-edged binary masks by thresholding at 0.5
-        # This converts soft alpha-blended edges to crisp binary (0 or 1) masks
-        hard_masks = []
+        # Refine each soft mask once into a hard-edged RefinedMask (inside the
+        # person's landmark bbox); NDI, thumbnails and preview all reuse it
+        hard_masks: List[Optional[RefinedMask]] = []
         if segmentation_masks:
-            for seg_mask in segmentation_masks:
+            for idx, seg_mask in enumerate(segmentation_masks):
                 try:
                     mask_np = seg_mask.numpy_view() if hasattr(seg_mask, 'numpy_view') else seg_mask
-                    # Ensure 2D mask
-                    if len(mask_np.shape) == 3 and mask_np.shape[2] == 1:
-                        mask_np = mask_np.squeeze(axis=2)
-                    
-                    # Convert to uint8 for processing
-                    mask_uint8 = (mask_np * 255).astype(np.uint8)
-                    
-                    # Light blur to reduce pixel noise while preserving contour
-                    mask_blurred = cv2.GaussianBlur(mask_uint8, (5, 5), 0)
-                    
-                    # Higher threshold = tighter fit to body
-                    _, mask_binary = cv2.threshold(mask_blurred, 160, 255, cv2.THRESH_BINARY)
-                    
-                    # Small morphological ops - just remove speckles, don't fill gaps
-                    kernel_small = np.ones((3, 3), np.uint8)
-                    mask_binary = cv2.morphologyEx(mask_binary, cv2.MORPH_OPEN, kernel_small, iterations=1)  # remove noise
-                    mask_binary = cv2.morphologyEx(mask_binary, cv2.MORPH_CLOSE, kernel_small, iterations=1) # fill tiny holes
-                    
-                    # Gentle edge smoothing via blur + threshold
-                    mask_binary = cv2.GaussianBlur(mask_binary, (5, 5), 0)
-                    _, mask_binary = cv2.threshold(mask_binary, 127, 255, cv2.THRESH_BINARY)
-                    
-                    # Find the largest contour and keep only that (removes stray blobs)
-                    contours, _ = cv2.findContours(mask_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                    if contours:
-                        largest_contour = max(contours, key=cv2.contourArea)
-                        mask_largest_contour = np.zeros_like(mask_binary)
-                        cv2.drawContours(mask_largest_contour, [largest_contour], -1, 255, -1)
-                        mask_binary = mask_largest_contour
-                    
-                    # Convert back to float32 (0.0 or 1.0)
-                    binary_mask = (mask_binary / 255.0).astype(np.float32)
-                    hard_masks.append(binary_mask)
+                    landmarks = pose_landmarks_list[idx] if idx < len(pose_landmarks_list) else None
+                    hard_masks.append(refine_mask(mask_np, landmarks, scale=self.mask_scale))
                 except Exception as e:
                     if self.frame_counter <= 5:
-                        print(f"DEBUG: Thresholding mask error: {e}")
-                    pass
+                        print(f"DEBUG: Mask refinement error: {e}")
+                    hard_masks.append(None)  # Keep masks aligned with pose indices
         self.last_hard_masks = hard_masks if hard_masks else None
         
+        # Zone membership for all poses in one pass; the keypoint arrays are
+        # reused for smoothing below
+        all_keypoints = np.stack([landmarks_to_array(lms) for lms in pose_landmarks_list])
+        zone_hits = self.zone_filter.evaluate(all_keypoints)
+        zone_names = self.zone_filter.zone_names
+        
         # Process each detected pose
         for idx, landmarks in enumerate(pose_landmarks_list):
             # Get corresponding segmentation mask if available
@@ -341,8 +330,8 @@ class MultiPersonDetector:
                 if len(seg_mask.shape) == 3 and seg_mask.shape[2] == 1:
                     seg_mask = seg_mask.squeeze(axis=2)
             
-            # Check if pose is in zone
-            in_zone = self.zone_filter.is_in_zone(landmarks)
+            # Check if pose is in zone (any configured zone)
+            in_zone = bool(zone_hits[idx].any())
             
             # Match or create UUID using face-based pHash
             # Pass landmarks directly (list format) - participant_tracker handles both formats
@@ -363,170 +352,257 @@ class MultiPersonDetector:
                 "uuid": uuid if uuid else temp_uuid,
                 "landmarks": landmarks,
                 "in_zone": in_zone,
+                "zones": [name for name, hit in zip(zone_names, zone_hits[idx]) if hit],
+                "keypoints": all_keypoints[idx],
                 "timestamp": time.time()
             })
         
         # Write poses to shared memory for Scoring module (only real UUIDs, skip temp)
         # Apply landmark smoothing to reduce jitter
-        real_participants = [p for p in detected if not p["uuid"].startswith("temp_")]
-        smoothed_participants = self._smooth_landmarks(real_participants)
-        if smoothed_participants:
-            self.shared_memory_writer.write_poses(smoothed_participants)
+        real_participants = [p for p in detected if not p["uuid"].startswith("temp_")][:MAX_PARTICIPANTS]
+        if real_participants:
+            uuids = [p["uuid"] for p in real_participants]
+            timestamps = [p["timestamp"] for p in real_participants]
+            keypoints = np.stack([p["keypoints"] for p in real_participants])
+            smoothed = self.landmark_filter.filter(uuids, keypoints, timestamps)
+            in_zone = [p["in_zone"] for p in real_participants]
+            self.shared_memory_writer.write_pose_arrays(uuids, timestamps, smoothed, in_zone)
+            # In-process scoring: same arrays, no shared memory round trip
+            if self.scoring_stage is not None:
+                self.scoring_stage.process(uuids, smoothed, in_zone)
         
-        self.frame_counter += 1
         return detected
     
-    def _extract_bounding_box_crop(self, frame: np.ndarray, landmarks, w: int, h: int) -> np.ndarray:
-        """Fallback: extract bounding box crop if segmentation mask fails."""
-        if not landmarks:
-            return np.zeros((h, w, 3), dtype=np.uint8)
-        
-        # Get bounding box from landmarks
-        x_coords = [lm.x * w for lm in landmarks if hasattr(lm, 'x')]
-        y_coords = [lm.y * h for lm in landmarks if hasattr(lm, 'y')]
-        
-        if not x_coords or not y_coords:
-            return np.zeros((h, w, 3), dtype=np.uint8)
-        
-        x_min = max(0, int(min(x_coords) - 20))
-        x_max = min(w, int(max(x_coords) + 20))
-        y_min = max(0, int(min(y_coords) - 20))
-        y_max = min(h, int(max(y_coords) + 20))
-        
-        if x_max <= x_min or y_max <= y_min:
-            return np.zeros((h, w, 3), dtype=np.uint8)
-        
-        crop = frame[y_min:y_max, x_min:x_max]
-        return crop
-    
-    def create_participant_stream_frame(self, frame: np.ndarray, uuid: str, landmarks, hard_mask: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    def create_participant_stream_frame(self, frame: np.ndarray, uuid: str, landmarks, hard_mask: Optional[RefinedMask] = None) -> Optional[np.ndarray]:
         """
-        Create a composite frame for NDI streaming: hard-edged segmented person + skeleton overlay.
+        Create a stream-resolution composite frame: hard-edged segmented person + skeleton overlay.
+        
+        NDI streams render straight into their send buffers (see publish_outputs);
+        this allocates a frame for other consumers that need a standalone frame.
         
         Args:
             frame: Full frame
             uuid: Participant UUID
             landmarks: Pose landmarks
-            hard_mask: Binary segmentation mask (0.0 or 1.0)
+            hard_mask: Refined segmentation mask for this person
         
         Returns:
-            BGRA frame with segmented person + skeleton, or None if failed
+            BGRA frame at stream resolution, or None if failed
         """
         try:
-            h, w = frame.shape[:2]
-            
-            # Start with black background
-            output = np.zeros((h, w, 3), dtype=np.uint8)
-            
-            # Apply hard-edged segmentation mask to extract person
-            if hard_mask is not None:
-                try:
-                    # Ensure mask is 2D and matches frame size
-                    mask_uint8 = (hard_mask * 255).astype(np.uint8)
-                    if mask_uint8.shape[:2] != frame.shape[:2]:
-                        mask_uint8 = cv2.resize(mask_uint8, (w, h), interpolation=cv2.INTER_NEAREST)
-                    
-                    # Ensure mask is binary (hard edges) - threshold again for robustness
-                    _, mask_binary = cv2.threshold(mask_uint8, 127, 255, cv2.THRESH_BINARY)
-                    
-                    # Apply morphological operations to clean up mask (remove noise, fill holes)
-                    # Light smoothing - preserve body contour
-                    mask_binary = cv2.GaussianBlur(mask_binary, (5, 5), 0)
-                    _, mask_binary = cv2.threshold(mask_binary, 160, 255, cv2.THRESH_BINARY)
-                    
-                    kernel = np.ones((3, 3), np.uint8)
-                    mask_binary = cv2.morphologyEx(mask_binary, cv2.MORPH_OPEN, kernel, iterations=1)
-                    mask_binary = cv2.morphologyEx(mask_binary, cv2.MORPH_CLOSE, kernel, iterations=1)
-                    
-                    # Gentle edge smoothing
-                    mask_binary = cv2.GaussianBlur(mask_binary, (5, 5), 0)
-                    _, mask_binary = cv2.threshold(mask_binary, 127, 255, cv2.THRESH_BINARY)
-                    
-                    # Apply mask to extract person (hard edges)
-                    output = cv2.bitwise_and(frame, frame, mask=mask_binary)
-                except Exception as e:
-                    if self.frame_counter <= 5:
-                        print(f"DEBUG: Mask application error for {uuid[:8]}: {e}")
-                    # Fallback: use bounding box
-                    output = self._extract_bounding_box_crop(frame, landmarks, w, h)
-            else:
-                # Fallback: use bounding box if no mask
-                output = self._extract_bounding_box_crop(frame, landmarks, w, h)
-            
-            # Draw skeleton overlay on segmented person
-            if landmarks and len(landmarks) >= 33:
-                color = (0, 255, 0)  # Green skeleton
-                
-                # Draw connections (skeleton)
-                for connection in self.POSE_CONNECTIONS:
-                    start_idx, end_idx = connection
-                    if start_idx < len(landmarks) and end_idx < len(landmarks):
-                        start = landmarks[start_idx]
-                        end = landmarks[end_idx]
-                        if hasattr(start, 'x') and hasattr(end, 'x'):
-                            start_pt = (int(start.x * w), int(start.y * h))
-                            end_pt = (int(end.x * w), int(end.y * h))
-                            cv2.line(output, start_pt, end_pt, color, 3)
-                
-                # Draw key points (joints)
-                for landmark in landmarks:
-                    if hasattr(landmark, 'x') and hasattr(landmark, 'y'):
-                        x = int(landmark.x * w)
-                        y = int(landmark.y * h)
-                        cv2.circle(output, (x, y), 5, color, -1)
-            
-            # Convert to BGRA for NDI streaming
-            bgra_frame = cv2.cvtColor(output, cv2.COLOR_BGR2BGRA)
-            return bgra_frame
+            width, height = self.stream_resolution
+            output = np.empty((height, width, 4), dtype=np.uint8)
+            self.compositor.render(output, frame, landmarks, hard_mask)
+            return output
         except Exception as e:
             if self.frame_counter <= 5:
                 print(f"DEBUG: Stream frame creation error for {uuid[:8]}: {e}")
             return None
     
-    def save_participant_thumbnail(self, frame: np.ndarray, uuid: str, landmarks, hard_mask: Optional[np.ndarray] = None):
-        """
-        Save a thumbnail that matches the NDI stream output: segmented person + skeleton overlay.
-        
-        Args:
-            frame: Full frame
-            uuid: Participant UUID (MUST be real UUID, not temp - caller should filter)
-            landmarks: Pose landmarks
-            hard_mask: Binary segmentation mask
-        """
-        # Only save once per UUID (caller should already filter temp UUIDs)
-        if uuid in self.saved_thumbnails:
-            return
-        
-        try:
-            # Create the same composite frame as NDI stream (segmented + skeleton)
-            stream_frame = self.create_participant_stream_frame(frame, uuid, landmarks, hard_mask)
-            if stream_frame is None:
-                return
+    def publish_outputs(self, frame: np.ndarray, participants: List[Dict],
+                        hard_masks: Optional[List[Optional[RefinedMask]]]):
+        """Per-participant outputs for a detection result: thumbnails and NDI streams."""
+        # Lifecycle runs on this (outputs) thread, which owns the NDI streams
+        self.lifecycle.seen(p["uuid"] for p in participants if not p["uuid"].startswith("temp_"))
+        self.lifecycle.update()
+        
+        # Queue thumbnails and feed NDI streams for each detected participant
+        # ONLY for real UUIDs (skip temp UUIDs)
+        for idx, p in enumerate(participants):
+            uuid = p["uuid"]
             
-            # Convert BGRA to BGR for saving
-            bgr_frame = cv2.cvtColor(stream_frame, cv2.COLOR_BGRA2BGR)
+            # SKIP temp UUIDs completely - no thumbnails, no streams
+            if uuid.startswith("temp_"):
+                continue
             
-            # Resize to thumbnail size
-            thumbnail = cv2.resize(bgr_frame, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+            landmarks = p["landmarks"]
+            # Get corresponding hard mask if available
+            hard_mask = hard_masks[idx] if hard_masks and idx < len(hard_masks) else None
             
-            # Save thumbnail
-            thumbnail_path = self.thumbnails_dir / f"participant_{uuid}.jpg"
-            cv2.imwrite(str(thumbnail_path), thumbnail)
-            self.saved_thumbnails.add(uuid)
+            # Queue a thumbnail refresh if due (rendered off this thread)
+            self.thumbnail_writer.submit(uuid, frame, landmarks, hard_mask, p["timestamp"])
             
-        except Exception as e:
-            if self.frame_counter <= 5:
-                print(f"DEBUG: Thumbnail save error for {uuid[:8]}: {e}")
-            import traceback
-            traceback.print_exc()
+            # Create NDI stream if it doesn't exist
+            if uuid not in self.ndi_streamer.streams:
+                self.ndi_streamer.create_stream(
+                    uuid,
+                    self.stream_resolution[0],
+                    self.stream_resolution[1],
+                    fps=30.0
+                )
+            
+            # Composite (segmented person + skeleton) straight into the stream's send buffer
+            try:
+                # render runs synchronously inside send_render
+                self.ndi_streamer.send_render(
+                    uuid, lambda out: self.compositor.render(out, frame, landmarks, hard_mask, uuid=uuid)
+                )
+            except Exception as e:
+                if self.frame_counter <= 5:
+                    print(f"DEBUG: Stream frame creation error for {uuid[:8]}: {e}")
     
     def close(self):
         """Clean up resources."""
         if self.landmarker:
             self.landmarker.close()
+        self.lifecycle.evict_all()
+        if self.scoring_stage is not None:
+            self.scoring_stage.close()
+        self.thumbnail_writer.close()
+        self.zone_filter.close()
         self.ndi_streamer.close()
         self.shared_memory_writer.close()
-        self.tracker.save()
+        self.tracker.close()
+
+
+def draw_preview(detector: MultiPersonDetector, frame: np.ndarray, participants: List[Dict],
+                 hard_masks: Optional[List[Optional[RefinedMask]]], scale: float = 1.0) -> np.ndarray:
+    """
+    Side-by-side preview: pose skeletons + zone (left), segmentation overlay (right).
+    
+    scale < 1 renders both panels at reduced resolution (cheaper).
+    """
+    if scale != 1.0:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    # Draw pose skeleton on left side
+    annotated = frame.copy()
+    h, w = frame.shape[:2]
+    
+    # Draw each zone outline with semi-transparent fill (blend only the zone bbox)
+    for name, shape in zip(detector.zone_filter.zone_names, detector.zone_filter.zones.shapes):
+        pts = np.round(shape * (w, h)).astype(np.int32)
+        zx1, zy1 = np.maximum(pts.min(axis=0), 0)
+        zx2, zy2 = pts.max(axis=0)
+        zone_roi = annotated[zy1:zy2, zx1:zx2]
+        if zone_roi.size:
+            fill = zone_roi.copy()
+            cv2.fillPoly(fill, [pts - (zx1, zy1)], (255, 255, 0))
+            cv2.addWeighted(fill, 0.15, zone_roi, 0.85, 0, zone_roi)
+        # Draw thick border
+        cv2.polylines(annotated, [pts], True, (0, 255, 255), 3)
+        # Label
+        label = "ZONE" if name == "main" else name.upper()
+        cv2.putText(annotated, label, (int(zx1) + 5, int(zy1) + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    
+    if participants:
+        for p in participants:
+            landmarks = p["landmarks"]
+            if not landmarks or len(landmarks) < 33:
+                continue
+            
+            color = (0, 255, 0) if p["in_zone"] else (0, 0, 255)
+            
+            # Draw connections (skeleton) - thicker lines
+            for connection in detector.POSE_CONNECTIONS:
+                start_idx, end_idx = connection
+                if start_idx < len(landmarks) and end_idx < len(landmarks):
+                    start = landmarks[start_idx]
+                    end = landmarks[end_idx]
+                    if hasattr(start, 'x') and hasattr(end, 'x'):
+                        start_pt = (int(start.x * w), int(start.y * h))
+                        end_pt = (int(end.x * w), int(end.y * h))
+                        cv2.line(annotated, start_pt, end_pt, color, 4)
+            
+            # Draw key points (joints) - larger circles
+            for landmark in landmarks:
+                if hasattr(landmark, 'x') and hasattr(landmark, 'y'):
+                    x = int(landmark.x * w)
+                    y = int(landmark.y * h)
+                    cv2.circle(annotated, (x, y), 6, color, -1)
+            
+            # Calculate average Z (depth) for this person
+            z_values = [lm.z for lm in landmarks if hasattr(lm, 'z')]
+            avg_z = sum(z_values) / len(z_values) if z_values else 0.0
+            z_cfg = detector.zone_filter.config["z_range"]
+            in_z = z_cfg["min"] <= avg_z <= z_cfg["max"]
+            
+            # Draw UUID label with Z value
+            if len(landmarks) > 0 and hasattr(landmarks[0], 'x'):
+                nose = landmarks[0]
+                zone_status = "IN" if p['in_zone'] else "OUT"
+                if p['in_zone'] and len(detector.zone_filter.zone_names) > 1:
+                    zone_status = ",".join(p['zones'])
+                z_status = "" if in_z else " Z!"
+                uuid_text = f"{p['uuid'][:8]} {zone_status}{z_status}"
+                label_x = int(nose.x * w)
+                label_y = int(nose.y * h) - 40
+                
+                # Background box for readability
+                (tw, th), _ = cv2.getTextSize(uuid_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+                cv2.rectangle(annotated, (label_x - 5, label_y - th - 5), 
+                             (label_x + tw + 5, label_y + 5), (0, 0, 0), -1)
+                cv2.putText(annotated, uuid_text, (label_x, label_y),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+                
+                # Z depth bar below label
+                bar_y = label_y + 10
+                bar_w = 80
+                bar_h = 8
+                # Map Z from range to bar position (-1 to 1 -> 0 to bar_w)
+                z_norm = (avg_z + 1.0) / 2.0  # -1 to 1 -> 0 to 1
+                z_pos = max(0, min(bar_w, int(z_norm * bar_w)))
+                z_min_pos = max(0, int((z_cfg["min"] + 1.0) / 2.0 * bar_w))
+                z_max_pos = min(bar_w, int((z_cfg["max"] + 1.0) / 2.0 * bar_w))
+                
+                # Draw Z bar background
+                cv2.rectangle(annotated, (label_x, bar_y), (label_x + bar_w, bar_y + bar_h), (50, 50, 50), -1)
+                # Draw Z range (valid zone)
+                cv2.rectangle(annotated, (label_x + z_min_pos, bar_y), 
+                             (label_x + z_max_pos, bar_y + bar_h), (0, 100, 0), -1)
+                # Draw current Z position
+                z_color = (0, 255, 0) if in_z else (0, 0, 255)
+                cv2.line(annotated, (label_x + z_pos, bar_y - 2), 
+                        (label_x + z_pos, bar_y + bar_h + 2), z_color, 2)
+                # Z value text
+                cv2.putText(annotated, f"Z:{avg_z:.2f}", (label_x + bar_w + 5, bar_y + bar_h),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
+    
+    # Create segmentation overlay on right side with hard edges
+    seg_overlay = frame.copy()
+    if hard_masks:
+        for idx, hard_mask in enumerate(hard_masks):
+            if hard_mask is None:
+                continue
+            try:
+                # Ensure mask matches frame dimensions (nearest neighbor preserves hard edges)
+                mask = hard_mask.resized(w, h)
+                rows, cols = mask.roi
+                
+                # Colored overlay (green tint) blended inside the mask bbox only
+                roi = seg_overlay[rows, cols]
+                color_mask = np.zeros_like(roi)
+                color_mask[:, :, 1] = mask.mask  # Green channel
+                seg_overlay[rows, cols] = cv2.addWeighted(roi, 0.4, color_mask, 0.6, 0)  # 60% green blend
+                
+                # Draw skeleton on segmentation overlay if we have participants
+                if idx < len(participants):
+                    p = participants[idx]
+                    landmarks = p["landmarks"]
+                    if landmarks and len(landmarks) >= 33:
+                        color = (0, 255, 0) if p["in_zone"] else (0, 0, 255)
+                        for connection in detector.POSE_CONNECTIONS:
+                            start_idx, end_idx = connection
+                            if start_idx < len(landmarks) and end_idx < len(landmarks):
+                                start = landmarks[start_idx]
+                                end = landmarks[end_idx]
+                                if hasattr(start, 'x') and hasattr(end, 'x'):
+                                    start_pt = (int(start.x * w), int(start.y * h))
+                                    end_pt = (int(end.x * w), int(end.y * h))
+                                    cv2.line(seg_overlay, start_pt, end_pt, color, 3)
+            except Exception as e:
+                if detector.frame_counter <= 5:
+                    print(f"DEBUG: Hard mask visualization error: {e}")
+                pass
+    
+    # Combine side by side
+    combined = np.hstack([annotated, seg_overlay])
+    
+    # Add labels
+    cv2.putText(combined, "Pose Skeleton", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+    cv2.putText(combined, "Segmentation", (w + 10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+    
+    return combined
 
 
 def main():
@@ -539,18 +615,71 @@ def main():
                         help="Loop video file (for testing)")
     parser.add_argument("--persist", "-p", action="store_true",
                         help="Keep participants_db.json from previous run (default: clear)")
+    parser.add_argument("--zone-watch", choices=WATCH_MODES, default="notify",
+                        help="Reload zone_config.json on OS file notifications (default), by polling its mtime, or never")
     parser.add_argument("--phash-history-size", type=int, default=3,
                         help="Number of recent pHash values to keep per participant (default: 3)")
     parser.add_argument("--phash-threshold-floor", type=int, default=40,
                         help="Minimum face pHash match threshold (default: 40)")
+    parser.add_argument("--db-flush-interval", type=float, default=2.0,
+                        help="Seconds between participants DB writes (default: 2.0, 0 = every change)")
+    parser.add_argument("--db-journal", action="store_true",
+                        help="Append DB changes to a journal between full writes (crash safety)")
+    parser.add_argument("--live-stream", action="store_true",
+                        help="Run the landmarker asynchronously (LIVE_STREAM mode) for high-FPS cameras")
+    parser.add_argument("--drop-policy", choices=MultiPersonDetector.DROP_POLICIES, default="skip",
+                        help="LIVE_STREAM: skip frames while busy, or submit all and let MediaPipe drop (default: skip)")
+    parser.add_argument("--max-in-flight", type=int, default=1,
+                        help="LIVE_STREAM: frames allowed in flight before the skip policy drops (default: 1)")
+    parser.add_argument("--mask-scale", type=float, default=1.0,
+                        help="Resolution fraction for segmentation mask refinement (e.g. 0.5 = faster, default: 1.0)")
+    parser.add_argument("--auto-frame", action="store_true",
+                        help="Crop each participant's NDI stream around the person instead of the full frame")
+    parser.add_argument("--headless", action="store_true",
+                        help="No preview window (production); tune zones via the control endpoint")
+    parser.add_argument("--preview-fps", type=float, default=15.0,
+                        help="Preview redraw rate (default: 15, 0 = every result)")
+    parser.add_argument("--preview-scale", type=float, default=1.0,
+                        help="Preview resolution as a fraction of the camera frame (default: 1.0)")
+    parser.add_argument("--control-port", type=int, default=8765,
+                        help="Local HTTP port for zone control (GET/POST /zone, GET /stats; 0 = off)")
+    parser.add_argument("--participant-ttl", type=float, default=30.0,
+                        help="Seconds a participant may be unseen before their NDI stream and state are released (default: 30)")
+    parser.add_argument("--landmark-filter", choices=FILTER_MODES, default="one_euro",
+                        help="Landmark smoothing: speed-adaptive one_euro or fixed ema (default: one_euro)")
+    parser.add_argument("--filter-min-cutoff", type=float, default=1.0,
+                        help="One-Euro cutoff at rest in Hz (lower = steadier, default: 1.0)")
+    parser.add_argument("--filter-beta", type=float, default=8.0,
+                        help="One-Euro speed coefficient (higher = less lag on fast moves, default: 8.0)")
+    parser.add_argument("--thumbnail-interval", type=float, default=2.0,
+                        help="Seconds between thumbnail refreshes per participant (0 = once only, default: 2.0)")
+    parser.add_argument("--in-process-scoring", action="store_true",
+                        help="Score poses inside this process (no separate pose_scorer.py; lowest latency)")
+    parser.add_argument("--scoring-reference", default="reference_poses.json",
+                        help="In-process scoring: reference poses in scoring/ (default: reference_poses.json)")
+    parser.add_argument("--score-file-rate", type=float, default=5.0,
+                        help="In-process scoring: max score JSON writes per second per participant (0 = none)")
+    parser.add_argument("--search-window", type=int, default=None,
+                        help="In-process scoring: match reference frames only within +/- N of the last match")
+    parser.add_argument("--thumbnail-jpeg", action="store_true",
+                        help="Also write thumbnails/participant_<uuid>.jpg (default: shared memory atlas only)")
+    parser.add_argument("--stats-interval", type=float, default=5.0,
+                        help="Seconds between pipeline timing printouts (0 = off)")
     args = parser.parse_args()
     
+    # Orchestrator stops us with SIGTERM: exit through the finally block so
+    # the participants DB is flushed
+    signal.signal(signal.SIGTERM, lambda sig, frame: sys.exit(0))
+    
     # Clear participants by default (unless --persist)
     if not args.persist:
         db_path = Path(__file__).parent / "participants_db.json"
         if db_path.exists():
             db_path.unlink()
             print("Cleared participants_db.json")
+        journal_path = db_path.with_name(db_path.name + ".journal")
+        if journal_path.exists():
+            journal_path.unlink()
         # Clear thumbnails
         thumb_dir = Path(__file__).parent / "thumbnails"
         if thumb_dir.exists():
@@ -564,11 +693,40 @@ def main():
                 if "test" not in f.name:
                     f.unlink()
             print("Cleared score files")
+        # Clear entries left in the shared memory score table and thumbnail atlas
+        for table in (ScoreTableWriter(adopt=False), ThumbnailAtlasWriter(adopt=False)):
+            table.close()
+        print("Cleared shared memory scores and thumbnails")
+    
+    scoring_stage = None
+    if args.in_process_scoring:
+        scoring_stage = ScoringStage(
+            create_scorer(SCORING_DIR / args.scoring_reference, args.search_window),
+            output_dir=SCORING_DIR / "output",
+            file_rate=args.score_file_rate,
+            participant_ttl=args.participant_ttl
+        )
+        print("In-process scoring enabled")
     
     detector = MultiPersonDetector(
         num_poses=3,
+        zone_watch=args.zone_watch,
         hash_history_size=args.phash_history_size,
-        face_threshold_floor=args.phash_threshold_floor
+        face_threshold_floor=args.phash_threshold_floor,
+        db_flush_interval=args.db_flush_interval,
+        db_journal=args.db_journal,
+        live_stream=args.live_stream,
+        drop_policy=args.drop_policy,
+        max_in_flight=args.max_in_flight,
+        mask_scale=args.mask_scale,
+        auto_frame=args.auto_frame,
+        participant_ttl=args.participant_ttl,
+        landmark_filter=args.landmark_filter,
+        filter_min_cutoff=args.filter_min_cutoff,
+        filter_beta=args.filter_beta,
+        thumbnail_interval=args.thumbnail_interval,
+        thumbnail_jpeg=args.thumbnail_jpeg,
+        scoring_stage=scoring_stage
     )
     
     # Parse source - int for camera, string for file
@@ -584,299 +742,121 @@ def main():
     actual_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     print(f"Camera resolution: {actual_w}x{actual_h}")
     
-    # Create window with zone config trackbars
-    cv2.namedWindow("Pose Detection + Segmentation", cv2.WINDOW_NORMAL)
-    
-    def save_zone_config():
-        """Save current zone config to disk."""
-        detector.zone_filter.save_config()
-    
-    def on_zone_x(v):
-        detector.zone_filter.config["screen_region"]["x"] = v / 100.0
-        save_zone_config()
-    def on_zone_y(v):
-        detector.zone_filter.config["screen_region"]["y"] = v / 100.0
-        save_zone_config()
-    def on_zone_w(v):
-        detector.zone_filter.config["screen_region"]["width"] = max(1, v) / 100.0
-        save_zone_config()
-    def on_zone_h(v):
-        detector.zone_filter.config["screen_region"]["height"] = max(1, v) / 100.0
-        save_zone_config()
-    
-    # Get initial values from config
-    cfg = detector.zone_filter.config["screen_region"]
-    z_cfg = detector.zone_filter.config["z_range"]
-    cv2.createTrackbar("Zone X %", "Pose Detection + Segmentation", int(cfg["x"] * 100), 100, on_zone_x)
-    cv2.createTrackbar("Zone Y %", "Pose Detection + Segmentation", int(cfg["y"] * 100), 100, on_zone_y)
-    cv2.createTrackbar("Zone W %", "Pose Detection + Segmentation", int(cfg["width"] * 100), 100, on_zone_w)
-    cv2.createTrackbar("Zone H %", "Pose Detection + Segmentation", int(cfg["height"] * 100), 100, on_zone_h)
-    
-    # Z range sliders (-1.0 to 1.0 mapped to 0-100)
-    def z_to_slider(z): return max(0, min(100, int((z + 1.0) * 50)))  # -1 to 1 -> 0 to 100
-    def slider_to_z(v): return (v / 50.0) - 1.0    # 0 to 100 -> -1 to 1
-    
-    def on_z_min(v):
-        detector.zone_filter.config["z_range"]["min"] = slider_to_z(v)
-        save_zone_config()
-    def on_z_max(v):
-        detector.zone_filter.config["z_range"]["max"] = slider_to_z(v)
-        save_zone_config()
-    
-    # Clamp initial Z values to valid range for sliders
-    z_min_init = max(-1.0, min(1.0, z_cfg.get("min", -1.0)))
-    z_max_init = max(-1.0, min(1.0, z_cfg.get("max", 1.0)))
-    cv2.createTrackbar("Z Min", "Pose Detection + Segmentation", z_to_slider(z_min_init), 100, on_z_min)
-    cv2.createTrackbar("Z Max", "Pose Detection + Segmentation", z_to_slider(z_max_init), 100, on_z_max)
-    
-    # Click-to-set-zone state
-    zone_corners = []
-    
-    def mouse_callback(event, x, y, flags, param):
-        nonlocal zone_corners
-        if event == cv2.EVENT_LBUTTONDOWN:
-            # Only accept clicks on left side (pose skeleton view)
-            if x >= actual_w:
-                print(f"Click on LEFT side (pose view) to set zone, not right side")
-                return
-            # Click sets zone corner (need 2 clicks: top-left, bottom-right)
-            zone_corners.append((x, y))
-            if len(zone_corners) == 2:
-                # Calculate zone from two corners
-                x1, y1 = zone_corners[0]
-                x2, y2 = zone_corners[1]
-                # Normalize to 0-1 (combined view is 2*w wide)
-                frame_w = actual_w  # single frame width
-                norm_x = min(x1, x2) / frame_w
-                norm_y = min(y1, y2) / actual_h
-                norm_w = abs(x2 - x1) / frame_w
-                norm_h = abs(y2 - y1) / actual_h
-                # Clamp to valid range
-                norm_x = max(0, min(1, norm_x))
-                norm_y = max(0, min(1, norm_y))
-                norm_w = max(0.01, min(1 - norm_x, norm_w))
-                norm_h = max(0.01, min(1 - norm_y, norm_h))
-                # Update config
-                detector.zone_filter.config["screen_region"]["x"] = norm_x
-                detector.zone_filter.config["screen_region"]["y"] = norm_y
-                detector.zone_filter.config["screen_region"]["width"] = norm_w
-                detector.zone_filter.config["screen_region"]["height"] = norm_h
-                save_zone_config()
-                # Update sliders
-                cv2.setTrackbarPos("Zone X %", "Pose Detection + Segmentation", int(norm_x * 100))
-                cv2.setTrackbarPos("Zone Y %", "Pose Detection + Segmentation", int(norm_y * 100))
-                cv2.setTrackbarPos("Zone W %", "Pose Detection + Segmentation", int(norm_w * 100))
-                cv2.setTrackbarPos("Zone H %", "Pose Detection + Segmentation", int(norm_h * 100))
-                print(f"Zone set: x={norm_x:.2f} y={norm_y:.2f} w={norm_w:.2f} h={norm_h:.2f}")
-                zone_corners = []
-            else:
-                print(f"Click 1: ({x}, {y}) - click again for opposite corner")
+    # Capture, inference and outputs run on their own threads
+    is_file = not str(source).isdigit()
+    source_fps = cap.get(cv2.CAP_PROP_FPS) if is_file else 0
+    pipeline = VisionPipeline(
+        detector,
+        cap,
+        loop=args.loop and is_file,
+        pace_fps=source_fps if source_fps and source_fps > 0 else None
+    )
+    
+    def get_stats() -> dict:
+        stats = {"pipeline": pipeline.stats(), "ndi": detector.ndi_streamer.get_stats()}
+        if detector.live_stream:
+            stats["live_stream"] = detector.live_stats()
+        return stats
     
-    cv2.setMouseCallback("Pose Detection + Segmentation", mouse_callback)
+    # Zone tuning over HTTP (works with or without the preview window)
+    control = None
+    if args.control_port:
+        control = ControlServer(detector.zone_filter, port=args.control_port, stats_fn=get_stats)
+        control.start()
     
-    print("Controls: sliders to adjust zone, click 2 corners to set zone, 'q' to quit.")
+    preview = None
+    window = "Pose Detection + Segmentation"
+    if not args.headless:
+        cv2.namedWindow(window, cv2.WINDOW_NORMAL)
+        preview_w = int(actual_w * args.preview_scale)
+        preview_h = int(actual_h * args.preview_scale)
+        
+        # Click-to-set-zone state
+        zone_corners = []
+        
+        def mouse_callback(event, x, y, flags, param):
+            nonlocal zone_corners
+            if event == cv2.EVENT_LBUTTONDOWN:
+                # Only accept clicks on left side (pose skeleton view)
+                if x >= preview_w:
+                    print(f"Click on LEFT side (pose view) to set zone, not right side")
+                    return
+                if detector.zone_filter.config.get("zones"):
+                    print("Zones are defined in zone_config.json 'zones'; edit the file or POST /zone")
+                    return
+                # Click sets zone corner (need 2 clicks: top-left, bottom-right)
+                zone_corners.append((x, y))
+                if len(zone_corners) == 2:
+                    # Calculate zone from two corners
+                    x1, y1 = zone_corners[0]
+                    x2, y2 = zone_corners[1]
+                    # Normalize to 0-1 (combined view is 2*w wide)
+                    norm_x = min(x1, x2) / preview_w
+                    norm_y = min(y1, y2) / preview_h
+                    norm_w = abs(x2 - x1) / preview_w
+                    norm_h = abs(y2 - y1) / preview_h
+                    # Clamp to valid range
+                    norm_x = max(0, min(1, norm_x))
+                    norm_y = max(0, min(1, norm_y))
+                    norm_w = max(0.01, min(1 - norm_x, norm_w))
+                    norm_h = max(0.01, min(1 - norm_y, norm_h))
+                    detector.zone_filter.update({"screen_region": {
+                        "x": norm_x, "y": norm_y, "width": norm_w, "height": norm_h
+                    }})
+                    print(f"Zone set: x={norm_x:.2f} y={norm_y:.2f} w={norm_w:.2f} h={norm_h:.2f}")
+                    zone_corners = []
+                else:
+                    print(f"Click 1: ({x}, {y}) - click again for opposite corner")
+        
+        cv2.setMouseCallback(window, mouse_callback)
+        
+        # Preview is drawn on its own thread at a reduced rate; the main
+        # thread only shows it (OpenCV windows must stay on the main thread)
+        preview = PreviewThread(
+            pipeline,
+            lambda result: draw_preview(detector, result.frame, result.participants, result.hard_masks,
+                                        scale=args.preview_scale),
+            fps=args.preview_fps
+        )
+        print("Controls: click 2 corners to set zone, 'q' to quit.")
+    else:
+        print("Headless: no preview. Ctrl+C to quit.")
+    
+    pipeline.start()
+    if preview:
+        preview.start()
+    last_stats = time.time()
     
     try:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                if args.loop and not str(source).isdigit():
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                break
-            
-            participants = detector.detect(frame)
-            detector.frame_counter += 1
-            
-            # Save thumbnails and create NDI streams for each detected participant
-            # ONLY for real UUIDs (skip temp UUIDs)
-            hard_masks = detector.last_hard_masks
-            for idx, p in enumerate(participants):
-                uuid = p["uuid"]
-                
-                # SKIP temp UUIDs completely - no thumbnails, no streams
-                if uuid.startswith("temp_"):
-                    continue
-                
-                landmarks = p["landmarks"]
-                # Get corresponding hard mask if available
-                hard_mask = hard_masks[idx] if hard_masks and idx < len(hard_masks) else None
-                
-                # Save thumbnail (once per participant, only real UUIDs)
-                detector.save_participant_thumbnail(frame, uuid, landmarks, hard_mask)
-                
-                # Create NDI stream if it doesn't exist
-                if uuid not in detector.ndi_streamer.streams:
-                    detector.ndi_streamer.create_stream(
-                        uuid,
-                        detector.stream_resolution[0],
-                        detector.stream_resolution[1],
-                        fps=30.0
-                    )
-                
-                # Create composite frame (segmented person + skeleton) and send to NDI
-                stream_frame = detector.create_participant_stream_frame(frame, uuid, landmarks, hard_mask)
-                if stream_frame is not None:
-                    # Resize to stream resolution
-                    stream_frame_resized = cv2.resize(
-                        stream_frame,
-                        detector.stream_resolution,
-                        interpolation=cv2.INTER_LINEAR
-                    )
-                    detector.ndi_streamer.send_frame(uuid, stream_frame_resized)
-            
-            # Zone config is updated directly by trackbars (no need to reload from disk)
-            
-            # Get segmentation masks for overlay
-            seg_masks = detector.last_segmentation_masks
-            
-            # Draw pose skeleton on left side
-            annotated = frame.copy()
-            h, w = frame.shape[:2]
-            
-            # Draw zone rectangle with semi-transparent fill
-            zone = detector.zone_filter.config["screen_region"]
-            zx1 = int(zone["x"] * w)
-            zy1 = int(zone["y"] * h)
-            zx2 = int((zone["x"] + zone["width"]) * w)
-            zy2 = int((zone["y"] + zone["height"]) * h)
-            # Draw semi-transparent cyan fill
-            overlay = annotated.copy()
-            cv2.rectangle(overlay, (zx1, zy1), (zx2, zy2), (255, 255, 0), -1)
-            cv2.addWeighted(overlay, 0.15, annotated, 0.85, 0, annotated)
-            # Draw thick border
-            cv2.rectangle(annotated, (zx1, zy1), (zx2, zy2), (0, 255, 255), 3)
-            # Label
-            cv2.putText(annotated, "ZONE", (zx1 + 5, zy1 + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-            
-            if participants:
-                for p in participants:
-                    landmarks = p["landmarks"]
-                    if not landmarks or len(landmarks) < 33:
-                        continue
-                    
-                    color = (0, 255, 0) if p["in_zone"] else (0, 0, 255)
-                    
-                    # Draw connections (skeleton) - thicker lines
-                    for connection in detector.POSE_CONNECTIONS:
-                        start_idx, end_idx = connection
-                        if start_idx < len(landmarks) and end_idx < len(landmarks):
-                            start = landmarks[start_idx]
-                            end = landmarks[end_idx]
-                            if hasattr(start, 'x') and hasattr(end, 'x'):
-                                start_pt = (int(start.x * w), int(start.y * h))
-                                end_pt = (int(end.x * w), int(end.y * h))
-                                cv2.line(annotated, start_pt, end_pt, color, 4)
-                    
-                    # Draw key points (joints) - larger circles
-                    for landmark in landmarks:
-                        if hasattr(landmark, 'x') and hasattr(landmark, 'y'):
-                            x = int(landmark.x * w)
-                            y = int(landmark.y * h)
-                            cv2.circle(annotated, (x, y), 6, color, -1)
-                    
-                    # Calculate average Z (depth) for this person
-                    z_values = [lm.z for lm in landmarks if hasattr(lm, 'z')]
-                    avg_z = sum(z_values) / len(z_values) if z_values else 0.0
-                    z_cfg = detector.zone_filter.config["z_range"]
-                    in_z = z_cfg["min"] <= avg_z <= z_cfg["max"]
-                    
-                    # Draw UUID label with Z value
-                    if len(landmarks) > 0 and hasattr(landmarks[0], 'x'):
-                        nose = landmarks[0]
-                        zone_status = "IN" if p['in_zone'] else "OUT"
-                        z_status = "" if in_z else " Z!"
-                        uuid_text = f"{p['uuid'][:8]} {zone_status}{z_status}"
-                        label_x = int(nose.x * w)
-                        label_y = int(nose.y * h) - 40
-                        
-                        # Background box for readability
-                        (tw, th), _ = cv2.getTextSize(uuid_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                        cv2.rectangle(annotated, (label_x - 5, label_y - th - 5), 
-                                     (label_x + tw + 5, label_y + 5), (0, 0, 0), -1)
-                        cv2.putText(annotated, uuid_text, (label_x, label_y),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                        
-                        # Z depth bar below label
-                        bar_y = label_y + 10
-                        bar_w = 80
-                        bar_h = 8
-                        # Map Z from range to bar position (-1 to 1 -> 0 to bar_w)
-                        z_norm = (avg_z + 1.0) / 2.0  # -1 to 1 -> 0 to 1
-                        z_pos = max(0, min(bar_w, int(z_norm * bar_w)))
-                        z_min_pos = max(0, int((z_cfg["min"] + 1.0) / 2.0 * bar_w))
-                        z_max_pos = min(bar_w, int((z_cfg["max"] + 1.0) / 2.0 * bar_w))
-                        
-                        # Draw Z bar background
-                        cv2.rectangle(annotated, (label_x, bar_y), (label_x + bar_w, bar_y + bar_h), (50, 50, 50), -1)
-                        # Draw Z range (valid zone)
-                        cv2.rectangle(annotated, (label_x + z_min_pos, bar_y), 
-                                     (label_x + z_max_pos, bar_y + bar_h), (0, 100, 0), -1)
-                        # Draw current Z position
-                        z_color = (0, 255, 0) if in_z else (0, 0, 255)
-                        cv2.line(annotated, (label_x + z_pos, bar_y - 2), 
-                                (label_x + z_pos, bar_y + bar_h + 2), z_color, 2)
-                        # Z value text
-                        cv2.putText(annotated, f"Z:{avg_z:.2f}", (label_x + bar_w + 5, bar_y + bar_h),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
-            
-            # Get hard-edged binary masks (thresholded from pose segmentation)
-            hard_masks = detector.last_hard_masks
-            
-            # Create segmentation overlay on right side with hard edges
-            seg_overlay = frame.copy()
-            if hard_masks:
-                for idx, hard_mask in enumerate(hard_masks):
-                    try:
-                        # Convert binary mask (0.0 or 1.0) to uint8 (0 or 255) - hard edges!
-                        mask_uint8 = (hard_mask * 255).astype(np.uint8)
-                        
-                        # Ensure mask matches frame dimensions (use nearest neighbor to preserve hard edges)
-                        if mask_uint8.shape[:2] != frame.shape[:2]:
-                            mask_uint8 = cv2.resize(mask_uint8, (w, h), interpolation=cv2.INTER_NEAREST)
-                        
-                        # Create colored overlay (green tint) with hard edges
-                        color_mask = np.zeros_like(frame)
-                        color_mask[:, :, 1] = mask_uint8  # Green channel
-                        seg_overlay = cv2.addWeighted(seg_overlay, 0.4, color_mask, 0.6, 0)  # 60% green blend
-                        
-                        # Draw skeleton on segmentation overlay if we have participants
-                        if idx < len(participants):
-                            p = participants[idx]
-                            landmarks = p["landmarks"]
-                            if landmarks and len(landmarks) >= 33:
-                                color = (0, 255, 0) if p["in_zone"] else (0, 0, 255)
-                                for connection in detector.POSE_CONNECTIONS:
-                                    start_idx, end_idx = connection
-                                    if start_idx < len(landmarks) and end_idx < len(landmarks):
-                                        start = landmarks[start_idx]
-                                        end = landmarks[end_idx]
-                                        if hasattr(start, 'x') and hasattr(end, 'x'):
-                                            start_pt = (int(start.x * w), int(start.y * h))
-                                            end_pt = (int(end.x * w), int(end.y * h))
-                                            cv2.line(seg_overlay, start_pt, end_pt, color, 3)
-                    except Exception as e:
-                        if detector.frame_counter <= 5:
-                            print(f"DEBUG: Hard mask visualization error: {e}")
-                        pass
-            
-            # Combine side by side
-            combined = np.hstack([annotated, seg_overlay])
-            
-            # Add labels
-            cv2.putText(combined, "Pose Skeleton", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-            cv2.putText(combined, "Segmentation", (w + 10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-            
-            # Show combined view
-            cv2.imshow("Pose Detection + Segmentation", combined)
+        while pipeline.running:
+            if preview:
+                image = preview.get_image(timeout=0.05)
+                if image is not None:
+                    cv2.imshow(window, image)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            else:
+                pipeline.get_result(timeout=0.1)  # Results are only consumed
             
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+            if args.stats_interval > 0 and time.time() - last_stats >= args.stats_interval:
+                stats = get_stats()
+                print(format_stats(stats["pipeline"]))
+                print(f"[ndi] {stats['ndi']}")
+                if "live_stream" in stats:
+                    print(f"[live_stream] {stats['live_stream']}")
+                last_stats = time.time()
+    except KeyboardInterrupt:
+        pass
     finally:
+        if preview:
+            preview.stop()
+        pipeline.stop()
+        if control:
+            control.stop()
         cap.release()
-        cv2.destroyAllWindows()
+        if not args.headless:
+            cv2.destroyAllWindows()
         detector.close()
 
-
 if __name__ == "__main__":
     main()
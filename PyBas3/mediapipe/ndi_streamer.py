@@ -3,11 +3,16 @@
 NDI video streamer for participant video outputs.
 
 Creates separate NDI streams named `BAS_Participant_<UUID>` for each detected participant.
+Each stream has its own send thread fed through a small drop-oldest queue, so
+a slow NDI send never blocks the detection loop.
 """
 
+import threading
+import time
+from collections import deque
 import cv2
 import numpy as np
-from typing import Dict, Optional
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 from pathlib import Path
 
 try:
@@ -18,11 +23,187 @@ except ImportError:
     print("Warning: ndi-python not available. NDI streaming disabled.")
 
 
+class BGRXFramePool:
+    """Fixed set of preallocated (height, width, 4) uint8 BGRX buffers."""
+    
+    def __init__(self, width: int, height: int, count: int):
+        self.width = width
+        self.height = height
+        self._free: List[np.ndarray] = [
+            np.full((height, width, 4), 255, dtype=np.uint8) for _ in range(count)
+        ]
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> Optional[np.ndarray]:
+        """Take a free buffer, or None if all are in use."""
+        with self._lock:
+            return self._free.pop() if self._free else None
+    
+    def release(self, buffer: np.ndarray):
+        """Return a buffer to the pool."""
+        with self._lock:
+            self._free.append(buffer)
+
+
+class NDISendWorker:
+    """
+    Sends frames for one NDI stream on a background thread.
+    
+    submit() converts the frame into a pooled BGRX buffer and queues it;
+    submit_render() lets the caller draw straight into the pooled buffer.
+    When the queue is full the oldest queued frame is dropped, so the
+    stream always sends the most recent frames and latency stays bounded.
+    """
+    
+    def __init__(self, name: str, sender, width: int, height: int, fps: float = 30.0, queue_size: int = 1):
+        self.name = name
+        self.sender = sender
+        self.width = width
+        self.height = height
+        self.queue_size = max(1, queue_size)
+        # Queued frames plus the one being sent
+        self.pool = BGRXFramePool(width, height, self.queue_size + 1)
+        self._queue: Deque[Tuple[np.ndarray, float]] = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._resize_scratch: Dict[int, np.ndarray] = {}  # channels -> resize target
+        
+        # Reused for every send
+        self._video_frame = ndi.VideoFrameV2()
+        self._video_frame.xres = width
+        self._video_frame.yres = height
+        self._video_frame.FourCC = ndi.FOURCC_VIDEO_TYPE_BGRX
+        self._video_frame.frame_rate_N = int(fps * 1000)
+        self._video_frame.frame_rate_D = 1000
+        self._video_frame.picture_aspect_ratio = width / height
+        self._video_frame.line_stride_in_bytes = width * 4
+        
+        # Stats
+        self.submitted = 0
+        self.sent = 0
+        self.dropped = 0
+        self.send_ms = 0.0  # Smoothed duration of the NDI send call
+        self.latency_ms = 0.0  # Smoothed submit -> sent time
+        
+        self._thread = threading.Thread(target=self._run, name=f"ndi-send-{name}", daemon=True)
+        self._thread.start()
+    
+    def _fill(self, frame: np.ndarray, out: np.ndarray):
+        """Resize/convert frame (gray, BGR or BGRA) into the BGRX buffer out."""
+        h, w = frame.shape[:2]
+        if h != self.height or w != self.width:
+            channels = 1 if frame.ndim == 2 else frame.shape[2]
+            scratch = self._resize_scratch.get(channels)
+            if scratch is None or scratch.dtype != frame.dtype:
+                shape = (self.height, self.width) if channels == 1 else (self.height, self.width, channels)
+                scratch = np.empty(shape, dtype=frame.dtype)
+                self._resize_scratch[channels] = scratch
+            frame = cv2.resize(frame, (self.width, self.height), dst=scratch)
+        
+        # Convert to BGRX (ignore alpha, use X=255)
+        if frame.ndim == 2:
+            cv2.cvtColor(frame, cv2.COLOR_GRAY2BGRA, dst=out)
+        elif frame.shape[2] == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=out)
+        else:
+            np.copyto(out, frame)
+            out[:, :, 3] = 255
+    
+    def submit(self, frame: np.ndarray) -> bool:
+        """Queue a frame for sending (copied; the caller keeps ownership)."""
+        return self.submit_render(lambda out: self._fill(frame, out))
+    
+    def submit_render(self, render: Callable[[np.ndarray], None]) -> bool:
+        """
+        Queue a frame produced by render(out), which must fully overwrite
+        the (height, width, 4) BGRX buffer out.
+        """
+        if not self._running:
+            return False
+        
+        buffer = self.pool.acquire()
+        if buffer is None:
+            # Queue full: recycle the oldest queued frame's buffer
+            with self._cond:
+                if self._queue:
+                    buffer, _ = self._queue.popleft()
+                    self.dropped += 1
+            if buffer is None:
+                self.dropped += 1
+                return False
+        
+        try:
+            render(buffer)
+        except Exception:
+            self.pool.release(buffer)
+            raise
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                stale, _ = self._queue.popleft()
+                self.pool.release(stale)
+                self.dropped += 1
+            self._queue.append((buffer, time.perf_counter()))
+            self.submitted += 1
+            self._cond.notify()
+        return True
+    
+    def _run(self):
+        """Send queued frames until stopped."""
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._queue:
+                    return  # Stopped and drained
+                buffer, queued_at = self._queue.popleft()
+            
+            start = time.perf_counter()
+            try:
+                self._video_frame.data = buffer
+                ndi.send_send_video_v2(self.sender, self._video_frame)
+                self.sent += 1
+            except Exception as e:
+                print(f"NDI send error on {self.name}: {e}")
+            finally:
+                self.pool.release(buffer)
+            
+            done = time.perf_counter()
+            self.send_ms = 0.9 * self.send_ms + 0.1 * (done - start) * 1000
+            self.latency_ms = 0.9 * self.latency_ms + 0.1 * (done - queued_at) * 1000
+    
+    def stats(self) -> dict:
+        """Queue depth, frame counters and smoothed timings."""
+        with self._cond:
+            depth = len(self._queue)
+        return {
+            "queue_depth": depth,
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "send_ms": round(self.send_ms, 2),
+            "latency_ms": round(self.latency_ms, 2),
+        }
+    
+    def stop(self, drain: bool = False):
+        """Stop the send thread (optionally sending what is still queued)."""
+        with self._cond:
+            self._running = False
+            if not drain:
+                while self._queue:
+                    self.pool.release(self._queue.popleft()[0])
+            self._cond.notify()
+        self._thread.join()
+
+
 class NDIStreamer:
     """Manages per-participant NDI video streams."""
     
-    def __init__(self):
-        self.streams: Dict[str, dict] = {}  # uuid -> {sender, width, height}
+    def __init__(self, queue_size: int = 1):
+        self.streams: Dict[str, dict] = {}  # uuid -> {sender, width, height, worker}
+        # Guards streams: the outputs thread creates/removes streams while
+        # get_stats() runs on the main loop and the control server thread
+        self._lock = threading.Lock()
+        self.queue_size = queue_size  # Frames buffered per stream before dropping the oldest
         self._initialized = False
         
         if not NDI_AVAILABLE:
@@ -44,88 +225,83 @@ class NDIStreamer:
         if not self._initialized:
             return False
         
-        if uuid in self.streams:
-            return True  # Already exists
-        
-        stream_name = f"BAS_Participant_{uuid}"
-        
-        # Create dedicated sender for this participant
-        send_create = ndi.SendCreate()
-        send_create.ndi_name = stream_name
-        send_create.clock_video = False
-        
-        sender = ndi.send_create(send_create)
-        if not sender:
-            print(f"Failed to create NDI sender for {stream_name}")
-            return False
-        
-        self.streams[uuid] = {
-            "name": stream_name,
-            "sender": sender,
-            "width": width,
-            "height": height,
-            "fps": fps
-        }
+        with self._lock:
+            if uuid in self.streams:
+                return True  # Already exists
+            
+            stream_name = f"BAS_Participant_{uuid}"
+            
+            # Create dedicated sender for this participant
+            send_create = ndi.SendCreate()
+            send_create.ndi_name = stream_name
+            send_create.clock_video = False
+            
+            sender = ndi.send_create(send_create)
+            if not sender:
+                print(f"Failed to create NDI sender for {stream_name}")
+                return False
+            
+            self.streams[uuid] = {
+                "name": stream_name,
+                "sender": sender,
+                "width": width,
+                "height": height,
+                "fps": fps,
+                "worker": NDISendWorker(stream_name, sender, width, height, fps, self.queue_size)
+            }
         
         print(f"Created NDI stream: {stream_name} ({width}x{height})")
         return True
     
     def send_frame(self, uuid: str, frame_bgra: np.ndarray) -> bool:
         """
-        Send a frame to a participant's NDI stream.
+        Queue a frame (gray, BGR or BGRA, any size) for a participant's NDI stream.
+        
+        Returns immediately; the frame is resized/converted into a pooled
+        BGRX buffer and sent by the stream's worker thread.
         """
         if not self._initialized:
             return False
         
-        if uuid not in self.streams:
+        with self._lock:
+            stream = self.streams.get(uuid)
+        if stream is None:
             return False
         
-        stream = self.streams[uuid]
-        sender = stream["sender"]
-        width = stream["width"]
-        height = stream["height"]
+        return stream["worker"].submit(frame_bgra)
+    
+    def send_render(self, uuid: str, render: Callable[[np.ndarray], None]) -> bool:
+        """
+        Queue a frame rendered directly into the stream's pooled BGRX buffer.
         
-        # Ensure frame matches stream dimensions
-        h, w = frame_bgra.shape[:2]
-        if h != height or w != width:
-            frame_bgra = cv2.resize(frame_bgra, (width, height))
+        render(out) receives a (height, width, 4) uint8 buffer at the stream
+        resolution and must overwrite all of it (X channel = 255).
+        """
+        if not self._initialized:
+            return False
         
-        # Convert to BGRX (ignore alpha, use X=255)
-        if len(frame_bgra.shape) == 2:
-            frame_bgrx = cv2.cvtColor(frame_bgra, cv2.COLOR_GRAY2BGRA)
-        elif frame_bgra.shape[2] == 3:
-            frame_bgrx = cv2.cvtColor(frame_bgra, cv2.COLOR_BGR2BGRA)
-        else:
-            frame_bgrx = frame_bgra.copy()
-        
-        # Set alpha to 255
-        frame_bgrx[:, :, 3] = 255
-        
-        # Ensure contiguous C-order array
-        frame_bgrx = np.ascontiguousarray(frame_bgrx, dtype=np.uint8)
-        
-        # Create fresh video frame each time
-        video_frame = ndi.VideoFrameV2()
-        video_frame.xres = width
-        video_frame.yres = height
-        video_frame.FourCC = ndi.FOURCC_VIDEO_TYPE_BGRX
-        video_frame.frame_rate_N = 30000
-        video_frame.frame_rate_D = 1000
-        video_frame.picture_aspect_ratio = width / height
-        video_frame.line_stride_in_bytes = width * 4
-        video_frame.data = frame_bgrx
-        
-        # Send frame
-        ndi.send_send_video_v2(sender, video_frame)
-        return True
+        with self._lock:
+            stream = self.streams.get(uuid)
+        if stream is None:
+            return False
+        
+        return stream["worker"].submit_render(render)
+    
+    def get_stats(self) -> Dict[str, dict]:
+        """Per-stream send stats: {uuid: {queue_depth, submitted, sent, dropped, send_ms, latency_ms}}."""
+        with self._lock:
+            streams = list(self.streams.items())
+        return {uuid: stream["worker"].stats() for uuid, stream in streams}
     
     def remove_stream(self, uuid: str):
         """Remove and destroy an NDI stream for a participant."""
-        if uuid in self.streams:
-            stream = self.streams[uuid]
+        with self._lock:
+            stream = self.streams.pop(uuid, None)
+        if stream is not None:
+            # Stopped outside the lock: stop() joins the send thread
+            stream["worker"].stop()
             if stream.get("sender"):
                 ndi.send_destroy(stream["sender"])
-            del self.streams[uuid]
             print(f"Removed NDI stream: BAS_Participant_{uuid}")
     
     def close(self):
@@ -134,7 +310,9 @@ class NDIStreamer:
             return
         
         # Destroy all participant senders
-        for uuid in list(self.streams.keys()):
+        with self._lock:
+            uuids = list(self.streams.keys())
+        for uuid in uuids:
             self.remove_stream(uuid)
         
         # Destroy NDI library
@@ -166,5 +344,6 @@ if __name__ == "__main__":
         streamer.send_frame("test1234", frame)
         time.sleep(1/30)
     
+    print(f"Stats: {streamer.get_stats()}")
     streamer.close()
     print("Test complete")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Per-participant NDI frame compositor.
+
+Renders a participant (masked pixels + skeleton) straight into a
+stream-resolution BGRX buffer, e.g. a pooled NDI send buffer. Only the
+participant's bounding box is resized and composited, so the cost scales
+with the person's size instead of the camera resolution.
+
+Two framings:
+- full frame (default): the whole camera frame maps onto the stream, as before
+- auto-frame: a crop centred on the person, smoothed per participant
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from mask_refiner import RefinedMask
+
+# Fallback crop padding (pixels) around landmarks when there is no mask
+FALLBACK_PAD_PX = 20
+
+# Little-endian BGRX pixel (0, 0, 0, 255) as one 32-bit word
+_OPAQUE_BLACK = np.uint32(0xFF000000) if np.little_endian else np.uint32(0x000000FF)
+
+Crop = Tuple[int, int, int, int]  # x0, y0, width, height in frame pixels
+
+
+def _clear_bgrx(out: np.ndarray):
+    """Fill a BGRX buffer with opaque black."""
+    if out.flags.c_contiguous:
+        out.view(np.uint32).fill(_OPAQUE_BLACK)  # One 32-bit store per pixel
+    else:
+        out[:] = (0, 0, 0, 255)
+
+
+class ParticipantCompositor:
+    """
+    Composites segmented participants into stream-sized BGRX buffers.
+
+    Example:
+        compositor = ParticipantCompositor(connections, auto_frame=True)
+        compositor.render(out, frame, landmarks, refined_mask, uuid=uuid)
+    """
+
+    def __init__(
+        self,
+        connections: List[Tuple[int, int]],
+        auto_frame: bool = False,
+        margin: float = 0.15,
+        min_height_fraction: float = 0.25,
+        smoothing: float = 0.3
+    ):
+        """
+        Args:
+            connections: Skeleton landmark index pairs to draw
+            auto_frame: Crop the stream around the person instead of showing the full frame
+            margin: Auto-frame padding around the person (fraction of person size)
+            min_height_fraction: Auto-frame never zooms closer than this fraction of frame height
+            smoothing: Auto-frame EMA factor per frame (lower = steadier framing)
+        """
+        self.connections = connections
+        self.auto_frame = auto_frame
+        self.margin = margin
+        self.min_height_fraction = min_height_fraction
+        self.smoothing = smoothing
+        self._framing: Dict[str, np.ndarray] = {}  # uuid -> smoothed (cx, cy, crop height)
+
+    def forget(self, uuid: str):
+        """Drop auto-framing state for a participant that left."""
+        self._framing.pop(uuid, None)
+
+    def _content_bbox(self, landmarks, mask: Optional[RefinedMask], width: int, height: int):
+        """Pixel region (x0, y0, x1, y1) holding the person, or None."""
+        if mask is not None:
+            return mask.bbox
+        if not landmarks:
+            return None
+        xs = [lm.x * width for lm in landmarks if hasattr(lm, 'x')]
+        ys = [lm.y * height for lm in landmarks if hasattr(lm, 'y')]
+        if not xs:
+            return None
+        x0 = max(0, int(min(xs) - FALLBACK_PAD_PX))
+        x1 = min(width, int(max(xs) + FALLBACK_PAD_PX))
+        y0 = max(0, int(min(ys) - FALLBACK_PAD_PX))
+        y1 = min(height, int(max(ys) + FALLBACK_PAD_PX))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def _auto_crop(self, uuid: Optional[str], bbox, frame_w: int, frame_h: int, aspect: float) -> Crop:
+        """Person-centred crop with the stream's aspect ratio, clamped to the frame."""
+        x0, y0, x1, y1 = bbox
+        target = np.array([
+            (x0 + x1) / 2,
+            (y0 + y1) / 2,
+            max((y1 - y0) * (1 + 2 * self.margin),
+                (x1 - x0) * (1 + 2 * self.margin) / aspect,
+                frame_h * self.min_height_fraction),
+        ])
+        if uuid is not None:
+            state = self._framing.get(uuid)
+            if state is None:
+                state = target
+            else:
+                state = state + self.smoothing * (target - state)
+            self._framing[uuid] = state
+            target = state
+
+        cx, cy, crop_h = target
+        crop_w = crop_h * aspect
+        if crop_w > frame_w:
+            crop_w, crop_h = frame_w, frame_w / aspect
+        if crop_h > frame_h:
+            crop_w, crop_h = frame_h * aspect, frame_h
+        crop_w, crop_h = max(1, int(round(crop_w))), max(1, int(round(crop_h)))
+        cx0 = int(round(min(max(cx - crop_w / 2, 0), frame_w - crop_w)))
+        cy0 = int(round(min(max(cy - crop_h / 2, 0), frame_h - crop_h)))
+        return cx0, cy0, crop_w, crop_h
+
+    def render(
+        self,
+        out: np.ndarray,
+        frame: np.ndarray,
+        landmarks,
+        mask: Optional[RefinedMask] = None,
+        uuid: Optional[str] = None
+    ):
+        """
+        Render one participant into out.
+
+        Args:
+            out: (H, W, 4) uint8 BGRX buffer, fully overwritten
+            frame: Full BGR camera frame
+            landmarks: Pose landmarks (normalized)
+            mask: Refined segmentation mask (None = unmasked landmark bbox)
+            uuid: Participant UUID for smoothed auto-framing (None = unsmoothed)
+        """
+        out_h, out_w = out.shape[:2]
+        frame_h, frame_w = frame.shape[:2]
+        _clear_bgrx(out)
+
+        if mask is not None:
+            mask = mask.resized(frame_w, frame_h)
+        bbox = self._content_bbox(landmarks, mask, frame_w, frame_h)
+
+        if self.auto_frame and bbox is not None:
+            crop_x, crop_y, crop_w, crop_h = self._auto_crop(uuid, bbox, frame_w, frame_h, out_w / out_h)
+        else:
+            crop_x, crop_y, crop_w, crop_h = 0, 0, frame_w, frame_h
+        sx, sy = out_w / crop_w, out_h / crop_h
+
+        if bbox is not None:
+            self._composite(out, frame, mask, bbox, (crop_x, crop_y, crop_w, crop_h), sx, sy)
+
+        if landmarks and len(landmarks) >= 33:
+            self._draw_skeleton(out, landmarks, frame_w, frame_h, crop_x, crop_y, sx, sy)
+
+    def _composite(self, out, frame, mask: Optional[RefinedMask], bbox, crop: Crop, sx: float, sy: float):
+        """Scale the person's pixels (masked) from the crop into out."""
+        crop_x, crop_y, crop_w, crop_h = crop
+        out_h, out_w = out.shape[:2]
+
+        # Person region visible in the crop (frame pixels)
+        x0, y0 = max(bbox[0], crop_x), max(bbox[1], crop_y)
+        x1, y1 = min(bbox[2], crop_x + crop_w), min(bbox[3], crop_y + crop_h)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        # Its place in the output
+        dx0, dy0 = int(round((x0 - crop_x) * sx)), int(round((y0 - crop_y) * sy))
+        dx1 = min(out_w, max(dx0 + 1, int(round((x1 - crop_x) * sx))))
+        dy1 = min(out_h, max(dy0 + 1, int(round((y1 - crop_y) * sy))))
+        if dx1 <= dx0 or dy1 <= dy0:
+            return
+        size = (dx1 - dx0, dy1 - dy0)
+
+        src = frame[y0:y1, x0:x1]
+        interpolation = cv2.INTER_AREA if size[0] < src.shape[1] else cv2.INTER_LINEAR
+        pixels = cv2.cvtColor(cv2.resize(src, size, interpolation=interpolation), cv2.COLOR_BGR2BGRA)
+        target = out[dy0:dy1, dx0:dx1]
+
+        if mask is None:
+            np.copyto(target, pixels)
+            return
+
+        mx0, my0 = mask.bbox[0], mask.bbox[1]
+        person = mask.mask[y0 - my0:y1 - my0, x0 - mx0:x1 - mx0]
+        person = cv2.resize(person, size, interpolation=cv2.INTER_NEAREST)
+        cv2.copyTo(pixels, person, target)
+
+    def _draw_skeleton(self, out, landmarks, frame_w, frame_h, crop_x, crop_y, sx, sy):
+        """Draw skeleton lines and joints in output coordinates."""
+        color = (0, 255, 0, 255)  # Green skeleton
+        # 2px lines / 3px joints at 640px wide, scaled with the output
+        scale = out.shape[1] / 640
+        thickness = max(1, int(round(2 * scale)))
+        radius = max(1, int(round(3 * scale)))
+
+        points = [
+            (int((lm.x * frame_w - crop_x) * sx), int((lm.y * frame_h - crop_y) * sy))
+            if hasattr(lm, 'x') and hasattr(lm, 'y') else None
+            for lm in landmarks
+        ]
+
+        # Draw connections (skeleton)
+        for start_idx, end_idx in self.connections:
+            if start_idx < len(points) and end_idx < len(points):
+                start, end = points[start_idx], points[end_idx]
+                if start is not None and end is not None:
+                    cv2.line(out, start, end, color, thickness)
+
+        # Draw key points (joints)
+        for point in points:
+            if point is not None:
+                cv2.circle(out, point, radius, color, -1)
@@ -3,20 +3,38 @@
 Participant tracking using perceptual hashing (pHash).
 
 Maintains stable UUIDs across frames using upper-body image hashing.
-Persists UUIDs to participants_db.json for restart persistence.
+Persists UUIDs to participants_db.json for restart persistence. Writes are
+batched: the tracking loop only marks participants dirty, and a background
+thread flushes them (optionally through an append-only journal).
 """
 
+import atexit
 import cv2
 import numpy as np
 import json
 import os
+import threading
 import time
 from pathlib import Path
 from uuid import uuid4
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Set, Tuple
 import mediapipe as mp
 
 
+# Full snapshot once the journal holds this many records
+JOURNAL_COMPACT_RECORDS = 500
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    # numpy < 2.0: per-byte lookup table
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        words = np.ascontiguousarray(words)
+        return _POPCOUNT_TABLE[words.view(np.uint8)].reshape(*words.shape, -1).sum(axis=-1)
+
+
 class ParticipantTracker:
     """Tracks participants using perceptual hashing."""
     
@@ -27,7 +45,9 @@ class ParticipantTracker:
         threshold: int = 10,
         max_participants: int = 3,
         hash_history_size: int = 3,
-        face_threshold_floor: int = 40
+        face_threshold_floor: int = 40,
+        flush_interval: float = 2.0,
+        journal: bool = False
     ):
         self.db_path = db_path
         self.hash_size = hash_size
@@ -36,7 +56,111 @@ class ParticipantTracker:
         self.hash_history_size = max(1, hash_history_size)
         self.face_threshold_floor = face_threshold_floor
         self.participants: Dict[str, Dict] = {}  # uuid -> {"phash": array, "phash_history": list, "last_seen": timestamp}
+        
+        # Hashes are packed into uint64 words; all participants' histories live
+        # in one (participants, history, words) matrix for a single XOR/popcount pass
+        self.hash_words = (hash_size * hash_size + 63) // 64
+        self._index_uuids: List[str] = []  # matrix row -> uuid
+        self._index_rows: Dict[str, int] = {}  # uuid -> matrix row
+        self._hash_matrix = np.zeros((0, self.hash_history_size, self.hash_words), dtype=np.uint64)
+        self._hash_valid = np.zeros((0, self.hash_history_size), dtype=bool)
+        
+        # Persistence: changes are marked dirty in the hot loop and written by
+        # a background thread every flush_interval seconds (0 = write immediately)
+        self.flush_interval = flush_interval
+        self.journal_path = f"{db_path}.journal" if journal else None
+        self._dirty: Set[str] = set()  # uuids changed (or removed) since last flush
+        self._entries: Dict[str, dict] = {}  # uuid -> serialized entry as on disk
+        self._journal_records = 0
+        self._lock = threading.Lock()  # Guards participants/_dirty
+        self._io_lock = threading.Lock()  # Serializes flushes
+        self._stop = threading.Event()
+        self._closed = False
+        
         self._load_db()
+        self._journal_records = self._replay_journal()
+        self._entries = {uuid: self._serialize_entry(info) for uuid, info in self.participants.items()}
+        if self.journal_path and os.path.exists(self.journal_path) and os.path.getsize(self.journal_path):
+            self._write_snapshot()  # Fold replayed records (and any torn tail) into the snapshot
+        for uuid in self.participants:
+            self._index_set(uuid)
+        
+        self._writer: Optional[threading.Thread] = None
+        if self.flush_interval > 0:
+            self._writer = threading.Thread(target=self._writer_loop, name="participant-db-writer", daemon=True)
+            self._writer.start()
+        atexit.register(self.close)
+    
+    def pack_hash(self, bits) -> np.ndarray:
+        """Pack a flat 0/1 bit array into little-endian uint64 words."""
+        packed = np.packbits(np.asarray(bits, dtype=bool), bitorder='little')
+        words = np.zeros(self.hash_words * 8, dtype=np.uint8)
+        words[:packed.size] = packed[:words.size]
+        return words.view('<u8').astype(np.uint64)
+    
+    def _parse_hash(self, value) -> np.ndarray:
+        """
+        Parse a stored hash into packed words (empty array if unusable).
+        
+        Accepts the packed hex form plus the legacy 0/1 list / JSON-list forms.
+        """
+        try:
+            if isinstance(value, np.ndarray) and value.dtype == np.uint64:
+                words = value
+            elif isinstance(value, str) and not value.lstrip().startswith('['):
+                words = np.frombuffer(bytes.fromhex(value), dtype='>u8').astype(np.uint64)
+            else:
+                bits = json.loads(value) if isinstance(value, str) else value
+                bits = np.asarray(bits, dtype=np.uint8).ravel()
+                if bits.size != self.hash_size * self.hash_size:
+                    return np.zeros(0, dtype=np.uint64)
+                words = self.pack_hash(bits)
+        except (json.JSONDecodeError, ValueError, TypeError):
+            return np.zeros(0, dtype=np.uint64)
+        if words.size != self.hash_words:
+            return np.zeros(0, dtype=np.uint64)  # Different hash_size
+        return words
+    
+    @staticmethod
+    def _hash_to_hex(words: np.ndarray) -> str:
+        """Packed hash -> hex string (DB form)."""
+        return np.asarray(words, dtype='>u8').tobytes().hex()
+    
+    @staticmethod
+    def _is_legacy_entry(value) -> bool:
+        """True for entries stored as unpacked 0/1 lists."""
+        if isinstance(value, str):
+            return True
+        phash = value.get("phash", "") if isinstance(value, dict) else ""
+        return not isinstance(phash, str) or phash.lstrip().startswith('[')
+    
+    def _parse_entry(self, value) -> Dict:
+        """Parse one stored DB entry (packed hex, or legacy unpacked formats)."""
+        if isinstance(value, str):
+            # Old format: just hash string
+            phash = self._parse_hash(value)
+            return {
+                "phash": phash,
+                "phash_history": [phash] if phash.size else [],
+                "last_seen": None  # Unknown timestamp
+            }
+        
+        # Dict format: phash, phash_history and last_seen
+        phash = self._parse_hash(value.get("phash", ""))
+        raw_history = value.get("phash_history", [])
+        history: List[np.ndarray] = []
+        if isinstance(raw_history, list):
+            for item in raw_history:
+                words = self._parse_hash(item)
+                if words.size:
+                    history.append(words)
+        if not history and phash.size:
+            history = [phash]
+        return {
+            "phash": phash,
+            "phash_history": history[-self.hash_history_size:],
+            "last_seen": value.get("last_seen")
+        }
     
     def _load_db(self):
         """Load participant database from disk."""
@@ -46,35 +170,10 @@ class ParticipantTracker:
                     data = json.load(f)
                     # Handle both old format (just hash) and new format (dict with hash + timestamp)
                     for uuid, value in data.items():
-                        if isinstance(value, str):
-                            # Old format: just hash string
-                            phash = np.array(json.loads(value), dtype=np.uint8)
-                            self.participants[uuid] = {
-                                "phash": phash,
-                                "phash_history": [phash] if phash.size else [],
-                                "last_seen": None  # Unknown timestamp
-                            }
-                        elif isinstance(value, dict):
-                            # New format: dict with phash and last_seen
-                            phash = np.array(json.loads(value.get("phash", "[]")), dtype=np.uint8)
-                            raw_history = value.get("phash_history", [])
-                            history: List[np.ndarray] = []
-                            if isinstance(raw_history, list):
-                                for item in raw_history:
-                                    if isinstance(item, str):
-                                        try:
-                                            history.append(np.array(json.loads(item), dtype=np.uint8))
-                                        except (json.JSONDecodeError, ValueError):
-                                            continue
-                                    else:
-                                        history.append(np.array(item, dtype=np.uint8))
-                            if not history and phash.size:
-                                history = [phash]
-                            self.participants[uuid] = {
-                                "phash": phash,
-                                "phash_history": history,
-                                "last_seen": value.get("last_seen")
-                            }
+                        if isinstance(value, (str, dict)):
+                            self.participants[uuid] = self._parse_entry(value)
+                            if self._is_legacy_entry(value):
+                                self._dirty.add(uuid)  # Rewrite in packed form on next flush
             except (json.JSONDecodeError, KeyError, ValueError) as e:
                 # Invalid file, start fresh
                 print(f"Warning: Could not load participants DB: {e}")
@@ -82,65 +181,182 @@ class ParticipantTracker:
         else:
             self.participants = {}
     
-    def _save_db(self):
-        """Atomically save participant database to disk."""
-        # Convert to JSON-serializable format with timestamps
-        data = {}
-        for uuid, info in self.participants.items():
-            # Handle both old format (just array) and new format (dict)
-            if isinstance(info, dict):
-                phash = info.get("phash", np.array([], dtype=np.uint8))
-                last_seen = info.get("last_seen")
-                history = info.get("phash_history", [])
-            else:
-                # Old format: just numpy array
-                phash = info
-                last_seen = None
-                history = []
-            
-            if not isinstance(phash, np.ndarray):
-                phash = np.array(phash, dtype=np.uint8)
-            
-            history_list: List[List[int]] = []
-            for item in history:
-                if isinstance(item, np.ndarray):
-                    history_list.append(item.tolist())
-                elif isinstance(item, list):
-                    history_list.append(item)
-                elif isinstance(item, str):
-                    try:
-                        history_list.append(json.loads(item))
-                    except (json.JSONDecodeError, ValueError):
-                        continue
-            if not history_list and phash.size:
-                history_list = [phash.tolist()]
-            if len(history_list) > self.hash_history_size:
-                history_list = history_list[-self.hash_history_size:]
-            
-            data[uuid] = {
-                "phash": json.dumps(phash.tolist()),
-                "phash_history": history_list,
-                "last_seen": last_seen
-            }
+    def _replay_journal(self) -> int:
+        """Apply journal records written after the last snapshot. Returns record count."""
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
         
+        count = 0
+        with open(self.journal_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    uuid = record.pop("uuid")
+                    if record.get("deleted"):
+                        self.participants.pop(uuid, None)
+                    else:
+                        self.participants[uuid] = self._parse_entry(record)
+                except (json.JSONDecodeError, KeyError, ValueError, AttributeError):
+                    break  # Torn tail from a crash mid-append
+                count += 1
+        return count
+    
+    def _serialize_entry(self, info) -> dict:
+        """Convert one participant to its JSON-serializable DB entry (hex-packed hashes)."""
+        phash = self._parse_hash(info.get("phash", ""))
+        history = [self._parse_hash(h) for h in info.get("phash_history", [])]
+        history = [h for h in history if h.size][-self.hash_history_size:]
+        if not history and phash.size:
+            history = [phash]
+        
+        return {
+            "phash": self._hash_to_hex(phash),
+            "phash_history": [self._hash_to_hex(h) for h in history],
+            "last_seen": info.get("last_seen")
+        }
+    
+    def _index_set(self, uuid: str):
+        """Copy a participant's hash history into its matrix row. Call with self._lock held (or during init)."""
+        row = self._index_rows.get(uuid)
+        if row is None:
+            row = len(self._index_uuids)
+            self._index_uuids.append(uuid)
+            self._index_rows[uuid] = row
+            new_row = np.zeros((1, self.hash_history_size, self.hash_words), dtype=np.uint64)
+            self._hash_matrix = np.concatenate([self._hash_matrix, new_row])
+            self._hash_valid = np.concatenate([self._hash_valid, np.zeros((1, self.hash_history_size), dtype=bool)])
+        
+        history = [h for h in self.participants[uuid].get("phash_history", []) if h.size == self.hash_words]
+        history = history[-self.hash_history_size:]
+        self._hash_valid[row] = False
+        if history:
+            self._hash_matrix[row, :len(history)] = history
+            self._hash_valid[row, :len(history)] = True
+    
+    def _index_remove(self, uuid: str):
+        """Drop a participant's matrix row. Call with self._lock held."""
+        row = self._index_rows.pop(uuid, None)
+        if row is None:
+            return
+        del self._index_uuids[row]
+        self._index_rows = {u: i for i, u in enumerate(self._index_uuids)}
+        self._hash_matrix = np.delete(self._hash_matrix, row, axis=0)
+        self._hash_valid = np.delete(self._hash_valid, row, axis=0)
+    
+    def match_hash(self, new_hash: np.ndarray) -> Tuple[Optional[str], float]:
+        """
+        Find the participant whose hash history is closest to new_hash.
+        
+        Returns (uuid, Hamming distance), or (None, inf) if nobody is stored.
+        """
+        if not self._index_uuids or new_hash.size != self.hash_words:
+            return None, float('inf')
+        
+        # (participants, history) distances in one pass; empty history slots never win
+        distances = _popcount(self._hash_matrix ^ new_hash).sum(axis=-1, dtype=np.int64)
+        distances[~self._hash_valid] = np.iinfo(np.int64).max
+        best = distances.min(axis=1)
+        row = int(best.argmin())
+        if not self._hash_valid[row].any():
+            return None, float('inf')
+        return self._index_uuids[row], int(best[row])
+    
+    def _write_snapshot(self):
+        """Atomically write the full database and truncate the journal."""
         temp_path = f"{self.db_path}.tmp"
         with open(temp_path, 'w') as f:
-            json.dump(data, f, indent=2)
+            json.dump(self._entries, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
         os.replace(temp_path, self.db_path)
+        
+        if self.journal_path and (self._journal_records or os.path.exists(self.journal_path)):
+            open(self.journal_path, 'w').close()
+        self._journal_records = 0
+    
+    def _append_journal(self, records: List[dict]):
+        """Append change records to the journal (one JSON object per line)."""
+        with open(self.journal_path, 'a') as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_records += len(records)
+    
+    def _mark_dirty(self, uuid: str):
+        """Record that a participant changed. Call with self._lock held."""
+        self._dirty.add(uuid)
+    
+    def flush(self, compact: bool = False):
+        """
+        Write pending changes to disk.
+        
+        With a journal, changes are appended to it and the full database is
+        rewritten only when compact=True or the journal grows large.
+        """
+        with self._io_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                changed = {uuid: self.participants.get(uuid) for uuid in dirty}
+            
+            records = []
+            for uuid, info in changed.items():
+                if info is None:
+                    self._entries.pop(uuid, None)
+                    records.append({"uuid": uuid, "deleted": True})
+                else:
+                    entry = self._serialize_entry(info)
+                    self._entries[uuid] = entry
+                    records.append({"uuid": uuid, **entry})
+            
+            if not records and not (compact and self._journal_records):
+                return
+            try:
+                if (
+                    self.journal_path
+                    and not compact
+                    and self._journal_records + len(records) < JOURNAL_COMPACT_RECORDS
+                ):
+                    self._append_journal(records)
+                else:
+                    self._write_snapshot()
+            except OSError as e:
+                print(f"Warning: Could not save participants DB: {e}")
+                with self._lock:
+                    self._dirty.update(changed)  # Retry on next flush
+    
+    def _writer_loop(self):
+        """Background thread: flush dirty participants every flush_interval."""
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+    
+    def _save_db(self):
+        """Flush pending changes and write a full snapshot of the database."""
+        self.flush(compact=True)
     
     def save(self):
         """Public method to save database."""
         self._save_db()
     
+    def close(self):
+        """Stop the writer thread and flush everything to disk."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._writer and self._writer is not threading.current_thread():
+            self._writer.join()
+        self._save_db()
+        atexit.unregister(self.close)
+    
     def compute_phash(self, image: np.ndarray) -> np.ndarray:
         """
         Compute perceptual hash (dHash variant) of image.
         
         Algorithm: resize to (hash_size+1) x hash_size, convert to grayscale,
-        compute horizontal differences, flatten to binary array.
+        compute horizontal differences, pack the bits into uint64 words.
         """
         if image.size == 0:
-            return np.array([])
+            return np.zeros(0, dtype=np.uint64)
         
         # Resize image
         resized = cv2.resize(image, (self.hash_size + 1, self.hash_size))
@@ -158,14 +374,13 @@ class ParticipantTracker:
         # Compute horizontal differences
         diff = gray[:, 1:] > gray[:, :-1]
         
-        # Flatten to 1D boolean array
-        return diff.flatten().astype(np.uint8)
+        return self.pack_hash(diff.ravel())
     
     def hamming_distance(self, hash1: np.ndarray, hash2: np.ndarray) -> int:
-        """Compute Hamming distance between two hash arrays."""
+        """Compute Hamming distance between two packed hashes."""
         if hash1.shape != hash2.shape:
             return float('inf')
-        return np.count_nonzero(hash1 != hash2)
+        return int(_popcount(np.bitwise_xor(hash1, hash2)).sum())
     
     def get_face_crop(
         self,
@@ -281,7 +496,6 @@ class ParticipantTracker:
         
         # Try to match existing participant
         best_match = None
-        best_distance = float('inf')
         current_time = time.time()
         
         # For face-based pHash, use very lenient threshold
@@ -289,35 +503,9 @@ class ParticipantTracker:
         # Face crops can vary significantly between frames, so we need a high threshold
         face_threshold = max(self.threshold * 3, self.face_threshold_floor)  # Very lenient for face matching
         
-        for uuid, info in self.participants.items():
-            # Handle both old format (string) and new format (array)
-            stored_hash = info.get("phash", np.array([], dtype=np.uint8))
-            if isinstance(stored_hash, str):
-                stored_hash = np.array(json.loads(stored_hash), dtype=np.uint8)
-            elif not isinstance(stored_hash, np.ndarray):
-                stored_hash = np.array(stored_hash, dtype=np.uint8)
-            
-            history = info.get("phash_history", [])
-            if not history:
-                history = [stored_hash] if stored_hash.size else []
-            
-            best_local = float('inf')
-            for hist_hash in history:
-                if isinstance(hist_hash, str):
-                    try:
-                        hist_hash = np.array(json.loads(hist_hash), dtype=np.uint8)
-                    except (json.JSONDecodeError, ValueError):
-                        continue
-                elif not isinstance(hist_hash, np.ndarray):
-                    hist_hash = np.array(hist_hash, dtype=np.uint8)
-                if hist_hash.size == 0:
-                    continue
-                best_local = min(best_local, self.hamming_distance(new_hash, hist_hash))
-            
-            distance = best_local
-            if distance < face_threshold and distance < best_distance:
-                best_distance = distance
-                best_match = uuid
+        uuid, distance = self.match_hash(new_hash)
+        if distance < face_threshold:
+            best_match = uuid
         
         if best_match:
             # Update hash and timestamp for matched participant
@@ -326,12 +514,16 @@ class ParticipantTracker:
             history.append(new_hash)
             if len(history) > self.hash_history_size:
                 history = history[-self.hash_history_size:]
-            self.participants[best_match] = {
-                "phash": new_hash,
-                "phash_history": history,
-                "last_seen": current_time
-            }
-            self._save_db()
+            with self._lock:
+                self.participants[best_match] = {
+                    "phash": new_hash,
+                    "phash_history": history,
+                    "last_seen": current_time
+                }
+                self._index_set(best_match)
+                self._mark_dirty(best_match)
+            if self._writer is None:
+                self.flush()
             return best_match
         
         # Check if we've hit max participants
@@ -344,19 +536,26 @@ class ParticipantTracker:
                 oldest_time = self.participants[oldest_uuid].get("last_seen", 0)
                 # If oldest participant hasn't been seen in >10 seconds, replace them
                 if current_time - oldest_time > 10.0:
-                    del self.participants[oldest_uuid]
+                    with self._lock:
+                        del self.participants[oldest_uuid]
+                        self._index_remove(oldest_uuid)
+                        self._mark_dirty(oldest_uuid)
                     # Now we can create new participant
                 else:
                     return None
         
         # Create new participant
         new_uuid = str(uuid4())[:8]
-        self.participants[new_uuid] = {
-            "phash": new_hash,
-            "phash_history": [new_hash],
-            "last_seen": current_time
-        }
-        self._save_db()
+        with self._lock:
+            self.participants[new_uuid] = {
+                "phash": new_hash,
+                "phash_history": [new_hash],
+                "last_seen": current_time
+            }
+            self._index_set(new_uuid)
+            self._mark_dirty(new_uuid)
+        if self._writer is None:
+            self.flush()
         return new_uuid
 
 
@@ -364,3 +563,4 @@ if __name__ == "__main__":
     # Simple test
     tracker = ParticipantTracker()
     print(f"Loaded {len(tracker.participants)} participants from DB")
+    tracker.close()
@@ -3,6 +3,9 @@
 Shared memory writer for pose data to Scoring module.
 
 Writes participant poses to `bas_pose_data` buffer for inter-process communication.
+Frames go into a seqlock-versioned ring (see common/shared_memory.py) so
+readers never see a half-written frame and can tell when nothing changed.
+Every published frame wakes blocked readers (see common/notify.py).
 Uses common module for protocol definitions.
 """
 
@@ -12,18 +15,20 @@ from multiprocessing import shared_memory
 from typing import List, Optional
 import time
 
+import numpy as np
+
 # Add parent directory to path for common module
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from common.protocols import (
     SHARED_MEMORY_BUFFER_NAME,
     MAX_PARTICIPANTS,
-    POSE_BUFFER_SIZE,
+    MEDIAPIPE_LANDMARKS,
     POSE_RECORD_SIZE,
-    ParticipantPose,
-    PoseKeypoint,
+    RING_BUFFER_SIZE,
 )
-from common.shared_memory import encode_pose
+from common.notify import BufferNotifier
+from common.shared_memory import ring_init, ring_write_frame_arrays
 
 
 class SharedMemoryPoseWriter:
@@ -38,6 +43,10 @@ class SharedMemoryPoseWriter:
         self.max_participants = max_participants
         self.record_size = POSE_RECORD_SIZE
         self.shm: Optional[shared_memory.SharedMemory] = None
+        self.frame_id = 0  # Last published frame id
+        # Reused every frame so writes allocate no per-landmark objects
+        self._keypoints = np.zeros((max_participants, MEDIAPIPE_LANDMARKS, 4), dtype=np.float32)
+        self.notifier = BufferNotifier(buffer_name)
         self._create_or_connect()
     
     def _create_or_connect(self):
@@ -45,108 +54,130 @@ class SharedMemoryPoseWriter:
         try:
             # Try to connect to existing buffer first
             self.shm = shared_memory.SharedMemory(name=self.buffer_name)
+            if self.shm.size < RING_BUFFER_SIZE:
+                # Left over from an older (flat) layout - replace it
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = None
         except FileNotFoundError:
+            pass
+        
+        if self.shm is None:
             # Create new buffer if it doesn't exist
             self.shm = shared_memory.SharedMemory(
                 name=self.buffer_name,
                 create=True,
-                size=POSE_BUFFER_SIZE
+                size=RING_BUFFER_SIZE
             )
+        
+        # Resume frame numbering if a compatible ring is already there
+        self.frame_id = ring_init(self.shm.buf)
     
-    def write_poses(self, participants: List[dict]):
+    def write_poses(self, participants: List[dict]) -> int:
         """
-        Write participant poses to shared memory.
+        Write participant poses to shared memory as a new frame.
         
         Args:
             participants: List of dicts with keys: uuid, landmarks, in_zone, timestamp
                 - uuid: str (participant UUID)
-                - landmarks: List of MediaPipe landmark objects (33 landmarks)
+                - landmarks: MediaPipe landmark objects, (x, y, z, vis) tuples,
+                  or a (33, 4) array
                 - in_zone: bool
                 - timestamp: float (optional, defaults to current time)
+        
+        Returns:
+            Frame id of the published frame (0 if not connected)
         """
         if not self.shm:
-            return
+            return 0
         
-        # Clear buffer first (fill with zeros)
-        buffer = bytearray(POSE_BUFFER_SIZE)
-        
-        # Convert participants to ParticipantPose and encode
-        offset = 0
+        uuids = []
+        timestamps = []
+        in_zone = []
         for participant in participants[:self.max_participants]:
-            pose = self._convert_to_participant_pose(participant)
-            if pose:
-                offset = encode_pose(pose, buffer, offset)
+            uuid = participant.get("uuid")
+            landmarks = participant.get("landmarks")
+            if not uuid or landmarks is None or len(landmarks) == 0:
+                continue
+            try:
+                self._fill_keypoints(landmarks, self._keypoints[len(uuids)])
+            except Exception as e:
+                print(f"DEBUG: Error converting landmarks for {uuid}: {e}")
+                continue
+            uuids.append(uuid)
+            timestamps.append(participant.get("timestamp", time.time()))
+            in_zone.append(participant.get("in_zone", False))
         
-        # Write to shared memory (atomic write)
-        # Use memoryview to write bytearray to shared memory buffer
-        self.shm.buf[:POSE_BUFFER_SIZE] = memoryview(buffer)
+        return self.write_pose_arrays(uuids, timestamps, self._keypoints[:len(uuids)], in_zone)
     
-    def _convert_to_participant_pose(self, participant: dict) -> Optional[ParticipantPose]:
+    def write_pose_arrays(
+        self,
+        uuids: List[str],
+        timestamps: List[float],
+        keypoints: np.ndarray,
+        in_zone: List[bool]
+    ) -> int:
         """
-        Convert participant dict to ParticipantPose.
-        
-        Args:
-            participant: Dict with uuid, landmarks, in_zone, timestamp
+        Write a frame from arrays ((N, 33, 4) keypoints) without per-landmark objects.
         
         Returns:
-            ParticipantPose or None if conversion fails
+            Frame id of the published frame (0 if not connected)
         """
-        try:
-            uuid = participant.get("uuid")
-            landmarks = participant.get("landmarks")
-            in_zone = participant.get("in_zone", False)
-            timestamp = participant.get("timestamp", time.time())
-            
-            if not uuid or not landmarks:
-                return None
-            
-            # Convert MediaPipe landmarks to PoseKeypoint list
-            keypoints = []
-            for lm in landmarks:
-                if hasattr(lm, 'x') and hasattr(lm, 'y'):
-                    x = lm.x
-                    y = lm.y
-                    z = lm.z if hasattr(lm, 'z') else 0.0
-                    visibility = lm.visibility if hasattr(lm, 'visibility') else 1.0
-                    keypoints.append(PoseKeypoint(x=x, y=y, z=z, visibility=visibility))
-                else:
-                    # Fallback: assume tuple/list format
-                    if isinstance(lm, (tuple, list)) and len(lm) >= 2:
-                        x, y = lm[0], lm[1]
-                        z = lm[2] if len(lm) > 2 else 0.0
-                        visibility = lm[3] if len(lm) > 3 else 1.0
-                        keypoints.append(PoseKeypoint(x=x, y=y, z=z, visibility=visibility))
-                    else:
-                        # Invalid landmark, skip
-                        continue
-            
-            # Ensure we have exactly 33 landmarks (MediaPipe pose format)
-            if len(keypoints) < 33:
-                # Pad with zero keypoints if needed
-                while len(keypoints) < 33:
-                    keypoints.append(PoseKeypoint(x=0.0, y=0.0, z=0.0, visibility=0.0))
-            elif len(keypoints) > 33:
-                # Truncate if too many
-                keypoints = keypoints[:33]
-            
-            return ParticipantPose(
-                uuid=uuid,
-                timestamp=timestamp,
-                keypoints=keypoints,
-                in_zone=in_zone
-            )
-        except Exception as e:
-            print(f"DEBUG: Error converting participant to ParticipantPose: {e}")
-            return None
+        if not self.shm:
+            return 0
+        
+        # Encode straight into the next ring slot (seqlock-protected)
+        self.frame_id += 1
+        ring_write_frame_arrays(self.shm.buf, self.frame_id, uuids, timestamps, keypoints, in_zone)
+        self.notifier.notify()
+        return self.frame_id
+    
+    @staticmethod
+    def _fill_keypoints(landmarks, out: np.ndarray):
+        """
+        Copy landmarks into a (33, 4) keypoint row, zero-padding missing ones.
+        
+        Accepts arrays, (x, y[, z[, visibility]]) sequences, or MediaPipe
+        landmark objects. Missing z defaults to 0, missing visibility to 1.
+        """
+        out.fill(0.0)
+        if isinstance(landmarks, np.ndarray):
+            rows = landmarks[:MEDIAPIPE_LANDMARKS]
+            out[:len(rows), :rows.shape[1]] = rows[:, :4]
+            if rows.shape[1] < 4:
+                out[:len(rows), 3] = 1.0
+            return
+        
+        rows = []
+        for lm in landmarks[:MEDIAPIPE_LANDMARKS]:
+            if hasattr(lm, 'x') and hasattr(lm, 'y'):
+                rows.append((
+                    lm.x,
+                    lm.y,
+                    lm.z if hasattr(lm, 'z') else 0.0,
+                    lm.visibility if hasattr(lm, 'visibility') else 1.0,
+                ))
+            elif isinstance(lm, (tuple, list)) and len(lm) >= 2:
+                rows.append((
+                    lm[0],
+                    lm[1],
+                    lm[2] if len(lm) > 2 else 0.0,
+                    lm[3] if len(lm) > 3 else 1.0,
+                ))
+            # Invalid landmark, skip
+        if rows:
+            out[:len(rows)] = rows
     
     def close(self):
         """Close shared memory connection (does not unlink - Scoring module may still be using it)."""
+        self.notifier.close()
         if self.shm:
             self.shm.close()
             self.shm = None
     
     def unlink(self):
         """Unlink shared memory (removes it from system). Only call when no other processes are using it."""
+        self.notifier.close()
         if self.shm:
             self.shm.close()
             self.shm.unlink()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Background thumbnail producer for the vision process.
+
+Participant thumbnails (segmented person + skeleton, like the NDI stream)
+are rendered at thumbnail size on a worker thread and published into the
+shared memory thumbnail atlas (common.thumbnail_atlas). The outputs thread
+only queues references to the frame/landmarks/mask, so no rendering or
+disk I/O happens on the detection path. Thumbnails refresh every
+refresh_interval seconds per participant; JPEG export is optional.
+"""
+
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from participant_compositor import ParticipantCompositor
+from vision_pipeline import DropOldestQueue
+
+# Add parent directory to path for common module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from common.protocols import THUMB_HEIGHT, THUMB_WIDTH
+from common.thumbnail_atlas import ThumbnailAtlasWriter
+
+
+class ThumbnailWriter:
+    """
+    Renders and publishes participant thumbnails on a background thread.
+
+    Example:
+        thumbnails = ThumbnailWriter(compositor, refresh_interval=2.0)
+        thumbnails.submit(uuid, frame, landmarks, refined_mask, timestamp)  # cheap; every frame
+        thumbnails.forget(uuid)  # participant left
+    """
+
+    def __init__(
+        self,
+        compositor: ParticipantCompositor,
+        refresh_interval: float = 2.0,
+        export_dir: Optional[Path] = None,
+        atlas: Optional[ThumbnailAtlasWriter] = None,
+        queue_size: int = 4
+    ):
+        """
+        Args:
+            compositor: Renders the participant (shared with the NDI streams)
+            refresh_interval: Seconds between thumbnail updates per participant (0 = once only)
+            export_dir: Also write participant_<uuid>.jpg here (None = shared memory only)
+            atlas: Atlas to publish into (default: connect to / create the standard one)
+            queue_size: Pending thumbnail jobs; the oldest is dropped when full
+        """
+        self.compositor = compositor
+        self.refresh_interval = refresh_interval
+        self.export_dir = export_dir
+        if export_dir is not None:
+            export_dir.mkdir(parents=True, exist_ok=True)
+        self.atlas = atlas if atlas is not None else ThumbnailAtlasWriter()
+
+        self._lock = threading.Lock()  # Guards the atlas and the schedule
+        self._next_due: Dict[str, float] = {}  # uuid -> earliest next submit time
+        self._jobs = DropOldestQueue(queue_size)
+        self._canvas = np.empty((THUMB_HEIGHT, THUMB_WIDTH, 4), dtype=np.uint8)
+        self._image = np.empty((THUMB_HEIGHT, THUMB_WIDTH, 3), dtype=np.uint8)
+
+        self.published = 0
+        self._thread = threading.Thread(target=self._run, name="vision-thumbnails", daemon=True)
+        self._thread.start()
+
+    def submit(self, uuid: str, frame: np.ndarray, landmarks, mask, timestamp: float) -> bool:
+        """
+        Queue a thumbnail if the participant's is due. Returns True if queued.
+
+        frame and mask are referenced, not copied; they must not be modified afterwards.
+        """
+        with self._lock:
+            due = self._next_due.get(uuid)
+            if due is not None and (timestamp < due or self.refresh_interval <= 0):
+                return False
+            self._next_due[uuid] = timestamp + max(self.refresh_interval, 0.0)
+        return self._jobs.put((uuid, frame, landmarks, mask, timestamp))
+
+    def _run(self):
+        """Render and publish queued thumbnails until closed."""
+        while True:
+            job = self._jobs.get(timeout=0.5)
+            if job is None:
+                if self._jobs.closed:
+                    return
+                continue
+            uuid, frame, landmarks, mask, timestamp = job
+            try:
+                self.compositor.render(self._canvas, frame, landmarks, mask)
+                cv2.cvtColor(self._canvas, cv2.COLOR_BGRA2BGR, dst=self._image)
+                with self._lock:
+                    if uuid not in self._next_due:
+                        continue  # Forgotten while queued
+                    self.atlas.publish(uuid, self._image, timestamp)
+                self.published += 1
+                if self.export_dir is not None:
+                    cv2.imwrite(str(self.export_dir / f"participant_{uuid}.jpg"), self._image)
+            except Exception as e:
+                print(f"[thumbnails] Error for {uuid[:8]}: {e}")
+
+    def forget(self, uuid: str):
+        """Remove a participant's thumbnail from the atlas."""
+        with self._lock:
+            self._next_due.pop(uuid, None)
+            self.atlas.retire(uuid)
+
+    def close(self):
+        """Finish queued thumbnails, stop the worker and close the atlas."""
+        self._jobs.close()
+        self._thread.join(timeout=2.0)
+        with self._lock:
+            self.atlas.close()
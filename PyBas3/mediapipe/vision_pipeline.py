@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Threaded capture -> inference -> outputs pipeline for the vision process.
+
+Each stage runs on its own thread and stages are joined by small
+drop-oldest queues, so a slow stage only ever works on the newest frame
+and throughput is bounded by the slowest stage (normally inference)
+instead of the sum of all stages:
+
+    CaptureThread -> [latest frame] -> inference (detect)
+                  -> [results] -> outputs (thumbnails, NDI)
+                  -> [latest result] -> caller / PreviewThread (optional, decimated)
+
+With a LIVE_STREAM detector the inference stage only submits frames
+(detect_async) and results enter the results queue from the detector's
+result callback.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+class DropOldestQueue:
+    """Bounded queue whose put() discards the oldest item instead of blocking."""
+
+    def __init__(self, maxsize: int = 1):
+        self.maxsize = max(1, maxsize)
+        self._items: Deque[Any] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item) -> bool:
+        """Add item; returns False if the queue is closed."""
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        return True
+
+    def get(self, timeout: Optional[float] = None):
+        """Oldest item, or None on timeout / when closed and empty."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        """Wake all waiters; queued items can still be read."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class StageTimer:
+    """Thread-safe smoothed per-stage durations and rates."""
+
+    def __init__(self, smoothing: float = 0.1):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._ms: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._window_start = time.perf_counter()
+        self._window_counts: Dict[str, int] = {}
+        self._fps: Dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float):
+        """Add one measurement for a stage."""
+        ms = seconds * 1000
+        with self._lock:
+            prev = self._ms.get(stage)
+            self._ms[stage] = ms if prev is None else prev + self.smoothing * (ms - prev)
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+            self._window_counts[stage] = self._window_counts.get(stage, 0) + 1
+
+            now = time.perf_counter()
+            elapsed = now - self._window_start
+            if elapsed >= 1.0:
+                self._fps = {name: count / elapsed for name, count in self._window_counts.items()}
+                self._window_counts = {}
+                self._window_start = now
+
+    def stats(self) -> Dict[str, dict]:
+        """{stage: {"ms": smoothed duration, "fps": recent rate, "count": total}}"""
+        with self._lock:
+            return {
+                stage: {
+                    "ms": round(ms, 2),
+                    "fps": round(self._fps.get(stage, 0.0), 1),
+                    "count": self._counts[stage],
+                }
+                for stage, ms in self._ms.items()
+            }
+
+
+@dataclass
+class CapturedFrame:
+    """Frame from the capture thread."""
+    frame_id: int
+    frame: np.ndarray
+    captured_at: float  # time.perf_counter() when read completed
+
+
+@dataclass
+class PipelineResult:
+    """Detection result for one frame, passed between the later stages."""
+    frame_id: int
+    frame: np.ndarray
+    participants: List[Dict]
+    hard_masks: Optional[List[Any]]  # RefinedMask (or None) per pose
+    captured_at: float
+    inferred_at: float = 0.0
+
+
+class CaptureThread(threading.Thread):
+    """
+    Captures frames on a separate thread, always keeping only the latest.
+
+    Video files are paced to their native frame rate (cameras block in
+    read() anyway) and optionally looped.
+    """
+
+    def __init__(
+        self,
+        cap: cv2.VideoCapture,
+        output: DropOldestQueue,
+        loop: bool = False,
+        pace_fps: Optional[float] = None,
+        timer: Optional[StageTimer] = None
+    ):
+        super().__init__(name="vision-capture", daemon=True)
+        self.cap = cap
+        self.output = output
+        self.loop = loop
+        self.frame_interval = 1.0 / pace_fps if pace_fps else 0.0
+        self.timer = timer
+        self.frame_id = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        next_frame_at = time.perf_counter()
+        try:
+            while not self._stop_event.is_set() and self.cap.isOpened():
+                start = time.perf_counter()
+                ret, frame = self.cap.read()
+                if not ret:
+                    if self.loop:
+                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    break
+
+                now = time.perf_counter()
+                if self.timer:
+                    self.timer.record("capture", now - start)
+                self.frame_id += 1
+                self.output.put(CapturedFrame(self.frame_id, frame, now))
+
+                if self.frame_interval:
+                    next_frame_at = max(next_frame_at + self.frame_interval, now - self.frame_interval)
+                    self._stop_event.wait(max(0.0, next_frame_at - time.perf_counter()))
+        finally:
+            self.output.close()  # End of stream
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class VisionPipeline:
+    """
+    Runs capture, inference and output stages of MultiPersonDetector on separate threads.
+
+    Example:
+        pipeline = VisionPipeline(detector, cap)
+        pipeline.start()
+        while pipeline.running:
+            result = pipeline.get_result(timeout=0.1)  # Latest result for preview
+        pipeline.stop()
+    """
+
+    def __init__(
+        self,
+        detector,
+        cap: cv2.VideoCapture,
+        loop: bool = False,
+        pace_fps: Optional[float] = None,
+        output_queue_size: int = 2
+    ):
+        self.detector = detector
+        self.timer = StageTimer()
+        self.live_stream = getattr(detector, "live_stream", False)
+        if self.live_stream:
+            detector.on_result = self._on_live_result
+
+        self._frames = DropOldestQueue(1)
+        self._results = DropOldestQueue(output_queue_size)
+        self._preview = DropOldestQueue(1)
+
+        self.capture = CaptureThread(cap, self._frames, loop=loop, pace_fps=pace_fps, timer=self.timer)
+        self._inference = threading.Thread(target=self._inference_loop, name="vision-inference", daemon=True)
+        self._outputs = threading.Thread(target=self._output_loop, name="vision-outputs", daemon=True)
+        self._stop_event = threading.Event()
+
+    def start(self):
+        self.capture.start()
+        self._inference.start()
+        self._outputs.start()
+
+    @property
+    def running(self) -> bool:
+        """True until the source ends (and queued work is done) or stop() is called."""
+        return not self._preview.closed or len(self._preview) > 0
+
+    def _inference_loop(self):
+        """Detect poses on the newest captured frame."""
+        try:
+            while not self._stop_event.is_set():
+                captured = self._frames.get(timeout=0.1)
+                if captured is None:
+                    if self._frames.closed:
+                        break
+                    continue
+
+                start = time.perf_counter()
+                if self.live_stream:
+                    if self.detector.detect_async(captured.frame, tag=captured):
+                        self.detector.frame_counter += 1
+                    self.timer.record("submit", time.perf_counter() - start)
+                    continue
+
+                participants = self.detector.detect(captured.frame)
+                self.detector.frame_counter += 1
+                hard_masks = self.detector.last_hard_masks
+                done = time.perf_counter()
+                self.timer.record("inference", done - start)
+
+                self._results.put(PipelineResult(
+                    frame_id=captured.frame_id,
+                    frame=captured.frame,
+                    participants=participants,
+                    hard_masks=hard_masks,
+                    captured_at=captured.captured_at,
+                    inferred_at=done
+                ))
+        finally:
+            self._results.close()
+
+    def _on_live_result(self, frame: np.ndarray, participants: List[Dict],
+                        hard_masks: Optional[List[Any]], captured: CapturedFrame, latency_ms: float):
+        """LIVE_STREAM result callback: queue the result for the outputs stage."""
+        self.timer.record("inference", latency_ms / 1000)
+        self._results.put(PipelineResult(
+            frame_id=captured.frame_id,
+            frame=frame,
+            participants=participants,
+            hard_masks=hard_masks,
+            captured_at=captured.captured_at,
+            inferred_at=time.perf_counter()
+        ))
+
+    def _output_loop(self):
+        """Thumbnails and NDI streams for each result, then hand it to the preview."""
+        try:
+            while not self._stop_event.is_set():
+                result = self._results.get(timeout=0.1)
+                if result is None:
+                    if self._results.closed:
+                        break
+                    continue
+
+                start = time.perf_counter()
+                self.detector.publish_outputs(result.frame, result.participants, result.hard_masks)
+                done = time.perf_counter()
+                self.timer.record("outputs", done - start)
+                self.timer.record("latency", done - result.captured_at)
+                self._preview.put(result)
+        finally:
+            self._preview.close()
+
+    def get_result(self, timeout: Optional[float] = None) -> Optional[PipelineResult]:
+        """Newest fully processed result (older unread ones are dropped)."""
+        return self._preview.get(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-stage timings plus queue drop counters."""
+        return {
+            "stages": self.timer.stats(),
+            "dropped": {
+                "capture": self._frames.dropped,
+                "results": self._results.dropped,
+                "preview": self._preview.dropped,
+            },
+        }
+
+    def stop(self):
+        """Stop all stages and wait for them to exit."""
+        self._stop_event.set()
+        self.capture.stop()
+        for thread in (self.capture, self._inference, self._outputs):
+            if thread.is_alive():
+                thread.join(timeout=2.0)
+
+
+class PreviewThread(threading.Thread):
+    """
+    Renders preview images from pipeline results on its own thread.
+    
+    Results arriving faster than fps are skipped, so preview drawing costs
+    a fixed budget regardless of the pipeline rate. The caller only shows
+    the images (OpenCV windows must stay on the main thread).
+    """
+    
+    def __init__(self, pipeline: "VisionPipeline", render: Callable[[PipelineResult], np.ndarray],
+                 fps: float = 15.0):
+        super().__init__(name="vision-preview", daemon=True)
+        self.pipeline = pipeline
+        self.render = render
+        self.frame_interval = 1.0 / fps if fps > 0 else 0.0
+        self._images = DropOldestQueue(1)
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        next_render_at = 0.0
+        try:
+            while not self._stop_event.is_set() and self.pipeline.running:
+                result = self.pipeline.get_result(timeout=0.1)
+                if result is None:
+                    continue
+                start = time.perf_counter()
+                if start < next_render_at:
+                    continue  # Decimate
+                next_render_at = start + self.frame_interval
+                
+                image = self.render(result)
+                self.pipeline.timer.record("preview", time.perf_counter() - start)
+                self._images.put(image)
+        finally:
+            self._images.close()
+    
+    def get_image(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Newest rendered preview image, or None."""
+        return self._images.get(timeout)
+    
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=2.0)
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    """One-line summary of VisionPipeline.stats()."""
+    stages = " ".join(
+        f"{name}={s['ms']:.1f}ms@{s['fps']:.0f}fps" for name, s in stats["stages"].items()
+    )
+    dropped = " ".join(f"{name}={count}" for name, count in stats["dropped"].items())
+    return f"[pipeline] {stages} | dropped {dropped}"
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Zone engine for the vision process.
+
+Evaluates any number of named zones (rectangles or polygons in normalized
+image coordinates, each with a depth range) against an (N, 33, 4) landmark
+array in one NumPy pass. A pose is in a zone when it has at least
+min_landmarks landmarks, some landmark lies inside the zone's shape (edges
+included) and some landmark lies inside its z range.
+
+zone_config.json:
+    {
+      "screen_region": {"x": 0.3, "y": 0.4, "width": 0.4, "height": 0.5},
+      "z_range": {"min": -0.5, "max": 0.5},
+      "zones": [                                  # optional; replaces screen_region
+        {"name": "left", "rect": {"x": 0.0, "y": 0.2, "width": 0.3, "height": 0.6}},
+        {"name": "stage", "polygon": [[0.4, 0.9], [0.5, 0.3], [0.9, 0.9]],
+         "z_range": {"min": -0.3, "max": 0.3}}
+      ],
+      ...
+    }
+
+Without "zones", screen_region + z_range form a single zone named "main".
+Zones without their own z_range use the top-level one.
+
+The config file is watched for changes and reloaded only when it actually
+changed: watch="notify" (default) uses OS file notifications via watchdog,
+watch="poll" checks the mtime every POLL_INTERVAL seconds (for filesystems
+without notifications, e.g. network shares), watch="off" never reloads.
+"notify" falls back to polling, with a warning, if watchdog is missing.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from landmark_filter import landmarks_to_array
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+DEFAULT_CONFIG = {
+    "screen_region": {"x": 0.0, "y": 0.0, "width": 1.0, "height": 1.0},
+    "z_range": {"min": -10.0, "max": 10.0},
+    "max_people": 3,
+    "min_visibility": 0.1,
+    "min_landmarks": 1
+}
+
+# Config file watch modes (see module docstring)
+WATCH_MODES = ("notify", "poll", "off")
+
+# watch="poll": seconds between mtime checks
+POLL_INTERVAL = 0.5
+
+# Tolerance of the on-edge test (cross product in normalized units); edge points count as inside
+EDGE_EPSILON = 1e-9
+
+
+class ZoneSet:
+    """Zones from one config, compiled into arrays for vectorized evaluation."""
+
+    def __init__(self, config: Dict):
+        """Compile zones; raises ValueError on malformed zone definitions."""
+        default_z = config.get("z_range", DEFAULT_CONFIG["z_range"])
+        zones = config.get("zones")
+        if not zones:
+            zones = [{"name": "main", "rect": config["screen_region"], "z_range": default_z}]
+        if not isinstance(zones, list):
+            raise ValueError("'zones' must be a list")
+
+        self.names: List[str] = []
+        self.shapes: List[np.ndarray] = []  # Normalized outline per zone (for drawing)
+        rects, rect_z, rect_order = [], [], []
+        polygons, poly_z, poly_order = [], [], []
+
+        for i, zone in enumerate(zones):
+            if not isinstance(zone, dict):
+                raise ValueError("each zone must be an object")
+            name = str(zone.get("name", f"zone{i}"))
+            z = zone.get("z_range", default_z)
+            z_bounds = (float(z["min"]), float(z["max"]))
+            if z_bounds[0] > z_bounds[1]:
+                raise ValueError(f"zone '{name}': z_range min must not exceed max")
+
+            if "rect" in zone:
+                r = zone["rect"]
+                x0, y0 = float(r["x"]), float(r["y"])
+                x1, y1 = x0 + float(r["width"]), y0 + float(r["height"])
+                rects.append((x0, y0, x1, y1))
+                rect_z.append(z_bounds)
+                rect_order.append(i)
+                self.shapes.append(np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32))
+            elif "polygon" in zone:
+                points = np.asarray(zone["polygon"], dtype=np.float64)
+                if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+                    raise ValueError(f"zone '{name}': polygon needs at least 3 [x, y] points")
+                polygons.append(points)
+                poly_z.append(z_bounds)
+                poly_order.append(i)
+                self.shapes.append(points.astype(np.float32))
+            else:
+                raise ValueError(f"zone '{name}' needs a 'rect' or 'polygon'")
+            self.names.append(name)
+
+        self.min_landmarks = int(config.get("min_landmarks", 1))
+
+        # Rectangles: (R,) bounds
+        rect_arr = np.array(rects, dtype=np.float64).reshape(-1, 4)
+        self._rect_bounds = rect_arr.T  # x0, y0, x1, y1 rows
+        self._rect_z = np.array(rect_z, dtype=np.float64).reshape(-1, 2).T
+
+        # Polygons: edges padded to (P, E); padded edges are zero-length and never cross
+        max_edges = max((len(p) for p in polygons), default=0)
+        self._edge_start = np.zeros((len(polygons), max_edges, 2))
+        self._edge_end = np.zeros((len(polygons), max_edges, 2))
+        self._edge_valid = np.zeros((len(polygons), max_edges), dtype=bool)
+        for k, points in enumerate(polygons):
+            self._edge_start[k, :len(points)] = points
+            self._edge_end[k, :len(points)] = np.roll(points, -1, axis=0)
+            self._edge_valid[k, :len(points)] = True
+        self._poly_z = np.array(poly_z, dtype=np.float64).reshape(-1, 2).T
+
+        # Output column order (rects first, then polygons) -> config order
+        self._columns = np.argsort(np.array(rect_order + poly_order, dtype=np.intp), kind="stable")
+
+    def evaluate(self, keypoints: np.ndarray) -> np.ndarray:
+        """(N, 33, 4) keypoints -> (N, zones) bool membership."""
+        keypoints = np.asarray(keypoints, dtype=np.float64)
+        n = len(keypoints)
+        if n == 0 or not self.names:
+            return np.zeros((n, len(self.names)), dtype=bool)
+
+        x = keypoints[:, :, 0, None]  # (N, 33, 1)
+        y = keypoints[:, :, 1, None]
+        z = keypoints[:, :, 2, None]
+        present = np.any(keypoints != 0.0, axis=2)  # Zero rows are padding
+        enough = present.sum(axis=1) >= self.min_landmarks  # (N,)
+        present = present[:, :, None]
+
+        # Rectangles (inclusive bounds)
+        x0, y0, x1, y1 = self._rect_bounds
+        in_rect = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1) & present
+        in_rect_z = (z >= self._rect_z[0]) & (z <= self._rect_z[1]) & present
+        rect_hits = in_rect.any(axis=1) & in_rect_z.any(axis=1)  # (N, R)
+
+        # Polygons: even-odd ray casting against all edges at once -> (N, 33, P, E),
+        # plus points on an edge (inclusive, like the rectangle bounds)
+        if len(self._edge_start):
+            px, py = x[..., None], y[..., None]
+            sx, sy = self._edge_start[..., 0], self._edge_start[..., 1]
+            ex, ey = self._edge_end[..., 0], self._edge_end[..., 1]
+            straddles = (sy > py) != (ey > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cross_x = sx + (py - sy) * (ex - sx) / (ey - sy)
+            inside = np.count_nonzero(straddles & (px < cross_x), axis=3) % 2 == 1  # (N, 33, P)
+            on_edge = (np.abs((ex - sx) * (py - sy) - (ey - sy) * (px - sx)) <= EDGE_EPSILON) \
+                & (px >= np.minimum(sx, ex) - EDGE_EPSILON) & (px <= np.maximum(sx, ex) + EDGE_EPSILON) \
+                & (py >= np.minimum(sy, ey) - EDGE_EPSILON) & (py <= np.maximum(sy, ey) + EDGE_EPSILON) \
+                & self._edge_valid
+            in_poly = (inside | on_edge.any(axis=3)) & present
+            in_poly_z = (z >= self._poly_z[0]) & (z <= self._poly_z[1]) & present
+            poly_hits = in_poly.any(axis=1) & in_poly_z.any(axis=1)
+        else:
+            poly_hits = np.zeros((n, 0), dtype=bool)
+
+        hits = np.concatenate([rect_hits, poly_hits], axis=1)[:, self._columns]
+        return hits & enough[:, None]
+
+
+class ZoneFilter:
+    """Filters detections based on zone configuration."""
+
+    # Allowed keys for update(): section -> {key: type}, or top-level key -> type
+    UPDATE_SCHEMA = {
+        "screen_region": {"x": float, "y": float, "width": float, "height": float},
+        "z_range": {"min": float, "max": float},
+        "zones": list,
+        "max_people": int,
+        "min_visibility": float,
+        "min_landmarks": int,
+    }
+
+    def __init__(self, config_path: str = None, watch: str = "notify"):
+        if watch not in WATCH_MODES:
+            raise ValueError(f"watch must be one of {WATCH_MODES}, got {watch!r}")
+        if config_path is None:
+            config_path = str(Path(__file__).parent / "zone_config.json")
+        self.config_path = config_path
+        self.config = self._load_config()
+        self.zones = ZoneSet(self.config)
+        self._mtime = self._file_mtime()
+
+        self._stop_event = threading.Event()
+        self._observer = None
+        self._poll_thread = None
+        if watch == "notify" and not WATCHDOG_AVAILABLE:
+            print(f"[zones] watchdog not installed, polling {self.config_path} every {POLL_INTERVAL}s")
+            watch = "poll"
+        self.watch = watch
+        if watch != "off":
+            self._start_watching()
+
+    @property
+    def zone_names(self) -> List[str]:
+        return self.zones.names
+
+    def _file_mtime(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.config_path)
+            return stat.st_mtime, stat.st_size
+        except OSError:
+            return None
+
+    def _start_watching(self):
+        """Reload on file changes: OS notifications (watch="notify") or mtime checks (watch="poll")."""
+        if self.watch == "notify":
+            zone_filter = self
+            target = os.path.abspath(self.config_path)
+
+            class _Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    paths = {os.path.abspath(p) for p in (event.src_path, getattr(event, "dest_path", "")) if p}
+                    if target in paths:
+                        zone_filter.reload()
+
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.schedule(_Handler(), os.path.dirname(target) or ".", recursive=False)
+            self._observer.start()
+        else:
+            self._poll_thread = threading.Thread(target=self._poll_loop, name="zone-config-watch", daemon=True)
+            self._poll_thread.start()
+
+    def _poll_loop(self):
+        while not self._stop_event.wait(POLL_INTERVAL):
+            if self._file_mtime() != self._mtime:
+                self.reload()
+
+    def reload(self) -> bool:
+        """Re-read the config file if it changed. Keeps the current zones on errors."""
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            with open(self.config_path, 'r') as f:
+                config = {**DEFAULT_CONFIG, **json.load(f)}
+            zones = ZoneSet(config)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[zones] Ignoring invalid {self.config_path}: {e}")
+            return False
+        self.config, self.zones = config, zones
+        print(f"[zones] Reloaded {len(zones.names)} zone(s): {', '.join(zones.names)}")
+        return True
+
+    def close(self):
+        """Stop watching the config file."""
+        self._stop_event.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout=2.0)
+            self._observer = None
+
+    def save_config(self):
+        """Save current config to disk."""
+        tmp_path = self.config_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.config, f, indent=2)
+        os.replace(tmp_path, self.config_path)
+        self._mtime = self._file_mtime()  # Our own write needs no reload
+
+    def update(self, changes: Dict) -> Dict:
+        """
+        Merge a partial config (e.g. {"screen_region": {"x": 0.3}}), save it and
+        return the new config.
+
+        The config and compiled zones are replaced rather than mutated, so
+        detection threads never see a half-applied update. Raises ValueError
+        on unknown keys or bad values.
+        """
+        if not isinstance(changes, dict):
+            raise ValueError("expected a JSON object")
+        config = json.loads(json.dumps(self.config))  # Deep copy
+        for key, value in changes.items():
+            schema = self.UPDATE_SCHEMA.get(key)
+            if schema is None:
+                raise ValueError(f"unknown zone setting '{key}'")
+            if isinstance(schema, dict):
+                if not isinstance(value, dict):
+                    raise ValueError(f"'{key}' must be an object")
+                for sub_key, sub_value in value.items():
+                    if sub_key not in schema:
+                        raise ValueError(f"unknown zone setting '{key}.{sub_key}'")
+                    config[key][sub_key] = schema[sub_key](sub_value)
+            elif schema is list:
+                if not isinstance(value, list):
+                    raise ValueError(f"'{key}' must be a list")
+                config[key] = value
+            else:
+                config[key] = schema(value)
+
+        region = config["screen_region"]
+        if not all(0.0 <= region[k] <= 1.0 for k in ("x", "y", "width", "height")):
+            raise ValueError("screen_region values must be within 0-1")
+        if config["z_range"]["min"] > config["z_range"]["max"]:
+            raise ValueError("z_range min must not exceed max")
+        try:
+            zones = ZoneSet(config)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"invalid zones: {e}")
+
+        self.config, self.zones = config, zones
+        self.save_config()
+        return config
+
+    def _load_config(self) -> Dict:
+        """Load zone configuration from JSON file."""
+        default_config = dict(DEFAULT_CONFIG)
+
+        if os.path.exists(self.config_path):
+            try:
+                with open(self.config_path, 'r') as f:
+                    config = json.load(f)
+                    # Merge with defaults
+                    default_config.update(config)
+                    return default_config
+            except (json.JSONDecodeError, KeyError):
+                # Keep the broken file for the user to fix; run on defaults
+                print(f"[zones] Invalid {self.config_path}, using defaults")
+                return default_config
+
+        # Save default config if file doesn't exist
+        with open(self.config_path, 'w') as f:
+            json.dump(default_config, f, indent=2)
+
+        return default_config
+
+    def evaluate(self, keypoints: np.ndarray) -> np.ndarray:
+        """
+        Per-zone membership for a batch of poses.
+
+        Args:
+            keypoints: (N, 33, 4) x, y, z, visibility
+
+        Returns:
+            (N, len(zone_names)) bool array
+        """
+        return self.zones.evaluate(keypoints)
+
+    def is_in_zone(self, landmarks) -> bool:
+        """
+        Check if pose landmarks are within any configured zone.
+
+        Args:
+            landmarks: List of pose landmarks (Tasks API format), tuples or a (33, 4) array
+
+        Returns:
+            True if pose is in zone, False otherwise
+        """
+        if landmarks is None or len(landmarks) == 0:
+            return False
+        return bool(self.evaluate(landmarks_to_array(landmarks)[None]).any())
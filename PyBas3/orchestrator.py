@@ -6,6 +6,7 @@ Usage:
     python orchestrator.py              # Vision + Scoring only
     python orchestrator.py --dashboard  # + live score display
     python orchestrator.py --persist    # Keep participants across restarts
+    python orchestrator.py --topology in-process  # Score inside Vision (lowest latency)
 """
 
 import argparse
@@ -70,6 +71,11 @@ def main():
                         help="Keep participants across restarts")
     parser.add_argument("--vision-only", action="store_true",
                         help="Only start Vision (skip Scoring)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run Vision without its preview window (zone control via HTTP)")
+    parser.add_argument("--topology", choices=["multi-process", "in-process"], default="multi-process",
+                        help="multi-process: separate Scoring process reading shared memory; "
+                             "in-process: Vision scores poses itself (lowest latency)")
     args = parser.parse_args()
     
     orch = Orchestrator()
@@ -85,12 +91,17 @@ def main():
     
     # Start processes
     vision_args = ["--persist"] if args.persist else []
+    if args.headless:
+        vision_args.append("--headless")
+    in_process = args.topology == "in-process" and not args.vision_only
+    if in_process:
+        vision_args.append("--in-process-scoring")
     orch.start("vision", VISION_SCRIPT, vision_args)
     
     # Small delay to let Vision create shared memory
     time.sleep(1)
     
-    if not args.vision_only:
+    if not args.vision_only and not in_process:
         orch.start("scoring", SCORING_SCRIPT)
     
     if args.dashboard:
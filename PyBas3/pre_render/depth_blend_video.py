@@ -16,6 +16,18 @@ import time
 from tqdm import tqdm
 import json
 import pickle
+import sys
+from pathlib import Path
+
+from depth_effects import ChronophotoAccumulator, create_chronophotography, depth_banding
+from depth_stage import DEFAULT_CACHE_DIR, DepthCache, DepthStage, normalize_depth
+from effect_graph import BatchNode, EffectGraph, Node, PngSink, VideoSink
+from frame_effects import PIXEL_SCALES, RainbowTrail, dither_frame, pixelate_frame, red_overlay_frame, rainbow_trail_frame
+
+# Add parent directory to path for common module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from common.frame_source import FrameSource
 
 
 def log(step: str, detail: str = "", frame: int = None, total: int = None):
@@ -81,21 +93,13 @@ def detect_green_screen(frame: np.ndarray, threshold: float = 0.15) -> bool:
 
 def analyze_video_for_greenscreen(video_path: str, sample_frames: int = 5) -> tuple[bool, float]:
     """Sample video to detect green screen. Returns (has_greenscreen, green_ratio)."""
-    cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    indices = np.linspace(0, total_frames - 1, sample_frames, dtype=int)
-    
     green_ratios = []
-    for idx in indices:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
-        if ret:
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            lower_green = np.array([35, 40, 40])
-            upper_green = np.array([85, 255, 255])
-            mask = cv2.inRange(hsv, lower_green, upper_green)
-            green_ratios.append(np.sum(mask > 0) / mask.size)
-    cap.release()
+    for frame in FrameSource(video_path, num_frames=sample_frames).frames():
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        lower_green = np.array([35, 40, 40])
+        upper_green = np.array([85, 255, 255])
+        mask = cv2.inRange(hsv, lower_green, upper_green)
+        green_ratios.append(np.sum(mask > 0) / mask.size)
     
     avg_green = np.mean(green_ratios) if green_ratios else 0
     return avg_green > 0.15, avg_green
@@ -461,6 +465,77 @@ def process_frame_for_output(frame: np.ndarray, has_greenscreen: bool, chroma_pa
         return frame.copy()
 
 
+def postprocess_depth(depth_map, raw_frame: np.ndarray, has_greenscreen: bool,
+                      chroma_params: dict, depth_params: dict) -> np.ndarray:
+    """Normalize a depth estimate and suppress the background (chroma mask or soft depth scaling)."""
+    depth_gray = normalize_depth(depth_map)
+    
+    if has_greenscreen:
+        # Get subject mask from raw frame
+        fg_mask = extract_subject_mask(raw_frame, has_greenscreen, chroma_params)
+        if fg_mask.shape != depth_gray.shape:
+            fg_mask = cv2.resize(fg_mask, (depth_gray.shape[1], depth_gray.shape[0]))
+        return cv2.bitwise_and(depth_gray, depth_gray, mask=fg_mask)
+    
+    depth_percentile_high = np.percentile(depth_gray, depth_params['percentile_high'])
+    depth_percentile_low = np.percentile(depth_gray, depth_params['percentile_low'])
+    depth_float = depth_gray.astype(np.float32)
+    soft_mask = np.clip(
+        (depth_float - depth_percentile_low) / (depth_percentile_high - depth_percentile_low + 1e-6),
+        0.0, 1.0
+    )
+    return (depth_float * (depth_params['background_scale'] + (1 - depth_params['background_scale']) * soft_mask)).astype(np.uint8)
+
+
+DEFAULT_DEPTH_PARAMS = {
+    'percentile_low': 40,
+    'percentile_high': 70,
+    'background_scale': 0.3,
+    'mask_erode': 0,
+    'mask_dilate': 0
+}
+
+
+def create_depth_stage(args) -> DepthStage:
+    """Depth stage for args.model; the model itself is only loaded once a frame misses the depth cache."""
+    def load_model():
+        log("MODEL", f"Loading {args.model}...")
+        return pipeline(task="depth-estimation", model=args.model, device=args.device)
+    
+    cache = None if args.no_depth_cache else DepthCache(args.depth_cache, args.model)
+    return DepthStage(load_model, cache, batch_size=args.batch_size, loaders=args.workers, writers=args.workers)
+
+
+def tune_depth_params(depth_stage: DepthStage, sample_frame: np.ndarray, has_greenscreen: bool,
+                      chroma_params: dict, params_file: str) -> dict:
+    """Interactive depth tuning on one raw frame; saves the result to params_file (defaults if cancelled)."""
+    sample_depth_gray = depth_stage.estimate([sample_frame])[0]
+    
+    depth_params = interactive_depth_tuning(sample_depth_gray, sample_frame, has_greenscreen, chroma_params)
+    if not depth_params:
+        return dict(DEFAULT_DEPTH_PARAMS)
+    
+    # Save parameters
+    if not os.path.exists(params_file):
+        saved_params = {}
+    else:
+        with open(params_file, 'r') as f:
+            saved_params = json.load(f)
+    saved_params['depth'] = depth_params
+    with open(params_file, 'w') as f:
+        json.dump(saved_params, f, indent=2)
+    log("PARAMS", "Depth parameters saved")
+    return depth_params
+
+
+def sampled_frames(video_path: str, num_frames: int, target_fps: float = None) -> FrameSource:
+    """Sequential source of the frames to process: num_frames evenly spaced, or as many as target_fps gives."""
+    source = FrameSource(video_path, num_frames=num_frames, target_fps=target_fps)
+    if target_fps is not None:
+        log("EXTRACT", f"Duration: {source.duration:.2f}s @ {target_fps}fps = {len(source)} frames")
+    return source
+
+
 def extract_frames(video_path: str, num_frames: int, output_dir: str, 
                    target_fps: float = None, has_greenscreen: bool = False, 
                    chroma_params: dict = None) -> list[str]:
@@ -479,37 +554,21 @@ def extract_frames(video_path: str, num_frames: int, output_dir: str,
         frame_paths = [os.path.join(chroma_keyed_dir, f) for f in existing_frames]
         return frame_paths
     
-    # Extract frames from video
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise ValueError(f"Cannot open video: {video_path}")
-    
-    video_fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = total_frames / video_fps if video_fps > 0 else 0
-    
-    if target_fps is not None:
-        num_frames = int(duration * target_fps)
-        log("EXTRACT", f"Duration: {duration:.2f}s @ {target_fps}fps = {num_frames} frames")
-    
-    frame_indices = np.linspace(0, total_frames - 1, num_frames, dtype=int)
+    # Extract frames from video (decoded sequentially, no per-frame seeking)
+    source = sampled_frames(video_path, num_frames, target_fps)
     frame_paths = []
     
-    for idx, frame_num in enumerate(tqdm(frame_indices, desc="Extracting frames", unit="frame")):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-        ret, frame = cap.read()
-        if ret:
-            # Save raw frame
-            raw_frame_path = os.path.join(raw_frames_dir, f"frame_{idx:04d}.png")
-            cv2.imwrite(raw_frame_path, frame)
-            
-            # Process and save chroma-keyed frame (or regular if no greenscreen)
-            processed = process_frame_for_output(frame, has_greenscreen, chroma_params)
-            chroma_path = os.path.join(chroma_keyed_dir, f"frame_{idx:04d}.png")
-            cv2.imwrite(chroma_path, processed)
-            frame_paths.append(chroma_path)
+    for idx, frame in enumerate(tqdm(source.frames(), total=len(source), desc="Extracting frames", unit="frame")):
+        # Save raw frame
+        raw_frame_path = os.path.join(raw_frames_dir, f"frame_{idx:04d}.png")
+        cv2.imwrite(raw_frame_path, frame)
+        
+        # Process and save chroma-keyed frame (or regular if no greenscreen)
+        processed = process_frame_for_output(frame, has_greenscreen, chroma_params)
+        chroma_path = os.path.join(chroma_keyed_dir, f"frame_{idx:04d}.png")
+        cv2.imwrite(chroma_path, processed)
+        frame_paths.append(chroma_path)
     
-    cap.release()
     log("EXTRACT", f"Done - {len(frame_paths)} frames (raw={raw_frames_dir}, chroma_keyed={chroma_keyed_dir})")
     return frame_paths
 
@@ -574,81 +633,10 @@ def blend_screen(base: np.ndarray, overlay: np.ndarray) -> np.ndarray:
     return (result * 255).astype(np.uint8)
 
 
-def create_chronophotography(depth_images: list[np.ndarray], mode: str = "lighten") -> np.ndarray:
-    """Create Marey-style chronophotography from multiple depth maps."""
-    if len(depth_images) == 0:
-        return None
-    
-    result = depth_images[0].astype(np.float32)
-    
-    if mode == "lighten":
-        for img in depth_images[1:]:
-            result = np.maximum(result, img.astype(np.float32))
-        return result.astype(np.uint8)
-    
-    elif mode == "add":
-        for img in depth_images[1:]:
-            result += img.astype(np.float32)
-        result = (result - result.min()) / (result.max() - result.min() + 1e-6) * 255
-        return result.astype(np.uint8)
-    
-    elif mode == "screen":
-        result = result / 255.0
-        for img in depth_images[1:]:
-            overlay = img.astype(np.float32) / 255.0
-            result = 1 - (1 - result) * (1 - overlay)
-        return (result * 255).astype(np.uint8)
-    
-    elif mode == "average":
-        for img in depth_images[1:]:
-            result += img.astype(np.float32)
-        result /= len(depth_images)
-        return result.astype(np.uint8)
-    
-    elif mode == "darken":
-        for img in depth_images[1:]:
-            result = np.minimum(result, img.astype(np.float32))
-        return result.astype(np.uint8)
-    
-    elif mode == "lighten_add":
-        lighten_result = depth_images[0].astype(np.float32)
-        for img in depth_images[1:]:
-            lighten_result = np.maximum(lighten_result, img.astype(np.float32))
-        add_result = depth_images[0].astype(np.float32)
-        for img in depth_images[1:]:
-            add_result += img.astype(np.float32)
-        add_result = (add_result - add_result.min()) / (add_result.max() - add_result.min() + 1e-6) * 255
-        hybrid = lighten_result * 0.7 + add_result * 0.3
-        return np.clip(hybrid, 0, 255).astype(np.uint8)
-    
-    elif mode == "long_exposure":
-        # Normalized additive blend - creates long exposure effect
-        for img in depth_images[1:]:
-            result += img.astype(np.float32)
-        # Normalize to prevent whiteout
-        result = result / len(depth_images)
-        return np.clip(result, 0, 255).astype(np.uint8)
-    
-    elif mode == "hero_ghost":
-        # Hero frame at full opacity, others as ghost underlay
-        hero = depth_images[0].astype(np.float32)
-        ghost = depth_images[0].astype(np.float32)
-        
-        # Average all frames for ghost layer
-        for img in depth_images[1:]:
-            ghost += img.astype(np.float32)
-        ghost /= len(depth_images)
-        
-        # Blend: 70% hero, 30% ghost
-        result = hero * 0.7 + ghost * 0.3
-        return np.clip(result, 0, 255).astype(np.uint8)
-    
-    else:
-        return depth_images[0]
-
-
 BLEND_MODES = ["lighten", "add", "screen", "average", "darken", "lighten_add", "long_exposure", "hero_ghost"]
 
+EFFECTS = ["rainbow_trail", "microres", "lowres", "dithered", "depth", "red_overlay", "atkinson", "extract", "bayer", "depth_banding", "chronophoto"]
+
 
 def process_dither_frame(args):
     """Thread worker for dithering."""
@@ -658,40 +646,7 @@ def process_dither_frame(args):
         return None
     
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    h, w = gray.shape
-    
-    if dither_type == "floyd":
-        pil_gray = Image.fromarray(gray, mode='L')
-        dithered = pil_gray.convert('1', dither=Image.Dither.FLOYDSTEINBERG)
-        result = np.array(dithered.convert('L'))
-    
-    elif dither_type == "atkinson":
-        gray_f = gray.astype(np.float32)
-        for y in range(h):
-            for x in range(w):
-                old_pixel = gray_f[y, x]
-                new_pixel = 255.0 if old_pixel > 127 else 0.0
-                gray_f[y, x] = new_pixel
-                error = (old_pixel - new_pixel) / 8.0
-                if x + 1 < w: gray_f[y, x + 1] += error
-                if x + 2 < w: gray_f[y, x + 2] += error
-                if y + 1 < h:
-                    if x > 0: gray_f[y + 1, x - 1] += error
-                    gray_f[y + 1, x] += error
-                    if x + 1 < w: gray_f[y + 1, x + 1] += error
-                if y + 2 < h: gray_f[y + 2, x] += error
-        result = np.clip(gray_f, 0, 255).astype(np.uint8)
-    
-    elif dither_type == "bayer":
-        bayer_matrix = np.array([
-            [0, 8, 2, 10], [12, 4, 14, 6],
-            [3, 11, 1, 9], [15, 7, 13, 5]
-        ], dtype=np.float32) / 16.0 * 255.0
-        threshold = np.tile(bayer_matrix, (h // 4 + 1, w // 4 + 1))[:h, :w]
-        result = (gray.astype(np.float32) > threshold).astype(np.uint8) * 255
-    
-    else:
-        result = gray
+    result = dither_frame(gray, dither_type)
     
     out_path = os.path.join(output_dir, f"frame_{idx:04d}.png")
     Image.fromarray(result, mode='L').save(out_path)
@@ -699,26 +654,14 @@ def process_dither_frame(args):
 
 
 def process_pixel_frame(args):
-    """Thread worker for pixelated frames with adaptive threshold."""
+    """Thread worker for pixelated frames (Otsu threshold adapts to each frame; frame_stats is unused)."""
     idx, frame_path, output_dir, scale, frame_stats = args
     frame = cv2.imread(frame_path)
     if frame is None:
         return None
     
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    h, w = gray.shape
-    
-    # Adaptive threshold based on frame statistics
-    mean_val, std_val = frame_stats
-    # Lower threshold for darker videos, higher for brighter
-    base_thresh = max(5, mean_val * 0.15)
-    
-    small = cv2.resize(gray, (max(1, w // scale), max(1, h // scale)), interpolation=cv2.INTER_AREA)
-    
-    # Use Otsu's method for automatic thresholding
-    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    
-    result = cv2.resize(binary, (w, h), interpolation=cv2.INTER_NEAREST)
+    result = pixelate_frame(gray, scale)
     
     out_path = os.path.join(output_dir, f"frame_{idx:04d}.png")
     Image.fromarray(result, mode='L').save(out_path)
@@ -788,6 +731,183 @@ def compute_frame_stats(frame_paths: list[str]) -> tuple[float, float]:
     return (np.mean(values), np.std(values)) if values else (128, 50)
 
 
+def build_effect_graph(args, has_greenscreen: bool, chroma_params: dict,
+                       estimate_depth, existing_videos: dict) -> EffectGraph:
+    """
+    Effect graph for the requested effects, blend modes and sinks.
+    
+    Streams: frame (decoded source) -> chroma_keyed -> gray -> per-frame effects;
+    depth (batched model inference on the source frames) -> depth effects and
+    blend composites. Outputs whose MP4 already exists are left out.
+    
+    Args:
+        estimate_depth: Callable mapping a list of raw BGR frames to uint8 depth maps
+        existing_videos: {video name: exists} from check_existing_outputs()
+    """
+    graph = EffectGraph(batch_size=args.batch_size, workers=args.workers)
+    videos_dir = os.path.join(args.output_dir, "videos")
+    png = args.png_frames or args.effects == ["extract"]
+    
+    def output(stream: str, name: str, png_prefix: str = "frame_", folder: str = None):
+        """Video sink (unless it exists already) plus optional PNG sink for a stream."""
+        if existing_videos.get(name, False):
+            log("RESUME", f"{name}.mp4 already exists")
+        else:
+            graph.sink(stream, VideoSink(os.path.join(videos_dir, f"{name}.mp4"), args.target_fps))
+        if png:
+            graph.sink(stream, PngSink(os.path.join(args.output_dir, folder or name), png_prefix))
+    
+    graph.add(Node("chroma_keyed", lambda frame: process_frame_for_output(frame, has_greenscreen, chroma_params), ["frame"]))
+    graph.add(Node("gray", lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), ["chroma_keyed"]))
+    graph.add(BatchNode("depth", estimate_depth, ["frame"], ahead=True))
+    if png:
+        graph.sink("frame", PngSink(os.path.join(args.output_dir, "raw_frames")))
+    output("chroma_keyed", "chroma_keyed")
+    if args.effects == ["extract"]:
+        return graph
+    
+    needs_depth = "depth" in args.effects or "depth_banding" in args.effects or args.blend_modes
+    if png and needs_depth:
+        graph.sink("depth", PngSink(os.path.join(args.output_dir, "depth_maps"), "depth_"))
+    
+    # Depth maps share the first map's size; the grayscale frame is resized to match
+    first_shape = {}
+    
+    def common_size(key: str, image: np.ndarray, shape: tuple) -> np.ndarray:
+        target = first_shape.setdefault(key, shape)
+        return image if image.shape[:2] == target else cv2.resize(image, (target[1], target[0]))
+    
+    graph.add(Node("depth_common", lambda depth: common_size("depth", depth, depth.shape), ["depth"], stateful=True))
+    graph.add(Node("gray_common", lambda gray, depth: common_size("gray", gray, depth.shape),
+                   ["gray", "depth_common"], stateful=True))
+    
+    # Depth chronophoto of the whole clip
+    depth_chrono = ChronophotoAccumulator("lighten_add")
+    graph.add(Node("depth_chrono", depth_chrono.add, ["depth"], stateful=True,
+                   finish=lambda: {"chronophoto": depth_chrono.result()}))
+    if needs_depth:
+        graph.still("depth_chrono", "chronophoto", os.path.join(args.output_dir, "depth_maps", "chronophoto.png"))
+    if "depth" in args.effects:
+        output("depth", "depth_maps")
+    
+    # Dithering and pixelation
+    graph.add(Node("dithered", lambda gray: dither_frame(gray, "floyd"), ["gray"]))
+    graph.add(Node("atkinson", lambda gray: dither_frame(gray, "atkinson"), ["gray"]))
+    graph.add(Node("bayer", lambda gray: dither_frame(gray, "bayer"), ["gray"]))
+    for name, scale in PIXEL_SCALES.items():
+        graph.add(Node(name, lambda gray, scale=scale: pixelate_frame(gray, scale), ["gray"]))
+    graph.add(Node("red_overlay", red_overlay_frame, ["gray", "dithered"]))
+    graph.add(Node("rainbow_trail", RainbowTrail(), ["gray"], stateful=True))
+    
+    banding_params = {
+        "max_spacing": args.banding_spacing,
+        "spacing_falloff": args.banding_falloff,
+        "wave_frequency": args.banding_wave_freq,
+        "wave_amplitude": args.banding_wave_amplitude,
+        "noise_density": args.banding_noise,
+    }
+    
+    def banding(depth, gray):
+        if depth.shape != gray.shape:
+            depth = cv2.resize(depth, (gray.shape[1], gray.shape[0]))
+        return depth_banding(depth, **banding_params)
+    
+    graph.add(Node("depth_banding", banding, ["depth", "gray"]))
+    
+    for effect in ["dithered", "atkinson", "bayer", *PIXEL_SCALES, "red_overlay", "rainbow_trail", "depth_banding"]:
+        if effect in args.effects:
+            output(effect, effect)
+    
+    # Chronophoto pass: ghostly composites of the (grayscale) frames
+    if "chronophoto" in args.effects:
+        chrono_modes = ["long_exposure", "hero_ghost", "lighten_add"]
+        frame_chronos = {mode: ChronophotoAccumulator(mode) for mode in chrono_modes}
+        
+        def add_frame(gray):
+            for acc in frame_chronos.values():
+                acc.add(gray)
+        
+        graph.add(Node("chronophoto", add_frame, ["gray_common" if needs_depth else "gray"], stateful=True,
+                       finish=lambda: {mode: acc.result() for mode, acc in frame_chronos.items()}))
+        for mode in chrono_modes:
+            graph.still("chronophoto", mode, os.path.join(args.output_dir, "chronophoto", f"chronophoto_{mode}.png"))
+    
+    # Blend modes: running depth composite over the frame, per frame and for the whole clip
+    for mode in args.blend_modes:
+        graph.add(blend_mode_node(mode, args.alpha))
+        output(f"blend_{mode}", mode)
+        graph.still(f"blend_{mode}", "chronophoto", os.path.join(args.output_dir, mode, "chronophoto.png"))
+    
+    return graph
+
+
+def blend_mode_node(mode: str, alpha: float) -> Node:
+    """Node compositing the depth maps so far (create_chronophotography mode) over the current frame."""
+    depth_acc = ChronophotoAccumulator(mode)
+    frame_sum = {}
+    
+    def blend(depth, gray):
+        depth_acc.add(depth)
+        frame = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        frame_sum["sum"] = frame_sum.get("sum", 0) + frame.astype(np.float64)
+        frame_sum["count"] = frame_sum.get("count", 0) + 1
+        depth_rgb = cv2.cvtColor(depth_acc.result(), cv2.COLOR_GRAY2RGB)
+        return cv2.addWeighted(depth_rgb, 1.0 - alpha, frame, alpha, 0)
+    
+    def finish():
+        depth_result = depth_acc.result()
+        if depth_result is None:
+            return {}
+        depth_rgb = cv2.cvtColor(depth_result, cv2.COLOR_GRAY2RGB)
+        avg_raw = (frame_sum["sum"] / frame_sum["count"]).astype(np.uint8)
+        return {"chronophoto": cv2.addWeighted(depth_rgb, 1.0 - alpha, avg_raw, alpha, 0)}
+    
+    return Node(f"blend_{mode}", blend, ["depth_common", "gray_common"], stateful=True, finish=finish)
+
+
+def run_streaming(args, has_greenscreen: bool, chroma_params: dict, depth_params: dict,
+                  params_file: str, existing_status: dict):
+    """Decode the video once and stream every frame through the effect graph (no intermediate PNGs)."""
+    depth_stage = None
+    
+    def estimate_depth(frames):
+        return [postprocess_depth(depth, frame, has_greenscreen, chroma_params, depth_params)
+                for depth, frame in zip(depth_stage.estimate(frames), frames)]
+    
+    graph = build_effect_graph(args, has_greenscreen, chroma_params, estimate_depth, existing_status['videos'])
+    if not graph.sinks and not graph.stills:
+        log("DONE", f"All requested outputs exist. Output: {args.output_dir}")
+        return
+    streams = graph.active_streams()
+    
+    source = sampled_frames(args.video_path, args.num_frames, args.target_fps)
+    
+    if "depth" in streams:
+        depth_stage = create_depth_stage(args)
+        
+        # Interactive depth tuning on the middle frame (before processing all frames)
+        if "depth" in args.effects and depth_params is None and len(source):
+            log("TUNING", "Opening interactive depth tuning...")
+            middle = FrameSource(args.video_path, indices=[source.indices[len(source) // 2]])
+            for sample_frame in middle.frames():
+                depth_params = tune_depth_params(depth_stage, sample_frame, has_greenscreen, chroma_params, params_file)
+    else:
+        log("SKIP", "Skipping depth estimation (not needed for requested effects)")
+    if depth_params is None:
+        depth_params = dict(DEFAULT_DEPTH_PARAMS)
+    
+    log("STREAM", f"{len(source)} frames -> {', '.join(streams)}")
+    try:
+        with tqdm(total=len(source), desc="Streaming effects", unit="frame") as pbar:
+            count = graph.run(source.frames(), progress=pbar.update)
+    finally:
+        if depth_stage:
+            depth_stage.close()
+    if depth_stage:
+        log("DEPTH", f"{depth_stage.hits} cached, {depth_stage.misses} estimated")
+    log("DONE", f"{count} frames. Output: {args.output_dir}")
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("video_path", type=str)
@@ -800,13 +920,25 @@ def main():
     parser.add_argument("--alpha", type=float, default=0.5)
     parser.add_argument("--effects", type=str, nargs="+", 
                         default=["rainbow_trail", "microres", "lowres", "dithered", "depth", "red_overlay", "atkinson"],
-                        choices=["rainbow_trail", "microres", "lowres", "dithered", "depth", "red_overlay", "atkinson", "extract", "bayer", "depth_banding", "chronophoto"],
+                        choices=EFFECTS,
                         help="Which effects to generate")
+    parser.add_argument("--banding-spacing", type=int, default=20, help="Depth banding: line spacing (px) at depth 0")
+    parser.add_argument("--banding-falloff", type=float, default=15.0, help="Depth banding: depth units per 1 px less spacing")
+    parser.add_argument("--banding-wave-freq", type=float, default=0.1, help="Depth banding: wave phase per row (radians)")
+    parser.add_argument("--banding-wave-amplitude", type=float, default=3.0, help="Depth banding: wave offset (rows)")
+    parser.add_argument("--banding-noise", type=float, default=0.1, help="Depth banding: noise density at full depth")
     parser.add_argument("--output-dir", type=str, default=None)
     parser.add_argument("--force-greenscreen", action="store_true", help="Force green screen mode")
     parser.add_argument("--force-no-greenscreen", action="store_true", help="Force regular video mode")
     parser.add_argument("--workers", type=int, default=4, help="Number of worker threads")
     parser.add_argument("--batch-size", type=int, default=4, help="Batch size for depth estimation")
+    parser.add_argument("--depth-cache", type=str, default=str(DEFAULT_CACHE_DIR),
+                        help="Depth cache directory (shared across runs, keyed by frame content and model)")
+    parser.add_argument("--no-depth-cache", action="store_true", help="Always run the depth model")
+    parser.add_argument("--png-frames", action="store_true",
+                        help="Also dump every output as PNG frames (raw_frames/, chroma_keyed/, depth_maps/, <effect>/)")
+    parser.add_argument("--folders", action="store_true",
+                        help="Legacy pipeline: write PNG folders first, then encode videos from them (resumes per folder)")
     
     args = parser.parse_args()
     
@@ -873,12 +1005,17 @@ def main():
             log("CHROMA", "Using auto/default chroma key parameters")
             chroma_params = None  # Will use defaults in chroma_key_green function
     
+    if not args.folders:
+        os.makedirs(args.output_dir, exist_ok=True)
+        run_streaming(args, has_greenscreen, chroma_params, depth_params, params_file, existing_status)
+        return
+    
     # Extract frames (saves to raw_frames and chroma_keyed folders)
     chroma_keyed_dir = os.path.join(args.output_dir, "chroma_keyed")
     raw_frames_dir = os.path.join(args.output_dir, "raw_frames")
     if not existing_status['frames']:
         log("EXTRACT", f"Starting @ {args.target_fps}fps...")
-        frame_paths = extract_frames(args.video_path, args.num_frames, chroma_keyed_dir, 
+        frame_paths = extract_frames(args.video_path, args.num_frames, args.output_dir, 
                                       target_fps=args.target_fps, has_greenscreen=has_greenscreen,
                                       chroma_params=chroma_params)
     else:
@@ -909,10 +1046,7 @@ def main():
     
     # Load Depth Anything V2 (only if needed)
     needs_depth = "depth" in args.effects or "depth_banding" in args.effects or args.blend_modes
-    pipe = None
-    if needs_depth:
-        log("MODEL", f"Loading {args.model}...")
-        pipe = pipeline(task="depth-estimation", model=args.model, device=args.device)
+    depth_stage = create_depth_stage(args) if needs_depth else None
     
     # Create output dirs
     depth_maps_dir = os.path.join(args.output_dir, "depth_maps")
@@ -927,47 +1061,11 @@ def main():
         raw_frame_files = sorted([f for f in os.listdir(raw_frames_dir) if f.startswith("frame_") and f.endswith(".png")])
         sample_frame_path = os.path.join(raw_frames_dir, raw_frame_files[len(raw_frame_files) // 2])  # Middle frame
         sample_frame = cv2.imread(sample_frame_path)
-        sample_image = Image.open(sample_frame_path)
-        sample_result = pipe([sample_image])[0]
-        sample_depth_array = np.array(sample_result["depth"])
-        depth_min, depth_max = sample_depth_array.min(), sample_depth_array.max()
-        if depth_max > depth_min:
-            depth_norm = (sample_depth_array - depth_min) / (depth_max - depth_min)
-        else:
-            depth_norm = np.zeros_like(sample_depth_array, dtype=np.float32)
-        sample_depth_gray = (depth_norm * 255).astype(np.uint8)
-        
-        depth_params = interactive_depth_tuning(sample_depth_gray, sample_frame, has_greenscreen, chroma_params)
-        if depth_params:
-            # Save parameters
-            if not os.path.exists(params_file):
-                saved_params = {}
-            else:
-                with open(params_file, 'r') as f:
-                    saved_params = json.load(f)
-            saved_params['depth'] = depth_params
-            with open(params_file, 'w') as f:
-                json.dump(saved_params, f, indent=2)
-            log("PARAMS", "Depth parameters saved")
-        else:
-            # Use defaults
-            depth_params = {
-                'percentile_low': 40,
-                'percentile_high': 70,
-                'background_scale': 0.3,
-                'mask_erode': 0,
-                'mask_dilate': 0
-            }
+        depth_params = tune_depth_params(depth_stage, sample_frame, has_greenscreen, chroma_params, params_file)
     
     # Use default depth params if not set
     if depth_params is None:
-        depth_params = {
-            'percentile_low': 40,
-            'percentile_high': 70,
-            'background_scale': 0.3,
-            'mask_erode': 0,
-            'mask_dilate': 0
-        }
+        depth_params = dict(DEFAULT_DEPTH_PARAMS)
     
     # Define function to run depth estimation
     def run_depth_estimation():
@@ -980,62 +1078,17 @@ def main():
             
             log("DEPTH", f"Running depth estimation on {len(raw_frame_paths)} raw frames...")
             
-            # Process in batches
-            num_batches = (len(raw_frame_paths) + args.batch_size - 1) // args.batch_size
-            with tqdm(total=len(raw_frame_paths), desc="Depth estimation", unit="frame") as pbar:
-                for batch_start in range(0, len(raw_frame_paths), args.batch_size):
-                    batch_end = min(batch_start + args.batch_size, len(raw_frame_paths))
-                    batch_paths = raw_frame_paths[batch_start:batch_end]
-                    
-                    # Load batch images (use raw frames for depth estimation)
-                    batch_images = [Image.open(p) for p in batch_paths]
-                    
-                    # Run depth on batch
-                    results = pipe(batch_images)
-                    
-                    for i, (result, raw_frame_path) in enumerate(zip(results, batch_paths)):
-                        idx = batch_start + i
-                        depth_map = result["depth"]
-                        depth_array = np.array(depth_map)
-                        
-                        # Get subject mask from raw frame
-                        orig_frame = cv2.imread(raw_frame_path)
-                        fg_mask = extract_subject_mask(orig_frame, has_greenscreen, chroma_params)
-                        
-                        # Resize mask if needed
-                        if fg_mask.shape != depth_array.shape:
-                            fg_mask = cv2.resize(fg_mask, (depth_array.shape[1], depth_array.shape[0]))
-                        
-                        # Normalize depth
-                        depth_min, depth_max = depth_array.min(), depth_array.max()
-                        if depth_max > depth_min:
-                            depth_norm = (depth_array - depth_min) / (depth_max - depth_min)
-                        else:
-                            depth_norm = np.zeros_like(depth_array, dtype=np.float32)
-                        
-                        depth_gray = (depth_norm * 255).astype(np.uint8)
-                        
-                        # Apply subject mask with tuned parameters
-                        if has_greenscreen:
-                            depth_gray = cv2.bitwise_and(depth_gray, depth_gray, mask=fg_mask)
-                        else:
-                            depth_percentile_high = np.percentile(depth_gray, depth_params['percentile_high'])
-                            depth_percentile_low = np.percentile(depth_gray, depth_params['percentile_low'])
-                            depth_float = depth_gray.astype(np.float32)
-                            soft_mask = np.clip(
-                                (depth_float - depth_percentile_low) / (depth_percentile_high - depth_percentile_low + 1e-6),
-                                0.0, 1.0
-                            )
-                            depth_gray = (depth_float * (depth_params['background_scale'] + (1 - depth_params['background_scale']) * soft_mask)).astype(np.uint8)
-                        
-                        depth_imgs.append(depth_gray)
-                        
-                        path = os.path.join(depth_maps_dir, f"depth_{idx:04d}.png")
-                        Image.fromarray(depth_gray, mode='L').save(path)
-                    
-                    pbar.update(len(batch_paths))
+            # Batches are loaded ahead of the model and saved behind it (depth_stage pools)
+            depths = depth_stage.map(raw_frame_paths, load=cv2.imread)
+            for idx, (_, orig_frame, depth) in enumerate(tqdm(depths, total=len(raw_frame_paths), desc="Depth estimation", unit="frame")):
+                depth_gray = postprocess_depth(depth, orig_frame, has_greenscreen, chroma_params, depth_params)
+                depth_imgs.append(depth_gray)
+                
+                path = os.path.join(depth_maps_dir, f"depth_{idx:04d}.png")
+                depth_stage.submit(cv2.imwrite, path, depth_gray)
+            depth_stage.flush()
             
-            log("DEPTH", f"Done - {len(depth_imgs)} depth maps")
+            log("DEPTH", f"Done - {len(depth_imgs)} depth maps ({depth_stage.hits} cached, {depth_stage.misses} estimated)")
             
             # Create depth chronophoto
             depth_chrono = create_chronophotography(depth_imgs, "lighten_add")
@@ -1057,17 +1110,13 @@ def main():
     # Check if depth is needed for any effects
     needs_depth = "depth" in args.effects or "depth_banding" in args.effects or args.blend_modes
     
-    # Run depth estimation - will be used in parallel with independent effects
+    # Run depth estimation (depth_stage overlaps frame loading and PNG writing with inference;
+    # the depth maps are needed right away for the video, resizing and chronophoto pass)
     depth_images = []
-    depth_executor = None
-    depth_future = None
     
     if needs_depth:
         if not existing_status['depth_maps']:
-            log("PARALLEL", "Starting depth estimation (will run in parallel with independent effects)...")
-            # Start depth estimation in thread (GPU work can run while CPU processes effects)
-            depth_executor = ThreadPoolExecutor(max_workers=1)
-            depth_future = depth_executor.submit(run_depth_estimation)
+            depth_images = run_depth_estimation()
         else:
             log("RESUME", "Loading existing depth maps...")
             existing_depths = sorted([f for f in os.listdir(depth_maps_dir) if f.startswith("depth_") and f.endswith(".png")])
@@ -1077,6 +1126,7 @@ def main():
                 if depth_img is not None:
                     depth_images.append(depth_img)
             log("RESUME", f"Loaded {len(depth_images)} existing depth maps")
+        depth_stage.close()
     else:
         log("SKIP", "Skipping depth estimation (not needed for requested effects)")
     
@@ -1094,6 +1144,7 @@ def main():
     
     # Resize depths to common size (only if we have depth images)
     resized_depths = []
+    target_shape = None
     if depth_images:
         target_shape = depth_images[0].shape
         for img in depth_images:
@@ -1152,13 +1203,10 @@ def main():
             
             log("CHRONO", "Chronophoto pass done")
     
-    # Process independent effects while depth estimation runs (if depth is running)
+    # Independent effects
     # These effects don't need depth: dithered, atkinson, bayer, extract, lowres, microres, rainbow_trail
     dithered_images = []
     
-    if depth_future:
-        log("PARALLEL", "Processing independent effects while depth estimation runs...")
-    
     # Parallel dithering (independent effect - runs while depth estimation continues)
     if ("dithered" in args.effects or "red_overlay" in args.effects) and not existing_status['effects'].get('dithered', False):
         log("DITHER", "Creating dithered frames (parallel)...")
@@ -1186,12 +1234,6 @@ def main():
             if d_img is not None:
                 dithered_images.append(d_img)
     
-    # Wait for depth estimation to complete (if it was running)
-    if depth_future:
-        log("PARALLEL", "Waiting for depth estimation to complete...")
-        depth_images = depth_future.result()
-        depth_executor.shutdown(wait=True)
-    
     if "atkinson" in args.effects and not existing_status['effects'].get('atkinson', False):
         log("DITHER", "Creating Atkinson dithered frames...")
         atkinson_dir = os.path.join(args.output_dir, "atkinson")
@@ -1292,25 +1334,10 @@ def main():
             frame = cv2.imread(frame_path)
             if frame is None:
                 continue
-            h, w = frame.shape[:2]
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            dark_base = np.clip(gray.astype(np.float32) * 0.3, 0, 255).astype(np.uint8)
             
             if idx < len(dithered_images):
-                dith = dithered_images[idx]
-                if dith.shape != (h, w):
-                    dith = cv2.resize(dith, (w, h))
-                
-                result = np.zeros((h, w, 3), dtype=np.uint8)
-                result[:, :, 0] = np.clip(dark_base * 0.4, 0, 60).astype(np.uint8)
-                result[:, :, 1] = np.clip(dark_base * 0.2, 0, 40).astype(np.uint8)
-                result[:, :, 2] = np.clip(dark_base * 0.3, 0, 50).astype(np.uint8)
-                
-                dith_mask = dith > 127
-                result[:, :, 2] = np.where(dith_mask, 255, result[:, :, 2])
-                result[:, :, 1] = np.where(dith_mask, 80, result[:, :, 1])
-                result[:, :, 0] = np.where(dith_mask, 20, result[:, :, 0])
-                
+                result = red_overlay_frame(gray, dithered_images[idx])
                 Image.fromarray(cv2.cvtColor(result, cv2.COLOR_BGR2RGB)).save(
                     os.path.join(red_overlay_dir, f"frame_{idx:04d}.png"))
         log("EFFECT", "Red overlay done")
@@ -1334,50 +1361,12 @@ def main():
             frame = cv2.imread(frame_path)
             if frame is None:
                 continue
-            h, w = frame.shape[:2]
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            result = np.zeros((h, w, 3), dtype=np.float32)
-            
-            trail_frames = max(0, idx - 8)
-            for t_idx in range(trail_frames, idx + 1):
-                t_frame = cv2.imread(frame_paths[t_idx])
-                if t_frame is None:
-                    continue
-                t_gray = cv2.cvtColor(t_frame, cv2.COLOR_BGR2GRAY).astype(np.float32)
-                if t_gray.shape != (h, w):
-                    t_gray = cv2.resize(t_gray, (w, h))
-                
-                time_offset = (idx - t_idx) / 8.0
-                hue = (time_offset * 0.7) % 1.0
-                
-                if hue < 1/6:
-                    r, g, b = 1.0, hue * 6, 0
-                elif hue < 2/6:
-                    r, g, b = 1 - (hue - 1/6) * 6, 1.0, 0
-                elif hue < 3/6:
-                    r, g, b = 0, 1.0, (hue - 2/6) * 6
-                elif hue < 4/6:
-                    r, g, b = 0, 1 - (hue - 3/6) * 6, 1.0
-                elif hue < 5/6:
-                    r, g, b = (hue - 4/6) * 6, 0, 1.0
-                else:
-                    r, g, b = 1.0, 0, 1 - (hue - 5/6) * 6
-                
-                fade = 1.0 - (time_offset * 0.7)
-                intensity = t_gray / 255.0 * fade
-                blurred = cv2.GaussianBlur(intensity, (15, 15), 0)
-                result[:, :, 2] += blurred * r * 180
-                result[:, :, 1] += blurred * g * 180
-                result[:, :, 0] += blurred * b * 180
-            
-            current_bright = gray.astype(np.float32) / 255.0
-            bright_mask = current_bright > 0.6
-            result[:, :, 0] = np.where(bright_mask, np.clip(result[:, :, 0] + current_bright * 200, 0, 255), result[:, :, 0])
-            result[:, :, 1] = np.where(bright_mask, np.clip(result[:, :, 1] + current_bright * 200, 0, 255), result[:, :, 1])
-            result[:, :, 2] = np.where(bright_mask, np.clip(result[:, :, 2] + current_bright * 200, 0, 255), result[:, :, 2])
-            
-            noise = np.random.normal(0, 8, (h, w, 3))
-            result = np.clip(result + noise, 0, 255).astype(np.uint8)
+            trail = []
+            for t_idx in range(max(0, idx - 8), idx + 1):
+                t_frame = frame if t_idx == idx else cv2.imread(frame_paths[t_idx])
+                if t_frame is not None:
+                    trail.append(cv2.cvtColor(t_frame, cv2.COLOR_BGR2GRAY))
+            result = rainbow_trail_frame(trail)
             Image.fromarray(cv2.cvtColor(result, cv2.COLOR_BGR2RGB)).save(
                 os.path.join(rainbow_dir, f"frame_{idx:04d}.png"))
         log("EFFECT", "Rainbow trail done")
@@ -1396,6 +1385,13 @@ def main():
         log("EFFECT", "Creating depth banding frames...")
         banding_dir = os.path.join(args.output_dir, "depth_banding")
         os.makedirs(banding_dir, exist_ok=True)
+        banding_params = {
+            "max_spacing": args.banding_spacing,
+            "spacing_falloff": args.banding_falloff,
+            "wave_frequency": args.banding_wave_freq,
+            "wave_amplitude": args.banding_wave_amplitude,
+            "noise_density": args.banding_noise,
+        }
         
         for idx, frame_path in enumerate(tqdm(frame_paths, desc="Depth banding", unit="frame")):
             frame = cv2.imread(frame_path)
@@ -1410,20 +1406,7 @@ def main():
             else:
                 depth = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             
-            result = np.zeros((h, w), dtype=np.uint8)
-            
-            for y in range(h):
-                for x in range(w):
-                    d = depth[y, x]
-                    if d < 10:
-                        continue
-                    line_spacing = max(2, int(20 - d / 15))
-                    wave = int(np.sin(y * 0.1 + d * 0.05) * 3)
-                    if (y + wave) % line_spacing < 2:
-                        result[y, x] = 255
-            
-            noise_mask = np.random.random((h, w)) < (depth.astype(np.float32) / 255.0 * 0.1)
-            result = np.where(noise_mask, 255, result).astype(np.uint8)
+            result = depth_banding(depth, **banding_params)
             Image.fromarray(result, mode='L').save(os.path.join(banding_dir, f"frame_{idx:04d}.png"))
         log("EFFECT", "Depth banding done")
         
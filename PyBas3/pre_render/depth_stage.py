@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Depth estimation stage for the pre-render pipeline.
+
+Keeps the depth model busy and never runs it twice on the same frame:
+- a loader pool reads, converts and hashes the next batches while the
+  model runs on the current one (map() prefetches `prefetch` batches ahead)
+- a writer pool saves outputs (cache entries, depth PNGs), so inference
+  never waits on disk
+- DepthCache stores each normalized depth map under a hash of the exact
+  RGB pixels (and so the resolution) fed to the model, per model. Re-runs,
+  other effect selections and tuning sessions reuse it, and the model is
+  only loaded once a frame misses the cache.
+
+Cached maps are the normalized model output, before background suppression
+(postprocess_depth in depth_blend_video.py), so changing depth or chroma
+parameters never invalidates them.
+
+Example:
+    stage = DepthStage(lambda: pipeline(task="depth-estimation", model=name), DepthCache(cache_dir, name))
+    for path, frame, depth in stage.map(frame_paths, load=cv2.imread):
+        ...
+    stage.close()
+"""
+
+import hashlib
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / "outputs" / "depth_cache"
+
+
+def normalize_depth(depth_map) -> np.ndarray:
+    """Depth model output (PIL image or array) -> uint8, stretched to the full 0-255 range."""
+    depth_array = np.array(depth_map)
+    depth_min, depth_max = depth_array.min(), depth_array.max()
+    if depth_max > depth_min:
+        depth_norm = (depth_array - depth_min) / (depth_max - depth_min)
+    else:
+        depth_norm = np.zeros_like(depth_array, dtype=np.float32)
+    return (depth_norm * 255).astype(np.uint8)
+
+
+def frame_key(rgb: np.ndarray) -> str:
+    """Content hash of a model input frame (shape included, so resolution is part of the key)."""
+    digest = hashlib.sha1(np.asarray(rgb.shape, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(rgb).data)
+    return digest.hexdigest()
+
+
+class DepthCache:
+    """Content-addressed store of normalized depth maps: <root>/<model>/<key[:2]>/<key>.png."""
+
+    def __init__(self, root: str, model: str):
+        self.root = Path(root) / model.replace("/", "--")
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        return cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+
+    def put(self, key: str, depth: np.ndarray):
+        """Store a depth map (written to a temp file and renamed, so readers never see partial PNGs)."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.stem}.{os.getpid()}.{threading.get_ident()}.png")
+        cv2.imwrite(str(tmp), depth)
+        os.replace(tmp, path)
+
+
+class DepthStage:
+    """Batched depth estimation with prefetching loaders, a writer pool and an optional DepthCache."""
+
+    def __init__(self, load_model: Callable[[], Callable], cache: Optional[DepthCache] = None,
+                 batch_size: int = 4, loaders: int = 2, writers: int = 2, prefetch: int = 2):
+        """
+        Args:
+            load_model: Returns the depth pipeline (called on the first cache miss)
+            cache: Depth cache (None = always run the model)
+            batch_size: Frames per model call in map()
+            loaders: Threads reading / converting / hashing frames
+            writers: Threads saving outputs (cache entries and submit()ted jobs)
+            prefetch: Batches map() prepares ahead of the model
+        """
+        self._load_model = load_model
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.prefetch = max(0, prefetch)
+        self._loader = ThreadPoolExecutor(max_workers=max(1, loaders), thread_name_prefix="depth-load")
+        self._writer = ThreadPoolExecutor(max_workers=max(1, writers), thread_name_prefix="depth-write")
+        self._writes: List[Future] = []  # Guarded by _writes_lock: submit() may run on a graph ahead thread
+        self._writes_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self) -> Callable:
+        """The depth pipeline, loaded on first use."""
+        with self._model_lock:
+            if self._model is None:
+                self._model = self._load_model()
+            return self._model
+
+    def _prepare(self, frame: np.ndarray) -> Tuple[np.ndarray, str, Optional[np.ndarray]]:
+        """BGR frame -> (model input RGB, cache key, cached depth or None)."""
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.cache is None:
+            return rgb, "", None
+        key = frame_key(rgb)
+        return rgb, key, self.cache.get(key)
+
+    def _infer(self, prepared: List[tuple]) -> List[np.ndarray]:
+        """Depth for prepared frames: cache hits as is, one model call for the misses."""
+        depths = [cached for _, _, cached in prepared]
+        misses = [i for i, depth in enumerate(depths) if depth is None]
+        if misses:
+            results = self.model([Image.fromarray(prepared[i][0]) for i in misses])
+            for i, result in zip(misses, results):
+                depths[i] = normalize_depth(result["depth"])
+                if self.cache is not None:
+                    self.submit(self.cache.put, prepared[i][1], depths[i])
+        self.hits += len(prepared) - len(misses)
+        self.misses += len(misses)
+        return depths
+
+    def estimate(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        """Normalized uint8 depth maps for a batch of BGR frames (cache lookups in parallel)."""
+        return self._infer(list(self._loader.map(self._prepare, frames)))
+
+    def map(self, items: Iterable, load: Optional[Callable[..., np.ndarray]] = None
+            ) -> Iterator[Tuple[object, np.ndarray, np.ndarray]]:
+        """
+        Pipelined depth over a stream: yields (item, BGR frame, depth) in order.
+
+        load(item) -> BGR frame runs on the loader pool, up to `prefetch`
+        batches ahead of the model (default: items are frames already).
+        """
+        load = load or (lambda frame: frame)
+
+        def prepare(item):
+            frame = load(item)
+            return (item, frame) + self._prepare(frame)
+
+        items = iter(items)
+        ahead = self.batch_size * (self.prefetch + 1)
+        pending = deque(self._loader.submit(prepare, item) for item in islice(items, ahead))
+        while pending:
+            batch = [pending.popleft().result() for _ in range(min(self.batch_size, len(pending)))]
+            # Refill before inference so loading overlaps with the model
+            pending.extend(self._loader.submit(prepare, item) for item in islice(items, len(batch)))
+            depths = self._infer([entry[2:] for entry in batch])
+            for (item, frame, *_), depth in zip(batch, depths):
+                yield item, frame, depth
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Run an output job (e.g. saving a PNG) on the writer pool (thread-safe, like flush)."""
+        future = self._writer.submit(fn, *args)
+        with self._writes_lock:
+            self._writes = [f for f in self._writes if not f.done() or f.exception()] + [future]
+        return future
+
+    def flush(self):
+        """Wait for all submitted writes (re-raises the first failure)."""
+        with self._writes_lock:
+            writes, self._writes = self._writes, []
+        for future in writes:
+            future.result()
+
+    def close(self):
+        """Finish pending writes and stop the pools."""
+        try:
+            self.flush()
+        finally:
+            self._loader.shutdown()
+            self._writer.shutdown()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Error-diffusion dithering (Atkinson, Floyd-Steinberg, Sierra, Stucki) without per-pixel Python loops.
+
+Error diffusion is sequential: every pixel depends on the quantization error
+of pixels before it. With a kernel reaching at most `reach` columns right of
+the source in the rows below, pixel (y, x) only depends on pixels with a
+smaller x + slope * y (slope = reach + 1), so each anti-diagonal "wave" of
+that value is processed as one vectorized step (W + slope * H steps instead
+of W * H iterations).
+
+Waves are pulled, not pushed: each pixel adds its neighbours' errors in the
+same order the raster loop would have pushed them, in float32, so Atkinson
+output is bit-exact with the original loop (atkinson_reference).
+
+Usage:
+    python dithering.py                          # Benchmark vs. the Python loop
+    python dithering.py --width 1920 --height 1080 --kernel stucki
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+# name -> (divisor, [(dy, dx, weight)]) with (dy, dx) relative to the source pixel
+ERROR_DIFFUSION_KERNELS = {
+    "atkinson": (8, [
+        (0, 1, 1), (0, 2, 1),
+        (1, -1, 1), (1, 0, 1), (1, 1, 1),
+        (2, 0, 1),
+    ]),
+    "floyd_steinberg": (16, [
+        (0, 1, 7),
+        (1, -1, 3), (1, 0, 5), (1, 1, 1),
+    ]),
+    "sierra": (32, [
+        (0, 1, 5), (0, 2, 3),
+        (1, -2, 2), (1, -1, 4), (1, 0, 5), (1, 1, 4), (1, 2, 2),
+        (2, -1, 2), (2, 0, 3), (2, 1, 2),
+    ]),
+    "stucki": (42, [
+        (0, 1, 8), (0, 2, 4),
+        (1, -2, 2), (1, -1, 4), (1, 0, 8), (1, 1, 4), (1, 2, 2),
+        (2, -2, 1), (2, -1, 2), (2, 0, 4), (2, 1, 2), (2, 2, 1),
+    ]),
+}
+
+
+def error_diffuse(gray: np.ndarray, kernel: str = "atkinson", threshold: float = 127) -> np.ndarray:
+    """
+    Dither a grayscale image to black/white by error diffusion.
+
+    Args:
+        gray: (H, W) uint8 grayscale image
+        kernel: Key of ERROR_DIFFUSION_KERNELS
+        threshold: Pixels above this become 255, the rest 0
+
+    Returns:
+        (H, W) uint8 image of 0 / 255
+    """
+    divisor, taps = ERROR_DIFFUSION_KERNELS[kernel]
+    h, w = gray.shape
+    reach_down = max(dy for dy, _, _ in taps)
+    reach_side = max(abs(dx) for _, dx, _ in taps)
+    slope = max(dx for dy, dx, _ in taps if dy > 0) + 1
+
+    # Padding keeps every neighbour lookup inside the array (padded errors stay 0)
+    pw = w + 2 * reach_side
+    values = np.zeros((h + reach_down, pw), dtype=np.float32)
+    values[reach_down:, reach_side:reach_side + w] = gray
+    errors = np.zeros_like(values)
+    values, errors = values.ravel(), errors.ravel()
+
+    # Neighbours a pixel pulls from, in the order a raster loop pushes them
+    # (earlier rows first, then left to right): flat offset and weight
+    pulls = sorted((-dy, -dx, weight) for dy, dx, weight in taps)
+    pulls = [(sy * pw + sx, np.float32(weight / divisor)) for sy, sx, weight in pulls]
+    # Equal weights (Atkinson): store errors pre-weighted, so a pull is a single add
+    uniform = len({weight for _, weight in pulls}) == 1
+    error_scale = pulls[0][1] if uniform else np.float32(1)
+
+    step = pw - slope  # Flat distance between consecutive pixels of a wave
+    for t in range(w + slope * (h - 1)):
+        y0 = max(0, -(-(t - w + 1) // slope))
+        y1 = min(h - 1, t // slope)
+        start = (y0 + reach_down) * pw + reach_side + t - slope * y0
+        wave = slice(start, start + (y1 - y0) * step + 1, step)
+
+        old = values[wave]
+        for offset, weight in pulls:
+            neighbours = errors[start + offset:wave.stop + offset:step]
+            old += neighbours if uniform else neighbours * weight
+        new = (old > threshold) * np.float32(255)
+        errors[wave] = (old - new) * error_scale
+        values[wave] = new
+
+    result = values.reshape(h + reach_down, pw)[reach_down:, reach_side:reach_side + w]
+    return result.astype(np.uint8)
+
+
+def atkinson_reference(gray: np.ndarray) -> np.ndarray:
+    """Original per-pixel Atkinson loop (reference for tests and the benchmark)."""
+    h, w = gray.shape
+    gray_f = gray.astype(np.float32)
+    for y in range(h):
+        for x in range(w):
+            old_pixel = gray_f[y, x]
+            new_pixel = 255.0 if old_pixel > 127 else 0.0
+            gray_f[y, x] = new_pixel
+            error = (old_pixel - new_pixel) / 8.0
+            if x + 1 < w: gray_f[y, x + 1] += error
+            if x + 2 < w: gray_f[y, x + 2] += error
+            if y + 1 < h:
+                if x > 0: gray_f[y + 1, x - 1] += error
+                gray_f[y + 1, x] += error
+                if x + 1 < w: gray_f[y + 1, x + 1] += error
+            if y + 2 < h: gray_f[y + 2, x] += error
+    return np.clip(gray_f, 0, 255).astype(np.uint8)
+
+
+def _test_image(width: int, height: int) -> np.ndarray:
+    """Gradient + noise: exercises both thresholds and long error runs."""
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :].repeat(height, axis=0)
+    noise = rng.normal(0, 40, (height, width))
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized error diffusion against the Python loop")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--kernel", default="atkinson", choices=list(ERROR_DIFFUSION_KERNELS))
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs of the vectorized version")
+    parser.add_argument("--skip-reference", action="store_true", help="Don't time the (slow) Python loop")
+    args = parser.parse_args()
+
+    gray = _test_image(args.width, args.height)
+    print(f"{args.width}x{args.height}, kernel={args.kernel}")
+
+    error_diffuse(gray, args.kernel)  # Warm up
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        fast = error_diffuse(gray, args.kernel)
+    fast_ms = (time.perf_counter() - start) / args.repeats * 1000
+    print(f"  vectorized:  {fast_ms:8.1f} ms/frame")
+
+    if args.skip_reference or args.kernel != "atkinson":
+        return
+
+    start = time.perf_counter()
+    slow = atkinson_reference(gray)
+    slow_ms = (time.perf_counter() - start) * 1000
+    print(f"  Python loop: {slow_ms:8.1f} ms/frame")
+    print(f"  speedup:     {slow_ms / fast_ms:8.1f}x")
+    print(f"  bit-exact:   {np.array_equal(fast, slow)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Streaming effect graph for the pre-render pipeline.
+
+Frames are decoded once and pushed through the graph in small batches: each
+node computes one named stream (chroma key, depth, an effect...) from
+streams computed before it for the same frame, and every requested stream
+goes straight to its sinks (an MP4 encoder, optionally a PNG folder).
+Nothing round-trips through disk between nodes.
+
+Nodes only run if a sink (directly or through other nodes) needs them.
+Stateless nodes run across the frames of a batch on a thread pool; stateful
+nodes (trails, running composites) see frames strictly in order. Batch
+nodes (depth estimation) get the whole batch in one call; with ahead=True
+they already run on the next batch while the rest of the graph processes
+the current one, so model inference overlaps with the effects and encoders.
+
+Example:
+    graph = EffectGraph(batch_size=4, workers=4)
+    graph.add(Node("gray", lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), ["frame"]))
+    graph.sink("gray", VideoSink("videos/gray.mp4", fps=24))
+    graph.run(frames)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import cv2
+import numpy as np
+from PIL import Image
+
+SOURCE_STREAM = "frame"
+
+
+class Node:
+    """
+    Computes stream `name` for each frame as fn(*input streams).
+
+    A None result means "no output for this frame" (sinks skip it, and so
+    do nodes depending on it).
+    """
+
+    ahead = False  # Runs one batch ahead of the other nodes (see BatchNode)
+
+    def __init__(self, name: str, fn: Callable, inputs: Sequence[str], stateful: bool = False,
+                 finish: Optional[Callable[[], Dict[str, np.ndarray]]] = None):
+        """
+        Args:
+            name: Stream this node produces
+            fn: Called with one frame's input streams, returns the output image
+            inputs: Names of the streams fn takes (in argument order)
+            stateful: fn keeps state across frames, so call it in frame order
+            finish: Called once after the last frame; returns {still name: image}
+        """
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.stateful = stateful
+        self._finish = finish
+
+    def process(self, ctxs: List[dict], executor: ThreadPoolExecutor):
+        """Compute this node's stream for every frame of a batch (in place)."""
+        ready = [ctx for ctx in ctxs if all(ctx.get(name) is not None for name in self.inputs)]
+        call = lambda ctx: self.fn(*(ctx[name] for name in self.inputs))
+        results = map(call, ready) if self.stateful or len(ready) < 2 else executor.map(call, ready)
+        for ctx, result in zip(ready, results):
+            ctx[self.name] = result
+
+    def finish(self) -> Dict[str, np.ndarray]:
+        return self._finish() if self._finish else {}
+
+
+class BatchNode(Node):
+    """Node whose fn takes lists of inputs for a whole batch (e.g. model inference)."""
+
+    def __init__(self, name: str, fn: Callable, inputs: Sequence[str], ahead: bool = False,
+                 finish: Optional[Callable[[], Dict[str, np.ndarray]]] = None):
+        """
+        Args:
+            ahead: Process each batch while the other nodes still work on the
+                   previous one (inputs must be the source stream only)
+        """
+        super().__init__(name, fn, inputs, finish=finish)
+        self.ahead = ahead
+
+    def process(self, ctxs: List[dict], executor: ThreadPoolExecutor):
+        ready = [ctx for ctx in ctxs if all(ctx.get(name) is not None for name in self.inputs)]
+        if not ready:
+            return
+        results = self.fn(*([ctx[name] for ctx in ready] for name in self.inputs))
+        for ctx, result in zip(ready, results):
+            ctx[self.name] = result
+
+
+class VideoSink:
+    """Encodes a stream to MP4 (opened on the first frame; later frames are resized to match)."""
+
+    def __init__(self, path: str, fps: float, fourcc: str = "mp4v"):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.frames = 0
+        self._writer: Optional[cv2.VideoWriter] = None
+        self._size = None
+
+    def write(self, idx: int, image: np.ndarray):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        if self._writer is None:
+            h, w = image.shape[:2]
+            self._size = (w, h)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self._size)
+            if not self._writer.isOpened():
+                raise IOError(f"Failed to open video writer for {self.path}")
+        if (image.shape[1], image.shape[0]) != self._size:
+            image = cv2.resize(image, self._size)
+        self._writer.write(image)
+        self.frames += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+class PngSink:
+    """Dumps a stream as <folder>/<prefix>NNNN.png."""
+
+    def __init__(self, folder: str, prefix: str = "frame_"):
+        self.folder = folder
+        self.prefix = prefix
+        self.frames = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def write(self, idx: int, image: np.ndarray):
+        cv2.imwrite(os.path.join(self.folder, f"{self.prefix}{idx:04d}.png"), image)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+def save_still(path: str, image: np.ndarray):
+    """Save a single image (grayscale or BGR) as PNG."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if image.ndim == 2:
+        Image.fromarray(image, mode='L').save(path)
+    else:
+        Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)).save(path)
+
+
+class EffectGraph:
+    """Runs nodes over a frame stream and feeds their outputs to sinks."""
+
+    def __init__(self, batch_size: int = 4, workers: int = 4):
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.nodes: Dict[str, Node] = {}  # Insertion order = a valid evaluation order
+        self.sinks: Dict[str, list] = {}
+        self.stills: Dict[str, Dict[str, str]] = {}  # node -> {still name: output path}
+
+    def add(self, node: Node) -> Node:
+        """Add a node. Its inputs must be the source stream or earlier nodes."""
+        for name in node.inputs:
+            if name != SOURCE_STREAM and name not in self.nodes:
+                raise ValueError(f"Node '{node.name}' needs unknown stream '{name}'")
+        if node.name in self.nodes or node.name == SOURCE_STREAM:
+            raise ValueError(f"Duplicate stream '{node.name}'")
+        if node.ahead and node.inputs != [SOURCE_STREAM]:
+            raise ValueError(f"Node '{node.name}' runs ahead, so it can only take the '{SOURCE_STREAM}' stream")
+        self.nodes[node.name] = node
+        return node
+
+    def sink(self, stream: str, sink):
+        """Send every frame of a stream to a sink (VideoSink, PngSink or anything with write/close)."""
+        if stream != SOURCE_STREAM and stream not in self.nodes:
+            raise ValueError(f"Unknown stream '{stream}'")
+        self.sinks.setdefault(stream, []).append(sink)
+
+    def still(self, stream: str, name: str, path: str):
+        """Save still `name` from node `stream`'s finish() to path when the run ends."""
+        if stream not in self.nodes:
+            raise ValueError(f"Unknown stream '{stream}'")
+        self.stills.setdefault(stream, {})[name] = path
+
+    def _active_nodes(self) -> List[Node]:
+        """Nodes needed by some sink or still, in evaluation order."""
+        needed = set(self.sinks) | set(self.stills)
+        for node in reversed(list(self.nodes.values())):
+            if node.name in needed:
+                needed.update(node.inputs)
+        return [node for node in self.nodes.values() if node.name in needed]
+
+    def active_streams(self) -> List[str]:
+        """Names of the streams a run will compute."""
+        return [node.name for node in self._active_nodes()]
+
+    def run(self, frames: Iterable[np.ndarray], progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Push all frames through the graph.
+
+        Args:
+            frames: Source frames (BGR), in order
+            progress: Called with the number of frames after each batch
+
+        Returns:
+            Number of frames processed
+        """
+        nodes = self._active_nodes()
+        ahead = [node for node in nodes if node.ahead]
+        rest = [node for node in nodes if not node.ahead]
+        sinks = [(stream, sink) for stream, stream_sinks in self.sinks.items() for sink in stream_sinks]
+        count = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph-ahead") as ahead_executor:
+            try:
+                previous = None  # (batch, future of its ahead nodes)
+                for batch in self._batches(frames):
+                    count += len(batch)
+                    future = ahead_executor.submit(self._run_nodes, batch, ahead, executor)
+                    if previous:
+                        self._run_batch(*previous, rest, sinks, executor, progress)
+                    previous = (batch, future)
+                if previous:
+                    self._run_batch(*previous, rest, sinks, executor, progress)
+
+                for node in nodes:
+                    paths = self.stills.get(node.name, {})
+                    for name, image in node.finish().items():
+                        if name in paths and image is not None:
+                            save_still(paths[name], image)
+            finally:
+                for _, sink in sinks:
+                    sink.close()
+        return count
+
+    def _batches(self, frames: Iterable[np.ndarray]) -> Iterable[List[dict]]:
+        """Group source frames into per-frame contexts of batch_size."""
+        batch = []
+        for index, frame in enumerate(frames):
+            batch.append({"index": index, SOURCE_STREAM: frame})
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _run_nodes(ctxs: List[dict], nodes: List[Node], executor: ThreadPoolExecutor):
+        for node in nodes:
+            node.process(ctxs, executor)
+
+    def _run_batch(self, ctxs: List[dict], ahead, nodes: List[Node], sinks: list,
+                   executor: ThreadPoolExecutor, progress: Optional[Callable[[int], None]]):
+        ahead.result()  # The ahead nodes' streams for this batch
+        self._run_nodes(ctxs, nodes, executor)
+
+        # Sinks run in parallel with each other; each sees its frames in order
+        def drain(stream_sink):
+            stream, sink = stream_sink
+            for ctx in ctxs:
+                image = ctx.get(stream)
+                if image is not None:
+                    sink.write(ctx["index"], image)
+
+        list(executor.map(drain, sinks))
+        if progress:
+            progress(len(ctxs))
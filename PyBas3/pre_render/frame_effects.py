@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Per-frame 2D effects of depth_blend_video (dithering, pixelation, overlays, trails).
+
+Each effect takes in-memory frames and returns the output image, so the same
+code serves the streaming effect graph and the PNG-folder workers.
+"""
+
+from collections import deque
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from dithering import ERROR_DIFFUSION_KERNELS, error_diffuse
+
+BAYER_MATRIX = np.array([
+    [0, 8, 2, 10], [12, 4, 14, 6],
+    [3, 11, 1, 9], [15, 7, 13, 5]
+], dtype=np.float32) / 16.0 * 255.0
+
+# Pixelation block size per effect
+PIXEL_SCALES = {"extract": 8, "lowres": 16, "microres": 24}
+
+# Frames blended into a rainbow trail (current frame included)
+RAINBOW_TRAIL_LENGTH = 9
+
+
+def dither_frame(gray: np.ndarray, dither_type: str) -> np.ndarray:
+    """Dither a grayscale frame: "floyd" (PIL), an ERROR_DIFFUSION_KERNELS name, or "bayer"."""
+    h, w = gray.shape
+    if dither_type == "floyd":
+        pil_gray = Image.fromarray(gray, mode='L')
+        dithered = pil_gray.convert('1', dither=Image.Dither.FLOYDSTEINBERG)
+        return np.array(dithered.convert('L'))
+    if dither_type in ERROR_DIFFUSION_KERNELS:
+        return error_diffuse(gray, dither_type)
+    if dither_type == "bayer":
+        threshold = np.tile(BAYER_MATRIX, (h // 4 + 1, w // 4 + 1))[:h, :w]
+        return (gray.astype(np.float32) > threshold).astype(np.uint8) * 255
+    return gray
+
+
+def pixelate_frame(gray: np.ndarray, scale: int) -> np.ndarray:
+    """Downscale by `scale`, Otsu-threshold and upscale back with hard pixel edges."""
+    h, w = gray.shape
+    small = cv2.resize(gray, (max(1, w // scale), max(1, h // scale)), interpolation=cv2.INTER_AREA)
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return cv2.resize(binary, (w, h), interpolation=cv2.INTER_NEAREST)
+
+
+def red_overlay_frame(gray: np.ndarray, dithered: np.ndarray) -> np.ndarray:
+    """Dark tinted base with the dithered frame's white pixels in red (BGR)."""
+    h, w = gray.shape
+    if dithered.shape != (h, w):
+        dithered = cv2.resize(dithered, (w, h))
+    dark_base = np.clip(gray.astype(np.float32) * 0.3, 0, 255).astype(np.uint8)
+
+    result = np.zeros((h, w, 3), dtype=np.uint8)
+    result[:, :, 0] = np.clip(dark_base * 0.4, 0, 60).astype(np.uint8)
+    result[:, :, 1] = np.clip(dark_base * 0.2, 0, 40).astype(np.uint8)
+    result[:, :, 2] = np.clip(dark_base * 0.3, 0, 50).astype(np.uint8)
+
+    dith_mask = dithered > 127
+    result[:, :, 2] = np.where(dith_mask, 255, result[:, :, 2])
+    result[:, :, 1] = np.where(dith_mask, 80, result[:, :, 1])
+    result[:, :, 0] = np.where(dith_mask, 20, result[:, :, 0])
+    return result
+
+
+def _rainbow_color(hue: float) -> tuple:
+    """Hue in [0, 1) -> (r, g, b) on the saturated color wheel."""
+    if hue < 1/6:
+        return 1.0, hue * 6, 0
+    elif hue < 2/6:
+        return 1 - (hue - 1/6) * 6, 1.0, 0
+    elif hue < 3/6:
+        return 0, 1.0, (hue - 2/6) * 6
+    elif hue < 4/6:
+        return 0, 1 - (hue - 3/6) * 6, 1.0
+    elif hue < 5/6:
+        return (hue - 4/6) * 6, 0, 1.0
+    else:
+        return 1.0, 0, 1 - (hue - 5/6) * 6
+
+
+def rainbow_trail_frame(trail: list[np.ndarray]) -> np.ndarray:
+    """
+    Rainbow motion trail (BGR).
+
+    Args:
+        trail: Grayscale frames oldest first, ending with the current frame
+               (up to RAINBOW_TRAIL_LENGTH)
+    """
+    gray = trail[-1]
+    h, w = gray.shape
+    result = np.zeros((h, w, 3), dtype=np.float32)
+
+    for age, t_gray in zip(range(len(trail) - 1, -1, -1), trail):
+        t_gray = t_gray.astype(np.float32)
+        if t_gray.shape != (h, w):
+            t_gray = cv2.resize(t_gray, (w, h))
+        time_offset = age / 8.0
+        r, g, b = _rainbow_color((time_offset * 0.7) % 1.0)
+        fade = 1.0 - (time_offset * 0.7)
+        blurred = cv2.GaussianBlur(t_gray / 255.0 * fade, (15, 15), 0)
+        result[:, :, 2] += blurred * r * 180
+        result[:, :, 1] += blurred * g * 180
+        result[:, :, 0] += blurred * b * 180
+
+    current_bright = gray.astype(np.float32) / 255.0
+    bright_mask = current_bright > 0.6
+    for c in range(3):
+        result[:, :, c] = np.where(bright_mask, np.clip(result[:, :, c] + current_bright * 200, 0, 255), result[:, :, c])
+
+    noise = np.random.normal(0, 8, (h, w, 3))
+    return np.clip(result + noise, 0, 255).astype(np.uint8)
+
+
+class RainbowTrail:
+    """Streaming rainbow trail: feed frames in order, get each frame's trail."""
+
+    def __init__(self, length: int = RAINBOW_TRAIL_LENGTH):
+        self._frames = deque(maxlen=length)
+
+    def __call__(self, gray: np.ndarray) -> np.ndarray:
+        self._frames.append(gray)
+        return rainbow_trail_frame(list(self._frames))
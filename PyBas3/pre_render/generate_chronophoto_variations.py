@@ -5,6 +5,7 @@ Composites onto raw frames (B&W, no chroma key) and includes hero+ghost mode.
 """
 
 import os
+import sys
 import cv2
 import numpy as np
 from PIL import Image
@@ -12,6 +13,9 @@ from pathlib import Path
 import argparse
 from tqdm import tqdm
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common.frame_source import FrameSource
+
 
 def create_chronophotography(depth_images: list[np.ndarray], mode: str = "lighten_add") -> np.ndarray:
     """Create Marey-style chronophotography from multiple depth maps."""
@@ -117,6 +121,19 @@ def load_raw_frames(frames_dir: str) -> list[np.ndarray]:
     return frames
 
 
+def decode_raw_frames(video_path: str, num_frames: int, target_fps: float = None) -> list[np.ndarray]:
+    """Decode the frames depth_blend_video sampled straight from the source video, as B&W."""
+    source = FrameSource(video_path, num_frames=num_frames, target_fps=target_fps)
+    frames = []
+    
+    print(f"Decoding {len(source)} frames from {video_path}...")
+    for img in tqdm(source.frames(), total=len(source), desc="Decoding frames"):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        frames.append(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+    
+    return frames
+
+
 def select_frames_sequential(total_frames: int, num_frames: int) -> list[int]:
     """Select frames evenly spaced across the sequence."""
     if num_frames >= total_frames:
@@ -223,6 +240,18 @@ def main():
         default="outputs/runside-megaslow_blend_output/frames",
         help="Directory containing raw frame images"
     )
+    parser.add_argument(
+        "--video",
+        type=str,
+        default=None,
+        help="Source video to decode raw frames from (instead of --frames_dir)"
+    )
+    parser.add_argument(
+        "--target_fps",
+        type=float,
+        default=None,
+        help="Sampling rate depth_blend_video used (with --video; default: one frame per depth map)"
+    )
     parser.add_argument(
         "--frame_counts",
         type=int,
@@ -248,7 +277,10 @@ def main():
     
     # Load all depth images and raw frames
     depth_images = load_depth_images(str(depth_maps_dir))
-    raw_frames = load_raw_frames(str(frames_dir))
+    if args.video:
+        raw_frames = decode_raw_frames(args.video, len(depth_images), args.target_fps)
+    else:
+        raw_frames = load_raw_frames(str(frames_dir))
     total_frames = len(depth_images)
     
     print(f"\nLoaded {total_frames} depth images and {len(raw_frames)} raw frames")
@@ -20,6 +20,9 @@ from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 from download_model import download_model
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common.frame_source import FrameSource
+
 
 # Pose connections (33 landmarks)
 POSE_CONNECTIONS = [
@@ -70,7 +73,10 @@ def main():
                         help="Skeleton color")
     parser.add_argument("--thickness", type=int, default=2, help="Line thickness")
     parser.add_argument("--num-poses", type=int, default=3, help="Max poses to detect")
-    parser.add_argument("--fps", type=float, default=None, help="Output fps (default: match source)")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="Sample source frames at this fps (default: every frame)")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="Output fps (default: --target-fps, else match source)")
     args = parser.parse_args()
     
     # Colors
@@ -86,19 +92,19 @@ def main():
     frames_dir = Path(args.output_dir) / "frames"
     frames_dir.mkdir(parents=True, exist_ok=True)
     
-    # Open video
-    cap = cv2.VideoCapture(args.video_path)
-    if not cap.isOpened():
-        print(f"Cannot open video: {args.video_path}")
+    # Open video (decoded sequentially on a prefetch thread)
+    try:
+        source = FrameSource(args.video_path, target_fps=args.target_fps)
+    except ValueError as e:
+        print(e)
         sys.exit(1)
     
-    video_fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    video_fps = source.fps
+    total_frames = len(source)
+    width, height = source.width, source.height
     
-    output_fps = args.fps if args.fps else video_fps
-    print(f"Video: {width}x{height} @ {video_fps}fps, {total_frames} frames")
+    output_fps = args.fps or args.target_fps or video_fps
+    print(f"Video: {width}x{height} @ {video_fps}fps, {source.frame_count} frames ({total_frames} sampled)")
     print(f"Output: {args.output_dir}")
     
     # Init MediaPipe
@@ -117,19 +123,18 @@ def main():
     
     # Process frames
     frame_idx = 0
+    last_timestamp_ms = -1
+    result = None
     pbar = tqdm(total=total_frames, desc="Processing", unit="frame")
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Detect pose
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
-        timestamp_ms = int(frame_idx * 1000 / video_fps)
-        
-        result = landmarker.detect_for_video(mp_image, timestamp_ms)
+    for source_idx, frame in source:
+        # Detect pose (a repeated source frame reuses its result: VIDEO mode needs increasing timestamps)
+        timestamp_ms = source.timestamp_ms(source_idx)
+        if timestamp_ms > last_timestamp_ms:
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+            result = landmarker.detect_for_video(mp_image, timestamp_ms)
+            last_timestamp_ms = timestamp_ms
         
         # Draw all detected skeletons
         canvas = np.zeros((height, width, 3), dtype=np.uint8)
@@ -146,7 +151,6 @@ def main():
         pbar.update(1)
     
     pbar.close()
-    cap.release()
     landmarker.close()
     
     print(f"Saved {frame_idx} frames to {frames_dir}")
@@ -16,6 +16,8 @@ from depth_blend_video import (
     chroma_key_green, extract_subject_mask,
     blend_lighten, blend_add, blend_screen
 )
+from depth_effects import depth_banding
+from dithering import error_diffuse
 
 def apply_all_effects(raw_frame, chroma_frame, depth_map, frame_stats):
     """Apply all effects to both frames and return results."""
@@ -37,21 +39,7 @@ def apply_all_effects(raw_frame, chroma_frame, depth_map, frame_stats):
         results[f"{frame_type}_dithered"] = np.array(dithered.convert('L'))
         
         # Atkinson
-        gray_f = gray.astype(np.float32)
-        for y in range(h):
-            for x in range(w):
-                old_pixel = gray_f[y, x]
-                new_pixel = 255.0 if old_pixel > 127 else 0.0
-                gray_f[y, x] = new_pixel
-                error = (old_pixel - new_pixel) / 8.0
-                if x + 1 < w: gray_f[y, x + 1] += error
-                if x + 2 < w: gray_f[y, x + 2] += error
-                if y + 1 < h:
-                    if x > 0: gray_f[y + 1, x - 1] += error
-                    gray_f[y + 1, x] += error
-                    if x + 1 < w: gray_f[y + 1, x + 1] += error
-                if y + 2 < h: gray_f[y + 2, x] += error
-        results[f"{frame_type}_atkinson"] = np.clip(gray_f, 0, 255).astype(np.uint8)
+        results[f"{frame_type}_atkinson"] = error_diffuse(gray, "atkinson")
         
         # Bayer
         bayer_matrix = np.array([
@@ -101,20 +89,8 @@ def apply_all_effects(raw_frame, chroma_frame, depth_map, frame_stats):
     
     # Depth banding (only on chroma since depth is from raw)
     print("  Applying depth banding...")
-    for frame_type, frame in [("raw", raw_frame), ("chroma", chroma_frame)]:
-        result = np.zeros((h, w), dtype=np.uint8)
-        for y in range(h):
-            for x in range(w):
-                d = depth_map[y, x]
-                if d < 10:
-                    continue
-                line_spacing = max(2, int(20 - d / 15))
-                wave = int(np.sin(y * 0.1 + d * 0.05) * 3)
-                if (y + wave) % line_spacing < 2:
-                    result[y, x] = 255
-        noise_mask = np.random.random((h, w)) < (depth_map.astype(np.float32) / 255.0 * 0.1)
-        result = np.where(noise_mask, 255, result).astype(np.uint8)
-        results[f"{frame_type}_depth_banding"] = result
+    banding = depth_banding(np.stack([depth_map, depth_map]))
+    results["raw_depth_banding"], results["chroma_depth_banding"] = banding
     
     return results
 
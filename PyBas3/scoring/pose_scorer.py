@@ -3,22 +3,151 @@
 Pose Scorer - Process 2
 
 Reads poses from shared memory, compares to reference video,
-writes per-participant score JSON files.
+publishes per-participant scores to the shared memory score table
+(and, rate-limited, to per-participant score JSON files).
+
+ScoringStage is the per-frame scoring step; the vision process can also
+host it directly (multi_person_detector.py --in-process-scoring).
 
 Usage:
-    python pose_scorer.py [--reference reference_poses.json]
+    python pose_scorer.py [--reference reference_poses.json|reference_poses.npy]
 """
 
 import argparse
 import json
 import math
 import os
+import sys
 import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
+# Add parent directory to path for common module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from common.protocols import MAX_PARTICIPANTS, MEDIAPIPE_LANDMARKS
+from common.lifecycle import GONE, ParticipantLifecycle
+from common.score_table import ScoreTableWriter
+from reference_format import load_reference
 from shared_memory_reader import SharedMemoryPoseReader
 
+SCORING_DIR = Path(__file__).parent
+
+
+class ReferenceIndex:
+    """
+    Reference feature matrix for nearest-pose lookup.
+    
+    Wraps (frames, 33, 4) reference keypoints (typically a memory-mapped
+    reference file) plus a per-frame validity mask, and scores a live pose
+    against every frame (or a window of frames) with one vectorized
+    distance pass over the x/y coordinates of the matching landmarks.
+    Scores use the same formula as PoseScorer.compute_similarity.
+    """
+    
+    def __init__(
+        self,
+        keypoints: np.ndarray,
+        valid: np.ndarray,
+        landmarks: List[int],
+        min_visibility: float
+    ):
+        """
+        Args:
+            keypoints: (frames, 33, 4) reference keypoints (not copied)
+            valid: (frames,) False for frames without a detected pose
+            landmarks: Landmark indices used for matching
+            min_visibility: Landmarks below this visibility are ignored
+        """
+        self.keypoints = keypoints
+        self.valid = valid
+        self.landmarks = np.array(landmarks)
+        self.min_visibility = min_visibility
+        self._features: Optional[np.ndarray] = None  # Built on first full search
+        self._valid: Optional[np.ndarray] = None
+    
+    @classmethod
+    def from_keypoint_lists(
+        cls,
+        frames: List[Optional[List[Tuple]]],
+        landmarks: List[int],
+        min_visibility: float
+    ) -> "ReferenceIndex":
+        """Build from per-frame keypoint lists (None = no pose)."""
+        keypoints = np.zeros((len(frames), MEDIAPIPE_LANDMARKS, 4), dtype=np.float64)
+        valid = np.zeros(len(frames), dtype=bool)
+        for i, kps in enumerate(frames):
+            if kps:
+                keypoints[i, :len(kps)] = kps[:MEDIAPIPE_LANDMARKS]
+                valid[i] = True
+        return cls(keypoints, valid, landmarks, min_visibility)
+    
+    @classmethod
+    def from_reference_array(
+        cls,
+        data: np.ndarray,
+        landmarks: List[int],
+        min_visibility: float
+    ) -> "ReferenceIndex":
+        """Build from a REFERENCE_DTYPE array (see reference_format.py)."""
+        return cls(data['keypoints'], data['valid'], landmarks, min_visibility)
+    
+    def __len__(self) -> int:
+        return len(self.keypoints)
+    
+    def match(self, live: np.ndarray, start: int = 0, stop: Optional[int] = None) -> Tuple[int, float]:
+        """
+        Best matching frame for a (33, 4) live pose within [start, stop).
+        
+        Returns (frame_index, score); (-1, 0.0) if nothing scores above 0.
+        """
+        if self._features is None and start == 0 and stop is None:
+            # First full search: cache the matching landmarks contiguously
+            # (a small fraction of the file; windowed searches never need it)
+            self._features = np.asarray(self.keypoints[:, self.landmarks], dtype=np.float64)
+            self._valid = np.asarray(self.valid, dtype=bool)
+        
+        if self._features is not None:
+            selected = self._features[start:stop]
+            valid = self._valid[start:stop]
+        else:
+            # Only the requested frames are paged in from the reference file
+            selected = np.asarray(self.keypoints[start:stop][:, self.landmarks], dtype=np.float64)
+            valid = np.asarray(self.valid[start:stop], dtype=bool)
+        if len(selected) == 0:
+            return -1, 0.0
+        xy = selected[:, :, :2]
+        
+        live_sel = live[self.landmarks]
+        usable = (
+            ~(selected[:, :, 3] < self.min_visibility)
+            & valid[:, None]
+            & ~(live_sel[:, 3] < self.min_visibility)
+        )
+        
+        dx = xy[:, :, 0] - live_sel[:, 0]
+        dy = xy[:, :, 1] - live_sel[:, 1]
+        dist = np.sqrt(dx * dx + dy * dy)
+        
+        # Accumulate landmark by landmark (same order as compute_similarity)
+        total = np.zeros(len(xy), dtype=np.float64)
+        for j in range(len(self.landmarks)):
+            total += np.where(usable[:, j], dist[:, j], 0.0)
+        count = usable.sum(axis=1)
+        
+        scores = np.zeros(len(xy), dtype=np.float64)
+        has_count = count > 0
+        scores[has_count] = np.clip((1.0 - total[has_count] / count[has_count] * 2) * 100, 0.0, 100.0)
+        
+        # Compare on rounded scores so ties resolve to the earliest frame
+        best = int(np.argmax(np.round(scores, 1)))
+        best_score = round(float(scores[best]), 1)
+        if best_score <= 0.0:
+            return -1, 0.0
+        return start + best, best_score
+
 
 class PoseScorer:
     """Score poses based on movement with smoothing."""
@@ -41,19 +170,216 @@ class PoseScorer:
     # MediaPipe has ~1-3% jitter on stationary poses even with smoothing
     MOVEMENT_NOISE_FLOOR = 0.02  # ~2% of frame = noise
     
-    def __init__(self, reference_path: str = None):
-        self.reference = self._load_reference(reference_path) if reference_path else []
+    # Visibility below this excludes a landmark from movement/similarity
+    MIN_VISIBILITY = 0.3
+    
+    # Scale movement to 0-100: 0.015 movement per frame = 100 score
+    MOVEMENT_SCALE = 6666
+    
+    # Upper-body landmarks used for reference matching
+    SIMILARITY_LANDMARKS = MOVEMENT_LANDMARKS[:9]
+    
+    def __init__(self, reference_path: str = None, search_window: Optional[int] = None):
+        """
+        Args:
+            reference_path: Reference poses JSON (optional)
+            search_window: If set, match each UUID only within +/- this many
+                frames of its last matched reference frame (full search on
+                first sight or when nothing in the window matches)
+        """
+        self.reference = self._load_reference(reference_path) if reference_path else None
+        self.reference_index = ReferenceIndex.from_reference_array(
+            self.reference, self.SIMILARITY_LANDMARKS, self.MIN_VISIBILITY
+        ) if self.reference is not None and len(self.reference) else None
+        self.search_window = search_window
         self.current_frame_per_uuid: Dict[str, int] = {}
-        self.previous_poses: Dict[str, List[Tuple]] = {}  # Track previous pose per UUID
-        self.smoothed_scores: Dict[str, float] = {}  # Smoothed score per UUID
+        
+        # Per-UUID state lives in arrays indexed by state slot
+        self._slots: Dict[str, int] = {}  # uuid -> state slot
+        self._free_slots: List[int] = []
+        self._movement_idx = np.array(self.MOVEMENT_LANDMARKS)
+        self._allocate_state(MAX_PARTICIPANTS)
     
-    def _load_reference(self, path: str) -> List[Optional[List[Tuple]]]:
-        """Load reference poses from JSON."""
-        with open(path, 'r') as f:
-            data = json.load(f)
+    def _allocate_state(self, capacity: int):
+        """Create (or grow) the per-slot state arrays."""
+        prev = np.zeros((capacity, MEDIAPIPE_LANDMARKS, 4), dtype=np.float64)
+        has_prev = np.zeros(capacity, dtype=bool)
+        smoothed = np.zeros(capacity, dtype=np.float64)
+        has_smoothed = np.zeros(capacity, dtype=bool)
         
-        # Extract just keypoints list (or None if missing)
-        return [p['keypoints'] for p in data['poses']]
+        old = getattr(self, '_prev_keypoints', None)
+        if old is not None:
+            n = len(old)
+            prev[:n] = old
+            has_prev[:n] = self._has_prev
+            smoothed[:n] = self._smoothed
+            has_smoothed[:n] = self._has_smoothed
+            self._free_slots.extend(range(n, capacity))
+        else:
+            self._free_slots = list(range(capacity))
+        
+        self._prev_keypoints = prev  # Previous pose per slot
+        self._has_prev = has_prev
+        self._smoothed = smoothed  # Smoothed score per slot
+        self._has_smoothed = has_smoothed
+    
+    def _slot_for(self, uuid: str) -> int:
+        """State slot for uuid, assigning a fresh one on first sight."""
+        slot = self._slots.get(uuid)
+        if slot is None:
+            if not self._free_slots:
+                self._allocate_state(len(self._prev_keypoints) * 2)
+            slot = self._free_slots.pop(0)
+            self._has_prev[slot] = False
+            self._has_smoothed[slot] = False
+            self._slots[uuid] = slot
+        return slot
+    
+    def forget(self, uuid: str):
+        """Release all per-UUID state (its slot is reused by the next new UUID)."""
+        slot = self._slots.pop(uuid, None)
+        if slot is not None:
+            self._has_prev[slot] = False
+            self._has_smoothed[slot] = False
+            self._free_slots.append(slot)
+        self.current_frame_per_uuid.pop(uuid, None)
+    
+    @property
+    def smoothed_scores(self) -> Dict[str, float]:
+        """Smoothed score per UUID (read-only snapshot)."""
+        return {
+            uuid: float(self._smoothed[slot])
+            for uuid, slot in self._slots.items()
+            if self._has_smoothed[slot]
+        }
+    
+    def _load_reference(self, path: str) -> np.ndarray:
+        """Memory-map reference poses (.npy, or .json converted on first use)."""
+        return load_reference(Path(path))
+    
+    @staticmethod
+    def _as_keypoint_array(keypoints) -> Optional[np.ndarray]:
+        """(33, 4) float64 array from keypoint tuples, or None if empty."""
+        if keypoints is None or len(keypoints) == 0:
+            return None
+        rows = np.zeros((MEDIAPIPE_LANDMARKS, 4), dtype=np.float64)
+        arr = np.asarray(keypoints, dtype=np.float64)[:MEDIAPIPE_LANDMARKS]
+        rows[:len(arr), :arr.shape[1]] = arr[:, :4]
+        if arr.shape[1] < 4:
+            rows[:len(arr), 3] = 1.0  # No visibility = always counted
+        return rows
+    
+    def _movement_batch(
+        self,
+        slots: np.ndarray,
+        current: np.ndarray,
+        valid: np.ndarray
+    ) -> np.ndarray:
+        """
+        Raw movement score 0-100 for every participant in one pass.
+        
+        Args:
+            slots: (N,) state slots
+            current: (N, 33, 4) float64 keypoints
+            valid: (N,) False where the current pose is missing
+        
+        Returns (N,) float64 raw scores (higher = more movement).
+        """
+        idx = self._movement_idx
+        curr = current[:, idx, :]
+        prev = self._prev_keypoints[slots][:, idx, :]
+        
+        # Skip landmarks whose visibility is too low in either frame
+        usable = (
+            ~(curr[:, :, 3] < self.MIN_VISIBILITY)
+            & ~(prev[:, :, 3] < self.MIN_VISIBILITY)
+            & (valid & self._has_prev[slots])[:, None]
+        )
+        
+        # 2D distance (x, y normalized 0-1), with noise floor
+        dx = curr[:, :, 0] - prev[:, :, 0]
+        dy = curr[:, :, 1] - prev[:, :, 1]
+        movement = np.sqrt(dx * dx + dy * dy)
+        movement[movement < self.MOVEMENT_NOISE_FLOOR] = 0.0
+        movement[~usable] = 0.0
+        
+        # Accumulate landmark by landmark so sums match the scalar path exactly
+        total = np.zeros(len(slots), dtype=np.float64)
+        for j in range(len(idx)):
+            total += movement[:, j]
+        valid_count = usable.sum(axis=1)
+        
+        raw = np.zeros(len(slots), dtype=np.float64)
+        has_count = valid_count > 0
+        raw[has_count] = np.minimum(
+            100.0,
+            total[has_count] / valid_count[has_count] * self.MOVEMENT_SCALE
+        )
+        return raw
+    
+    def _smooth_batch(self, slots: np.ndarray, raw: np.ndarray) -> np.ndarray:
+        """Apply exponential moving average smoothing for every participant."""
+        prev_smooth = np.where(self._has_smoothed[slots], self._smoothed[slots], raw)
+        smoothed = prev_smooth + self.SMOOTHING_ALPHA * (raw - prev_smooth)
+        self._smoothed[slots] = smoothed
+        self._has_smoothed[slots] = True
+        return smoothed
+    
+    def score_batch(self, uuids: List[str], keypoints: np.ndarray) -> List[Dict]:
+        """
+        Score every participant of a frame in one vectorized pass.
+        
+        Args:
+            uuids: Participant UUIDs (one per row)
+            keypoints: (N, 33, 4) array from shared memory
+        
+        Returns list of dicts ready to write as JSON (same as score_pose).
+        """
+        if not uuids:
+            return []
+        
+        slots = np.array([self._slot_for(uuid) for uuid in uuids])
+        current = np.asarray(keypoints, dtype=np.float64)
+        valid = np.ones(len(uuids), dtype=bool)
+        return self._score_slots(uuids, slots, current, valid)
+    
+    def _score_slots(
+        self,
+        uuids: List[str],
+        slots: np.ndarray,
+        current: np.ndarray,
+        valid: np.ndarray
+    ) -> List[Dict]:
+        """Shared scoring step for score_batch and score_pose."""
+        raw = self._movement_batch(slots, current, valid)
+        smoothed = self._smooth_batch(slots, raw)
+        
+        # Store current pose for next frame comparison
+        self._prev_keypoints[slots] = current
+        self._has_prev[slots] = valid
+        
+        now = time.time()
+        results = []
+        for i, uuid in enumerate(uuids):
+            # Optional: also find reference frame for additional data
+            ref_frame = 0
+            if self.reference_index is not None:
+                if valid[i]:
+                    ref_frame, _ = self.find_best_reference_frame(
+                        current[i],
+                        self.search_window,
+                        self.current_frame_per_uuid.get(uuid)
+                    )
+                self.current_frame_per_uuid[uuid] = ref_frame
+            
+            results.append({
+                'uuid': uuid,
+                'timestamp': now,
+                'reference_frame': ref_frame,
+                'score_0_to_100': round(float(smoothed[i]), 1),
+                'raw_movement': round(float(raw[i]), 1)
+            })
+        return results
     
     def compute_movement(
         self,
@@ -65,53 +391,17 @@ class PoseScorer:
         
         Returns raw movement score 0-100 (higher = more movement).
         """
-        prev_keypoints = self.previous_poses.get(uuid)
-        
-        if not prev_keypoints or not current_keypoints:
-            return 0.0
-        
-        total_movement = 0.0
-        valid_count = 0
-        
-        for idx in self.MOVEMENT_LANDMARKS:
-            if idx >= len(current_keypoints) or idx >= len(prev_keypoints):
-                continue
-            
-            curr = current_keypoints[idx]
-            prev = prev_keypoints[idx]
-            
-            # Skip if visibility too low
-            if len(curr) >= 4 and curr[3] < 0.3:
-                continue
-            if len(prev) >= 4 and prev[3] < 0.3:
-                continue
-            
-            # 2D distance (x, y normalized 0-1)
-            dx = curr[0] - prev[0]
-            dy = curr[1] - prev[1]
-            movement = math.sqrt(dx * dx + dy * dy)
-            
-            # Apply noise floor - ignore tiny jitter
-            if movement < self.MOVEMENT_NOISE_FLOOR:
-                movement = 0.0
-            
-            total_movement += movement
-            valid_count += 1
-        
-        if valid_count == 0:
+        current = self._as_keypoint_array(current_keypoints)
+        if current is None or uuid not in self._slots:
             return 0.0
-        
-        avg_movement = total_movement / valid_count
-        # Scale movement to 0-100: 0.015 movement per frame = 100 score
-        raw_score = min(100.0, avg_movement * 6666)
-        return raw_score
+        slots = np.array([self._slots[uuid]])
+        return float(self._movement_batch(slots, current[None], np.ones(1, dtype=bool))[0])
     
     def get_smoothed_score(self, uuid: str, raw_score: float) -> float:
         """Apply exponential moving average smoothing to score."""
-        prev_smooth = self.smoothed_scores.get(uuid, raw_score)
-        smoothed = prev_smooth + self.SMOOTHING_ALPHA * (raw_score - prev_smooth)
-        self.smoothed_scores[uuid] = smoothed
-        return round(smoothed, 1)
+        slots = np.array([self._slot_for(uuid)])
+        smoothed = self._smooth_batch(slots, np.array([raw_score], dtype=np.float64))
+        return round(float(smoothed[0]), 1)
     
     def compute_similarity(
         self,
@@ -157,54 +447,46 @@ class PoseScorer:
     def find_best_reference_frame(
         self,
         live_keypoints: List[Tuple],
-        search_window: int = 30
+        search_window: Optional[int] = None,
+        last_frame: Optional[int] = None
     ) -> Tuple[int, float]:
         """
         Find the reference frame that best matches the live pose.
         
+        Args:
+            live_keypoints: Live pose (keypoint tuples or (33, 4) array)
+            search_window: If set with last_frame, only search
+                [last_frame - window, last_frame + window]
+            last_frame: Previously matched frame for this participant
+        
         Returns (frame_index, score).
         """
-        best_frame = 0
-        best_score = 0.0
+        live = self._as_keypoint_array(live_keypoints)
+        if self.reference_index is None or live is None:
+            return 0, 0.0
         
-        for i, ref_kp in enumerate(self.reference):
-            if ref_kp is None:
-                continue
-            score = self.compute_similarity(live_keypoints, ref_kp)
-            if score > best_score:
-                best_score = score
-                best_frame = i
+        if search_window is not None and last_frame is not None:
+            start = max(0, last_frame - search_window)
+            frame, score = self.reference_index.match(live, start, last_frame + search_window + 1)
+            if frame >= 0:
+                return frame, score
         
-        return best_frame, best_score
+        frame, score = self.reference_index.match(live)
+        return max(frame, 0), score
     
     def score_pose(self, uuid: str, keypoints: List[Tuple]) -> Dict:
         """
         Score a participant based on movement (smoothed).
         
+        Single-participant wrapper around the batch path.
         Returns dict ready to write as JSON.
         """
-        # Compute raw movement score
-        raw_movement = self.compute_movement(uuid, keypoints)
-        
-        # Apply smoothing
-        smoothed_score = self.get_smoothed_score(uuid, raw_movement)
-        
-        # Store current pose for next frame comparison
-        self.previous_poses[uuid] = keypoints.copy() if keypoints else None
-        
-        # Optional: also find reference frame for additional data
-        ref_frame = 0
-        if self.reference:
-            ref_frame, _ = self.find_best_reference_frame(keypoints)
-            self.current_frame_per_uuid[uuid] = ref_frame
-        
-        return {
-            'uuid': uuid,
-            'timestamp': time.time(),
-            'reference_frame': ref_frame,
-            'score_0_to_100': smoothed_score,
-            'raw_movement': round(raw_movement, 1)
-        }
+        current = self._as_keypoint_array(keypoints)
+        valid = np.array([current is not None])
+        if current is None:
+            current = np.zeros((MEDIAPIPE_LANDMARKS, 4), dtype=np.float64)
+        slots = np.array([self._slot_for(uuid)])
+        return self._score_slots([uuid], slots, current[None], valid)[0]
 
 
 def write_score_json(output_dir: Path, uuid: str, score_data: Dict, in_zone: bool):
@@ -221,12 +503,113 @@ def write_score_json(output_dir: Path, uuid: str, score_data: Dict, in_zone: boo
     os.replace(temp_path, final_path)
 
 
+def create_scorer(reference_path: Path, search_window: Optional[int] = None) -> PoseScorer:
+    """PoseScorer with the reference if one exists (.json or .npy), else movement-only."""
+    if reference_path.exists() or reference_path.with_suffix('.npy').exists():
+        print(f"Loaded reference: {reference_path}")
+        return PoseScorer(str(reference_path), search_window=search_window)
+    print("No reference loaded - using movement-based scoring only")
+    return PoseScorer(None)
+
+
+class ScoringStage:
+    """
+    Scores frames of pose arrays and publishes the results.
+    
+    Used by the scorer process (fed from shared memory) and in-process by
+    MultiPersonDetector (fed the filtered landmarks right after tracking).
+    Scores go to the score table, then, rate-limited, to JSON files.
+    Participants unseen for participant_ttl seconds are released. Call
+    from a single thread.
+    """
+    
+    def __init__(
+        self,
+        scorer: PoseScorer,
+        output_dir: Optional[Path] = None,
+        file_rate: float = 5.0,
+        participant_ttl: float = 30.0,
+        score_table: Optional[ScoreTableWriter] = None
+    ):
+        """
+        Args:
+            scorer: Pose scorer (holds per-participant scoring state)
+            output_dir: Directory for score JSON files (None = no files)
+            file_rate: Max score JSON writes per second per participant (0 = no files)
+            participant_ttl: Seconds unseen before a participant's scoring state is released
+            score_table: Score table to publish to (default: the standard one)
+        """
+        self.scorer = scorer
+        self.output_dir = output_dir
+        if output_dir is not None:
+            output_dir.mkdir(exist_ok=True)
+        self.file_interval = 1.0 / file_rate if file_rate > 0 and output_dir is not None else None
+        self.score_table = score_table if score_table is not None else ScoreTableWriter()
+        self._last_file_write: Dict[str, float] = {}
+        
+        self.lifecycle = ParticipantLifecycle(
+            stale_after=min(2.0, participant_ttl),
+            gone_after=participant_ttl
+        )
+        self.lifecycle.on(GONE, self._release_participant)
+        # Entries adopted from a previous scorer run age out unless their participant shows up again
+        self.lifecycle.seen(self.score_table.adopted)
+    
+    def _release_participant(self, uuid: str):
+        """Lifecycle GONE callback: free scoring state, score table slot and score file."""
+        self.scorer.forget(uuid)
+        self.score_table.retire(uuid)
+        self._last_file_write.pop(uuid, None)
+        if self.output_dir is not None:
+            (self.output_dir / f"participant_{uuid}_score.json").unlink(missing_ok=True)
+    
+    def process(self, uuids: List[str], keypoints: np.ndarray, in_zone) -> List[Dict]:
+        """
+        Score one frame and publish it.
+        
+        Args:
+            uuids: Participant UUIDs (one per row)
+            keypoints: (N, 33, 4) keypoints
+            in_zone: Per-participant zone flags
+        
+        Returns:
+            Score dicts (as published)
+        """
+        now = time.time()
+        self.lifecycle.seen(uuids)
+        scores = self.scorer.score_batch(uuids, keypoints)
+        for score_data, zone in zip(scores, in_zone):
+            score_data['in_zone'] = bool(zone)
+            self.score_table.publish(score_data)
+        self.score_table.notify()
+        
+        # JSON files are a rate-limited fallback sink
+        if self.file_interval:
+            for score_data in scores:
+                uuid = score_data['uuid']
+                if now - self._last_file_write.get(uuid, 0.0) >= self.file_interval:
+                    write_score_json(self.output_dir, uuid, score_data, score_data['in_zone'])
+                    self._last_file_write[uuid] = now
+        return scores
+    
+    def update(self):
+        """Release participants not seen for participant_ttl seconds."""
+        if self.lifecycle.update():
+            self.score_table.notify()
+    
+    def close(self):
+        """Release all participants and close the score table."""
+        self.lifecycle.evict_all()
+        self.score_table.notify()
+        self.score_table.close()
+
+
 def main():
     parser = argparse.ArgumentParser(description='Pose Scorer')
     parser.add_argument(
         '--reference',
         default='reference_poses.json',
-        help='Path to reference poses JSON'
+        help='Path to reference poses (.npy, or .json converted to .npy on first use)'
     )
     parser.add_argument(
         '--output-dir',
@@ -236,50 +619,64 @@ def main():
     parser.add_argument(
         '--poll-rate',
         type=float,
+        default=2.0,
+        help='Wake-ups per second while no frames arrive (TTL checks); frames are scored as soon as Vision publishes them'
+    )
+    parser.add_argument(
+        '--search-window',
+        type=int,
+        default=None,
+        help='Match reference frames only within +/- N frames of the last match per participant'
+    )
+    parser.add_argument(
+        '--file-rate',
+        type=float,
+        default=5.0,
+        help='Max score JSON writes per second per participant (0 = no JSON files)'
+    )
+    parser.add_argument(
+        '--participant-ttl',
+        type=float,
         default=30.0,
-        help='Scoring updates per second'
+        help='Seconds a participant may be unseen before their scoring state, score slot and file are released'
     )
     args = parser.parse_args()
     
-    reference_path = Path(__file__).parent / args.reference
-    output_dir = Path(__file__).parent / args.output_dir
-    output_dir.mkdir(exist_ok=True)
-    
-    # Reference is now optional (movement-based scoring)
-    if reference_path.exists():
-        scorer = PoseScorer(str(reference_path))
-        print(f"Loaded reference: {reference_path}")
-    else:
-        scorer = PoseScorer(None)
-        print("No reference loaded - using movement-based scoring only")
+    scorer = create_scorer(SCORING_DIR / args.reference, args.search_window)
+    stage = ScoringStage(
+        scorer,
+        output_dir=SCORING_DIR / args.output_dir,
+        file_rate=args.file_rate,
+        participant_ttl=args.participant_ttl
+    )
     reader = SharedMemoryPoseReader()
     
     print("Waiting for shared memory buffer 'bas_pose_data'...")
     while not reader.connect():
         time.sleep(1.0)
     
-    print(f"Connected. Scoring at {args.poll_rate} Hz, output: {output_dir}")
-    poll_interval = 1.0 / args.poll_rate
+    print(f"Connected. Scoring each new frame -> score table '{stage.score_table.buffer_name}', files: {stage.output_dir}")
+    idle_timeout = 1.0 / args.poll_rate if args.poll_rate > 0 else 0.5
     
     try:
         while True:
-            start = time.time()
-            
-            poses = reader.read_poses()
+            # Sleep until Vision publishes a frame (or time out for TTL checks)
+            reader.wait_for_frame(idle_timeout)
             
-            for pose in poses:
-                score_data = scorer.score_pose(pose['uuid'], pose['keypoints'])
-                write_score_json(output_dir, pose['uuid'], score_data, pose['in_zone'])
+            # Only score frames Vision actually published since last wake-up
+            frames = reader.read_new_pose_arrays()
+            if frames:
+                arrays = frames[-1][1]
+                stage.process(arrays.uuids, arrays.keypoints, arrays.in_zone)
             
-            elapsed = time.time() - start
-            sleep_time = poll_interval - elapsed
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+            # Release participants not seen for --participant-ttl seconds
+            stage.update()
     
     except KeyboardInterrupt:
         print("\nStopping scorer")
     finally:
         reader.close()
+        stage.score_table.close()
 
 
 if __name__ == "__main__":
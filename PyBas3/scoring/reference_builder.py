@@ -3,30 +3,43 @@
 Build reference poses from a video file.
 
 Usage:
-    python reference_builder.py path/to/reference_video.mp4
+    python reference_builder.py path/to/reference_video.mp4 [--json] [--target-fps N]
     
-Creates reference_poses.json with normalized pose keypoints per frame.
+Creates reference_poses.npy (see reference_format.py) with normalized pose
+keypoints per frame. --json also writes the legacy reference_poses.json.
+--target-fps samples the video at N fps instead of using every frame.
 """
 
+import argparse
 import sys
 import json
+import os
 import cv2
 import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 # Add parent for model download
 sys.path.insert(0, str(Path(__file__).parent.parent / "mediapipe"))
 from download_model import download_model
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common.frame_source import FrameSource
 
-def extract_reference_poses(video_path: str) -> List[Dict]:
+from reference_format import build_reference_array, save_reference
+
+
+def extract_reference_poses(video_path: str, target_fps: Optional[float] = None) -> List[Dict]:
     """
     Extract pose keypoints from each frame of reference video.
     
-    Returns list of dicts with frame_index and keypoints.
+    Args:
+        video_path: Reference video
+        target_fps: Sample frames at this rate (None = every frame)
+    
+    Returns list of dicts with frame_index (source frame number) and keypoints.
     """
     model_path = download_model()
     base_options = python.BaseOptions(model_asset_path=model_path)
@@ -39,28 +52,26 @@ def extract_reference_poses(video_path: str) -> List[Dict]:
         min_tracking_confidence=0.5
     )
     
+    # Without sampling, decode to EOF: the container's frame count may be 0 or too low
+    source = FrameSource(video_path, target_fps=target_fps, to_eof=target_fps is None)
     landmarker = vision.PoseLandmarker.create_from_options(options)
-    cap = cv2.VideoCapture(video_path)
-    
-    if not cap.isOpened():
-        raise ValueError(f"Cannot open video: {video_path}")
     
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    print(f"Processing {total_frames} frames at {fps:.1f} FPS")
+    total_frames = len(source)
+    if source.to_eof:
+        print(f"Processing every frame (about {source.frame_count} reported) at {source.fps:.1f} FPS")
+    else:
+        print(f"Processing {total_frames} of {source.frame_count} frames at {source.fps:.1f} FPS")
     
     reference_poses = []
-    frame_idx = 0
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    for processed, (frame_idx, frame) in enumerate(source, start=1):
+        if reference_poses and reference_poses[-1]['frame_index'] == frame_idx:
+            continue  # target_fps above the source fps: VIDEO mode needs increasing timestamps
         
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
         
-        timestamp_ms = int(frame_idx * 1000 / fps)
+        timestamp_ms = source.timestamp_ms(frame_idx)
         result = landmarker.detect_for_video(mp_image, timestamp_ms)
         
         if result.pose_landmarks and len(result.pose_landmarks) > 0:
@@ -79,11 +90,9 @@ def extract_reference_poses(video_path: str) -> List[Dict]:
                 'keypoints': None
             })
         
-        frame_idx += 1
-        if frame_idx % 100 == 0:
-            print(f"  Processed {frame_idx}/{total_frames}")
+        if processed % 100 == 0:
+            print(f"  Processed {processed}/{total_frames or '?'}")
     
-    cap.release()
     landmarker.close()
     
     valid_count = sum(1 for p in reference_poses if p['keypoints'])
@@ -93,23 +102,40 @@ def extract_reference_poses(video_path: str) -> List[Dict]:
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python reference_builder.py <video_path>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Build reference poses from a video file")
+    parser.add_argument("video_path", type=str, help="Reference video path")
+    parser.add_argument("--json", action="store_true",
+                        help="Also write the legacy reference_poses.json")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="Sample the video at this fps (default: every frame)")
+    args = parser.parse_args()
+    if args.target_fps is not None and args.target_fps <= 0:
+        parser.error("--target-fps must be positive")
     
-    video_path = sys.argv[1]
-    output_path = Path(__file__).parent / "reference_poses.json"
+    video_path = args.video_path
+    target_fps = args.target_fps
+    output_path = Path(__file__).parent / "reference_poses.npy"
     
-    poses = extract_reference_poses(video_path)
-    
-    with open(output_path, 'w') as f:
-        json.dump({
-            'source_video': video_path,
-            'frame_count': len(poses),
-            'poses': poses
-        }, f)
+    poses = extract_reference_poses(video_path, target_fps)
     
+    data = build_reference_array(
+        [p['keypoints'] for p in poses],
+        [p['timestamp_ms'] for p in poses]
+    )
+    save_reference(output_path, data)
     print(f"Saved to {output_path}")
+    
+    if args.json:
+        json_path = output_path.with_suffix('.json')
+        with open(json_path, 'w') as f:
+            json.dump({
+                'source_video': video_path,
+                'frame_count': len(poses),
+                'poses': poses
+            }, f)
+        # Keep the .npy newer so the scorer does not re-convert it
+        os.utime(output_path)
+        print(f"Saved to {json_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Binary reference pose format.
+
+One structured .npy array with a row per reference video frame:
+timestamp_ms, valid (pose detected) and (33, 4) float32 keypoints.
+PoseScorer memory-maps it, so startup time and resident memory do not
+grow with the length of the reference video.
+
+Older reference_poses.json files are converted automatically on load.
+
+Usage:
+    python reference_format.py reference_poses.json   # Convert JSON -> .npy
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Add parent directory to path for common module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from common.protocols import MEDIAPIPE_LANDMARKS
+
+REFERENCE_DTYPE = np.dtype([
+    ('timestamp_ms', '<f8'),
+    ('valid', '?'),
+    ('keypoints', '<f4', (MEDIAPIPE_LANDMARKS, 4)),
+])
+
+
+def build_reference_array(
+    keypoints: List[Optional[List[Tuple]]],
+    timestamps_ms: List[float]
+) -> np.ndarray:
+    """Pack per-frame keypoint lists (None = no pose) into REFERENCE_DTYPE rows."""
+    data = np.zeros(len(keypoints), dtype=REFERENCE_DTYPE)
+    data['timestamp_ms'] = timestamps_ms
+    for i, kps in enumerate(keypoints):
+        if kps:
+            rows = np.asarray(kps, dtype=np.float32)[:MEDIAPIPE_LANDMARKS]
+            data['keypoints'][i, :len(rows), :rows.shape[1]] = rows[:, :4]
+            data['valid'][i] = True
+    return data
+
+
+def save_reference(path: Path, data: np.ndarray):
+    """Atomically write a reference array (.npy)."""
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.tmp")
+    with open(temp_path, 'wb') as f:
+        np.save(f, data)
+    os.replace(temp_path, path)
+
+
+def convert_json_reference(json_path: Path, npy_path: Path) -> np.ndarray:
+    """Convert a legacy reference_poses.json into the binary format."""
+    with open(json_path, 'r') as f:
+        poses = json.load(f)['poses']
+
+    data = build_reference_array(
+        [p.get('keypoints') for p in poses],
+        [p.get('timestamp_ms', 0) for p in poses]
+    )
+    save_reference(npy_path, data)
+    return data
+
+
+def load_reference(path: Path) -> np.ndarray:
+    """
+    Memory-map a reference file.
+
+    A .json path is served from the sibling .npy, which is (re)built
+    whenever it is missing or older than the JSON.
+
+    Returns:
+        Read-only REFERENCE_DTYPE array (memory-mapped when non-empty)
+    """
+    path = Path(path)
+    if path.suffix == '.json':
+        npy_path = path.with_suffix('.npy')
+        if path.exists() and (
+            not npy_path.exists() or npy_path.stat().st_mtime < path.stat().st_mtime
+        ):
+            print(f"Converting {path.name} -> {npy_path.name}")
+            convert_json_reference(path, npy_path)
+        path = npy_path
+
+    data = np.load(path, mmap_mode='r')
+    if data.dtype != REFERENCE_DTYPE:
+        raise ValueError(f"{path} is not a reference pose array (dtype {data.dtype})")
+    return data
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python reference_format.py <reference_poses.json>")
+        sys.exit(1)
+
+    source = Path(sys.argv[1])
+    target = source.with_suffix('.npy')
+    data = convert_json_reference(source, target)
+    print(f"Saved {len(data)} frames ({int(data['valid'].sum())} with poses) to {target}")
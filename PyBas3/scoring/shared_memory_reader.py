@@ -3,24 +3,29 @@
 Shared memory reader for pose data from Vision module.
 
 Reads from `bas_pose_data` buffer written by SharedMemoryPoseWriter.
+Frames are read from a seqlock-versioned ring, so each read is a consistent
+snapshot and readers can skip frames they already consumed.
+wait_for_frame() blocks until the writer publishes a new frame.
 Uses common module for protocol definitions.
 """
 
 from multiprocessing import shared_memory
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import sys
+import time
 from pathlib import Path
 
 # Add parent directory to path for common module
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from common.protocols import SHARED_MEMORY_BUFFER_NAME, MAX_PARTICIPANTS, POSE_RECORD_SIZE
-from common.shared_memory import decode_pose
+from common.protocols import SHARED_MEMORY_BUFFER_NAME, MAX_PARTICIPANTS, POSE_RECORD_SIZE, RING_SLOTS
+from common.notify import BufferWaiter
+from common.shared_memory import PoseArrays, ring_is_valid, ring_latest_frame_id, ring_read_frame_arrays
 
 
 class SharedMemoryPoseReader:
     """Reads pose data from shared memory buffer."""
-    
+
     def __init__(
         self,
         buffer_name: str = SHARED_MEMORY_BUFFER_NAME,
@@ -30,7 +35,10 @@ class SharedMemoryPoseReader:
         self.max_participants = max_participants
         self.record_size = POSE_RECORD_SIZE
         self.shm: Optional[shared_memory.SharedMemory] = None
-    
+        self.last_frame_id = 0  # Last frame returned to the caller
+        self.dropped_frames = 0  # Frames overwritten before we got to them
+        self._waiter: Optional[BufferWaiter] = None  # Created on first wait_for_frame()
+
     def connect(self) -> bool:
         """Connect to existing shared memory. Returns True on success."""
         try:
@@ -38,38 +46,135 @@ class SharedMemoryPoseReader:
             return True
         except FileNotFoundError:
             return False
-    
+
+    @property
+    def latest_frame_id(self) -> int:
+        """Id of the newest frame published by the writer (0 if none)."""
+        if not self.shm or not ring_is_valid(self.shm.buf):
+            return 0
+        return ring_latest_frame_id(self.shm.buf)
+
+    def has_new_frame(self) -> bool:
+        """True if the writer published a frame we have not returned yet."""
+        return self.latest_frame_id > self.last_frame_id
+
+    def wait_for_frame(self, timeout: float) -> bool:
+        """
+        Block until the writer publishes a frame we have not returned yet.
+
+        Returns:
+            True if a new frame is available, False on timeout
+        """
+        if self._waiter is None:
+            self._waiter = BufferWaiter(self.buffer_name)
+        deadline = time.monotonic() + timeout
+        # != rather than >: a restarted writer (lower frame ids) also counts
+        while self.latest_frame_id == self.last_frame_id:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._waiter.wait(remaining)
+        return True
+
+    def _read_frame(self, frame_id: int) -> Optional[PoseArrays]:
+        """Read one frame as arrays, or None if it is no longer in the ring."""
+        return ring_read_frame_arrays(self.shm.buf, frame_id)
+
+    def read_pose_arrays(self) -> Optional[PoseArrays]:
+        """
+        Read the latest frame as PoseArrays ((N, 33, 4) keypoints).
+
+        Returns None if nothing has been written yet.
+        """
+        latest = self.latest_frame_id
+        if not latest:
+            return None
+
+        # Fall back to older slots if the newest one is being rewritten
+        for frame_id in range(latest, max(0, latest - RING_SLOTS), -1):
+            arrays = self._read_frame(frame_id)
+            if arrays is not None:
+                self.last_frame_id = max(self.last_frame_id, frame_id)
+                return arrays
+        return None
+
     def read_poses(self) -> List[Dict]:
         """
-        Read all participant poses from shared memory.
-        
+        Read all participant poses from the latest frame in shared memory.
+
         Returns list of dicts with keys: uuid, timestamp, keypoints, in_zone
         Each keypoint is tuple (x, y, z, visibility)
         """
-        if not self.shm:
+        arrays = self.read_pose_arrays()
+        if arrays is None:
             return []
-        
-        poses = []
-        offset = 0
-        
-        for _ in range(self.max_participants):
-            pose = decode_pose(self.shm.buf, offset)
-            if pose:
-                # Convert ParticipantPose to dict format for compatibility
-                poses.append(pose.to_dict())
-            offset += self.record_size
-        
-        return poses
-    
+        # Dict format kept for compatibility
+        return arrays.to_dicts()[:self.max_participants]
+
+    def read_new_frames(self, catch_up: bool = False) -> List[Tuple[int, List[Dict]]]:
+        """
+        Read frames published since the last call, as pose dicts.
+
+        See read_new_pose_arrays for arguments.
+        """
+        return [
+            (frame_id, arrays.to_dicts()[:self.max_participants])
+            for frame_id, arrays in self.read_new_pose_arrays(catch_up)
+        ]
+
+    def read_new_pose_arrays(self, catch_up: bool = False) -> List[Tuple[int, PoseArrays]]:
+        """
+        Read frames published since the last call.
+
+        Args:
+            catch_up: If True, return every missed frame still held in the ring
+                (oldest first). If False, return only the newest frame.
+
+        Returns:
+            List of (frame_id, PoseArrays) tuples; empty if nothing changed
+            (or, without catch_up, if the newest frame was mid-write; it is
+            retried on the next call).
+        """
+        latest = self.latest_frame_id
+        if latest <= self.last_frame_id:
+            if latest < self.last_frame_id:
+                # Writer restarted with a fresh ring
+                self.last_frame_id = 0
+            return []
+
+        if not catch_up:
+            arrays = self._read_frame(latest)
+            if arrays is None:
+                return []  # Torn read: keep last_frame_id so the next call retries
+            self.last_frame_id = latest
+            return [(latest, arrays)]
+
+        first = max(self.last_frame_id + 1, latest - RING_SLOTS + 1)
+        self.dropped_frames += first - (self.last_frame_id + 1)
+
+        frames = []
+        for frame_id in range(first, latest + 1):
+            arrays = self._read_frame(frame_id)
+            if arrays is None:
+                self.dropped_frames += 1
+                continue
+            frames.append((frame_id, arrays))
+
+        self.last_frame_id = latest
+        return frames
+
     def close(self):
         """Close shared memory connection (does not unlink)."""
+        if self._waiter:
+            self._waiter.close()
+            self._waiter = None
         if self.shm:
             self.shm.close()
             self.shm = None
-    
+
     def __enter__(self):
         self.connect()
         return self
-    
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
@@ -6,9 +6,13 @@ Tests scoring logic without requiring shared memory from Vision module.
 """
 
 import json
+import math
 import time
 from pathlib import Path
-from pose_scorer import PoseScorer, write_score_json
+
+import numpy as np
+
+from pose_scorer import PoseScorer, ReferenceIndex, write_score_json
 
 
 def create_mock_reference(num_frames: int = 100) -> Path:
@@ -98,11 +102,135 @@ def test_scorer():
     else:
         print("❌ Score JSON not written")
     
+    # JSON reference is converted to the binary format on load
+    npy_path = ref_path.with_suffix('.npy')
+    assert npy_path.exists(), "Binary reference not created"
+    assert len(scorer.reference) == 100 and scorer.reference['valid'].all()
+    print(f"✅ Binary reference created: {npy_path.name}")
+    
     # Cleanup
-    if ref_path.exists():
-        ref_path.unlink()
-        print(f"Cleaned up test reference: {ref_path}")
+    for path in (ref_path, npy_path):
+        if path.exists():
+            path.unlink()
+            print(f"Cleaned up test reference: {path}")
+
+
+class LegacyScorer:
+    """Per-landmark scalar movement scoring, as PoseScorer did before score_batch."""
+    
+    def __init__(self):
+        self.previous_poses = {}
+        self.smoothed_scores = {}
+    
+    def compute_movement(self, uuid, current_keypoints):
+        prev_keypoints = self.previous_poses.get(uuid)
+        if not prev_keypoints or not current_keypoints:
+            return 0.0
+        total_movement = 0.0
+        valid_count = 0
+        for idx in PoseScorer.MOVEMENT_LANDMARKS:
+            curr = current_keypoints[idx]
+            prev = prev_keypoints[idx]
+            if curr[3] < 0.3 or prev[3] < 0.3:
+                continue
+            dx = curr[0] - prev[0]
+            dy = curr[1] - prev[1]
+            movement = math.sqrt(dx * dx + dy * dy)
+            if movement < PoseScorer.MOVEMENT_NOISE_FLOOR:
+                movement = 0.0
+            total_movement += movement
+            valid_count += 1
+        if valid_count == 0:
+            return 0.0
+        return min(100.0, total_movement / valid_count * 6666)
+    
+    def score_pose(self, uuid, keypoints):
+        raw_movement = self.compute_movement(uuid, keypoints)
+        prev_smooth = self.smoothed_scores.get(uuid, raw_movement)
+        smoothed = prev_smooth + PoseScorer.SMOOTHING_ALPHA * (raw_movement - prev_smooth)
+        self.smoothed_scores[uuid] = smoothed
+        self.previous_poses[uuid] = keypoints.copy() if keypoints else None
+        return {'score_0_to_100': round(smoothed, 1), 'raw_movement': round(raw_movement, 1)}
+
+
+def test_batch_matches_single():
+    """score_batch and score_pose must match the legacy scalar scoring on the same poses."""
+    print("Testing batch and single scoring against the legacy scalar path...")
+    rng = np.random.default_rng(42)
+    batch_scorer, batch_legacy = PoseScorer(None), LegacyScorer()
+    single_scorer, single_legacy = PoseScorer(None), LegacyScorer()
+    uuids = [f"batch{i:03d}" for i in range(10)]
+    poses = {uuid: 0.5 + rng.normal(0, 0.05, (33, 4)) for uuid in uuids}
+    checked = 0
+    
+    for tick in range(60):
+        present = [u for u in uuids if rng.random() < 0.8]
+        for uuid in present:
+            # Steps around the noise floor; visibility above and below the cutoff
+            poses[uuid][:, :2] += rng.normal(0, 0.02, (33, 2))
+            poses[uuid][:, 3] = rng.random(33)
+        keypoints = np.array([poses[u] for u in present], dtype=np.float32)
+        frames = [[tuple(row) for row in kp.tolist()] for kp in keypoints]
+        
+        batch = batch_scorer.score_batch(present, keypoints)
+        for i, uuid in enumerate(present):
+            legacy = batch_legacy.score_pose(uuid, frames[i])
+            assert batch[i]['score_0_to_100'] == legacy['score_0_to_100'], (tick, batch[i], legacy)
+            assert batch[i]['raw_movement'] == legacy['raw_movement'], (tick, batch[i], legacy)
+        
+        for i, uuid in enumerate(present):
+            live = [] if tick % 7 == 3 and i == 0 else frames[i]  # Occasionally a missing pose
+            expected_raw = single_legacy.compute_movement(uuid, live)
+            assert math.isclose(single_scorer.compute_movement(uuid, live), expected_raw, abs_tol=1e-9)
+            single = single_scorer.score_pose(uuid, live)
+            legacy = single_legacy.score_pose(uuid, live)
+            assert single['score_0_to_100'] == legacy['score_0_to_100'], (tick, single, legacy)
+            assert single['raw_movement'] == legacy['raw_movement'], (tick, single, legacy)
+            checked += 1
+    
+    for scorer, legacy in ((batch_scorer, batch_legacy), (single_scorer, single_legacy)):
+        assert scorer.smoothed_scores.keys() == legacy.smoothed_scores.keys()
+        for uuid, score in legacy.smoothed_scores.items():
+            assert math.isclose(scorer.smoothed_scores[uuid], score, abs_tol=1e-9), uuid
+    assert any(s > 0 for s in batch_legacy.smoothed_scores.values()), "Fixtures never crossed the noise floor"
+    print(f"✅ Batch and single scores match the legacy scalar path ({checked} poses)")
+
+
+def test_reference_index_matches_legacy():
+    """Indexed reference matching must agree with the compute_similarity scan."""
+    print("Testing indexed reference matching...")
+    rng = np.random.default_rng(7)
+    frames = [
+        None if i % 17 == 0 else [tuple(row) for row in rng.random((33, 4)).tolist()]
+        for i in range(200)
+    ]
+    scorer = PoseScorer(None)
+    scorer.reference = frames
+    scorer.reference_index = ReferenceIndex.from_keypoint_lists(
+        frames, scorer.SIMILARITY_LANDMARKS, scorer.MIN_VISIBILITY
+    )
+    
+    for _ in range(50):
+        live = [tuple(row) for row in rng.random((33, 4)).tolist()]
+        best_frame, best_score = 0, 0.0
+        for i, ref_kp in enumerate(frames):
+            if ref_kp is None:
+                continue
+            score = scorer.compute_similarity(live, ref_kp)
+            if score > best_score:
+                best_frame, best_score = i, score
+        assert scorer.find_best_reference_frame(live) == (best_frame, best_score)
+    
+    # Windowed search stays near the last matched frame
+    live = frames[120]
+    frame, _ = scorer.find_best_reference_frame(live, search_window=5, last_frame=60)
+    assert 55 <= frame <= 65, f"Windowed match {frame} left the window"
+    frame, _ = scorer.find_best_reference_frame(live, search_window=5, last_frame=118)
+    assert frame == 120, f"Expected exact frame 120, got {frame}"
+    print("✅ Indexed matching agrees with legacy scan")
 
 
 if __name__ == "__main__":
     test_scorer()
+    test_batch_matches_single()
+    test_reference_index_matches_legacy()
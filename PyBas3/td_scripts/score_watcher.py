@@ -1,19 +1,34 @@
 """
-Score JSON File Watcher for TouchDesigner
+Score Watcher for TouchDesigner
 
 Usage in TD:
 - Create ScoreWatcher instance with output directory
 - Call poll() each frame to get updated scores
+- Or poll_changes() to get only scores that changed since the last call
 - Or use watch() for a blocking watcher (not for TD main thread)
 
+Scores are read from the shared memory score table (`bas_score_data`)
+when the scorer is running; otherwise from the score JSON files.
+
 Score file format: scoring/output/participant_<uuid>_score.json
 """
 
 import json
 import os
 import re
+import sys
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+# Add PyBas3 to path for common module
+_pybas3_dir = Path(__file__).parent.parent
+if str(_pybas3_dir) not in sys.path:
+    sys.path.insert(0, str(_pybas3_dir))
+
+try:
+    from common.score_table import ScoreTableReader
+except ImportError:
+    ScoreTableReader = None
 
 # Pattern for score files
 SCORE_FILE_PATTERN = re.compile(r'^participant_([a-f0-9]{8})_score\.json$')
@@ -24,17 +39,33 @@ DEFAULT_SCORE_DIR = Path(__file__).parent.parent / "scoring" / "output"
 
 class ScoreWatcher:
     """
-    Watches score JSON files for updates.
+    Watches the score table (or score JSON files) for updates.
     
     Example:
         watcher = ScoreWatcher()
         scores = watcher.poll()  # Returns {uuid: score_dict}
     """
     
-    def __init__(self, score_dir: Optional[str] = None):
+    def __init__(self, score_dir: Optional[str] = None, use_table: bool = True):
         self.score_dir = Path(score_dir) if score_dir else DEFAULT_SCORE_DIR
         self._last_mtimes: Dict[str, float] = {}
         self._cached_scores: Dict[str, dict] = {}
+        self._table = ScoreTableReader() if use_table and ScoreTableReader else None
+    
+    @property
+    def using_table(self) -> bool:
+        """True while scores come from the shared memory score table."""
+        return self._table is not None and self._table.shm is not None
+    
+    def _poll_table(self) -> Optional[Tuple[Dict[str, dict], List[str]]]:
+        """Poll the score table; None if it is not available."""
+        if self._table is None or not self._table.connect():
+            return None
+        changed, removed = self._table.poll_changes()
+        for uuid in removed:
+            self._cached_scores.pop(uuid, None)
+        self._cached_scores.update(changed)
+        return changed, removed
     
     def _get_score_files(self) -> Dict[str, Path]:
         """
@@ -55,10 +86,25 @@ class ScoreWatcher:
     def poll(self) -> Dict[str, dict]:
         """
         Check for score updates. Returns all current scores.
-        Only re-reads files that have changed.
+        Only re-reads entries/files that have changed.
         
         Returns {uuid: score_dict}
         """
+        self.poll_changes()
+        return self._cached_scores.copy()
+    
+    def poll_changes(self) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Check for score updates.
+        
+        Returns (changed {uuid: score_dict}, removed [uuid]) since the last poll.
+        """
+        table_changes = self._poll_table()
+        if table_changes is not None:
+            return table_changes
+        
+        changed: Dict[str, dict] = {}
+        removed: List[str] = []
         score_files = self._get_score_files()
         current_uuids = set(score_files.keys())
         cached_uuids = set(self._cached_scores.keys())
@@ -67,6 +113,7 @@ class ScoreWatcher:
         for uuid in cached_uuids - current_uuids:
             del self._cached_scores[uuid]
             self._last_mtimes.pop(uuid, None)
+            removed.append(uuid)
         
         # Check each file
         for uuid, filepath in score_files.items():
@@ -78,20 +125,28 @@ class ScoreWatcher:
                     with open(filepath, 'r') as f:
                         self._cached_scores[uuid] = json.load(f)
                     self._last_mtimes[uuid] = mtime
+                    changed[uuid] = self._cached_scores[uuid]
                     
             except (json.JSONDecodeError, OSError) as e:
                 # File might be mid-write, skip this poll
                 continue
         
-        return self._cached_scores.copy()
+        return changed, removed
     
     def get_score(self, uuid: str) -> Optional[dict]:
         """Get score for specific participant."""
         return self._cached_scores.get(uuid)
     
     def get_active_uuids(self) -> list:
-        """Get list of UUIDs with score files."""
+        """Get list of UUIDs with scores."""
+        if self.using_table:
+            return list(self._cached_scores.keys())
         return list(self._get_score_files().keys())
+    
+    def close(self):
+        """Release the score table connection."""
+        if self._table:
+            self._table.close()
 
 
 # Singleton for TD use
@@ -127,8 +182,9 @@ def onFrameStart(frame):
 if __name__ == "__main__":
     import time
     
-    print(f"Watching: {DEFAULT_SCORE_DIR}")
     watcher = ScoreWatcher()
+    watcher.poll()
+    print(f"Watching: {'score table' if watcher.using_table else DEFAULT_SCORE_DIR}")
     
     print("Polling scores (Ctrl+C to stop)...")
     try:
@@ -141,3 +197,5 @@ if __name__ == "__main__":
             time.sleep(0.5)
     except KeyboardInterrupt:
         print("\nStopped.")
+    finally:
+        watcher.close()
@@ -32,22 +32,57 @@ _initialized = False
 _current_speed = MIN_SPEED  # Current playback speed (smoothed)
 _target_speed = MIN_SPEED   # Target speed from score calculation
 _accumulated_index = 0.0    # Smoothly accumulated video index
+_score_table = None         # Shared memory score table reader (when scorer runs)
+_thumbnail_atlas = None     # Shared memory thumbnail atlas reader (when vision runs)
 
 # Smoothing parameters: fast attack (score rises), slow decay (score falls)
 ATTACK_RATE = 0.08   # How fast speed rises (0-1, higher = faster) - reduced for smoother
 DECAY_RATE = 0.015   # How fast speed falls back (0-1, lower = slower decay)
 
+def _get_score_table():
+    """Connect to the scorer's shared memory score table, or None."""
+    global _score_table
+    if _score_table is None:
+        try:
+            if str(PYBAS3_PATH) not in sys.path:
+                sys.path.insert(0, str(PYBAS3_PATH))
+            from common.score_table import ScoreTableReader
+            _score_table = ScoreTableReader()
+        except ImportError:
+            return None
+    return _score_table if _score_table.connect() else None
+
+def _get_thumbnail_atlas():
+    """Connect to the vision process's shared memory thumbnail atlas, or None."""
+    global _thumbnail_atlas
+    if _thumbnail_atlas is None:
+        try:
+            if str(PYBAS3_PATH) not in sys.path:
+                sys.path.insert(0, str(PYBAS3_PATH))
+            from common.thumbnail_atlas import ThumbnailAtlasReader
+            _thumbnail_atlas = ThumbnailAtlasReader()
+        except ImportError:
+            return None
+    return _thumbnail_atlas if _thumbnail_atlas.connect() else None
+
 def _poll_scores():
-    """Read score JSON files, ignoring stale ones (>5 sec old)."""
+    """Read scores (score table, else JSON files), ignoring stale ones (>5 sec old)."""
     global _scores
     _scores = {}
     
-    if not SCORE_DIR.exists():
-        return
-    
     import time
     now = time.time()
     
+    table = _get_score_table()
+    if table is not None:
+        for uuid, score in table.poll().items():
+            if now - score['timestamp'] <= 5:
+                _scores[uuid] = score
+        return
+    
+    if not SCORE_DIR.exists():
+        return
+    
     for f in SCORE_DIR.iterdir():
         if f.name.startswith('participant_') and f.name.endswith('_score.json'):
             try:
@@ -328,3 +363,19 @@ def get_avg_score():
     if not _scores:
         return 0
     return sum(s.get('score_0_to_100', 0) for s in _scores.values()) / len(_scores)
+
+def get_thumbnail_atlas():
+    """
+    Live view of all thumbnails as one (slots*120, 160, 3) BGR array, or None.
+    Feed it to a Script TOP (scriptOp.copyNumpyArray after flipping/converting to RGBA).
+    """
+    atlas = _get_thumbnail_atlas()
+    return atlas.pixels() if atlas is not None else None
+
+def get_thumbnail_slot(uuid):
+    """Atlas slot (row block) holding a participant's thumbnail, or None."""
+    atlas = _get_thumbnail_atlas()
+    if atlas is None:
+        return None
+    atlas.poll_changes()
+    return atlas.slots.get(uuid)
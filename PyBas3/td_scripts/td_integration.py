@@ -110,16 +110,23 @@ def get_participants() -> Dict[str, ParticipantData]:
         return {}
 
 
-def get_poses() -> List[Dict]:
+def get_poses(timeout: float = 0.0) -> List[Dict]:
     """
     Get current pose data from shared memory.
     
+    Args:
+        timeout: If > 0, first wait up to this many seconds for Vision to
+            publish a new frame (e.g. from a worker thread). Keep 0 on
+            TouchDesigner's cook thread.
+    
     Returns list of pose dicts with keys: uuid, timestamp, keypoints, in_zone
     """
     if not _read_poses or _pose_reader is None:
         return []
     
     try:
+        if timeout > 0:
+            _pose_reader.wait_for_frame(timeout)
         return _pose_reader.read_poses()
     except Exception as e:
         print(f"ERROR reading poses: {e}")
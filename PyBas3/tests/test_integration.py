@@ -4,7 +4,7 @@ Integration tests for PyBas3 pipeline.
 
 Tests:
 1. Vision → Scoring shared memory communication
-2. Scoring → TD JSON output
+2. Scoring → TD score table / JSON output
 3. TD helper scripts
 """
 
@@ -23,10 +23,25 @@ from common.protocols import (
     POSE_BUFFER_SIZE,
     POSE_RECORD_SIZE,
     MAX_PARTICIPANTS,
+    RING_BUFFER_SIZE,
+    RING_SLOTS,
     ParticipantPose,
     PoseKeypoint,
 )
-from common.shared_memory import encode_pose, decode_pose
+from common.shared_memory import (
+    PoseArrays,
+    encode_pose,
+    decode_pose,
+    encode_pose_arrays,
+    decode_pose_arrays,
+    ring_init,
+    ring_write_frame,
+    ring_read_frame,
+)
+
+
+# Byte offset of the first keypoint within a record (after UUID + timestamp)
+UUID_OFFSET_TO_KEYPOINTS = 36 + 8
 
 
 def make_mock_pose(uuid: str, in_zone: bool = True) -> ParticipantPose:
@@ -135,13 +150,12 @@ def test_scoring_reads_shared_memory():
         shm = shared_memory.SharedMemory(
             name=SHARED_MEMORY_BUFFER_NAME,
             create=True,
-            size=POSE_BUFFER_SIZE
+            size=RING_BUFFER_SIZE
         )
         
         mock_pose = make_mock_pose("test1234", in_zone=True)
-        buffer = bytearray(POSE_BUFFER_SIZE)
-        encode_pose(mock_pose, buffer, 0)
-        shm.buf[:POSE_BUFFER_SIZE] = memoryview(buffer)
+        ring_init(shm.buf)
+        ring_write_frame(shm.buf, 1, [mock_pose])
         print("✓ Vision mock: wrote pose to shared memory")
         
         # Read using Scoring's reader
@@ -171,6 +185,973 @@ def test_scoring_reads_shared_memory():
             shm.unlink()
 
 
+def test_reference_format():
+    """Test the JSON -> .npy -> memmap reference round-trip and stale rebuilds."""
+    print("\n" + "=" * 60)
+    print("TEST: Reference Format")
+    print("=" * 60)
+    
+    try:
+        import os
+        import numpy as np
+        sys.path.insert(0, str(Path(__file__).parent.parent / "scoring"))
+        from reference_format import REFERENCE_DTYPE, convert_json_reference, load_reference
+        
+        def write_json(path, offset):
+            poses = [
+                {'frame_index': 0, 'timestamp_ms': 0, 'keypoints': [(offset + i / 33, 0.5, 0.0, 1.0) for i in range(33)]},
+                {'frame_index': 1, 'timestamp_ms': 40, 'keypoints': None},
+                {'frame_index': 2, 'timestamp_ms': 80, 'keypoints': [(offset, 0.25, 0.1, 0.9)] * 33},
+            ]
+            with open(path, 'w') as f:
+                json.dump({'poses': poses}, f)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = Path(tmp) / "reference_poses.json"
+            npy_path = json_path.with_suffix('.npy')
+            write_json(json_path, 0.0)
+            
+            data = convert_json_reference(json_path, npy_path)
+            assert data.dtype == REFERENCE_DTYPE and len(data) == 3
+            assert list(data['valid']) == [True, False, True], f"valid flags {list(data['valid'])}"
+            assert list(data['timestamp_ms']) == [0, 40, 80]
+            assert not data['keypoints'][1].any(), "Frame without pose should have zero keypoints"
+            assert np.allclose(data['keypoints'][0, :, 0], np.arange(33) / 33)
+            assert np.allclose(data['keypoints'][2, 0], (0.0, 0.25, 0.1, 0.9))
+            print("✓ JSON converted (keypoints: None -> valid=False)")
+            
+            loaded = load_reference(json_path)
+            assert isinstance(loaded, np.memmap) and not loaded.flags.writeable, "Expected a read-only memmap"
+            assert np.array_equal(loaded, data)
+            assert np.array_equal(load_reference(npy_path), data)
+            del loaded
+            print("✓ .json and .npy paths load the same memmap")
+            
+            # JSON newer than the .npy: rebuilt on load
+            write_json(json_path, 0.5)
+            stat = json_path.stat()
+            os.utime(npy_path, (stat.st_atime, stat.st_mtime - 10))
+            loaded = load_reference(json_path)
+            assert np.allclose(loaded['keypoints'][2, :, 0], 0.5), "Stale .npy was not rebuilt"
+            assert npy_path.stat().st_mtime >= stat.st_mtime
+            del loaded
+            
+            # .npy newer than the JSON: served as is
+            write_json(json_path, 0.75)
+            os.utime(json_path, (stat.st_atime, npy_path.stat().st_mtime - 10))
+            loaded = load_reference(json_path)
+            assert np.allclose(loaded['keypoints'][2, :, 0], 0.5), "Up-to-date .npy was rebuilt"
+            del loaded
+            print("✓ Stale .npy rebuilt, current .npy reused")
+            
+            bad_path = Path(tmp) / "not_a_reference.npy"
+            np.save(bad_path, np.zeros((3, 33, 4), dtype=np.float32))
+            try:
+                load_reference(bad_path)
+                raise AssertionError("Wrong dtype was accepted")
+            except ValueError:
+                pass
+            print("✓ Arrays with the wrong dtype are rejected")
+        
+        print("PASS: Reference format")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
+def test_array_codec_matches_struct():
+    """Test NumPy structured-dtype codec is byte-compatible with encode_pose."""
+    print("\n" + "=" * 60)
+    print("TEST: Array Codec Matches Struct Codec")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        
+        poses = [make_mock_pose("abc12345", True), make_mock_pose("def67890", False)]
+        poses[1].keypoints[5] = PoseKeypoint(0.125, 0.75, -0.5, 0.25)
+        
+        struct_buf = bytearray(POSE_BUFFER_SIZE)
+        offset = 0
+        for pose in poses:
+            offset = encode_pose(pose, struct_buf, offset)
+        
+        arrays = PoseArrays.from_poses(poses)
+        array_buf = bytearray(POSE_BUFFER_SIZE)
+        end = encode_pose_arrays(
+            array_buf, 0, arrays.uuids, arrays.timestamps, arrays.keypoints, arrays.in_zone
+        )
+        assert end == offset, f"Offset mismatch: {end} != {offset}"
+        assert array_buf == struct_buf, "Array encoding differs from struct encoding"
+        print("✓ Encodings are byte-identical")
+        
+        decoded = decode_pose_arrays(memoryview(struct_buf), 0, MAX_PARTICIPANTS)
+        assert decoded.uuids == ["abc12345", "def67890"], f"UUIDs: {decoded.uuids}"
+        assert decoded.keypoints.shape == (2, 33, 4)
+        assert decoded.keypoints.dtype == np.float32
+        assert decoded.in_zone.tolist() == [True, False]
+        assert decoded.to_dicts()[1]['keypoints'][5] == (0.125, 0.75, -0.5, 0.25)
+        print("✓ Decoded (N, 33, 4) float32 keypoints")
+        
+        view = decode_pose_arrays(memoryview(struct_buf), 0, 2)
+        struct_buf[UUID_OFFSET_TO_KEYPOINTS:UUID_OFFSET_TO_KEYPOINTS + 4] = np.float32(0.875).tobytes()
+        assert view.keypoints[0, 0, 0] == np.float32(0.875), "Keypoints are not a view"
+        print("✓ Keypoints are a zero-copy view")
+        
+        print("PASS: Array codec matches struct codec")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ring_buffer_frames():
+    """Test seqlock ring: versioning, skipping consumed frames, catch-up."""
+    print("\n" + "=" * 60)
+    print("TEST: Ring Buffer Frames")
+    print("=" * 60)
+    
+    shm = None
+    try:
+        from scoring.shared_memory_reader import SharedMemoryPoseReader
+        
+        try:
+            existing = shared_memory.SharedMemory(name=SHARED_MEMORY_BUFFER_NAME)
+            existing.close()
+            existing.unlink()
+        except FileNotFoundError:
+            pass
+        
+        shm = shared_memory.SharedMemory(
+            name=SHARED_MEMORY_BUFFER_NAME,
+            create=True,
+            size=RING_BUFFER_SIZE
+        )
+        assert ring_init(shm.buf) == 0, "Fresh ring should start at frame 0"
+        
+        reader = SharedMemoryPoseReader()
+        assert reader.connect(), "Failed to connect to shared memory"
+        assert reader.read_new_frames() == [], "Expected no frames before first write"
+        
+        ring_write_frame(shm.buf, 1, [make_mock_pose("aaaa1111"), make_mock_pose("bbbb2222")])
+        frames = reader.read_new_frames()
+        assert [f[0] for f in frames] == [1], f"Expected frame 1, got {frames}"
+        assert len(frames[0][1]) == 2, "Expected 2 poses in frame 1"
+        assert reader.read_new_frames() == [], "Consumed frame returned twice"
+        print("✓ New frame read once, then skipped")
+        
+        # Fewer participants must not leave stale records behind
+        ring_write_frame(shm.buf, 2, [make_mock_pose("cccc3333")])
+        for frame_id in range(3, 3 + RING_SLOTS):
+            ring_write_frame(shm.buf, frame_id, [make_mock_pose(f"{frame_id:08d}")])
+        latest = 2 + RING_SLOTS
+        frames = reader.read_new_frames(catch_up=True)
+        ids = [f[0] for f in frames]
+        assert ids == list(range(latest - RING_SLOTS + 1, latest + 1)), f"Unexpected catch-up ids {ids}"
+        assert reader.dropped_frames == 1, f"Expected 1 dropped frame, got {reader.dropped_frames}"
+        assert ring_read_frame(shm.buf, 2) is None, "Overwritten frame should not be readable"
+        print(f"✓ Catch-up returned frames {ids}, dropped {reader.dropped_frames}")
+        
+        # Slot left mid-write (odd seq) is rejected
+        ring_write_frame(shm.buf, latest + 1, [make_mock_pose("dddd4444")])
+        from common.protocols import RING_HEADER_BYTES, FRAME_SLOT_SIZE
+        slot = RING_HEADER_BYTES + ((latest + 1) % RING_SLOTS) * FRAME_SLOT_SIZE
+        shm.buf[slot] |= 1
+        assert ring_read_frame(shm.buf, latest + 1, retries=2) is None, "Torn frame was returned"
+        assert reader.read_new_frames() == [] and reader.last_frame_id == latest, "Torn read consumed the frame"
+        shm.buf[slot] &= ~1
+        frames = reader.read_new_frames()
+        assert [f[0] for f in frames] == [latest + 1], f"Frame not retried after torn read: {frames}"
+        print("✓ In-progress slot rejected, then retried")
+        
+        reader.close()
+        print("PASS: Ring buffer frames")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if shm:
+            shm.close()
+            shm.unlink()
+
+
+def test_wake_on_write():
+    """Test that readers blocked in wait_for_frame wake when a frame is written."""
+    print("\n" + "=" * 60)
+    print("TEST: Wake On Write")
+    print("=" * 60)
+    
+    writer = None
+    reader = None
+    try:
+        import threading
+        import numpy as np
+        sys.path.insert(0, str(Path(__file__).parent.parent / "mediapipe"))
+        from shared_memory_writer import SharedMemoryPoseWriter
+        from scoring.shared_memory_reader import SharedMemoryPoseReader
+        
+        name = "bas_pose_wake_test"
+        writer = SharedMemoryPoseWriter(name)
+        reader = SharedMemoryPoseReader(name)
+        assert reader.connect(), "Failed to connect to shared memory"
+        reader.read_new_pose_arrays()
+        
+        start = time.perf_counter()
+        assert not reader.wait_for_frame(0.1), "Woke without a new frame"
+        assert time.perf_counter() - start >= 0.09, "Timeout returned early"
+        print("✓ Times out when nothing is written")
+        
+        keypoints = np.zeros((1, 33, 4), dtype=np.float32)
+        timer = threading.Timer(0.05, writer.write_pose_arrays, (["aaaa1111"], [time.time()], keypoints, [True]))
+        start = time.perf_counter()
+        timer.start()
+        assert reader.wait_for_frame(2.0), "Missed the published frame"
+        waited = time.perf_counter() - start
+        timer.join()
+        assert waited < 1.0, f"Woke too late ({waited:.3f}s)"
+        frames = reader.read_new_pose_arrays()
+        assert [arrays.uuids for _, arrays in frames] == [["aaaa1111"]], f"Unexpected frames {frames}"
+        print(f"✓ Woke {waited * 1000:.1f} ms after waiting for a frame written at 50 ms")
+        
+        print("PASS: Wake on write")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if reader:
+            reader.close()
+        if writer:
+            writer.unlink()
+
+
+def test_score_table():
+    """Test shared memory score table: publish, change polling, retire."""
+    print("\n" + "=" * 60)
+    print("TEST: Score Table")
+    print("=" * 60)
+    
+    writer = None
+    reader = None
+    try:
+        from common.score_table import ScoreTableWriter, ScoreTableReader
+        
+        name = "bas_score_test"
+        writer = ScoreTableWriter(name)
+        reader = ScoreTableReader(name)
+        assert reader.connect(), "Failed to connect to score table"
+        assert reader.poll_changes() == ({}, []), "Expected empty table"
+        
+        score = {
+            "uuid": "abc12345",
+            "timestamp": time.time(),
+            "reference_frame": 10,
+            "score_0_to_100": 85.5,
+            "raw_movement": 0.0128,
+            "in_zone": True
+        }
+        writer.publish(score)
+        writer.publish({**score, "uuid": "def67890", "in_zone": False})
+        changed, removed = reader.poll_changes()
+        assert set(changed) == {"abc12345", "def67890"}, f"Unexpected changes {changed}"
+        assert changed["abc12345"] == score, f"Round-trip mismatch: {changed['abc12345']}"
+        assert reader.poll_changes() == ({}, []), "Unchanged entries reported again"
+        print("✓ Published scores read once")
+        
+        writer.publish({**score, "score_0_to_100": 90.0})
+        changed, removed = reader.poll_changes()
+        assert list(changed) == ["abc12345"], f"Expected only abc12345 to change, got {list(changed)}"
+        assert changed["abc12345"]["score_0_to_100"] == 90.0
+        print("✓ Only updated entry reported")
+        
+        writer.retire("def67890")
+        changed, removed = reader.poll_changes()
+        assert removed == ["def67890"] and not changed, f"Expected removal, got {changed}, {removed}"
+        assert set(reader.poll()) == {"abc12345"}
+        print("✓ Retired participant removed")
+        
+        sys.path.insert(0, str(Path(__file__).parent.parent / "scoring"))
+        from pose_scorer import PoseScorer, ScoringStage
+        restarted = ScoreTableWriter(name)  # A new scorer run finds abc12345 still in the table
+        assert restarted.adopted == ["abc12345"], f"Unexpected adoption {restarted.adopted}"
+        stage = ScoringStage(PoseScorer(None), participant_ttl=5.0, score_table=restarted)
+        stage.lifecycle.update(now=time.monotonic() + 1.0)
+        assert reader.poll_changes() == ({}, []), "Adopted entry retired before the TTL"
+        stage.lifecycle.update(now=time.monotonic() + 6.0)
+        changed, removed = reader.poll_changes()
+        assert removed == ["abc12345"], f"Adopted entry never aged out: {changed}, {removed}"
+        restarted.close()
+        print("✓ Entries adopted from a previous run age out with the participant TTL")
+        
+        writer.publish(score)
+        reader.poll_changes()
+        fresh = ScoreTableWriter(name, adopt=False)
+        changed, removed = reader.poll_changes()
+        assert fresh.adopted == [] and removed == ["abc12345"], f"Fresh session kept {removed}"
+        fresh.close()
+        print("✓ adopt=False clears a previous session's entries")
+        
+        print("PASS: Score table")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if reader:
+            reader.close()
+        if writer:
+            writer.unlink()
+
+
+def test_thumbnail_atlas():
+    """Test shared memory thumbnail atlas: publish, versioned polling, retire."""
+    print("\n" + "=" * 60)
+    print("TEST: Thumbnail Atlas")
+    print("=" * 60)
+    
+    writer = None
+    reader = None
+    try:
+        import numpy as np
+        from common.protocols import THUMB_HEIGHT, THUMB_WIDTH
+        from common.thumbnail_atlas import ThumbnailAtlasWriter, ThumbnailAtlasReader
+        
+        name = "bas_thumb_test"
+        writer = ThumbnailAtlasWriter(name)
+        reader = ThumbnailAtlasReader(name)
+        assert reader.connect(), "Failed to connect to thumbnail atlas"
+        assert reader.poll_changes() == ({}, []), "Expected empty atlas"
+        
+        image = np.random.default_rng(0).integers(0, 256, (THUMB_HEIGHT, THUMB_WIDTH, 3), dtype=np.uint8)
+        writer.publish("abc12345", image)
+        writer.publish("def67890", 255 - image)
+        changed, removed = reader.poll_changes()
+        assert set(changed) == {"abc12345", "def67890"}, f"Unexpected changes {list(changed)}"
+        assert np.array_equal(changed["abc12345"], image), "Thumbnail round-trip mismatch"
+        assert reader.poll_changes() == ({}, []), "Unchanged slots reported again"
+        slot = reader.slots["def67890"]
+        atlas = reader.pixels()
+        assert np.array_equal(atlas[slot * THUMB_HEIGHT:(slot + 1) * THUMB_HEIGHT], 255 - image)
+        del atlas  # Release the view before close
+        print("✓ Published thumbnails read once, atlas view matches")
+        
+        writer.publish("abc12345", 255 - image)
+        changed, removed = reader.poll_changes()
+        assert list(changed) == ["abc12345"], f"Expected only abc12345 to change, got {list(changed)}"
+        print("✓ Only refreshed thumbnail reported")
+        
+        writer.retire("def67890")
+        changed, removed = reader.poll_changes()
+        assert removed == ["def67890"] and not changed, f"Expected removal, got {list(changed)}, {removed}"
+        assert reader.get("def67890") is None
+        print("✓ Retired participant removed")
+        
+        restarted = ThumbnailAtlasWriter(name)
+        assert restarted.adopted == ["abc12345"], f"Unexpected adoption {restarted.adopted}"
+        restarted.publish("ghi24680", image)  # Adopted slot is not reused
+        changed, _ = reader.poll_changes()
+        assert list(changed) == ["ghi24680"] and reader.slots["ghi24680"] != reader.slots["abc12345"]
+        restarted.retire("abc12345")  # Lifecycle GONE callback (ThumbnailWriter.forget)
+        changed, removed = reader.poll_changes()
+        assert removed == ["abc12345"] and not changed, f"Expected removal, got {list(changed)}, {removed}"
+        restarted.close()
+        fresh = ThumbnailAtlasWriter(name, adopt=False)
+        changed, removed = reader.poll_changes()
+        assert fresh.adopted == [] and removed == ["ghi24680"], f"Fresh session kept {removed}"
+        fresh.close()
+        print("✓ Previous run's thumbnails adopted (retirable) or cleared with adopt=False")
+        
+        print("PASS: Thumbnail atlas")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if reader:
+            reader.close()
+        if writer:
+            writer.unlink()
+
+
+def test_participant_lifecycle():
+    """Test lifecycle states, TTL eviction and score slot retirement on gone."""
+    print("\n" + "=" * 60)
+    print("TEST: Participant Lifecycle")
+    print("=" * 60)
+    
+    writer = None
+    reader = None
+    try:
+        from common.lifecycle import ParticipantLifecycle, ENTER, ACTIVE, STALE, GONE
+        from common.score_table import ScoreTableWriter, ScoreTableReader
+        
+        name = "bas_score_lifecycle_test"
+        writer = ScoreTableWriter(name)
+        reader = ScoreTableReader(name)
+        assert reader.connect(), "Failed to connect to score table"
+        
+        events = []
+        lifecycle = ParticipantLifecycle(stale_after=2.0, gone_after=10.0, clock=lambda: 0.0)
+        for state in (ENTER, ACTIVE, STALE, GONE):
+            lifecycle.on(state, lambda uuid, state=state: events.append((state, uuid)))
+        lifecycle.on(GONE, writer.retire)
+        
+        lifecycle.seen(["abc12345", "def67890"], now=0.0)
+        for uuid in ("abc12345", "def67890"):
+            writer.publish({"uuid": uuid, "timestamp": time.time(), "score_0_to_100": 50.0})
+        assert events == [(ENTER, "abc12345"), (ENTER, "def67890")], f"Unexpected events {events}"
+        reader.poll_changes()
+        print("✓ New participants enter")
+        
+        events.clear()
+        lifecycle.seen(["abc12345"], now=1.0)
+        lifecycle.update(now=2.5)
+        assert events == [(ACTIVE, "abc12345"), (STALE, "def67890")], f"Unexpected events {events}"
+        events.clear()
+        lifecycle.update(now=2.9)
+        assert events == [], "Stale fired twice"
+        print("✓ Unseen participant goes stale once")
+        
+        lifecycle.seen(["abc12345"], now=9.0)
+        gone = lifecycle.update(now=10.5)
+        assert gone == ["def67890"], f"Expected def67890 gone, got {gone}"
+        assert "def67890" not in lifecycle and lifecycle.state("def67890") == GONE
+        assert lifecycle.state("abc12345") == ACTIVE
+        changed, removed = reader.poll_changes()
+        assert removed == ["def67890"], f"Score slot not retired: {removed}"
+        print("✓ Gone participant evicted and score slot retired")
+        
+        events.clear()
+        lifecycle.evict_all()
+        assert events == [(GONE, "abc12345")] and len(lifecycle) == 0
+        print("✓ evict_all tears down remaining participants")
+        
+        print("PASS: Participant lifecycle")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if reader:
+            reader.close()
+        if writer:
+            writer.unlink()
+
+
+def test_participant_db_journal():
+    """Test participant DB persistence: dirty flushes, journal replay, compaction, crash recovery."""
+    print("\n" + "=" * 60)
+    print("TEST: Participant DB Journal")
+    print("=" * 60)
+    
+    trackers = []
+    compact_records = None
+    try:
+        import atexit
+        import numpy as np
+        sys.path.insert(0, str(Path(__file__).parent.parent / "mediapipe"))
+        import participant_tracker
+        from participant_tracker import ParticipantTracker
+        compact_records = participant_tracker.JOURNAL_COMPACT_RECORDS
+        
+        def open_tracker(db_path, **kwargs):
+            tracker = ParticipantTracker(db_path=db_path, journal=True, **kwargs)
+            trackers.append(tracker)
+            return tracker
+        
+        def crash(tracker):
+            """Drop a tracker without its close-time flush."""
+            tracker._closed = True
+            tracker._stop.set()
+            atexit.unregister(tracker.close)
+        
+        def seen(tracker, uuid, seed):
+            """Record a sighting the way match_or_create does."""
+            phash = tracker.pack_hash(np.random.default_rng(seed).integers(0, 2, 64))
+            with tracker._lock:
+                info = tracker.participants.get(uuid, {"phash_history": []})
+                history = (list(info["phash_history"]) + [phash])[-tracker.hash_history_size:]
+                tracker.participants[uuid] = {"phash": phash, "phash_history": history, "last_seen": float(seed)}
+                tracker._index_set(uuid)
+                tracker._mark_dirty(uuid)
+            return phash
+        
+        def forget(tracker, uuid):
+            with tracker._lock:
+                del tracker.participants[uuid]
+                tracker._index_remove(uuid)
+                tracker._mark_dirty(uuid)
+        
+        def journal_lines(tracker):
+            path = Path(tracker.journal_path)
+            return path.read_text().splitlines() if path.exists() else []
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = str(Path(tmp) / "participants_db.json")
+            
+            tracker = open_tracker(db_path, flush_interval=60.0)
+            seen(tracker, "aaaa1111", 1)
+            assert not journal_lines(tracker) and not Path(db_path).exists(), "Written before flush"
+            tracker.flush()
+            tracker.flush()  # Nothing dirty: no second record
+            assert len(journal_lines(tracker)) == 1, journal_lines(tracker)
+            seen(tracker, "bbbb2222", 2)
+            tracker.close()
+            assert not journal_lines(tracker), "Close did not compact the journal"
+            assert set(json.loads(Path(db_path).read_text())) == {"aaaa1111", "bbbb2222"}
+            print("✓ Changes batched until flush, close flushes and compacts")
+            
+            tracker = open_tracker(db_path, flush_interval=0)
+            seen(tracker, "aaaa1111", 3)
+            pruned_hash = seen(tracker, "cccc3333", 4)
+            forget(tracker, "bbbb2222")
+            tracker.flush()
+            assert len(journal_lines(tracker)) == 3
+            crash(tracker)
+            with open(tracker.journal_path, "a") as f:
+                f.write('{"uuid": "dddd4444", "phash": "00')  # Torn append
+            
+            tracker = open_tracker(db_path, flush_interval=0)
+            assert set(tracker.participants) == {"aaaa1111", "cccc3333"}, set(tracker.participants)
+            assert not journal_lines(tracker), "Replayed journal left on disk"
+            print("✓ Crash: journal replayed up to the torn tail, then folded into the snapshot")
+            
+            latest = seen(tracker, "aaaa1111", 5)
+            forget(tracker, "cccc3333")
+            tracker.flush()
+            tracker.close()
+            
+            tracker = open_tracker(db_path, flush_interval=0)
+            assert set(tracker.participants) == {"aaaa1111"}, "Pruned participant came back"
+            assert np.array_equal(tracker.participants["aaaa1111"]["phash_history"][-1], latest)
+            assert tracker.match_hash(pruned_hash)[0] == "aaaa1111"
+            print("✓ Restart after recovery keeps later updates and deletions")
+            
+            participant_tracker.JOURNAL_COMPACT_RECORDS = 3
+            for seed in range(6, 9):
+                seen(tracker, f"eeee{seed:04d}", seed)
+                tracker.flush()
+            assert not journal_lines(tracker), "Journal not compacted at the threshold"
+            assert len(json.loads(Path(db_path).read_text())) == 4
+            tracker.close()
+            print("✓ Journal compacted into a snapshot at the record threshold")
+        
+        print("PASS: Participant DB journal")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+    finally:
+        if compact_records is not None:
+            participant_tracker.JOURNAL_COMPACT_RECORDS = compact_records
+        for tracker in trackers:
+            tracker.close()  # No-op for closed / crashed trackers
+
+
+def test_packed_phash_matching():
+    """Test packed pHash matching against the old element-wise distance on a legacy-format DB."""
+    print("\n" + "=" * 60)
+    print("TEST: Packed pHash Matching")
+    print("=" * 60)
+    
+    trackers = []
+    try:
+        import numpy as np
+        sys.path.insert(0, str(Path(__file__).parent.parent / "mediapipe"))
+        from participant_tracker import ParticipantTracker
+        
+        hash_size = 12  # 144 bits: three words, the last one partial
+        bits = hash_size * hash_size
+        rng = np.random.default_rng(0)
+        
+        def legacy_distance(a, b):
+            return np.count_nonzero(a != b)  # Element-wise distance of the unpacked format
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = str(Path(tmp) / "participants_db.json")
+            legacy = {
+                "str00001": rng.integers(0, 2, (1, bits), dtype=np.uint8),  # Old bare-string entries
+                "dict0002": rng.integers(0, 2, (3, bits), dtype=np.uint8),
+                "dict0003": rng.integers(0, 2, (2, bits), dtype=np.uint8),
+            }
+            db = {"str00001": json.dumps(legacy["str00001"][0].tolist())}
+            for uuid, encode in (("dict0002", lambda h: json.dumps(h.tolist())), ("dict0003", lambda h: h.tolist())):
+                history = [encode(h) for h in legacy[uuid]]  # JSON-string / list-of-bits histories
+                db[uuid] = {"phash": json.dumps(legacy[uuid][-1].tolist()), "phash_history": history, "last_seen": 1.0}
+            Path(db_path).write_text(json.dumps(db))
+            
+            tracker = ParticipantTracker(db_path=db_path, hash_size=hash_size, flush_interval=0)
+            trackers.append(tracker)
+            assert set(tracker.participants) == set(legacy), "Legacy entries not loaded"
+            
+            def check(tracker):
+                for trial in range(50):
+                    query = rng.integers(0, 2, bits, dtype=np.uint8)
+                    if trial % 10 == 0:  # Exact and near matches too
+                        uuid = list(legacy)[trial % 3]
+                        query = legacy[uuid][-1].copy()
+                        query[:trial // 10] ^= 1
+                    per_uuid = {uuid: min(legacy_distance(h, query) for h in hs) for uuid, hs in legacy.items()}
+                    expected = min(per_uuid.values())
+                    uuid, distance = tracker.match_hash(tracker.pack_hash(query))
+                    assert distance == expected and per_uuid[uuid] == expected, \
+                        f"Got {uuid}/{distance}, expected distance {expected} ({per_uuid})"
+                    other = legacy["dict0002"][0]
+                    assert tracker.hamming_distance(tracker.pack_hash(query), tracker.pack_hash(other)) == \
+                        legacy_distance(query, other)
+            
+            check(tracker)
+            print("✓ Legacy list and JSON-string histories match like the element-wise distance")
+            
+            tracker.close()
+            stored = json.loads(Path(db_path).read_text())
+            assert all(isinstance(h, str) and not h.startswith("[")
+                       for entry in stored.values() for h in entry["phash_history"]), "DB not migrated"
+            tracker = ParticipantTracker(db_path=db_path, hash_size=hash_size, flush_interval=0)
+            trackers.append(tracker)
+            check(tracker)
+            print("✓ Migrated to packed hex on save; reloaded DB matches the same")
+        
+        print("PASS: Packed pHash matching")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+    finally:
+        for tracker in trackers:
+            tracker.close()
+
+
+def test_landmark_filter():
+    """Test EMA mode against the original smoothing, One-Euro step response, slot growth and forget."""
+    print("\n" + "=" * 60)
+    print("TEST: Landmark Filter")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        sys.path.insert(0, str(Path(__file__).parent.parent / "mediapipe"))
+        from landmark_filter import LandmarkFilter
+        
+        def reference_ema(state, uuid, raw, alpha=0.15):
+            """The per-landmark loop of the original _smooth_landmarks."""
+            prev = state.get(uuid, raw)
+            smoothed = [(alpha * r[0] + (1 - alpha) * p[0], alpha * r[1] + (1 - alpha) * p[1],
+                         alpha * r[2] + (1 - alpha) * p[2], r[3]) for r, p in zip(raw, prev)]
+            state[uuid] = smoothed
+            return smoothed
+        
+        rng = np.random.default_rng(0)
+        ema = LandmarkFilter(mode="ema", alpha=0.15, capacity=1)
+        state = {}
+        schedule = [["a"], ["a", "b"], ["b", "a"], ["a", "b", "c"], ["c"], ["a", "c"]] * 5
+        for t, uuids in enumerate(schedule):
+            keypoints = rng.random((len(uuids), 33, 4)).astype(np.float32)
+            out = ema.filter(uuids, keypoints, t / 30.0)
+            for row, uuid in enumerate(uuids):
+                expected = np.array(reference_ema(state, uuid, keypoints[row].tolist()), dtype=np.float32)
+                assert np.allclose(out[row], expected, atol=1e-5), f"EMA differs for {uuid} at frame {t}"
+        print("✓ EMA mode reproduces the original alpha=0.15 smoothing (slots grown from 1 to 3)")
+        
+        one_euro = LandmarkFilter(mode="one_euro")
+        pose = np.zeros((1, 33, 4), dtype=np.float32)
+        pose[..., 3] = 1.0
+        for t in range(30):
+            out = one_euro.filter(["a"], pose, t / 30.0)
+        step = pose.copy()
+        step[..., :3] = 0.5
+        errors = []
+        for t in range(30, 90):
+            out = one_euro.filter(["a"], step, t / 30.0)
+            errors.append(float(np.abs(out[..., :3] - 0.5).max()))
+            assert (out[..., :3] <= 0.5 + 1e-6).all(), "One-Euro overshot the step"
+        assert all(b <= a + 1e-7 for a, b in zip(errors, errors[1:])), "Step response not monotonic"
+        assert errors[0] > 0.01 and errors[15] < 0.01 and errors[-1] < 1e-4, errors[::10]
+        assert np.array_equal(out[..., 3], step[..., 3]), "Visibility was filtered"
+        print(f"✓ One-Euro converges on a step (error {errors[0]:.3f} -> {errors[15]:.4f} after 0.5 s)")
+        
+        one_euro.forget("a")
+        assert len(one_euro) == 0
+        fresh = rng.random((1, 33, 4)).astype(np.float32)
+        out = one_euro.filter(["d"], fresh, 5.0)  # Reuses a's slot
+        assert np.array_equal(out, fresh), "New participant inherited forgotten state"
+        one_euro.forget("unknown")  # No-op
+        print("✓ forget() frees the slot; a new participant starts from its raw pose")
+        
+        print("PASS: Landmark filter")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
+def test_mask_refiner():
+    """Test bbox-restricted mask refinement against the original full-frame pass."""
+    print("\n" + "=" * 60)
+    print("TEST: Mask Refiner")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        import cv2
+        from types import SimpleNamespace
+        sys.path.insert(0, str(Path(__file__).parent.parent / "mediapipe"))
+        from mask_refiner import refine_mask
+        
+        def full_frame_refine(soft_mask):
+            """The original per-mask cleanup in MultiPersonDetector, over the whole frame."""
+            mask = cv2.GaussianBlur((soft_mask * 255).astype(np.uint8), (5, 5), 0)
+            _, mask = cv2.threshold(mask, 160, 255, cv2.THRESH_BINARY)
+            kernel = np.ones((3, 3), np.uint8)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+            mask = cv2.GaussianBlur(mask, (5, 5), 0)
+            _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            largest = max(contours, key=cv2.contourArea)
+            mask = np.zeros_like(mask)
+            cv2.drawContours(mask, [largest], -1, 255, -1)
+            return mask
+        
+        def landmarks(points, width, height):
+            return [SimpleNamespace(x=x / width, y=y / height) for x, y in points]
+        
+        rng = np.random.default_rng(0)
+        height, width = 240, 320
+        soft = np.zeros((height, width), dtype=np.float32)
+        cv2.ellipse(soft, (160, 120), (40, 90), 0, 0, 360, 1.0, -1)
+        soft = np.clip(cv2.GaussianBlur(soft, (9, 9), 0) + rng.normal(0, 0.15, soft.shape), 0, 1).astype(np.float32)
+        
+        cases = {
+            "inside the bbox": landmarks([(130, 40), (190, 200)], width, height),
+            "past the bbox edge": landmarks([(150, 100), (170, 130)], width, height),
+            "at the frame edge": landmarks([(0, 0), (319, 239)], width, height),
+        }
+        for name, lms in cases.items():
+            refined = refine_mask(soft, lms)
+            assert np.array_equal(refined.full(), full_frame_refine(soft)), f"Mask {name} differs from full-frame pass"
+            print(f"✓ Person {name} matches the full-frame pass")
+        
+        assert np.array_equal(refine_mask(soft).full(), full_frame_refine(soft))
+        half = refine_mask(soft, cases["inside the bbox"], scale=0.5).full()
+        assert (half != full_frame_refine(soft)).mean() < 0.01, "Half-scale mask drifted"
+        print("✓ No landmarks and half-scale refinement")
+        
+        print("PASS: Mask refiner")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
+def test_zone_engine():
+    """Test vectorized zone membership against cv2.pointPolygonTest, and update() validation."""
+    print("\n" + "=" * 60)
+    print("TEST: Zone Engine")
+    print("=" * 60)
+    
+    try:
+        import cv2
+        import numpy as np
+        sys.path.insert(0, str(Path(__file__).parent.parent / "mediapipe"))
+        from zone_filter import ZoneFilter, ZoneSet
+        
+        # Config order differs from the engine's rects-then-polygons order;
+        # polygons have different edge counts (padded edges) and one is concave
+        config = {
+            "z_range": {"min": -1.0, "max": 1.0},
+            "zones": [
+                {"name": "tri", "polygon": [[0.125, 0.875], [0.5, 0.25], [0.875, 0.875]]},
+                {"name": "left", "rect": {"x": 0.0, "y": 0.0, "width": 0.375, "height": 0.75}},
+                {"name": "notch", "polygon": [[0.5, 0.0], [1.0, 0.0], [1.0, 0.5], [0.75, 0.5],
+                                              [0.75, 0.25], [0.5, 0.25]]},
+                {"name": "right", "rect": {"x": 0.625, "y": 0.5, "width": 0.25, "height": 0.25},
+                 "z_range": {"min": 0.0, "max": 0.5}},
+            ],
+        }
+        zones = ZoneSet(config)
+        assert zones.names == ["tri", "left", "notch", "right"], zones.names
+        
+        # One landmark per pose on a 1/16 grid: inside, outside and exactly on edges and corners
+        grid = np.arange(17) / 16.0
+        points = np.array([(x, y) for x in grid for y in grid])
+        keypoints = np.zeros((len(points), 33, 4))
+        keypoints[:, 0, :2] = points
+        keypoints[:, 0, 2] = 0.25
+        keypoints[:, 0, 3] = 1.0
+        hits = zones.evaluate(keypoints)
+        assert hits.shape == (len(points), 4)
+        for column, shape in enumerate(zones.shapes):
+            expected = np.array([cv2.pointPolygonTest(shape.reshape(-1, 1, 2), (float(x), float(y)), False) >= 0
+                                 for x, y in points])
+            mismatches = points[hits[:, column] != expected]
+            assert len(mismatches) == 0, f"{zones.names[column]} differs from cv2 at {mismatches[:5].tolist()}"
+        edge_points = {(0.3125, 0.5625): "tri", (0.375, 0.5): "left", (0.75, 0.375): "notch", (0.875, 0.625): "right"}
+        for (x, y), name in edge_points.items():
+            assert hits[np.flatnonzero((points == (x, y)).all(axis=1))[0], zones.names.index(name)], (x, y, name)
+        print(f"✓ {len(points)} grid points (incl. edges/corners) match cv2.pointPolygonTest for rects and polygons")
+        
+        def pose(*landmarks):
+            kp = np.zeros((33, 4))
+            kp[:len(landmarks)] = np.array(landmarks).reshape(-1, 4)
+            return kp
+        
+        batch = np.stack([
+            pose((0.5, 0.75, 0.25, 1.0)),                          # tri only
+            pose((0.1, 0.1, 0.25, 1.0), (0.9, 0.1, 0.25, 1.0)),   # left + notch
+            pose((0.75, 0.625, 0.75, 1.0)),                        # right's xy, z outside its own range
+            pose((0.75, 0.625, 0.75, 1.0), (0.95, 0.95, 0.25, 1.0)),  # Another landmark brings z into range
+            pose(),                                                # All-zero padding row at (0, 0) in "left"
+        ])
+        assert zones.evaluate(batch).tolist() == [
+            [True, False, False, False],
+            [False, True, True, False],
+            [False, False, False, False],
+            [False, False, False, True],
+            [False, False, False, False],
+        ], zones.evaluate(batch).tolist()
+        assert zones.evaluate(np.zeros((0, 33, 4))).shape == (0, 4)
+        strict = ZoneSet({**config, "min_landmarks": 2})
+        assert strict.evaluate(batch[:2]).tolist() == [[False] * 4, [False, True, True, False]]
+        print("✓ Columns follow config order; zero padding rows, per-zone z_range and min_landmarks respected")
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config_path = str(Path(tmpdir) / "zone_config.json")
+            zone_filter = ZoneFilter(config_path, watch="off")
+            assert zone_filter.zone_names == ["main"]
+            saved = Path(config_path).read_text()
+            
+            invalid = [
+                {"bogus": 1},
+                {"screen_region": {"depth": 0.5}},
+                {"screen_region": 0.5},
+                {"screen_region": {"x": 1.5}},
+                {"z_range": {"min": 1.0, "max": 0.0}},
+                {"max_people": "three"},
+                {"zones": {"name": "a"}},
+                {"zones": [{"name": "a"}]},
+                {"zones": [{"name": "a", "rect": {"x": 0.0}}]},
+                {"zones": [{"name": "a", "polygon": [[0.0, 0.0], [1.0, 1.0]]}]},
+                {"zones": [{"name": "a", "rect": {"x": 0, "y": 0, "width": 1, "height": 1},
+                            "z_range": {"min": 1, "max": -1}}]},
+                ["not", "an", "object"],
+            ]
+            for changes in invalid:
+                try:
+                    zone_filter.update(changes)
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError(f"update accepted {changes}")
+            assert zone_filter.zone_names == ["main"] and Path(config_path).read_text() == saved
+            print(f"✓ update() rejects {len(invalid)} invalid changes, leaving config and file untouched")
+            
+            updated = zone_filter.update({"zones": config["zones"], "min_landmarks": "2", "screen_region": {"x": 0.25}})
+            assert updated["min_landmarks"] == 2 and updated["screen_region"]["x"] == 0.25
+            assert zone_filter.zone_names == ["tri", "left", "notch", "right"]
+            assert json.loads(Path(config_path).read_text())["zones"] == config["zones"]
+            assert not zone_filter.reload(), "Own write triggered a reload"
+            assert zone_filter.evaluate(batch[:2]).tolist() == [[False] * 4, [False, True, True, False]]
+            zone_filter.close()
+            print("✓ Valid update() coerces types, recompiles zones and saves without a reload")
+            
+            try:
+                ZoneFilter(config_path, watch="sometimes")
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("Unknown watch mode accepted")
+        
+        print("PASS: Zone engine")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
+def test_ndi_stream_registry():
+    """Test that NDI stream create/remove on one thread never breaks get_stats on another."""
+    print("\n" + "=" * 60)
+    print("TEST: NDI Stream Registry")
+    print("=" * 60)
+    
+    try:
+        import threading
+        import types
+        sys.path.insert(0, str(Path(__file__).parent.parent / "mediapipe"))
+        import ndi_streamer
+        
+        # Stand-in for NDIlib: senders are plain objects, sends are no-ops
+        fake_ndi = types.SimpleNamespace(
+            initialize=lambda: True, destroy=lambda: None,
+            SendCreate=types.SimpleNamespace, send_create=lambda settings: object(),
+            send_destroy=lambda sender: None, send_send_video_v2=lambda sender, frame: None,
+            VideoFrameV2=types.SimpleNamespace, FOURCC_VIDEO_TYPE_BGRX=0,
+        )
+        saved = (getattr(ndi_streamer, "ndi", None), ndi_streamer.NDI_AVAILABLE)
+        ndi_streamer.ndi, ndi_streamer.NDI_AVAILABLE = fake_ndi, True
+        try:
+            streamer = ndi_streamer.NDIStreamer()
+            stop = threading.Event()
+            
+            def churn():
+                for i in range(100):
+                    streamer.create_stream(f"uuid{i % 7}", 32, 24)
+                    streamer.remove_stream(f"uuid{(i + 3) % 7}")
+                stop.set()
+            
+            thread = threading.Thread(target=churn)
+            thread.start()
+            reads = 0
+            while not stop.is_set():
+                streamer.get_stats()  # Raised "dictionary changed size during iteration" unguarded
+                reads += 1
+            thread.join()
+            assert set(streamer.get_stats()) == set(streamer.streams)
+            streamer.close()
+            assert not streamer.streams, "close() left streams behind"
+            print(f"✓ {reads} get_stats() calls during 100 create/remove cycles")
+        finally:
+            if saved[0] is None:
+                del ndi_streamer.ndi
+            else:
+                ndi_streamer.ndi = saved[0]
+            ndi_streamer.NDI_AVAILABLE = saved[1]
+        
+        print("PASS: NDI stream registry")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
 def test_td_score_watcher():
     """Test that TD can watch score JSON files."""
     print("\n" + "=" * 60)
@@ -258,6 +1239,330 @@ def test_td_ndi_uuid_parsing():
         return False
 
 
+def test_error_diffusion():
+    """Test vectorized dithering against the per-pixel Atkinson loop."""
+    print("\n" + "=" * 60)
+    print("TEST: Error Diffusion Dithering")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        sys.path.insert(0, str(Path(__file__).parent.parent / "pre_render"))
+        from dithering import ERROR_DIFFUSION_KERNELS, atkinson_reference, error_diffuse
+        
+        rng = np.random.default_rng(7)
+        for h, w in [(1, 1), (3, 2), (2, 9), (31, 47)]:
+            gray = rng.integers(0, 256, (h, w), dtype=np.uint8)
+            assert np.array_equal(error_diffuse(gray, "atkinson"), atkinson_reference(gray)), f"{w}x{h} differs"
+        print("✓ Atkinson bit-exact with the Python loop")
+        
+        gray = np.full((24, 32), 64, dtype=np.uint8)
+        for kernel in ERROR_DIFFUSION_KERNELS:
+            result = error_diffuse(gray, kernel)
+            assert set(np.unique(result)) <= {0, 255}
+            coverage = (result == 255).mean()
+            assert 0.15 < coverage < 0.35, f"{kernel}: {coverage:.2f} white for 25% gray"
+        print(f"✓ {len(ERROR_DIFFUSION_KERNELS)} kernels preserve mean brightness")
+        
+        print("PASS: Error diffusion")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
+def test_depth_banding():
+    """Test the array-based depth banding kernel against the per-pixel loop."""
+    print("\n" + "=" * 60)
+    print("TEST: Depth Banding")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        sys.path.insert(0, str(Path(__file__).parent.parent / "pre_render"))
+        from depth_effects import depth_banding
+        
+        depth = np.tile(np.arange(256, dtype=np.uint8), (64, 1))  # Every (row, depth) pair
+        expected = np.zeros_like(depth)
+        for y in range(depth.shape[0]):
+            for x in range(depth.shape[1]):
+                d = depth[y, x]
+                if d < 10:
+                    continue
+                line_spacing = max(2, int(20 - d / 15))
+                wave = int(np.sin(y * 0.1 + d * 0.05) * 3)
+                if (y + wave) % line_spacing < 2:
+                    expected[y, x] = 255
+        assert np.array_equal(depth_banding(depth, noise_density=0), expected)
+        print("✓ Bands match the per-pixel loop")
+        
+        batch = depth_banding(np.stack([depth, depth[::-1]]), rng=np.random.default_rng(0))
+        assert batch.shape == (2,) + depth.shape
+        assert (batch[0] >= expected).all() and (batch[0] > expected).any()
+        print("✓ Batch input, noise only adds lit pixels")
+        
+        print("PASS: Depth banding")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
+def test_effect_graph():
+    """Test the streaming effect graph: pruning, frame order, sinks and chronophoto stills."""
+    print("\n" + "=" * 60)
+    print("TEST: Effect Graph")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        import cv2
+        sys.path.insert(0, str(Path(__file__).parent.parent / "pre_render"))
+        from depth_effects import ChronophotoAccumulator, create_chronophotography
+        from effect_graph import EffectGraph, Node, PngSink
+        
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (24, 32, 3), dtype=np.uint8) for _ in range(7)]
+        for mode in ("lighten", "add", "screen", "lighten_add", "hero_ghost"):
+            acc = ChronophotoAccumulator(mode)
+            for i, frame in enumerate(frames):
+                acc.add(frame[:, :, 0])
+                expected = create_chronophotography([f[:, :, 0] for f in frames[:i + 1]], mode)
+                assert np.array_equal(acc.result(), expected), f"{mode} differs after {i + 1} frames"
+        print("✓ Chronophoto accumulator matches the batch composite")
+        
+        calls = []
+        seen = []
+        def remember(gray):
+            seen.append(int(gray[0, 0]))
+            return gray
+        graph = EffectGraph(batch_size=3, workers=4)
+        graph.add(Node("gray", lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), ["frame"]))
+        graph.add(Node("unused", lambda gray: calls.append(gray), ["gray"]))
+        graph.add(Node("ordered", remember, ["gray"], stateful=True))
+        assert graph.active_streams() == [], "Nodes active without sinks"
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            sink = PngSink(str(Path(tmp) / "ordered"))
+            graph.sink("ordered", sink)
+            assert graph.active_streams() == ["gray", "ordered"]
+            assert graph.run(iter(frames)) == len(frames)
+            assert not calls, "Pruned node ran"
+            gray = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in frames]
+            assert seen == [int(g[0, 0]) for g in gray], "Stateful node saw frames out of order"
+            written = sorted(Path(sink.folder).iterdir())
+            assert [p.name for p in written] == [f"frame_{i:04d}.png" for i in range(len(frames))]
+            assert np.array_equal(cv2.imread(str(written[-1]), cv2.IMREAD_GRAYSCALE), gray[-1])
+        print("✓ Unneeded nodes pruned, stateful node in order, PNG sink complete")
+        
+        print("PASS: Effect graph")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
+def test_frame_source():
+    """Test sequential frame decoding against per-frame seeking."""
+    print("\n" + "=" * 60)
+    print("TEST: Frame Source")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        import cv2
+        from common.frame_source import FrameSource
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "clip.mp4")
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 24, (64, 48))
+            for i in range(48):
+                frame = np.zeros((48, 64, 3), dtype=np.uint8)
+                cv2.putText(frame, str(i), (4, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+                writer.write(frame)
+            writer.release()
+            
+            def seek(frame_numbers):
+                cap = cv2.VideoCapture(path)
+                frames = []
+                for n in frame_numbers:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, int(n))
+                    frames.append(cap.read()[1])
+                cap.release()
+                return frames
+            
+            source = FrameSource(path, target_fps=12, prefetch=2)
+            assert len(source) == 24 and source.indices[-1] == 47, f"Unexpected sampling {source.indices}"
+            frames = list(source)
+            assert [n for n, _ in frames] == list(source.indices)
+            assert all(np.array_equal(f, s) for (_, f), s in zip(frames, seek(source.indices)))
+            print("✓ Time-based sampling matches seeking")
+            
+            source = FrameSource(path, indices=[0, 3, 3, 40, 60], max_skip=10)
+            frames = list(source)
+            assert [n for n, _ in frames] == [0, 3, 3, 40], "Repeats or end of video mishandled"
+            assert all(np.array_equal(f, s) for (_, f), s in zip(frames, seek([0, 3, 3, 40])))
+            print("✓ Repeated indices, long-gap seeks and end of video")
+            
+            import common.frame_source as frame_source
+            real_capture, real_max_failures = cv2.VideoCapture, frame_source.MAX_CONSECUTIVE_FAILURES
+            bad_grabs, bad_retrieves = set(), set()
+            
+            class FlakyCapture:
+                """VideoCapture whose grab()/retrieve() fail at chosen frame numbers."""
+                def __init__(self, *args):
+                    self.cap, self.position = real_capture(*args), 0
+                def grab(self):
+                    self.position += 1
+                    return self.cap.grab() and self.position - 1 not in bad_grabs
+                def retrieve(self):
+                    return (False, None) if self.position - 1 in bad_retrieves else self.cap.retrieve()
+                def set(self, prop, value):
+                    if prop == cv2.CAP_PROP_POS_FRAMES:
+                        self.position = int(value)
+                    return self.cap.set(prop, value)
+                def __getattr__(self, name):
+                    return getattr(self.cap, name)
+            
+            try:
+                cv2.VideoCapture = FlakyCapture
+                bad_grabs.update({5}), bad_retrieves.update({9, 10})
+                frames = list(FrameSource(path, indices=[0, 4, 5, 5, 6, 9, 10, 11, 30]))
+                assert [n for n, _ in frames] == [0, 4, 6, 11, 30], [n for n, _ in frames]
+                assert all(np.array_equal(f, s) for (_, f), s in zip(frames, seek([0, 4, 6, 11, 30])))
+                print("✓ Failed grab/retrieve skips only that frame")
+                
+                frame_source.MAX_CONSECUTIVE_FAILURES = 3
+                bad_retrieves.clear()
+                bad_grabs.update({20, 21, 22})
+                numbers = [n for n, _ in FrameSource(path)]
+                assert numbers == [n for n in range(20) if n != 5], f"Expected stop at frame 20, got {numbers[-3:]}"
+                bad_grabs.discard(22)
+                numbers = [n for n, _ in FrameSource(path)]
+                assert numbers == [n for n in range(48) if n not in (5, 20, 21)], numbers
+                print("✓ Stream ends only after consecutive failures or at frame_count")
+                
+                class ShortCountCapture(FlakyCapture):
+                    """VideoCapture whose container under-reports its frame count."""
+                    def get(self, prop):
+                        return 10 if prop == cv2.CAP_PROP_FRAME_COUNT else self.cap.get(prop)
+                
+                cv2.VideoCapture = ShortCountCapture
+                bad_grabs.clear()
+                assert [n for n, _ in FrameSource(path)] == list(range(10)), "Sampled source should trust the count"
+                source = FrameSource(path, to_eof=True)
+                frames = list(source)
+                assert source.frame_count == 10 and [n for n, _ in frames] == list(range(48)), \
+                    f"Expected 48 frames to EOF, got {len(frames)}"
+                assert all(np.array_equal(f, s) for (_, f), s in zip(frames, seek(range(48))))
+                print("✓ to_eof decodes past an under-reported frame count")
+            finally:
+                cv2.VideoCapture = real_capture
+                frame_source.MAX_CONSECUTIVE_FAILURES = real_max_failures
+            
+            for n, _ in FrameSource(path, prefetch=1):
+                if n == 2:
+                    break
+            print("✓ Early exit stops the decode thread")
+        
+        print("PASS: Frame source")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
+def test_depth_stage():
+    """Test the depth stage: ordered prefetching, depth cache, lazy model, graph run-ahead."""
+    print("\n" + "=" * 60)
+    print("TEST: Depth Stage")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        import cv2
+        from PIL import Image
+        sys.path.insert(0, str(Path(__file__).parent.parent / "pre_render"))
+        from depth_stage import DepthCache, DepthStage, normalize_depth
+        from effect_graph import BatchNode, EffectGraph, Node
+        
+        calls = []
+        def fake_model(images):
+            calls.append(len(images))
+            return [{"depth": Image.fromarray(np.asarray(image)[:, :, 0])} for image in images]
+        
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (24, 32, 3), dtype=np.uint8) for _ in range(10)]
+        expected = [normalize_depth(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)[:, :, 0]) for f in frames]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            stage = DepthStage(lambda: fake_model, DepthCache(tmp, "org/model"), batch_size=4, prefetch=1)
+            results = list(stage.map(range(10), load=lambda i: frames[i]))
+            stage.close()
+            assert [item for item, _, _ in results] == list(range(10)), "Out of order"
+            assert all(np.array_equal(d, e) for (_, _, d), e in zip(results, expected))
+            assert calls == [4, 4, 2] and (stage.hits, stage.misses) == (0, 10)
+            print("✓ Batched, in order, model called once per batch")
+            
+            def no_model():
+                raise AssertionError("Model loaded despite a full cache")
+            stage = DepthStage(no_model, DepthCache(tmp, "org/model"))
+            assert all(np.array_equal(d, e) for d, e in zip(stage.estimate(frames[:3]), expected))
+            assert stage.hits == 3
+            stage.close()
+            stage = DepthStage(lambda: fake_model, DepthCache(tmp, "other/model"))
+            stage.estimate(frames[:1])
+            stage.close()
+            assert stage.misses == 1, "Cache shared across models"
+            print("✓ Cache hits skip the model; entries are per model")
+            
+            import threading
+            stage = DepthStage(lambda: fake_model, writers=4)
+            futures = []
+            def submitter():
+                for _ in range(300):
+                    futures.append(stage.submit(time.sleep, 0.0005))
+            thread = threading.Thread(target=submitter)
+            thread.start()
+            while thread.is_alive():
+                stage.flush()  # Concurrent with submit(), as with a run-ahead depth node
+            thread.join()
+            stage.close()
+            assert all(f.done() for f in futures), "flush() lost a write submitted concurrently"
+            print("✓ Writes submitted from another thread are all flushed")
+        
+        class NullSink:
+            def write(self, idx, image):
+                pass
+            def close(self):
+                pass
+        
+        order = []
+        graph = EffectGraph(batch_size=3, workers=2)
+        graph.add(BatchNode("depth", lambda fs: [f[:, :, 0] for f in fs], ["frame"], ahead=True))
+        graph.add(Node("ordered", lambda d: order.append(int(d[0, 0])) or d, ["depth"], stateful=True))
+        graph.sink("ordered", NullSink())
+        assert graph.run(iter(frames)) == len(frames)
+        assert order == [int(f[0, 0, 0]) for f in frames], "Run-ahead node broke frame order"
+        try:
+            graph.add(BatchNode("bad", lambda ds: ds, ["depth"], ahead=True))
+            raise AssertionError("Run-ahead node accepted a derived input")
+        except ValueError:
+            pass
+        print("✓ Run-ahead batch node keeps frame order")
+        
+        print("PASS: Depth stage")
+        return True
+        
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return False
+
+
 def main():
     """Run all integration tests."""
     print("\n" + "=" * 60)
@@ -268,8 +1573,26 @@ def main():
     
     results.append(("Shared Memory Round-Trip", test_shared_memory_roundtrip()))
     results.append(("Scoring Reads Shared Memory", test_scoring_reads_shared_memory()))
+    results.append(("Reference Format", test_reference_format()))
+    results.append(("Array Codec Matches Struct", test_array_codec_matches_struct()))
+    results.append(("Ring Buffer Frames", test_ring_buffer_frames()))
+    results.append(("Wake On Write", test_wake_on_write()))
+    results.append(("Score Table", test_score_table()))
+    results.append(("Thumbnail Atlas", test_thumbnail_atlas()))
+    results.append(("Participant Lifecycle", test_participant_lifecycle()))
+    results.append(("Participant DB Journal", test_participant_db_journal()))
+    results.append(("Packed pHash Matching", test_packed_phash_matching()))
+    results.append(("Landmark Filter", test_landmark_filter()))
+    results.append(("Mask Refiner", test_mask_refiner()))
+    results.append(("Zone Engine", test_zone_engine()))
+    results.append(("NDI Stream Registry", test_ndi_stream_registry()))
     results.append(("TD Score Watcher", test_td_score_watcher()))
     results.append(("TD NDI UUID Parsing", test_td_ndi_uuid_parsing()))
+    results.append(("Error Diffusion", test_error_diffusion()))
+    results.append(("Depth Banding", test_depth_banding()))
+    results.append(("Effect Graph", test_effect_graph()))
+    results.append(("Frame Source", test_frame_source()))
+    results.append(("Depth Stage", test_depth_stage()))
     
     print("\n" + "=" * 60)
     print("SUMMARY")